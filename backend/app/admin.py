@@ -0,0 +1,29 @@
+"""
+Admin - Token check for operator-only endpoints
+"""
+import logging
+import os
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    FastAPI dependency for admin endpoints
+
+    Raises:
+        HTTPException: 404 when ADMIN_TOKEN is not configured, 403 when the
+            X-Admin-Token header is missing or wrong
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        logger.warning("⚠️ Rejected admin request with missing or invalid token")
+        raise HTTPException(status_code=403, detail="Invalid admin token")
@@ -0,0 +1,191 @@
+"""
+Agent Registry - Lazy agent construction with background warm-up and readiness reporting
+"""
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Construct agents in the background as soon as the server starts
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "true").lower() == "true"
+# Agents warmed concurrently (each warm-up runs in a worker thread)
+AGENT_WARMUP_CONCURRENCY = int(os.getenv("AGENT_WARMUP_CONCURRENCY", "4"))
+
+COLD, WARMING, READY, FAILED = "cold", "warming", "ready", "failed"
+
+
+@dataclass
+class AgentSlot:
+    """One registered agent: where to find it and how construction went"""
+    name: str
+    target: str
+    required: bool = True
+    state: str = COLD
+    instance: Any = None
+    error: Optional[str] = None
+    seconds: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "required": self.required,
+            "seconds": self.seconds,
+            "error": self.error
+        }
+
+
+class AgentRegistry:
+    """
+    Imports and constructs agents on first use instead of at module load
+    Features:
+    - Agents are registered as "module:Class" and built once, on first use or
+      by warm_up(); construction is thread-safe
+    - warm_up() builds agents in worker threads so slow imports (SDKs, torch)
+      and model loads never run on the event loop
+    - Construction failures are reported by status() instead of stopping the
+      server from starting
+    """
+
+    def __init__(self):
+        self._slots: Dict[str, AgentSlot] = {}
+
+    def register(self, name: str, target: str, required: bool = True) -> "LazyAgent":
+        """
+        Register an agent without importing it
+
+        Args:
+            name: Registry name (e.g. "listener")
+            target: "module.path:ClassName"
+            required: Whether readiness waits for this agent
+
+        Returns:
+            A proxy that constructs the agent on first attribute access
+        """
+        self._slots[name] = AgentSlot(name=name, target=target, required=required)
+        return LazyAgent(self, name)
+
+    def get(self, name: str) -> Any:
+        """
+        The agent instance, constructing it on this thread if needed
+
+        Raises:
+            KeyError: if no agent is registered under `name`
+            Exception: whatever the agent's import or constructor raised
+        """
+        slot = self._slots[name]
+        if slot.state == READY:
+            return slot.instance
+        with slot.lock:
+            if slot.state != READY:
+                self._construct(slot)
+        return slot.instance
+
+    def peek(self, name: str) -> Any:
+        """The agent instance if it is already constructed, else None"""
+        slot = self._slots[name]
+        return slot.instance if slot.state == READY else None
+
+    async def ensure(self, *names: str):
+        """Construct agents off the event loop; use before first use of a slow agent"""
+        for name in names:
+            if self._slots[name].state != READY:
+                await asyncio.to_thread(self.get, name)
+
+    def _construct(self, slot: AgentSlot):
+        slot.state = WARMING
+        start = time.perf_counter()
+        try:
+            module_name, _, class_name = slot.target.partition(":")
+            agent_class = getattr(importlib.import_module(module_name), class_name)
+            slot.instance = agent_class()
+        except Exception as e:
+            slot.state = FAILED
+            slot.error = f"{type(e).__name__}: {e}"
+            slot.seconds = round(time.perf_counter() - start, 3)
+            logger.error("❌ Failed to initialize %s agent: %s", slot.name, slot.error)
+            raise
+        slot.seconds = round(time.perf_counter() - start, 3)
+        slot.error = None
+        slot.state = READY
+        logger.info("🔥 %s agent ready in %.2fs", slot.name, slot.seconds)
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None, concurrency: int = AGENT_WARMUP_CONCURRENCY):
+        """
+        Construct agents in worker threads; failures are logged and kept in status()
+
+        Args:
+            names: Agents to warm (default: all registered)
+            concurrency: Agents constructed at the same time
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        start = time.perf_counter()
+
+        async def warm(name: str):
+            async with semaphore:
+                try:
+                    await self.ensure(name)
+                except Exception:
+                    pass  # Recorded on the slot and logged by _construct
+
+        await asyncio.gather(*(warm(name) for name in (names or list(self._slots))))
+        failed = [name for name, slot in self._slots.items() if slot.state == FAILED]
+        logger.info(
+            "🔥 Agent warm-up finished in %.2fs%s",
+            time.perf_counter() - start, f" ({len(failed)} failed: {', '.join(failed)})" if failed else ""
+        )
+
+    def ready(self) -> bool:
+        """Whether every required agent is constructed"""
+        return all(slot.state == READY for slot in self._slots.values() if slot.required)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: slot.status() for name, slot in self._slots.items()}
+
+    def names(self) -> List[str]:
+        return list(self._slots)
+
+
+class LazyAgent:
+    """
+    Stand-in for an agent that is constructed on first attribute access
+
+    Module-level handles (listener_agent, qa_agent, ...) keep working unchanged.
+    Access on the event loop constructs synchronously if warm-up hasn't reached
+    the agent yet; call `await agent_registry.ensure(name)` first where that
+    could be slow (the listener loads Whisper models).
+    """
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: AgentRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self) -> str:
+        return f"<LazyAgent {self._name} ({self._registry._slots[self._name].state})>"
+
+
+# Shared registry the API registers its agents with
+agent_registry = AgentRegistry()
+
+metrics_registry.gauge(
+    "agent_ready",
+    "Whether an agent has been constructed (1) or not yet / failed (0)",
+    ["agent"],
+    collect=lambda: {(name,): float(status["state"] == READY) for name, status in agent_registry.status().items()}
+)
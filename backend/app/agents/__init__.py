@@ -1,18 +1,24 @@
 """
 Multi-Agent System Package
+
+Agents are imported on first access so importing one agent (or the package)
+doesn't pull in every provider SDK.
 """
-from .listener_agent import ListenerAgent
-from .summarizer_agent import SummarizerAgent
-from .task_generator_agent import TaskGeneratorAgent
-from .integration_agent import IntegrationAgent
-from .qa_agent import QAAgent
-from .personalized_assistant_agent import PersonalizedAssistantAgent
+import importlib
+
+_AGENT_MODULES = {
+    "ListenerAgent": ".listener_agent",
+    "SummarizerAgent": ".summarizer_agent",
+    "TaskGeneratorAgent": ".task_generator_agent",
+    "IntegrationAgent": ".integration_agent",
+    "QAAgent": ".qa_agent",
+    "PersonalizedAssistantAgent": ".personalized_assistant_agent"
+}
+
+__all__ = list(_AGENT_MODULES)
+
 
-__all__ = [
-    "ListenerAgent",
-    "Summarizer Agent",
-    "TaskGeneratorAgent",
-    "IntegrationAgent",
-    "QAAgent",
-    "PersonalizedAssistantAgent"
-]
+def __getattr__(name):
+    if name in _AGENT_MODULES:
+        return getattr(importlib.import_module(_AGENT_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,15 @@
 """
 Deepgram Real-Time Agent - Handles true real-time transcription using Deepgram streaming API
 """
+import logging
 import os
 import json
 import asyncio
 from deepgram import DeepgramClient, LiveTranscriptionEvents, LiveOptions
 from typing import Optional, Callable
+from app.metrics import record_outcome, stt_audio_bytes, stt_calls, timed
+
+logger = logging.getLogger(__name__)
 
 
 class DeepgramRealtimeAgent:
@@ -27,8 +31,9 @@ class DeepgramRealtimeAgent:
         self.connection = None
         self.is_connected = False
 
-        print(f"✅ Deepgram Real-Time Agent initialized")
+        logger.info("✅ Deepgram Real-Time Agent initialized")
 
+    @timed("deepgram")
     async def start_streaming(
         self,
         on_transcript: Callable,
@@ -60,7 +65,7 @@ class DeepgramRealtimeAgent:
 
             # Set up event handlers
             def on_open(self, open_event, **kwargs):
-                print("🎙️ Deepgram connection opened")
+                logger.info("🎙️ Deepgram connection opened")
                 self.is_connected = True
 
             def on_message(self, result, **kwargs):
@@ -78,22 +83,27 @@ class DeepgramRealtimeAgent:
                     if hasattr(first_word, 'speaker') and first_word.speaker is not None:
                         speaker = f"Speaker {first_word.speaker + 1}"
 
+                # Seconds of streamed audio this result covers up to
+                audio_end = (getattr(result, "start", 0) or 0) + (getattr(result, "duration", 0) or 0)
+
                 # Call the callback with transcript data
                 if asyncio.iscoroutinefunction(on_transcript):
                     asyncio.create_task(on_transcript({
                         "text": sentence,
                         "is_final": is_final,
-                        "speaker": speaker
+                        "speaker": speaker,
+                        "audio_end": audio_end
                     }))
                 else:
                     on_transcript({
                         "text": sentence,
                         "is_final": is_final,
-                        "speaker": speaker
+                        "speaker": speaker,
+                        "audio_end": audio_end
                     })
 
             def on_error_event(self, error, **kwargs):
-                print(f"❌ Deepgram error: {error}")
+                logger.error("❌ Deepgram error: %s", error)
                 if on_error:
                     if asyncio.iscoroutinefunction(on_error):
                         asyncio.create_task(on_error(error))
@@ -101,7 +111,7 @@ class DeepgramRealtimeAgent:
                         on_error(error)
 
             def on_close(self, close_event, **kwargs):
-                print("🔌 Deepgram connection closed")
+                logger.info("🔌 Deepgram connection closed")
                 self.is_connected = False
 
             # Register event handlers
@@ -111,13 +121,15 @@ class DeepgramRealtimeAgent:
             self.connection.on(LiveTranscriptionEvents.Close, on_close)
 
             # Start the connection
+            stt_calls.inc(provider="deepgram", operation="stream")
             if self.connection.start(options) is False:
                 raise Exception("Failed to start Deepgram connection")
 
-            print("✅ Deepgram streaming started")
+            logger.info("✅ Deepgram streaming started")
 
         except Exception as e:
-            print(f"❌ Failed to start Deepgram streaming: {e}")
+            record_outcome("error")
+            logger.error("❌ Failed to start Deepgram streaming: %s", e)
             raise
 
     def send_audio(self, audio_bytes: bytes):
@@ -130,8 +142,9 @@ class DeepgramRealtimeAgent:
         if self.connection and self.is_connected:
             try:
                 self.connection.send(audio_bytes)
+                stt_audio_bytes.inc(len(audio_bytes), provider="deepgram")
             except Exception as e:
-                print(f"❌ Error sending audio to Deepgram: {e}")
+                logger.error("❌ Error sending audio to Deepgram: %s", e)
 
     def finish(self):
         """
@@ -140,6 +153,6 @@ class DeepgramRealtimeAgent:
         if self.connection and self.is_connected:
             try:
                 self.connection.finish()
-                print("✅ Deepgram streaming finished")
+                logger.info("✅ Deepgram streaming finished")
             except Exception as e:
-                print(f"❌ Error finishing Deepgram stream: {e}")
+                logger.error("❌ Error finishing Deepgram stream: %s", e)
@@ -1,13 +1,65 @@
 """
 Emotion Analysis Agent - Detects sentiment and emotions using Claude (Anthropic)
 """
-import anthropic
+import logging
 import os
 import random
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional, Tuple
+from app.circuit_breaker import CircuitOpenError
+from app.fallbacks import local_message_emotion, local_transcript_emotions
+from app.hedging import DeadlineExceeded
+from app.llm_scheduler import BATCH, INTERACTIVE
+from app.metrics import record_outcome, timed
+from app.model_routing import CLAUDE_STRONG_MODEL, LOCAL, SKIP, STRONG, classify_utterance, local_tier_emotion, route_stats
 from app.models import TranscriptLine
+from app.prompt_cache import cached_system, cached_user_content
+from app.providers import create_llm_client
+from app.single_flight import normalize_text, single_flight
+from app.structured_output import MESSAGE_EMOTION_SCHEMA, json_tool, parse_structured
+from app.tokens import ContextBudget, count_tokens, prompt_budget, token_usage
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Frontend happiness percentage for each primary emotion
+EMOTION_TO_HAPPINESS = {
+    'excited': 95,
+    'very happy': 90,
+    'happy': 80,
+    'content': 70,
+    'calm': 60,
+    'focused': 60,
+    'neutral': 50,
+    'uncertain': 45,
+    'concerned': 35,
+    'frustrated': 25,
+    'disappointed': 20,
+    'sad': 15,
+    'angry': 10
+}
+POSITIVE_EMOTIONS = frozenset({'excited', 'very happy', 'happy', 'content', 'calm'})
+NEGATIVE_EMOTIONS = frozenset({'frustrated', 'disappointed', 'sad', 'angry', 'concerned'})
+
+
+def emotion_to_happiness(primary_emotion: str) -> Tuple[int, str]:
+    """
+    Map a primary emotion to the frontend's happiness percentage and sentiment
+
+    Args:
+        primary_emotion: Emotion name from analyze_single_message
+
+    Returns:
+        (happiness_level 0-100, "positive" | "negative" | "neutral")
+    """
+    if primary_emotion in POSITIVE_EMOTIONS:
+        sentiment = 'positive'
+    elif primary_emotion in NEGATIVE_EMOTIONS:
+        sentiment = 'negative'
+    else:
+        sentiment = 'neutral'
+    return EMOTION_TO_HAPPINESS.get(primary_emotion, 50), sentiment
+
 
 class EmotionAnalysisAgent:
     """
@@ -23,24 +75,23 @@ class EmotionAnalysisAgent:
         self.demo_mode = os.getenv("DEMO_MODE", "false").lower() == "true"
         
         if not self.demo_mode:
-            self.api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not self.api_key:
-                raise ValueError("ANTHROPIC_API_KEY not found in environment")
-            
-            # Create Claude client
-            self.client = anthropic.Anthropic(api_key=self.api_key)
+            # Claude client (or the simulated backend, see LLM_PROVIDER)
+            self.client = create_llm_client("emotion", priority=INTERACTIVE)
             self.model = os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307")
-            print(f"✅ Emotion Analysis Agent initialized with Claude model: {self.model}")
+            self.prompt_budget = prompt_budget("emotion", 8000)
+            logger.info("✅ Emotion Analysis Agent initialized with Claude model: %s", self.model)
         else:
             self.client = None
-            print("✅ Emotion Analysis Agent initialized in DEMO MODE")
+            logger.info("✅ Emotion Analysis Agent initialized in DEMO MODE")
     
-    async def analyze_emotions(self, transcript: List[TranscriptLine]) -> Dict:
+    @timed("emotion")
+    async def analyze_emotions(self, transcript: List[TranscriptLine], session_id: Optional[str] = None) -> Dict:
         """
         Analyze emotions and sentiment from meeting transcript
         
         Args:
             transcript: List of transcript lines with speaker and text
+            session_id: Meeting session ID for token accounting (optional)
             
         Returns:
             Dict containing emotion analysis results
@@ -66,11 +117,14 @@ class EmotionAnalysisAgent:
             if not transcript:
                 return {"error": "No transcript provided"}
             
-            # Prepare transcript text
-            transcript_text = "\n".join([
+            system_prompt = "You are an expert workplace emotion and sentiment analyst. Provide realistic, nuanced analysis of meeting emotions. Avoid being overly positive - most workplace communication is neutral or professional. Accurately identify genuine emotions, concerns, and stress indicators. Be honest about problems and challenges discussed. Always respond with valid JSON."
+
+            # Prepare transcript text (newest lines kept if over budget)
+            budget = ContextBudget(self.prompt_budget).reserve(system_prompt)
+            transcript_text = "\n".join(budget.take_lines([
                 f"{line.speaker}: {line.text}" 
                 for line in transcript
-            ])
+            ]))
             
             prompt = f"""Analyze the emotions and sentiment in this meeting transcript. Provide realistic, nuanced analysis - not all meetings are happy or positive.
 
@@ -118,11 +172,15 @@ Example response:
     "confidence_score": 0.85
 }}"""
 
-            response = self.client.messages.create(
+            prompt_tokens = count_tokens(system_prompt) + count_tokens(prompt)
+
+            # End-of-meeting report, not live UI
+            response = await self.client.messages.acreate(
+                priority=BATCH,
                 model=self.model,
                 max_tokens=1024,
                 temperature=0.2,  # Lower for more consistent analysis
-                system="You are an expert workplace emotion and sentiment analyst. Provide realistic, nuanced analysis of meeting emotions. Avoid being overly positive - most workplace communication is neutral or professional. Accurately identify genuine emotions, concerns, and stress indicators. Be honest about problems and challenges discussed. Always respond with valid JSON.",
+                system=cached_system(system_prompt, self.model),
                 messages=[
                     {
                         "role": "user",
@@ -130,16 +188,22 @@ Example response:
                     }
                 ]
             )
+
+            token_usage.record(session_id, "emotion", prompt_tokens, budget.trimmed_lines)
             
-            result = response.content[0].text
+            result = parse_structured(response, "emotion")
             
-            print(f"✅ Emotion analysis completed for meeting with {len(transcript)} lines")
+            logger.info("✅ Emotion analysis completed for meeting with %s lines", len(transcript))
             
-            import json
-            return json.loads(result)
+            return result
             
+        except CircuitOpenError as e:
+            record_outcome("fallback")
+            logger.warning("🔌 Emotion analysis using local scoring: %s", e)
+            return local_transcript_emotions(transcript)
         except Exception as e:
-            print(f"❌ Emotion analysis error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Emotion analysis error: %s", e)
             return {
                 "error": f"Emotion analysis failed: {str(e)}",
                 "overall_sentiment": "neutral",
@@ -151,16 +215,22 @@ Example response:
                 "confidence_score": 0.0
             }
     
-    async def analyze_single_message(self, speaker: str, text: str) -> Dict:
+    @timed("emotion")
+    @single_flight("emotion.analyze_single_message", key=lambda self, speaker, text, session_id=None: f"{session_id}\x1e{speaker}\x1e{normalize_text(text)}")
+    async def analyze_single_message(self, speaker: str, text: str, session_id: Optional[str] = None) -> Dict:
         """
         Analyze emotion of a single message in real-time
         
         Args:
             speaker: Speaker name
             text: Message text
+            session_id: Meeting session the tokens are booked to
             
         Returns:
             Dict containing emotion analysis for this message
+
+        Raises:
+            DeadlineExceeded: if called inside a deadline_scope that ran out
         """
         if self.demo_mode:
             # Return demo emotion data
@@ -180,12 +250,21 @@ Example response:
                 "key_emotions": [emotion, random.choice(["engaged", "focused", "attentive"])],
                 "overall_mood": f"{emotion} and engaged"
             }
-        
-        try:
-            prompt = f"""Analyze the emotion and sentiment of this single message in a meeting context. Be realistic and nuanced - not everything is happy or positive.
 
-Speaker: {speaker}
-Message: "{text}"
+        # Filler and short plain lines don't need a model; dense technical ones get the strong one
+        start = time.perf_counter()
+        route = classify_utterance(text)
+        if route.tier in (SKIP, LOCAL):
+            emotion = local_tier_emotion(route, text)
+        else:
+            emotion = await self._analyze_message_with_model(speaker, text, CLAUDE_STRONG_MODEL if route.tier == STRONG else self.model, session_id)
+        route_stats.record("emotion", route, time.perf_counter() - start, text, emotion)
+        return emotion
+
+    async def _analyze_message_with_model(self, speaker: str, text: str, model: str, session_id: Optional[str] = None) -> Dict:
+        try:
+            # Static instructions form a cacheable prefix; only the message varies
+            prompt = """Analyze the emotion and sentiment of the single message below in a meeting context. Be realistic and nuanced - not everything is happy or positive.
 
 Consider:
 - Tone indicators (enthusiasm, hesitation, certainty, doubt)
@@ -207,34 +286,44 @@ Guidelines:
 - Use concerned/frustrated for problem discussions
 
 Respond with JSON:
-{{
+{
     "primary_emotion": "emotion_name",
     "happiness_emoji": "emoji",
     "energy_level": "level",
     "stress_level": "level",
     "confidence": 0.8
-}}"""
+}"""
+            message = f'Speaker: {speaker}\nMessage: "{text}"'
 
-            response = self.client.messages.create(
-                model=self.model,
+            system_prompt = "You are an expert workplace emotion analyst. Provide realistic, nuanced emotion detection. Most workplace communication is neutral or professional. Only identify strong emotions when clearly present in the text. Be conservative with positive emotions - don't label everything as happy. Always respond with valid JSON."
+            prompt_tokens = count_tokens(system_prompt) + count_tokens(prompt) + count_tokens(message)
+
+            response = await self.client.messages.acreate(
+                model=model,
                 max_tokens=256,
                 temperature=0.1,  # Lower temperature for more consistent analysis
-                system="You are an expert workplace emotion analyst. Provide realistic, nuanced emotion detection. Most workplace communication is neutral or professional. Only identify strong emotions when clearly present in the text. Be conservative with positive emotions - don't label everything as happy. Always respond with valid JSON.",
+                system=cached_system(system_prompt, model),
                 messages=[
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": cached_user_content(prompt, message, model, system=system_prompt)
                     }
-                ]
+                ],
+                **json_tool("record_emotion", "Record the emotion detected in the message", MESSAGE_EMOTION_SCHEMA)
             )
+
+            token_usage.record(session_id, "emotion", prompt_tokens)
             
-            result = response.content[0].text
-            
-            import json
-            return json.loads(result)
+            return parse_structured(response, "emotion")
             
+        except DeadlineExceeded:
+            raise  # Too late to show; the caller drops it
+        except CircuitOpenError:
+            record_outcome("fallback")
+            return local_message_emotion(text)
         except Exception as e:
-            print(f"❌ Single message emotion analysis error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Single message emotion analysis error: %s", e)
             return {
                 "primary_emotion": "neutral",
                 "happiness_emoji": "😐",
@@ -243,18 +332,20 @@ Respond with JSON:
                 "confidence": 0.0
             }
     
-    async def get_happiness_summary(self, transcript: List[TranscriptLine]) -> str:
+    @timed("emotion")
+    async def get_happiness_summary(self, transcript: List[TranscriptLine], session_id: Optional[str] = None) -> str:
         """
         Generate a summary focused specifically on happiness and mood
         
         Args:
             transcript: List of transcript lines
+            session_id: Meeting session ID for token accounting (optional)
             
         Returns:
             String summary of happiness and mood in the meeting
         """
         try:
-            emotion_analysis = await self.analyze_emotions(transcript)
+            emotion_analysis = await self.analyze_emotions(transcript, session_id)
             
             happiness_level = emotion_analysis.get("happiness_level", "neutral")
             overall_sentiment = emotion_analysis.get("overall_sentiment", "neutral")
@@ -283,5 +374,6 @@ Respond with JSON:
             return summary
             
         except Exception as e:
-            print(f"❌ Happiness summary error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Happiness summary error: %s", e)
             return "😐 Unable to analyze meeting happiness levels"
\ No newline at end of file
@@ -1,12 +1,16 @@
 """
 Integration Agent - Handles external integrations (Jira, Teams, Slack)
 """
+import logging
 import os
 import aiohttp
 from typing import List, Dict
 import json
+from app.metrics import record_outcome, timed
 from app.models import ActionItem
 
+logger = logging.getLogger(__name__)
+
 
 class IntegrationAgent:
     """
@@ -27,20 +31,21 @@ class IntegrationAgent:
         self.teams_webhook = os.getenv("TEAMS_WEBHOOK_URL")
         self.slack_webhook = os.getenv("SLACK_WEBHOOK_URL")
         
-        print(f"✅ Integration Agent initialized")
+        logger.info("✅ Integration Agent initialized")
         if self.jira_url and self.jira_api_token:
-            print(f"   - Jira: Configured ({self.jira_url})")
+            logger.info("   - Jira: Configured (%s)", self.jira_url)
         if self.teams_webhook:
-            print(f"   - Teams: Configured")
+            logger.info("   - Teams: Configured")
         if self.slack_webhook:
-            print(f"   - Slack: Configured")
+            logger.info("   - Slack: Configured")
     
+    @timed("integration")
     async def create_jira_tasks(self, action_items: List[ActionItem]) -> List[Dict]:
         """
         Create Jira tasks from action items
         """
         if not all([self.jira_url, self.jira_email, self.jira_api_token]):
-            print("❌ Jira not configured")
+            logger.error("❌ Jira not configured")
             return []
         
         results = []
@@ -84,22 +89,24 @@ class IntegrationAgent:
                                 "url": f"{self.jira_url}/browse/{result.get('key')}",
                                 "action_item": item.text
                             })
-                            print(f"✅ Created Jira task: {result.get('key')}")
+                            logger.info("✅ Created Jira task: %s", result.get('key'))
                         else:
                             error_text = await response.text()
-                            print(f"❌ Jira task creation failed: {response.status} - {error_text}")
+                            logger.error("❌ Jira task creation failed: %s - %s", response.status, error_text)
                 
                 except Exception as e:
-                    print(f"❌ Error creating Jira task: {str(e)}")
+                    record_outcome("error")
+                    logger.error("❌ Error creating Jira task: %s", e)
         
         return results
     
+    @timed("integration")
     async def post_to_teams(self, summary: dict, action_items: List[ActionItem]) -> dict:
         """
         Post meeting summary to Microsoft Teams
         """
         if not self.teams_webhook:
-            print("❌ Teams webhook not configured")
+            logger.error("❌ Teams webhook not configured")
             return {"error": "Teams webhook not configured"}
         
         try:
@@ -136,23 +143,25 @@ class IntegrationAgent:
             async with aiohttp.ClientSession() as session:
                 async with session.post(self.teams_webhook, json=card) as response:
                     if response.status == 200:
-                        print("✅ Posted to Teams")
+                        logger.info("✅ Posted to Teams")
                         return {"status": "success", "platform": "teams"}
                     else:
                         error = await response.text()
-                        print(f"❌ Teams post failed: {error}")
+                        logger.error("❌ Teams post failed: %s", error)
                         return {"error": error}
         
         except Exception as e:
-            print(f"❌ Teams posting error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Teams posting error: %s", e)
             return {"error": str(e)}
     
+    @timed("integration")
     async def post_to_slack(self, summary: dict, action_items: List[ActionItem]) -> dict:
         """
         Post meeting summary to Slack
         """
         if not self.slack_webhook:
-            print("❌ Slack webhook not configured")
+            logger.error("❌ Slack webhook not configured")
             return {"error": "Slack webhook not configured"}
         
         try:
@@ -205,13 +214,14 @@ class IntegrationAgent:
             async with aiohttp.ClientSession() as session:
                 async with session.post(self.slack_webhook, json=payload) as response:
                     if response.status == 200:
-                        print("✅ Posted to Slack")
+                        logger.info("✅ Posted to Slack")
                         return {"status": "success", "platform": "slack"}
                     else:
                         error = await response.text()
-                        print(f"❌ Slack post failed: {error}")
+                        logger.error("❌ Slack post failed: %s", error)
                         return {"error": error}
         
         except Exception as e:
-            print(f"❌ Slack posting error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Slack posting error: %s", e)
             return {"error": str(e)}
@@ -2,11 +2,16 @@
 Jira Agent - Integrates with Jira to create tickets from action items
 Supports both API Token and SSO authentication
 """
+import logging
 import os
 import requests
 import base64
 from typing import Dict, Any
+from app.metrics import record_outcome, timed
 from app.models import ActionItem
+from app.usage_ledger import usage_ledger
+
+logger = logging.getLogger(__name__)
 
 
 class JiraAgent:
@@ -25,14 +30,14 @@ class JiraAgent:
         self.jira_auth_type = os.getenv("JIRA_AUTH_TYPE", "basic")  # "basic" or "bearer" for SSO
         
         if not all([self.jira_email, self.jira_api_token]):
-            print("⚠️ Jira Agent: Missing credentials - will use demo mode")
-            print("   To enable real Jira integration, set these environment variables:")
-            print("   - JIRA_EMAIL: Your Cross River Bank email")
-            print("   - JIRA_API_TOKEN: Your Jira API token or SSO token")
-            print("   - JIRA_AUTH_TYPE: 'basic' (default) or 'bearer' for SSO")
-            print(f"   - JIRA_URL: {self.jira_url} (already configured)")
-            print(f"   - JIRA_PROJECT_KEY: {self.jira_project_key} (primary project)")
-            print(f"   - JIRA_PROJECT_KEY_FALLBACK: (optional - alternative project if primary fails)")
+            logger.warning("⚠️ Jira Agent: Missing credentials - will use demo mode")
+            logger.info("   To enable real Jira integration, set these environment variables:")
+            logger.info("   - JIRA_EMAIL: Your Cross River Bank email")
+            logger.info("   - JIRA_API_TOKEN: Your Jira API token or SSO token")
+            logger.info("   - JIRA_AUTH_TYPE: 'basic' (default) or 'bearer' for SSO")
+            logger.info("   - JIRA_URL: %s (already configured)", self.jira_url)
+            logger.info("   - JIRA_PROJECT_KEY: %s (primary project)", self.jira_project_key)
+            logger.info("   - JIRA_PROJECT_KEY_FALLBACK: (optional - alternative project if primary fails)")
             self.demo_mode = True
         else:
             self.demo_mode = False
@@ -44,7 +49,7 @@ class JiraAgent:
                     "Authorization": f"Bearer {self.jira_api_token}",
                     "Content-Type": "application/json"
                 }
-                print(f"✅ Jira Agent initialized with SSO/Bearer token")
+                logger.info("✅ Jira Agent initialized with SSO/Bearer token")
             else:
                 # Default: Basic Auth with API Token
                 credentials = f"{self.jira_email}:{self.jira_api_token}"
@@ -53,13 +58,14 @@ class JiraAgent:
                     "Authorization": f"Basic {encoded_credentials}",
                     "Content-Type": "application/json"
                 }
-                print(f"✅ Jira Agent initialized with Basic Auth (API Token)")
+                logger.info("✅ Jira Agent initialized with Basic Auth (API Token)")
             
-            print(f"   Jira URL: {self.jira_url}")
-            print(f"   Project: {self.jira_project_key}")
-            print(f"   Email: {self.jira_email}")
-            print(f"   Auth Type: {self.jira_auth_type}")
+            logger.info("   Jira URL: %s", self.jira_url)
+            logger.info("   Project: %s", self.jira_project_key)
+            logger.info("   Email: %s", self.jira_email)
+            logger.info("   Auth Type: %s", self.jira_auth_type)
     
+    @timed("jira")
     async def create_ticket(
         self, 
         action_item: ActionItem, 
@@ -118,12 +124,7 @@ class JiraAgent:
                 }
             
             # Create the ticket - try primary project first
-            response = requests.post(
-                f"{self.jira_url}/rest/api/3/issue",
-                headers=self.headers,
-                json=ticket_data,
-                timeout=30
-            )
+            response = self._request("POST", "create_issue", "/rest/api/3/issue", json=ticket_data)
             
             if response.status_code == 201:
                 ticket_info = response.json()
@@ -136,15 +137,10 @@ class JiraAgent:
                 }
             elif response.status_code == 403 and self.jira_project_key_fallback:
                 # Permission denied on primary project - try fallback
-                print(f"⚠️ Permission denied on {self.jira_project_key}, trying fallback project {self.jira_project_key_fallback}...")
+                logger.warning("⚠️ Permission denied on %s, trying fallback project %s...", self.jira_project_key, self.jira_project_key_fallback)
                 ticket_data["fields"]["project"]["key"] = self.jira_project_key_fallback
                 
-                response = requests.post(
-                    f"{self.jira_url}/rest/api/3/issue",
-                    headers=self.headers,
-                    json=ticket_data,
-                    timeout=30
-                )
+                response = self._request("POST", "create_issue", "/rest/api/3/issue", json=ticket_data)
                 
                 if response.status_code == 201:
                     ticket_info = response.json()
@@ -157,7 +153,7 @@ class JiraAgent:
                         "fallback_used": True
                     }
                 else:
-                    print(f"❌ Fallback project also failed ({response.status_code}): {response.text[:200]}")
+                    logger.error("❌ Fallback project also failed (%s): %s", response.status_code, response.text[:200])
                     return {
                         "success": False,
                         "error": f"Permission denied on both {self.jira_project_key} and fallback {self.jira_project_key_fallback}",
@@ -165,15 +161,15 @@ class JiraAgent:
                     }
             elif response.status_code == 401:
                 auth_type = "SSO/Bearer token" if self.jira_auth_type.lower() == "bearer" else "API token"
-                print(f"❌ Jira Authentication Failed (401): Invalid {auth_type}")
-                print(f"   Response: {response.text[:200]}")
+                logger.error("❌ Jira Authentication Failed (401): Invalid %s", auth_type)
+                logger.info("   Response: %s", response.text[:200])
                 return {
                     "success": False,
                     "error": f"Jira authentication failed (401). Please verify your {auth_type} is correct and not expired.",
                     "debug_info": f"HTTP {response.status_code}: {response.text[:200]}"
                 }
             else:
-                print(f"❌ Jira API error ({response.status_code}): {response.text[:200]}")
+                logger.error("❌ Jira API error (%s): %s", response.status_code, response.text[:200])
                 return {
                     "success": False,
                     "error": f"Jira API error: {response.status_code}",
@@ -181,12 +177,22 @@ class JiraAgent:
                 }
                 
         except Exception as e:
-            print(f"❌ Jira Agent error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Jira Agent error: %s", e)
             return {
                 "success": False,
                 "error": f"Failed to create Jira ticket: {str(e)}"
             }
     
+    def _request(self, method: str, operation: str, path: str, **kwargs) -> requests.Response:
+        """Call the Jira REST API and record the call in the usage ledger"""
+        with usage_ledger.track("jira", operation, "jira") as call:
+            response = requests.request(method, f"{self.jira_url}{path}", headers=self.headers, timeout=30, **kwargs)
+            call["status"] = response.status_code
+            if response.status_code >= 400:
+                call["outcome"] = "error"
+        return response
+    
     def _create_demo_ticket(self, action_item: ActionItem, jira_description: Dict[str, str]) -> Dict[str, Any]:
         """
         Create a demo ticket response when Jira credentials are not available
@@ -215,6 +221,7 @@ class JiraAgent:
         }
         return priority_map.get(priority.lower(), "Medium")
     
+    @timed("jira")
     async def get_project_info(self) -> Dict[str, Any]:
         """
         Get information about the Jira project
@@ -228,11 +235,7 @@ class JiraAgent:
                     "demo_mode": True
                 }
             
-            response = requests.get(
-                f"{self.jira_url}/rest/api/3/project/{self.jira_project_key}",
-                headers=self.headers,
-                timeout=30
-            )
+            response = self._request("GET", "get_project", f"/rest/api/3/project/{self.jira_project_key}")
             
             if response.status_code == 200:
                 project_info = response.json()
@@ -249,6 +252,7 @@ class JiraAgent:
                 }
                 
         except Exception as e:
+            record_outcome("error")
             return {
                 "success": False,
                 "error": f"Failed to get project info: {str(e)}"
@@ -3,12 +3,17 @@ Listener Agent - Handles audio transcription using AssemblyAI, Local Whisper, De
 """
 from openai import OpenAI
 import httpx
+import logging
 import os
 from datetime import datetime
 from typing import Optional
 import io
 import random
+from app.circuit_breaker import circuit_breakers
+from app.metrics import record_outcome, stt_audio_bytes, stt_calls, timed
 from app.models import TranscriptLine
+from app.providers import STT_PROVIDER, create_stt_client
+from app.usage_ledger import usage_ledger
 import asyncio
 import json
 
@@ -33,6 +38,22 @@ try:
 except ImportError:
     DEEPGRAM_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
+# Browser MediaRecorder webm/opus chunks run at roughly 32 kbps; used to estimate
+# billed audio length when the provider doesn't report a duration
+STT_ASSUMED_BYTES_PER_SECOND = float(os.getenv("STT_ASSUMED_BYTES_PER_SECOND", "4000"))
+
+
+def estimate_audio_seconds(num_bytes: int) -> float:
+    """Audio length implied by an encoded chunk size"""
+    return num_bytes / STT_ASSUMED_BYTES_PER_SECOND
+
+
+def _segments_end(segments) -> Optional[float]:
+    """End time of the last local Whisper segment (the transcribed audio length)"""
+    return segments[-1].get("end") if segments else None
+
 
 class ListenerAgent:
     """
@@ -58,7 +79,7 @@ class ListenerAgent:
         self.latest_transcript = None
         
         if self.demo_mode:
-            print(f"✅ Listener Agent initialized in DEMO MODE (no API key needed)")
+            logger.info("✅ Listener Agent initialized in DEMO MODE (no API key needed)")
             self.demo_phrases = [
                 "Good morning team, let's start the meeting.",
                 "We need to update the documentation by Friday.",
@@ -72,12 +93,17 @@ class ListenerAgent:
             self.demo_index = 0
             self.client = None
             self.local_model = None
+        elif STT_PROVIDER == "simulated":
+            logger.info("✅ Listener Agent initialized with SIMULATED speech-to-text")
+            # Whisper-compatible client, so the OpenAI code paths below are exercised
+            self.client = create_stt_client()
+            self.local_model = None
         elif self.use_deepgram and DEEPGRAM_AVAILABLE:
             if not self.deepgram_key:
-                print(f"⚠️ DEEPGRAM_API_KEY not found - falling back to OpenAI Whisper")
+                logger.warning("⚠️ DEEPGRAM_API_KEY not found - falling back to OpenAI Whisper")
                 self.use_deepgram = False
             else:
-                print(f"✅ Listener Agent initialized with OPENAI WHISPER (real-time streaming)")
+                logger.info("✅ Listener Agent initialized with OPENAI WHISPER (real-time streaming)")
                 # Deepgram doesn't support webm chunks well, so use OpenAI Whisper instead
                 # Disable SSL verification to work with corporate proxies
                 http_client = httpx.Client(verify=False)
@@ -90,15 +116,15 @@ class ListenerAgent:
         elif self.use_assemblyai and ASSEMBLYAI_AVAILABLE:
             if not self.assemblyai_key:
                 raise ValueError("ASSEMBLYAI_API_KEY not found in environment")
-            print(f"✅ Listener Agent initialized with ASSEMBLYAI (5 hours/month free)")
+            logger.info("✅ Listener Agent initialized with ASSEMBLYAI (5 hours/month free)")
             aai.settings.api_key = self.assemblyai_key
             self.client = None
             self.local_model = None
         elif self.use_local_whisper and LOCAL_WHISPER_AVAILABLE:
-            print(f"✅ Listener Agent initialized with LOCAL WHISPER (free, runs on your Mac)")
-            print(f"   Loading Whisper TINY model (fastest, free)...")
+            logger.info("✅ Listener Agent initialized with LOCAL WHISPER (free, runs on your Mac)")
+            logger.info("   Loading Whisper TINY model (fastest, free)...")
             self.local_model = local_whisper.load_model("tiny")  # Use 'tiny' model for maximum speed
-            print(f"   ✅ Local Whisper TINY model loaded successfully!")
+            logger.info("   ✅ Local Whisper TINY model loaded successfully!")
             self.client = None
         else:
             if not self.api_key:
@@ -113,13 +139,18 @@ class ListenerAgent:
             self.local_model = None
         
         self.model = os.getenv("WHISPER_MODEL", "whisper-1")
+        # Ledger provider name for calls made through self.client
+        self.client_provider = "simulated" if STT_PROVIDER == "simulated" else "whisper_api"
+        # While open, chunks skip the Whisper API (local Whisper is used if loaded)
+        self.stt_breaker = circuit_breakers.get(self.client_provider)
         self.enable_diarization = os.getenv("ENABLE_SPEAKER_DIARIZATION", "True").lower() == "true"
         
         if not self.demo_mode and not self.use_local_whisper and not self.use_assemblyai:
-            print(f"✅ Listener Agent initialized with OpenAI API model: {self.model}")
+            logger.info("✅ Listener Agent initialized with OpenAI API model: %s", self.model)
         elif not self.demo_mode and self.use_local_whisper:
-            print(f"✅ Listener Agent ready with local Whisper")
+            logger.info("✅ Listener Agent ready with local Whisper")
     
+    @timed("listener")
     async def process_audio(self, audio_data: bytes) -> Optional[TranscriptLine]:
         """
         Process audio chunk and return transcription
@@ -140,7 +171,7 @@ class ListenerAgent:
                 speaker = f"Speaker {(self.demo_index % 3) + 1}"
                 self.demo_index += 1
                 
-                print(f"📝 Demo transcript: {speaker}: {text}")
+                logger.info("📝 Demo transcript: %s: %s", speaker, text, extra={"event": "transcript"})
                 
                 return TranscriptLine(
                     speaker=speaker,
@@ -155,7 +186,7 @@ class ListenerAgent:
             
             # REAL-TIME MODE: Use OpenAI Whisper for streaming chunks
             # OpenAI Whisper accepts audio chunks directly and works great for real-time
-            if self.client:
+            if self.client and self.stt_breaker.available:
                 try:
                     # Save audio chunk to temporary file (Whisper API needs a file)
                     import tempfile
@@ -165,7 +196,12 @@ class ListenerAgent:
                     
                     try:
                         # Use OpenAI Whisper API for transcription
-                        with open(temp_audio_path, "rb") as audio_file:
+                        stt_calls.inc(provider="whisper_api", operation="chunk")
+                        stt_audio_bytes.inc(len(audio_data), provider="whisper_api")
+                        with self.stt_breaker.guard(), open(temp_audio_path, "rb") as audio_file, usage_ledger.track(
+                            self.client_provider, "chunk", "listener", model="whisper-1",
+                            audio_seconds=estimate_audio_seconds(len(audio_data))
+                        ):
                             transcript = self.client.audio.transcriptions.create(
                                 model="whisper-1",
                                 file=audio_file,
@@ -177,7 +213,7 @@ class ListenerAgent:
                         if text:
                             speaker = self._detect_speaker(text)
                             
-                            print(f"📝 Whisper transcript: {text}")
+                            logger.info("📝 Whisper transcript: %s", text, extra={"event": "transcript"})
                             
                             return TranscriptLine(
                                 speaker=speaker,
@@ -194,9 +230,8 @@ class ListenerAgent:
                     return None
                     
                 except Exception as e:
-                    print(f"❌ Whisper error: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
+                    record_outcome("error")
+                    logger.exception("❌ Whisper error: %s", e)
                     # Fall through to other methods
                     pass
             
@@ -211,18 +246,24 @@ class ListenerAgent:
                 
                 try:
                     # Use AssemblyAI transcriber
+                    stt_calls.inc(provider="assemblyai", operation="chunk")
+                    stt_audio_bytes.inc(len(audio_data), provider="assemblyai")
                     transcriber = aai.Transcriber()
-                    transcript = transcriber.transcribe(tmp_path)
+                    with usage_ledger.track("assemblyai", "chunk", "listener") as call:
+                        transcript = transcriber.transcribe(tmp_path)
+                        call["audio_seconds"] = transcript.audio_duration or estimate_audio_seconds(len(audio_data))
+                        if transcript.status == aai.TranscriptStatus.error:
+                            call["outcome"] = "error"
                     
                     if transcript.status == aai.TranscriptStatus.error:
-                        print(f"❌ AssemblyAI error: {transcript.error}")
+                        logger.error("❌ AssemblyAI error: %s", transcript.error)
                         return None
                     
                     if transcript.text and transcript.text.strip():
                         text = transcript.text.strip()
                         speaker = self._detect_speaker(text)
                         
-                        print(f"📝 AssemblyAI transcript: {text}")
+                        logger.info("📝 AssemblyAI transcript: %s", text, extra={"event": "transcript"})
                         
                         return TranscriptLine(
                             speaker=speaker,
@@ -250,13 +291,17 @@ class ListenerAgent:
                     tmp_path = tmp_file.name
                 
                 try:
-                    result = self.local_model.transcribe(tmp_path, language="en")
+                    stt_calls.inc(provider="local_whisper", operation="chunk")
+                    stt_audio_bytes.inc(len(audio_data), provider="local_whisper")
+                    with usage_ledger.track("local_whisper", "chunk", "listener", model="tiny") as call:
+                        result = self.local_model.transcribe(tmp_path, language="en")
+                        call["audio_seconds"] = _segments_end(result.get('segments')) or estimate_audio_seconds(len(audio_data))
                     
                     if 'text' in result and result['text'].strip():
                         text = result['text'].strip()
                         speaker = self._detect_speaker(text)
                         
-                        print(f"📝 Local Whisper transcript: {text}")
+                        logger.info("📝 Local Whisper transcript: %s", text, extra={"event": "transcript"})
                         
                         return TranscriptLine(
                             speaker=speaker,
@@ -275,17 +320,23 @@ class ListenerAgent:
                         pass
             
             # OPENAI MODE: Use OpenAI Whisper API
-            if self.client is not None:
+            if self.client is not None and self.stt_breaker.available:
                 # Create audio file object
                 audio_file = io.BytesIO(audio_data)
                 audio_file.name = "audio.webm"
                 
                 # Call Whisper API
-                transcript = self.client.audio.transcriptions.create(
-                    model=self.model,
-                    file=audio_file,
-                    language="en"
-                )
+                stt_calls.inc(provider="whisper_api", operation="chunk")
+                stt_audio_bytes.inc(len(audio_data), provider="whisper_api")
+                with self.stt_breaker.guard(), usage_ledger.track(
+                    self.client_provider, "chunk", "listener", model=self.model,
+                    audio_seconds=estimate_audio_seconds(len(audio_data))
+                ):
+                    transcript = self.client.audio.transcriptions.create(
+                        model=self.model,
+                        file=audio_file,
+                        language="en"
+                    )
                 
                 if transcript and transcript.text:
                     text = transcript.text.strip()
@@ -306,9 +357,8 @@ class ListenerAgent:
             return None
             
         except Exception as e:
-            print(f"❌ Listener Agent error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            record_outcome("error")
+            logger.exception("❌ Listener Agent error: %s", e)
             return None
     
     def _detect_speaker(self, text: str) -> str:
@@ -326,6 +376,7 @@ class ListenerAgent:
         
         return "Speaker"
     
+    @timed("listener")
     async def transcribe_file(self, file_path: str) -> list[TranscriptLine]:
         """
         Transcribe an entire audio file (for batch processing)
@@ -333,7 +384,7 @@ class ListenerAgent:
         try:
             # Use demo mode if enabled
             if self.demo_mode:
-                print(f"🎙️ DEMO MODE: Generating sample transcript from file {file_path}")
+                logger.info("🎙️ DEMO MODE: Generating sample transcript from file %s", file_path)
                 import random
                 demo_phrases = [
                     "Good morning team, let's start the meeting.",
@@ -358,12 +409,12 @@ class ListenerAgent:
                         timestamp=datetime.now().isoformat(),
                         confidence=0.95
                     ))
-                print(f"✅ Generated {len(lines)} demo transcript lines")
+                logger.info("✅ Generated %s demo transcript lines", len(lines))
                 return lines
             
             # Use AssemblyAI if enabled
             if self.use_assemblyai and ASSEMBLYAI_AVAILABLE:
-                print(f"🎙️ Transcribing with ASSEMBLYAI (fast, 5 hours/month free)...")
+                logger.info("🎙️ Transcribing with ASSEMBLYAI (fast, 5 hours/month free)...")
                 
                 # Create transcriber
                 transcriber = aai.Transcriber()
@@ -374,12 +425,18 @@ class ListenerAgent:
                 )
                 
                 # Submit file for transcription
-                transcript = transcriber.transcribe(file_path, config=config)
+                stt_calls.inc(provider="assemblyai", operation="file")
+                stt_audio_bytes.inc(os.path.getsize(file_path), provider="assemblyai")
+                with usage_ledger.track("assemblyai", "file", "listener") as call:
+                    transcript = transcriber.transcribe(file_path, config=config)
+                    call["audio_seconds"] = transcript.audio_duration or estimate_audio_seconds(os.path.getsize(file_path))
+                    if transcript.status == aai.TranscriptStatus.error:
+                        call["outcome"] = "error"
                 
                 lines = []
                 
                 if transcript.status == aai.TranscriptStatus.error:
-                    print(f"❌ AssemblyAI transcription failed: {transcript.error}")
+                    logger.error("❌ AssemblyAI transcription failed: %s", transcript.error)
                     return lines
                 
                 # Parse words with timestamps
@@ -448,16 +505,20 @@ class ListenerAgent:
                             ))
                 
                 if lines:
-                    print(f"✅ AssemblyAI transcribed {len(lines)} segments in {transcript.audio_duration}s")
+                    logger.info("✅ AssemblyAI transcribed %s segments in %ss", len(lines), transcript.audio_duration)
                 else:
-                    print(f"⚠️ AssemblyAI found no speech")
+                    logger.warning("⚠️ AssemblyAI found no speech")
                 
                 return lines
             
             # Use local Whisper if available
             if self.local_model is not None:
-                print(f"🎙️ Transcribing with LOCAL WHISPER (free)...")
-                result = self.local_model.transcribe(file_path, language="en")
+                logger.info("🎙️ Transcribing with LOCAL WHISPER (free)...")
+                stt_calls.inc(provider="local_whisper", operation="file")
+                stt_audio_bytes.inc(os.path.getsize(file_path), provider="local_whisper")
+                with usage_ledger.track("local_whisper", "file", "listener", model="tiny") as call:
+                    result = self.local_model.transcribe(file_path, language="en")
+                    call["audio_seconds"] = _segments_end(result.get('segments')) or estimate_audio_seconds(os.path.getsize(file_path))
                 
                 lines = []
                 # Parse segments from local Whisper
@@ -484,25 +545,33 @@ class ListenerAgent:
                             ))
                 
                 if lines:
-                    print(f"✅ Local Whisper transcribed {len(lines)} segments")
+                    logger.info("✅ Local Whisper transcribed %s segments", len(lines))
                 else:
-                    print(f"⚠️ Local Whisper found no speech")
+                    logger.warning("⚠️ Local Whisper found no speech")
                 
                 return lines
             
             # Fall back to OpenAI API
-            with open(file_path, "rb") as audio_file:
+            stt_calls.inc(provider="whisper_api", operation="file")
+            stt_audio_bytes.inc(os.path.getsize(file_path), provider="whisper_api")
+            with self.stt_breaker.guard(), open(file_path, "rb") as audio_file, usage_ledger.track(
+                self.client_provider, "file", "listener", model=self.model
+            ) as call:
                 transcript = self.client.audio.transcriptions.create(
                     model=self.model,
                     file=audio_file,
                     language="en",
                     response_format="verbose_json"
                 )
+                # verbose_json reports the billed duration
+                call["audio_seconds"] = getattr(transcript, "duration", None) or estimate_audio_seconds(os.path.getsize(file_path))
             
-            print(f"🔍 Whisper API Response Type: {type(transcript)}")
-            print(f"🔍 Whisper API Response: {transcript}")
-            if hasattr(transcript, '__dict__'):
-                print(f"🔍 Response attributes: {transcript.__dict__}")
+            # Full response dumps are large; only build them when debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🔍 Whisper API Response Type: %s", type(transcript))
+                logger.debug("🔍 Whisper API Response: %s", transcript)
+                if hasattr(transcript, '__dict__'):
+                    logger.debug("🔍 Response attributes: %s", transcript.__dict__)
             
             # Parse segments and create transcript lines
             lines = []
@@ -550,14 +619,14 @@ class ListenerAgent:
                             ))
             
             if lines:
-                print(f"✅ Transcribed file with {len(lines)} segments")
+                logger.info("✅ Transcribed file with %s segments", len(lines))
             else:
-                print(f"⚠️ Transcription returned but no segments found. Raw transcript: {transcript}")
+                logger.warning("⚠️ Transcription returned but no segments found")
+                logger.debug("🔍 Raw transcript: %s", transcript)
             
             return lines
             
         except Exception as e:
-            print(f"❌ File transcription error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            record_outcome("error")
+            logger.exception("❌ File transcription error: %s", e)
             return []
@@ -1,10 +1,25 @@
 """
 Personalized Assistant Agent - Provides personalized explanations based on user's background
 """
-import anthropic
+import logging
 import os
 from typing import List, Dict, Optional
-import json
+from app.circuit_breaker import CircuitOpenError
+from app.llm_scheduler import INTERACTIVE
+from app.metrics import record_outcome, timed
+from app.prompt_cache import cached_system
+from app.providers import create_llm_client
+from app.structured_output import parse_structured
+
+logger = logging.getLogger(__name__)
+
+
+def format_explanation(explanation: str, terms: List[str]) -> str:
+    """Format an explanation and the terms it covers for the assistant panel"""
+    formatted_explanation = f"💡 **Quick Explanation**\n\n{explanation}"
+    if terms:
+        formatted_explanation += f"\n\n📌 Terms: {', '.join(terms)}"
+    return formatted_explanation
 
 
 class PersonalizedAssistantAgent:
@@ -20,15 +35,13 @@ class PersonalizedAssistantAgent:
     """
 
     def __init__(self):
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment")
-
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        # Claude client (or the simulated backend, see LLM_PROVIDER)
+        self.client = create_llm_client("personalized_assistant", priority=INTERACTIVE)
         self.model = os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307")
 
-        print(f"✅ Personalized Assistant Agent initialized with Claude model: {self.model}")
+        logger.info("✅ Personalized Assistant Agent initialized with Claude model: %s", self.model)
 
+    @timed("personalized_assistant")
     async def analyze_for_user(
         self,
         user_profile: Dict[str, any],
@@ -100,11 +113,11 @@ If a finance expert hears "We need to refactor the API endpoints", you might exp
     "explanation": "In simple terms: 'Refactor' means restructuring existing code to make it cleaner, and 'API endpoints' are like doors that allow different software systems to talk to each other. The team is essentially reorganizing how their software connects with other systems."
 }}"""
 
-            response = self.client.messages.create(
+            response = await self.client.messages.acreate(
                 model=self.model,
                 max_tokens=512,
                 temperature=0.3,
-                system="You are Cross River Rabbit, a helpful and friendly AI assistant who provides personalized explanations. Always respond with valid JSON.",
+                system=cached_system("You are Cross River Rabbit, a helpful and friendly AI assistant who provides personalized explanations. Always respond with valid JSON.", self.model),
                 messages=[
                     {
                         "role": "user",
@@ -113,29 +126,27 @@ If a finance expert hears "We need to refactor the API endpoints", you might exp
                 ]
             )
 
-            result_text = response.content[0].text
-            result = json.loads(result_text)
+            result = parse_structured(response, "personalized_assistant")
 
             if result.get("needs_explanation", False):
                 explanation = result.get("explanation", "")
                 terms = result.get("terms_identified", [])
 
-                print(f"✅ Personalized Assistant: Explanation provided for terms: {', '.join(terms)}")
-
-                # Format the explanation nicely
-                formatted_explanation = f"💡 **Quick Explanation**\n\n{explanation}"
-
-                if terms:
-                    formatted_explanation += f"\n\n📌 Terms: {', '.join(terms)}"
+                logger.info("✅ Personalized Assistant: Explanation provided for terms: %s", ', '.join(terms))
 
-                return formatted_explanation
+                return format_explanation(explanation, terms)
             else:
                 return None
 
+        except CircuitOpenError:
+            record_outcome("fallback")
+            return None  # Optional enrichment; skipped while the provider is down
         except Exception as e:
-            print(f"❌ Personalized Assistant error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Personalized Assistant error: %s", e)
             return None
 
+    @timed("personalized_assistant")
     async def get_contextual_help(
         self,
         user_profile: Dict[str, any],
@@ -165,11 +176,11 @@ User's Question: {question}
 
 Provide a clear, concise answer tailored to their background. Be friendly and use analogies from their area of expertise when possible."""
 
-            response = self.client.messages.create(
+            response = await self.client.messages.acreate(
                 model=self.model,
                 max_tokens=512,
                 temperature=0.5,
-                system="You are Cross River Rabbit, a helpful AI assistant providing personalized explanations.",
+                system=cached_system("You are Cross River Rabbit, a helpful AI assistant providing personalized explanations.", self.model),
                 messages=[
                     {
                         "role": "user",
@@ -181,9 +192,11 @@ Provide a clear, concise answer tailored to their background. Be friendly and us
             return response.content[0].text
 
         except Exception as e:
-            print(f"❌ Contextual help error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Contextual help error: %s", e)
             return "I'm having trouble processing your question right now. Please try again."
 
+    @timed("personalized_assistant")
     async def suggest_learning_topics(
         self,
         user_profile: Dict[str, any],
@@ -218,11 +231,11 @@ Identify 3-5 key topics or terms that came up repeatedly that are outside their
 Return as JSON array of strings:
 ["topic1", "topic2", "topic3"]"""
 
-            response = self.client.messages.create(
+            response = await self.client.messages.acreate(
                 model=self.model,
                 max_tokens=256,
                 temperature=0.3,
-                system="You are an AI assistant identifying learning topics. Respond with valid JSON.",
+                system=cached_system("You are an AI assistant identifying learning topics. Respond with valid JSON.", self.model),
                 messages=[
                     {
                         "role": "user",
@@ -231,9 +244,10 @@ Return as JSON array of strings:
                 ]
             )
 
-            topics = json.loads(response.content[0].text)
+            topics = parse_structured(response, "personalized_assistant")
             return topics if isinstance(topics, list) else []
 
         except Exception as e:
-            print(f"❌ Topic suggestion error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Topic suggestion error: %s", e)
             return []
@@ -1,11 +1,42 @@
 """
 Q&A Agent - Answers questions about meetings, tasks, and discussions using Claude (Anthropic)
 """
-import anthropic
-import os
-from typing import List, Optional
 import json
+import logging
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+from app.circuit_breaker import CircuitOpenError
+from app.llm_scheduler import INTERACTIVE
+from app.metrics import record_outcome, timed
 from app.models import TranscriptLine, ActionItem
+from app.providers import create_llm_client
+from app.retrieval import TranscriptRetriever
+from app.single_flight import fingerprint, normalize_text, single_flight
+from app.topic_index import TopicIndex, TopicIndexRegistry
+from app.prompt_cache import cached_system, cached_user_content
+from app.structured_output import QA_ANSWER_SCHEMA, json_tool, parse_structured, result_events, stream_structured
+from app.tokens import ContextBudget, count_tokens, prompt_budget, token_usage
+
+logger = logging.getLogger(__name__)
+
+QA_SYSTEM_PROMPT = "You are a helpful meeting assistant that answers questions accurately based on meeting transcripts. Always be honest if you don't have enough information. Always respond with valid JSON."
+QA_ERROR = {
+    "answer": "I'm sorry, I encountered an error processing your question. Please try rephrasing it.",
+    "confidence": 0.0,
+    "sources": [],
+    "relevant_speakers": []
+}
+
+
+def _question_key(self, question, transcript, action_items=None, summary=None, session_id=None) -> str:
+    """The same question about the same meeting state"""
+    return fingerprint([
+        session_id,
+        normalize_text(question),
+        fingerprint(f"{line.speaker}\x1e{line.text}" for line in transcript),
+        fingerprint(item.text for item in action_items or []),
+        json.dumps(summary, sort_keys=True, default=str)
+    ])
 
 
 class QAAgent:
@@ -20,22 +51,29 @@ class QAAgent:
     """
 
     def __init__(self):
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment")
-
-        # Create Claude client
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        # Claude client (or the simulated backend, see LLM_PROVIDER)
+        self.client = create_llm_client("qa")
         self.model = os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307")
 
-        print(f"✅ Q&A Agent initialized with Claude model: {self.model}")
+        # Local retrieval keeps the prompt bounded regardless of meeting length
+        self.retriever = TranscriptRetriever()
+
+        # Per-session topic indexes, updated as transcript lines arrive
+        self.topic_indexes = TopicIndexRegistry()
 
+        self.prompt_budget = prompt_budget("qa", 8000)
+
+        logger.info("✅ Q&A Agent initialized with Claude model: %s", self.model)
+
+    @timed("qa")
+    @single_flight("qa.answer_question", key=_question_key)
     async def answer_question(
         self,
         question: str,
         transcript: List[TranscriptLine],
         action_items: Optional[List[ActionItem]] = None,
-        summary: Optional[dict] = None
+        summary: Optional[dict] = None,
+        session_id: Optional[str] = None
     ) -> dict:
         """
         Answer a question based on meeting context
@@ -45,45 +83,166 @@ class QAAgent:
             transcript: Full meeting transcript
             action_items: List of action items (optional)
             summary: Meeting summary (optional)
+            session_id: Meeting session ID for token accounting (optional)
 
         Returns:
             Dictionary with answer, confidence, and relevant sources
         """
         try:
-            # Build context from transcript
-            transcript_text = "\n".join([
-                f"{line.speaker}: {line.text}"
-                for line in transcript
-            ])
+            prompt_prefix, prompt_suffix, trimmed_lines, passages = self._question_prompt(question, transcript, action_items, summary)
+            prompt_tokens = count_tokens(QA_SYSTEM_PROMPT) + count_tokens(prompt_prefix) + count_tokens(prompt_suffix)
+
+            response = await self.client.messages.acreate(
+                model=self.model,
+                max_tokens=1024,
+                temperature=0.3,
+                system=cached_system(QA_SYSTEM_PROMPT, self.model),
+                messages=[
+                    {
+                        "role": "user",
+                        "content": cached_user_content(prompt_prefix, prompt_suffix, self.model, system=QA_SYSTEM_PROMPT)
+                    }
+                ],
+                **json_tool("answer_question", "Return the answer to the user's question", QA_ANSWER_SCHEMA)
+            )
 
-            # Build action items context
-            action_text = ""
-            if action_items:
-                action_text = "\n\nACTION ITEMS:\n" + "\n".join([
-                    f"- {item.text} (Assignee: {item.assignee or 'Unassigned'}, Priority: {item.priority})"
-                    for item in action_items
-                ])
-
-            # Build summary context
-            summary_text = ""
-            if summary:
-                summary_text = f"\n\nMEETING SUMMARY:\n"
-                summary_text += f"Title: {summary.get('title', 'N/A')}\n"
-                summary_text += f"Summary: {summary.get('summary', 'N/A')}\n"
-                if summary.get('key_points'):
-                    summary_text += "Key Points:\n" + "\n".join([f"- {point}" for point in summary['key_points']])
-                if summary.get('decisions'):
-                    summary_text += "\nDecisions:\n" + "\n".join([f"- {decision}" for decision in summary['decisions']])
-
-            # Create prompt
-            prompt = f"""You are an intelligent meeting assistant. Answer the user's question based on the meeting context provided.
-
-MEETING TRANSCRIPT:
-{transcript_text}
-{action_text}
-{summary_text}
-
-USER QUESTION: {question}
+            token_usage.record(session_id, "qa", prompt_tokens, trimmed_lines)
+
+            parsed = parse_structured(response, "qa")
+
+            logger.info("✅ Q&A Agent answered question with confidence: %.2f (%s passages from %s lines)", parsed.get('confidence', 0), len(passages), len(transcript))
+
+            return parsed
+
+        except CircuitOpenError as e:
+            record_outcome("fallback")
+            logger.warning("🔌 Q&A returning retrieved excerpts only: %s", e)
+            return self._excerpt_answer(question, transcript)
+        except Exception as e:
+            record_outcome("error")
+            logger.error("❌ Q&A Agent error: %s", e)
+            return dict(QA_ERROR)
+
+    @timed("qa")
+    async def stream_answer(
+        self,
+        question: str,
+        transcript: List[TranscriptLine],
+        action_items: Optional[List[ActionItem]] = None,
+        summary: Optional[dict] = None,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        answer_question, streamed: tokens are forwarded as they arrive, the answer
+        text as it grows, and each field as soon as it is complete
+
+        Args:
+            question: User's question
+            transcript: Full meeting transcript
+            action_items: List of action items (optional)
+            summary: Meeting summary (optional)
+            session_id: Meeting session ID for token accounting (optional)
+
+        Yields:
+            stream_structured events, ending with {"type": "result", "value": answer},
+            or {"type": "error", "message"} if the stream fails after it started
+        """
+        streamed = False
+        try:
+            prompt_prefix, prompt_suffix, trimmed_lines, passages = self._question_prompt(question, transcript, action_items, summary)
+            prompt_tokens = count_tokens(QA_SYSTEM_PROMPT) + count_tokens(prompt_prefix) + count_tokens(prompt_suffix)
+
+            # Text (not a tool call) so the answer can stream
+            async with self.client.messages.astream(
+                priority=INTERACTIVE,
+                model=self.model,
+                max_tokens=1024,
+                temperature=0.3,
+                system=cached_system(QA_SYSTEM_PROMPT, self.model),
+                messages=[
+                    {
+                        "role": "user",
+                        "content": cached_user_content(prompt_prefix, prompt_suffix, self.model, system=QA_SYSTEM_PROMPT)
+                    }
+                ]
+            ) as stream:
+                async for event in stream_structured(stream, "qa"):
+                    streamed = True
+                    yield event
+                token_usage.record(session_id, "qa", prompt_tokens, trimmed_lines)
+
+            logger.info("✅ Q&A Agent streamed answer (%s passages from %s lines)", len(passages), len(transcript))
+
+        except Exception as e:
+            if streamed:
+                # Part of the answer is already out: report the failure rather than send a different answer
+                record_outcome("error")
+                logger.error("❌ Q&A answer stream failed: %s", e)
+                yield {"type": "error", "message": str(e)}
+            elif isinstance(e, CircuitOpenError):
+                record_outcome("fallback")
+                logger.warning("🔌 Q&A returning retrieved excerpts only: %s", e)
+                for event in result_events(self._excerpt_answer(question, transcript)):
+                    yield event
+            else:
+                record_outcome("error")
+                logger.error("❌ Q&A Agent error: %s", e)
+                for event in result_events(dict(QA_ERROR)):
+                    yield event
+
+    def _question_prompt(
+        self,
+        question: str,
+        transcript: List[TranscriptLine],
+        action_items: Optional[List[ActionItem]],
+        summary: Optional[dict]
+    ) -> Tuple[str, str, int, list]:
+        """
+        Cacheable prompt prefix and per-question suffix for a question
+
+        Returns:
+            (prompt_prefix, prompt_suffix, trimmed_lines, passages) tuple
+        """
+        budget = ContextBudget(self.prompt_budget).reserve(QA_SYSTEM_PROMPT).reserve(question)
+
+        # Retrieve only the passages relevant to the question
+        passages = self.retriever.select(question, transcript)
+        is_excerpt = sum(len(passage.lines) for passage in passages) < len(transcript)
+
+        # Build action items context (first claim on the budget)
+        action_text = ""
+        if action_items:
+            action_text = "\n\nACTION ITEMS:\n" + "\n".join(budget.take_lines([
+                f"- {item.text} (Assignee: {item.assignee or 'Unassigned'}, Priority: {item.priority})"
+                for item in action_items
+            ], newest_first=False))
+
+        # Build summary context
+        summary_text = ""
+        if summary:
+            summary_text = f"\n\nMEETING SUMMARY:\n"
+            summary_text += f"Title: {summary.get('title', 'N/A')}\n"
+            summary_text += f"Summary: {summary.get('summary', 'N/A')}\n"
+            if summary.get('key_points'):
+                summary_text += "Key Points:\n" + "\n".join([f"- {point}" for point in summary['key_points']])
+            if summary.get('decisions'):
+                summary_text += "\nDecisions:\n" + "\n".join([f"- {decision}" for decision in summary['decisions']])
+            budget.reserve(summary_text)
+
+        # Passages fill what's left, latest passages kept if over budget
+        transcript_text = "\n\n".join(budget.take_lines([
+            self.retriever.render([passage]) for passage in passages
+        ]))
+
+        # Stable context goes first so repeated questions hit the prompt cache;
+        # per-question excerpts and the question itself follow the cache breakpoint
+        full_transcript_text = "" if is_excerpt else f"\n\nMEETING TRANSCRIPT:\n{transcript_text}"
+        excerpt_text = (
+            f"RELEVANT TRANSCRIPT EXCERPTS ({len(transcript)} lines total, line numbers shown):\n{transcript_text}\n\n"
+            if is_excerpt else ""
+        )
+
+        prompt_prefix = f"""You are an intelligent meeting assistant. Answer the user's question based on the meeting context provided.
 
 Provide a clear, concise answer based on the meeting content. If the answer isn't in the meeting context, say so politely.
 
@@ -99,82 +258,139 @@ Example format:
   "confidence": 0.9,
   "sources": ["John: We should launch next week", "Sarah: I agree with the timeline"],
   "relevant_speakers": ["John", "Sarah"]
-}}"""
+}}{action_text}{summary_text}{full_transcript_text}"""
 
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                temperature=0.3,
-                system="You are a helpful meeting assistant that answers questions accurately based on meeting transcripts. Always be honest if you don't have enough information. Always respond with valid JSON.",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+        prompt_suffix = f"""{excerpt_text}USER QUESTION: {question}"""
 
-            result = response.content[0].text
-            parsed = json.loads(result)
+        return prompt_prefix, prompt_suffix, budget.trimmed_lines, passages
 
-            print(f"✅ Q&A Agent answered question with confidence: {parsed.get('confidence', 0):.2f}")
+    def _excerpt_answer(self, question: str, transcript: List[TranscriptLine]) -> dict:
+        """Degraded answer while the provider is down: the best-matching transcript passages"""
+        passages = self.retriever.select(question, transcript)[:3]
+        return {
+            "answer": "The AI service is temporarily unavailable. These are the parts of the meeting that best match your question:\n\n" + self.retriever.render(passages),
+            "confidence": 0.0,
+            "sources": [f"{line.speaker}: {line.text}" for passage in passages for line in passage.lines],
+            "relevant_speakers": list(dict.fromkeys(line.speaker for passage in passages for line in passage.lines)),
+            "degraded": True
+        }
 
-            return parsed
+    def index_line(self, session_id: str, line: TranscriptLine):
+        """
+        Add a live transcript line to the session's topic index
 
-        except Exception as e:
-            print(f"❌ Q&A Agent error: {str(e)}")
-            return {
-                "answer": "I'm sorry, I encountered an error processing your question. Please try rephrasing it.",
-                "confidence": 0.0,
-                "sources": [],
-                "relevant_speakers": []
-            }
+        Args:
+            session_id: Meeting session ID
+            line: Newly transcribed line
+        """
+        self.topic_indexes.get(session_id).add_line(line.speaker, line.text)
+
+    def drop_session(self, session_id: str):
+        """
+        Forget a session's topic index
+
+        Args:
+            session_id: Meeting session ID
+        """
+        self.topic_indexes.drop(session_id)
 
+    @timed("qa")
     async def search_topic(
         self,
         topic: str,
-        transcript: List[TranscriptLine]
+        transcript: List[TranscriptLine],
+        session_id: Optional[str] = None,
+        summarize: bool = True
     ) -> dict:
         """
         Search for a specific topic in the meeting
 
+        Matching runs locally against an incremental per-session index; Claude
+        is only asked to summarize the matched lines.
+
         Args:
             topic: Topic to search for
-            transcript: Full meeting transcript
+            transcript: Full meeting transcript (may be empty for live sessions)
+            session_id: Session whose live index should be used (optional)
+            summarize: Whether to generate the summary field with Claude
 
         Returns:
             Dictionary with relevant segments and summary
         """
         try:
-            transcript_text = "\n".join([
-                f"[{i}] {line.speaker}: {line.text}"
-                for i, line in enumerate(transcript)
+            if session_id:
+                index = self.topic_indexes.get(session_id)
+            else:
+                index = TopicIndex()
+            if transcript:
+                index.sync(transcript)
+
+            matches = index.search(topic)
+            if not matches:
+                logger.info("ℹ️ Q&A Agent: Topic '%s' not found in meeting", topic)
+                return {
+                    "found": False,
+                    "summary": f"No discussion of '{topic}' was found in this meeting.",
+                    "segments": [],
+                    "key_quotes": []
+                }
+
+            segments = sorted(line_number for line_number, _ in matches)
+            key_quotes = [index.lines[line_number][1] for line_number, _ in matches[:5]]
+
+            logger.info("✅ Q&A Agent found %s segments about: %s", len(segments), topic)
+
+            summary = f"'{topic}' came up {len(segments)} time(s) in the meeting."
+            if summarize:
+                summary = await self._summarize_topic(topic, index, segments, session_id)
+
+            return {
+                "found": True,
+                "summary": summary,
+                "segments": segments,
+                "key_quotes": key_quotes
+            }
+
+        except Exception as e:
+            record_outcome("error")
+            logger.error("❌ Topic search error: %s", e)
+            return {
+                "found": False,
+                "summary": "Error searching for topic",
+                "segments": [],
+                "key_quotes": []
+            }
+
+    async def _summarize_topic(
+        self,
+        topic: str,
+        index: TopicIndex,
+        segments: List[int],
+        session_id: Optional[str] = None
+    ) -> str:
+        """
+        Summarize what was said about a topic using only the matched lines
+        """
+        try:
+            matched_text = "\n".join([
+                f"[{line_number}] {index.lines[line_number][0]}: {index.lines[line_number][1]}"
+                for line_number in segments[:40]
             ])
 
-            prompt = f"""Search through this meeting transcript for discussions about: "{topic}"
+            prompt = f"""These lines from a meeting transcript mention "{topic}":
 
-MEETING TRANSCRIPT:
-{transcript_text}
+{matched_text}
 
-Find all relevant segments where this topic was discussed. Return JSON with:
-- found: Boolean indicating if topic was found
-- summary: Brief summary of what was said about this topic
-- segments: Array of transcript line numbers where this topic was discussed
-- key_quotes: Array of relevant quotes about this topic
+Write a brief summary (1-3 sentences) of what was said about this topic. Respond with the summary text only."""
 
-Example format:
-{{
-  "found": true,
-  "summary": "The team discussed launching the new feature...",
-  "segments": [5, 12, 23],
-  "key_quotes": ["We need to launch by next week", "The feature is almost ready"]
-}}"""
+            system_prompt = "You are an expert at summarizing meeting discussions concisely."
+            prompt_tokens = count_tokens(system_prompt) + count_tokens(prompt)
 
-            response = self.client.messages.create(
+            response = await self.client.messages.acreate(
                 model=self.model,
-                max_tokens=1024,
+                max_tokens=256,
                 temperature=0.2,
-                system="You are an expert at searching and analyzing meeting transcripts. Always respond with valid JSON.",
+                system=cached_system(system_prompt, self.model),
                 messages=[
                     {
                         "role": "user",
@@ -183,42 +399,38 @@ Example format:
                 ]
             )
 
-            result = json.loads(response.content[0].text)
-
-            if result.get("found"):
-                print(f"✅ Q&A Agent found {len(result.get('segments', []))} segments about: {topic}")
-            else:
-                print(f"ℹ️ Q&A Agent: Topic '{topic}' not found in meeting")
+            token_usage.record(session_id, "qa", prompt_tokens)
 
-            return result
+            return response.content[0].text.strip()
 
         except Exception as e:
-            print(f"❌ Topic search error: {str(e)}")
-            return {
-                "found": False,
-                "summary": "Error searching for topic",
-                "segments": [],
-                "key_quotes": []
-            }
+            logger.error("❌ Topic summary error: %s", e)
+            return f"'{topic}' came up {len(segments)} time(s) in the meeting."
 
+    @timed("qa")
     async def compare_tasks(
         self,
-        action_items: List[ActionItem]
+        action_items: List[ActionItem],
+        session_id: Optional[str] = None
     ) -> dict:
         """
         Analyze and compare action items to find dependencies, conflicts, or priorities
 
         Args:
             action_items: List of action items
+            session_id: Meeting session the tokens are booked to
 
         Returns:
             Analysis of task relationships and recommendations
         """
         try:
-            tasks_text = "\n".join([
+            system_prompt = "You are a project management expert analyzing task relationships. Always respond with valid JSON."
+            budget = ContextBudget(self.prompt_budget).reserve(system_prompt)
+
+            tasks_text = "\n".join(budget.take_lines([
                 f"{i+1}. {item.text} (Assignee: {item.assignee or 'Unassigned'}, Priority: {item.priority})"
                 for i, item in enumerate(action_items)
-            ])
+            ], newest_first=False))
 
             prompt = f"""Analyze these action items for dependencies, conflicts, and priorities:
 
@@ -233,11 +445,13 @@ Provide analysis with:
 
 Return as JSON."""
 
-            response = self.client.messages.create(
+            prompt_tokens = count_tokens(system_prompt) + count_tokens(prompt)
+
+            response = await self.client.messages.acreate(
                 model=self.model,
                 max_tokens=1024,
                 temperature=0.3,
-                system="You are a project management expert analyzing task relationships. Always respond with valid JSON.",
+                system=cached_system(system_prompt, self.model),
                 messages=[
                     {
                         "role": "user",
@@ -246,13 +460,16 @@ Return as JSON."""
                 ]
             )
 
-            result = json.loads(response.content[0].text)
-            print(f"✅ Q&A Agent analyzed {len(action_items)} tasks")
+            token_usage.record(session_id, "qa", prompt_tokens, budget.trimmed_lines)
+
+            result = parse_structured(response, "qa")
+            logger.info("✅ Q&A Agent analyzed %s tasks", len(action_items))
 
             return result
 
         except Exception as e:
-            print(f"❌ Task comparison error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Task comparison error: %s", e)
             return {
                 "dependencies": [],
                 "conflicts": [],
@@ -3,10 +3,19 @@
 """
 Real-time Insights Agent - Provides live meeting insights using Claude streaming API
 """
-import anthropic
+import logging
 import os
-from typing import List, AsyncGenerator
+from typing import List, AsyncGenerator, Optional
+from app.circuit_breaker import CircuitOpenError
+from app.hedging import DeadlineExceeded
+from app.llm_scheduler import INTERACTIVE
+from app.metrics import record_outcome, timed
 from app.models import TranscriptLine
+from app.prompt_cache import cached_system, cached_user_content
+from app.providers import create_llm_client
+from app.tokens import count_tokens, token_usage
+
+logger = logging.getLogger(__name__)
 
 
 class RealTimeInsightsAgent:
@@ -21,24 +30,22 @@ class RealTimeInsightsAgent:
     """
 
     def __init__(self):
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment")
-
-        # Create Claude client
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        # Claude client (or the simulated backend, see LLM_PROVIDER)
+        self.client = create_llm_client("realtime_insights", priority=INTERACTIVE)
         # Use faster model for real-time performance
         self.model = os.getenv("CLAUDE_REALTIME_MODEL", "claude-3-haiku-20240307")
 
         # Maintain conversation context
         self.conversation_history = []
 
-        print(f"✅ Real-Time Insights Agent initialized with Claude model: {self.model}")
+        logger.info("✅ Real-Time Insights Agent initialized with Claude model: %s", self.model)
 
+    @timed("realtime_insights")
     async def analyze_live_transcript(
         self,
         new_line: TranscriptLine,
-        recent_context: List[TranscriptLine] = None
+        recent_context: List[TranscriptLine] = None,
+        session_id: Optional[str] = None
     ) -> AsyncGenerator[dict, None]:
         """
         Analyze new transcript line in real-time and stream insights
@@ -46,9 +53,13 @@ class RealTimeInsightsAgent:
         Args:
             new_line: The newly transcribed line
             recent_context: Recent conversation context (last 3-5 lines)
+            session_id: Meeting session the tokens are booked to
 
         Yields:
             Dictionary containing real-time insights as they're generated
+
+        Raises:
+            DeadlineExceeded: if called inside a deadline_scope that ran out
         """
         try:
             # Build context from recent conversation
@@ -62,13 +73,8 @@ class RealTimeInsightsAgent:
             # Add new line
             current_text = f"{new_line.speaker}: {new_line.text}"
 
-            prompt = f"""You are a real-time meeting assistant analyzing conversations as they happen.
-
-RECENT CONTEXT:
-{context_text}
-
-NEW MESSAGE:
-{current_text}
+            # Static instructions form a cacheable prefix; only the conversation varies
+            prompt = """You are a real-time meeting assistant analyzing conversations as they happen.
 
 Provide INSTANT, CONCISE analysis (1-2 sentences max per insight):
 
@@ -90,6 +96,13 @@ Examples:
 "Let's go with option B" → "✅ DECISION: Chose option B"
 "The database is running slow" → "⚠️ CONCERN: Database performance issue"
 "Just checking in on progress" → "SKIP"
+"""
+
+            conversation = f"""RECENT CONTEXT:
+{context_text}
+
+NEW MESSAGE:
+{current_text}
 
 Respond with ONE LINE only:"""
 
@@ -103,21 +116,24 @@ Respond with ONE LINE only:"""
             if len(self.conversation_history) > 20:
                 self.conversation_history = self.conversation_history[-20:]
 
+            system_prompt = "You are a real-time meeting assistant. Provide instant, concise insights. Be extremely brief. Only highlight truly important moments."
+            prompt_tokens = count_tokens(system_prompt) + count_tokens(prompt) + count_tokens(conversation)
+
             # Stream the response from Claude
-            with self.client.messages.stream(
+            async with self.client.messages.astream(
                 model=self.model,
                 max_tokens=150,  # Short responses for speed
                 temperature=0.3,  # Lower for more consistent insights
-                system="You are a real-time meeting assistant. Provide instant, concise insights. Be extremely brief. Only highlight truly important moments.",
+                system=cached_system(system_prompt, self.model),
                 messages=[
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": cached_user_content(prompt, conversation, self.model, system=system_prompt)
                     }
                 ]
             ) as stream:
                 insight_text = ""
-                for text in stream.text_stream:
+                async for text in stream.text_stream:
                     insight_text += text
 
                     # Yield each chunk as it arrives
@@ -128,6 +144,8 @@ Respond with ONE LINE only:"""
                         "timestamp": new_line.timestamp.isoformat() if hasattr(new_line.timestamp, 'isoformat') else str(new_line.timestamp)
                     }
 
+                token_usage.record(session_id, "realtime_insights", prompt_tokens)
+
                 # Send final complete insight
                 if insight_text.strip() != "SKIP":
                     yield {
@@ -138,15 +156,22 @@ Respond with ONE LINE only:"""
                         "timestamp": new_line.timestamp.isoformat() if hasattr(new_line.timestamp, 'isoformat') else str(new_line.timestamp)
                     }
 
-                    print(f"🤖 Real-time insight: {insight_text.strip()}")
+                    logger.info("🤖 Real-time insight: %s", insight_text.strip(), extra={"event": "insight"})
 
+        except DeadlineExceeded:
+            raise  # Too late to show; the caller drops it
+        except CircuitOpenError:
+            record_outcome("fallback")
+            return  # Optional enrichment; skipped while the provider is down
         except Exception as e:
-            print(f"❌ Real-time insights error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Real-time insights error: %s", e)
             yield {
                 "type": "error",
                 "error": str(e)
             }
 
+    @timed("realtime_insights")
     async def get_meeting_summary_so_far(self) -> str:
         """
         Get a quick summary of the meeting so far (for periodic updates)
@@ -172,11 +197,11 @@ Focus on:
 
 Be extremely concise:"""
 
-            response = self.client.messages.create(
+            response = await self.client.messages.acreate(
                 model=self.model,
                 max_tokens=200,
                 temperature=0.3,
-                system="You are a meeting summarizer. Provide ultra-concise summaries in 2-3 sentences maximum.",
+                system=cached_system("You are a meeting summarizer. Provide ultra-concise summaries in 2-3 sentences maximum.", self.model),
                 messages=[
                     {
                         "role": "user",
@@ -188,10 +213,11 @@ Be extremely concise:"""
             return response.content[0].text.strip()
 
         except Exception as e:
-            print(f"❌ Summary generation error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Summary generation error: %s", e)
             return "Unable to generate summary"
 
     def clear_history(self):
         """Clear conversation history (call when starting new meeting)"""
         self.conversation_history = []
-        print("🔄 Real-time agent history cleared")
+        logger.info("🔄 Real-time agent history cleared")
@@ -1,10 +1,51 @@
 """
 Summarizer Agent - Generates meeting summaries using Claude (Anthropic)
 """
-import anthropic
+import asyncio
+import logging
 import os
-from typing import List
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Tuple
+from app.circuit_breaker import CircuitOpenError
+from app.fallbacks import extractive_summary
+from app.llm_scheduler import BATCH, INTERACTIVE
+from app.metrics import record_outcome, timed
 from app.models import TranscriptLine, ActionItem
+from app.prompt_cache import cached_system
+from app.providers import create_llm_client
+from app.structured_output import (
+    MEETING_SUMMARY_SCHEMA, SECTION_SUMMARY_SCHEMA, json_tool, parse_structured, result_events, stream_structured
+)
+from app.tokens import ContextBudget, count_tokens, prompt_budget, token_usage
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = "You are an expert meeting analyst. Provide concise, actionable summaries. Always respond with valid JSON."
+SUMMARY_ERROR = {
+    "title": "Meeting Summary",
+    "summary": "Error generating summary",
+    "key_points": [],
+    "decisions": [],
+    "participants": []
+}
+
+
+class RollingSummary:
+    """
+    Running map-reduce state for one live meeting
+    - Lines are buffered until a full chunk is available
+    - Each chunk is summarized in the background (chained so order is kept)
+    - Once there are too many chunk summaries, the oldest are merged into one
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.lines: List[TranscriptLine] = []
+        self.scheduled_upto = 0
+        self.chunk_summaries: List[dict] = []
+        self.task: Optional[asyncio.Task] = None
+        # Chunks scheduled but not yet summarized
+        self.pending_chunks = 0
 
 
 class SummarizerAgent:
@@ -18,49 +59,312 @@ class SummarizerAgent:
     """
     
     def __init__(self):
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment")
-        
-        # Create Claude client
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        # Claude client (or the simulated backend, see LLM_PROVIDER)
+        self.client = create_llm_client("summarizer", priority=BATCH)
         self.model = os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307")
+
+        # Rolling summary settings
+        self.chunk_lines = int(os.getenv("SUMMARY_CHUNK_LINES", "40"))
+        self.merge_fan_in = int(os.getenv("SUMMARY_MERGE_FAN_IN", "8"))
+        self.max_sessions = int(os.getenv("SUMMARY_MAX_SESSIONS", "64"))
+        self.rolling: "OrderedDict[str, RollingSummary]" = OrderedDict()
+        self.prompt_budget = prompt_budget("summarizer", 12000)
         
-        print(f"✅ Summarizer Agent initialized with Claude model: {self.model}")
+        logger.info("✅ Summarizer Agent initialized with Claude model: %s", self.model)
     
-    async def generate_summary(
-        self, 
-        transcript: List[TranscriptLine],
-        action_items: List[ActionItem]
-    ) -> dict:
+    def add_transcript_line(self, session_id: str, line: TranscriptLine):
         """
-        Generate comprehensive meeting summary
-        
+        Feed a live transcript line into the session's rolling summary.
+        A background chunk summary is scheduled whenever a full chunk is buffered.
+
         Args:
-            transcript: List of transcript lines
-            action_items: List of detected action items
-            
+            session_id: Meeting session ID
+            line: Newly transcribed line
+        """
+        state = self.rolling.get(session_id)
+        if state is None:
+            state = RollingSummary(session_id)
+            self.rolling[session_id] = state
+            while len(self.rolling) > self.max_sessions:
+                _, evicted = self.rolling.popitem(last=False)
+                self._cancel(evicted)
+
+        state.lines.append(line)
+        if len(state.lines) - state.scheduled_upto >= self.chunk_lines:
+            self._schedule_chunk(state, len(state.lines))
+
+    def drop_session(self, session_id: str):
+        """
+        Forget a session's rolling summary and cancel any chunk still being summarized
+
+        Args:
+            session_id: Meeting session ID
+        """
+        state = self.rolling.pop(session_id, None)
+        if state is not None:
+            self._cancel(state)
+
+    @staticmethod
+    def _cancel(state: RollingSummary):
+        if state.task and not state.task.done():
+            state.task.cancel()
+
+    def queue_depths(self) -> dict:
+        """Rolling summary backlog across sessions (for metrics)"""
+        return {
+            "summary_buffered_lines": sum(len(state.lines) - state.scheduled_upto for state in self.rolling.values()),
+            "summary_pending_chunks": sum(state.pending_chunks for state in self.rolling.values())
+        }
+
+    def _schedule_chunk(self, state: RollingSummary, end: int):
+        """Chain a background summary of lines [scheduled_upto, end) after any in-flight one"""
+        start = state.scheduled_upto
+        state.scheduled_upto = end
+        state.pending_chunks += 1
+        state.task = asyncio.create_task(
+            self._summarize_chunk_in_order(state, start, end, previous=state.task)
+        )
+
+    async def _summarize_chunk_in_order(
+        self,
+        state: RollingSummary,
+        start: int,
+        end: int,
+        previous: Optional[asyncio.Task]
+    ):
+        """Map step for one chunk, then merge old chunk summaries if there are too many"""
+        if previous is not None:
+            try:
+                await previous
+            except Exception:
+                pass
+
+        try:
+            state.chunk_summaries.append(
+                await self._summarize_chunk(state.lines[start:end], start, end, state.session_id)
+            )
+        finally:
+            state.pending_chunks -= 1
+
+        if len(state.chunk_summaries) > self.merge_fan_in:
+            merged = await self._merge_chunk_summaries(
+                state.chunk_summaries[:self.merge_fan_in], state.session_id
+            )
+            state.chunk_summaries[:self.merge_fan_in] = [merged]
+
+    async def _complete_json(
+        self,
+        prompt: str,
+        system: str,
+        max_tokens: int,
+        session_id: Optional[str] = None,
+        trimmed_lines: int = 0,
+        schema: dict = SECTION_SUMMARY_SCHEMA
+    ) -> dict:
+        """Run a Claude call through the LLM scheduler and parse its JSON response"""
+        prompt_tokens = count_tokens(system) + count_tokens(prompt)
+        response = await self.client.messages.acreate(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=0.3,
+            system=cached_system(system, self.model),
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            **json_tool("record_summary", "Record the structured meeting summary", schema)
+        )
+        token_usage.record(session_id, "summarizer", prompt_tokens, trimmed_lines)
+        return parse_structured(response, "summarizer")
+
+    @timed("summarizer")
+    async def _summarize_chunk(
+        self,
+        lines: List[TranscriptLine],
+        start: int,
+        end: int,
+        session_id: Optional[str] = None
+    ) -> dict:
+        """
+        Summarize a fixed-size slice of the transcript
+
         Returns:
-            Dictionary containing summary, key points, decisions
+            Dictionary with start_line, end_line, summary, key_points, decisions, participants
         """
+        chunk_text = "\n".join([
+            f"{line.speaker}: {line.text}"
+            for line in lines
+        ])
+
+        prompt = f"""Summarize this section of a longer meeting transcript (lines {start + 1}-{end}).
+
+TRANSCRIPT SECTION:
+{chunk_text}
+
+Format your response as JSON with keys:
+- summary: 1-3 sentences on what was discussed in this section
+- key_points: array of key discussion points
+- decisions: array of decisions made
+- participants: array of speaker names or people mentioned"""
+
         try:
-            # Build transcript text
-            transcript_text = "\n".join([
-                f"{line.speaker}: {line.text}" 
+            result = await self._complete_json(
+                prompt,
+                system="You are an expert meeting analyst summarizing one section of a meeting. Be concise. Always respond with valid JSON.",
+                max_tokens=512,
+                session_id=session_id
+            )
+        except CircuitOpenError:
+            record_outcome("fallback")
+            result = extractive_summary(lines)
+            del result["title"]
+        except Exception as e:
+            record_outcome("error")
+            logger.error("❌ Chunk summary error (lines %s-%s): %s", start + 1, end, e)
+            # Keep the section represented with the speakers we know about
+            result = {
+                "summary": "",
+                "key_points": [],
+                "decisions": [],
+                "participants": sorted({line.speaker for line in lines})
+            }
+
+        result["start_line"] = start
+        result["end_line"] = end
+        return result
+
+    @timed("summarizer")
+    async def _merge_chunk_summaries(self, chunk_summaries: List[dict], session_id: Optional[str] = None) -> dict:
+        """Reduce consecutive chunk summaries into a single higher-level summary"""
+        prompt = f"""Merge these consecutive section summaries of a meeting into one section summary.
+
+SECTION SUMMARIES:
+{self._render_chunk_summaries(chunk_summaries)}
+
+Format your response as JSON with keys: summary (2-4 sentences), key_points, decisions, participants.
+Deduplicate points and keep only the most important ones."""
+
+        try:
+            result = await self._complete_json(
+                prompt,
+                system="You are an expert meeting analyst. Combine section summaries faithfully and concisely. Always respond with valid JSON.",
+                max_tokens=768,
+                session_id=session_id
+            )
+        except Exception as e:
+            record_outcome("error")
+            logger.error("❌ Chunk merge error: %s", e)
+            result = {
+                "summary": " ".join(chunk.get("summary", "") for chunk in chunk_summaries).strip(),
+                "key_points": [point for chunk in chunk_summaries for point in chunk.get("key_points", [])],
+                "decisions": [decision for chunk in chunk_summaries for decision in chunk.get("decisions", [])],
+                "participants": sorted({p for chunk in chunk_summaries for p in chunk.get("participants", [])})
+            }
+
+        result["start_line"] = chunk_summaries[0].get("start_line", 0)
+        result["end_line"] = chunk_summaries[-1].get("end_line", 0)
+        return result
+
+    @staticmethod
+    def _render_chunk_summaries(chunk_summaries: List[dict]) -> str:
+        return "\n".join(SummarizerAgent._chunk_summary_parts(chunk_summaries))
+
+    @staticmethod
+    def _chunk_summary_parts(chunk_summaries: List[dict]) -> List[str]:
+        parts = []
+        for chunk in chunk_summaries:
+            part = f"[Lines {chunk.get('start_line', 0) + 1}-{chunk.get('end_line', 0)}]\n"
+            part += f"Summary: {chunk.get('summary', '')}\n"
+            if chunk.get("key_points"):
+                part += "Key Points:\n" + "\n".join([f"- {point}" for point in chunk["key_points"]]) + "\n"
+            if chunk.get("decisions"):
+                part += "Decisions:\n" + "\n".join([f"- {decision}" for decision in chunk["decisions"]]) + "\n"
+            if chunk.get("participants"):
+                part += f"Participants: {', '.join(chunk['participants'])}\n"
+            parts.append(part)
+        return parts
+
+    async def _collect_chunk_summaries(
+        self,
+        transcript: List[TranscriptLine],
+        session_id: Optional[str]
+    ) -> List[dict]:
+        """
+        Chunk summaries covering the whole transcript.
+        Live sessions reuse the rolling state so only the unsummarized tail is processed.
+        """
+        state = self.rolling.get(session_id) if session_id else None
+
+        # Only reuse state built from this transcript (not one restarted after drop_session)
+        if state is not None and state.lines == transcript[:len(state.lines)]:
+            # Pick up any lines that arrived without going through add_transcript_line
+            for line in transcript[len(state.lines):]:
+                state.lines.append(line)
+            if state.scheduled_upto < len(state.lines):
+                self._schedule_chunk(state, len(state.lines))
+            task = state.task
+            try:
+                if task is not None:
+                    # Shielded: a cancelled request must not cancel the session's background chain
+                    await asyncio.shield(task)
+                return state.chunk_summaries
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+                # Evicted or dropped while we waited: summarize without the rolling state
+                logger.info("ℹ️ Rolling summary for %s was discarded, summarizing from scratch", session_id)
+
+        # No live state: map all chunks concurrently
+        chunks = [
+            (start, min(start + self.chunk_lines, len(transcript)))
+            for start in range(0, len(transcript), self.chunk_lines)
+        ]
+        return list(await asyncio.gather(*[
+            self._summarize_chunk(transcript[start:end], start, end, session_id)
+            for start, end in chunks
+        ]))
+
+    async def _final_summary_prompt(
+        self,
+        transcript: List[TranscriptLine],
+        action_items: List[ActionItem],
+        session_id: Optional[str]
+    ) -> Tuple[str, int]:
+        """
+        Prompt for the whole-meeting summary: from chunk summaries for long
+        meetings, from the transcript itself otherwise
+
+        Returns:
+            (prompt, trimmed_lines) tuple
+        """
+        # Action items take priority over transcript context in the budget
+        budget = ContextBudget(self.prompt_budget).reserve(SUMMARY_SYSTEM_PROMPT)
+        action_text = "\n".join(budget.take_lines([
+            f"- {item.text} (Assignee: {item.assignee or 'Unassigned'})"
+            for item in action_items
+        ], newest_first=False))
+
+        if len(transcript) > self.chunk_lines:
+            chunk_summaries = await self._collect_chunk_summaries(transcript, session_id)
+            summaries_text = "\n".join(budget.take_lines(self._chunk_summary_parts(chunk_summaries)))
+            context = f"""These are summaries of consecutive sections of one meeting ({len(transcript)} transcript lines). Combine them into a structured summary of the whole meeting.
+
+SECTION SUMMARIES:
+{summaries_text}"""
+        else:
+            # Build transcript text (newest lines kept if over budget)
+            transcript_text = "\n".join(budget.take_lines([
+                f"{line.speaker}: {line.text}"
                 for line in transcript
-            ])
-            
-            # Build action items text
-            action_text = "\n".join([
-                f"- {item.text} (Assignee: {item.assignee or 'Unassigned'})"
-                for item in action_items
-            ])
-            
-            # Create prompt
-            prompt = f"""You are an expert meeting summarizer. Analyze this meeting transcript and provide a structured summary.
+            ]))
+            context = f"""Analyze this meeting transcript and provide a structured summary.
 
 TRANSCRIPT:
-{transcript_text}
+{transcript_text}"""
+
+        prompt = f"""You are an expert meeting summarizer. {context}
 
 ACTION ITEMS DETECTED:
 {action_text}
@@ -73,37 +377,117 @@ Please provide:
 5. List of participants mentioned
 
 Format your response as JSON with keys: title, summary, key_points, decisions, participants"""
+        return prompt, budget.trimmed_lines
 
-            response = self.client.messages.create(
+    @timed("summarizer")
+    async def generate_summary(
+        self, 
+        transcript: List[TranscriptLine],
+        action_items: List[ActionItem],
+        session_id: Optional[str] = None
+    ) -> dict:
+        """
+        Generate comprehensive meeting summary.
+        Long meetings are reduced from chunk summaries (built in the background
+        for live sessions), so the final step stays small.
+        
+        Args:
+            transcript: List of transcript lines
+            action_items: List of detected action items
+            session_id: Live session whose rolling summary should be reused (optional)
+            
+        Returns:
+            Dictionary containing summary, key points, decisions
+        """
+        try:
+            prompt, trimmed_lines = await self._final_summary_prompt(transcript, action_items, session_id)
+
+            result = await self._complete_json(
+                prompt,
+                system=SUMMARY_SYSTEM_PROMPT,
+                max_tokens=1024,
+                session_id=session_id,
+                trimmed_lines=trimmed_lines,
+                schema=MEETING_SUMMARY_SCHEMA
+            )
+
+            logger.info("✅ Summary generated for meeting with %s lines", len(transcript))
+
+            return result
+            
+        except CircuitOpenError as e:
+            record_outcome("fallback")
+            logger.warning("🔌 Summary using local extractive summarizer: %s", e)
+            return extractive_summary(transcript, action_items)
+        except Exception as e:
+            record_outcome("error")
+            logger.error("❌ Summarizer Agent error: %s", e)
+            return dict(SUMMARY_ERROR)
+
+    @timed("summarizer")
+    async def stream_summary(
+        self,
+        transcript: List[TranscriptLine],
+        action_items: List[ActionItem],
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        generate_summary, streamed: tokens are forwarded as they arrive and each
+        field (title, summary, key_points, ...) as soon as it is complete
+
+        Args:
+            transcript: List of transcript lines
+            action_items: List of detected action items
+            session_id: Live session whose rolling summary should be reused (optional)
+
+        Yields:
+            stream_structured events, ending with {"type": "result", "value": summary},
+            or {"type": "error", "message"} if the stream fails after it started
+        """
+        streamed = False
+        try:
+            prompt, trimmed_lines = await self._final_summary_prompt(transcript, action_items, session_id)
+            prompt_tokens = count_tokens(SUMMARY_SYSTEM_PROMPT) + count_tokens(prompt)
+
+            # Someone is watching this one: interactive priority, and text (not a tool call) so it can stream
+            async with self.client.messages.astream(
+                priority=INTERACTIVE,
                 model=self.model,
                 max_tokens=1024,
                 temperature=0.3,
-                system="You are an expert meeting analyst. Provide concise, actionable summaries. Always respond with valid JSON.",
+                system=cached_system(SUMMARY_SYSTEM_PROMPT, self.model),
                 messages=[
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ]
-            )
-            
-            result = response.content[0].text
-            
-            print(f"✅ Summary generated for meeting with {len(transcript)} lines")
-            
-            import json
-            return json.loads(result)
-            
+            ) as stream:
+                async for event in stream_structured(stream, "summarizer"):
+                    streamed = True
+                    yield event
+                token_usage.record(session_id, "summarizer", prompt_tokens, trimmed_lines)
+
+            logger.info("✅ Summary streamed for meeting with %s lines", len(transcript))
+
         except Exception as e:
-            print(f"❌ Summarizer Agent error: {str(e)}")
-            return {
-                "title": "Meeting Summary",
-                "summary": "Error generating summary",
-                "key_points": [],
-                "decisions": [],
-                "participants": []
-            }
+            if streamed:
+                # Part of the summary is already out: report the failure rather than send a different summary
+                record_outcome("error")
+                logger.error("❌ Summary stream failed: %s", e)
+                yield {"type": "error", "message": str(e)}
+            elif isinstance(e, CircuitOpenError):
+                record_outcome("fallback")
+                logger.warning("🔌 Summary using local extractive summarizer: %s", e)
+                for event in result_events(extractive_summary(transcript, action_items)):
+                    yield event
+            else:
+                record_outcome("error")
+                logger.error("❌ Summarizer Agent error: %s", e)
+                for event in result_events(dict(SUMMARY_ERROR)):
+                    yield event
     
+    @timed("summarizer")
     async def generate_pr_description(
         self,
         action_item: ActionItem,
@@ -134,11 +518,11 @@ Create a clear PR description with:
 
 Keep it concise and professional."""
 
-            response = self.client.messages.create(
+            response = await self.client.messages.acreate(
                 model=self.model,
                 max_tokens=500,
                 temperature=0.5,
-                system="You are a software engineer creating PR descriptions.",
+                system=cached_system("You are a software engineer creating PR descriptions.", self.model),
                 messages=[
                     {
                         "role": "user",
@@ -150,5 +534,6 @@ Keep it concise and professional."""
             return response.content[0].text
             
         except Exception as e:
-            print(f"❌ PR description generation error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ PR description generation error: %s", e)
             return f"Implement: {action_item.text}"
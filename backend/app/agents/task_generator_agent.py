@@ -1,11 +1,23 @@
 """
 Task Generator Agent - Extracts and structures action items using Claude (Anthropic)
 """
-import anthropic
+import logging
 import os
-from typing import List
-import json
+from typing import AsyncIterator, List, Optional
+from app.circuit_breaker import CircuitOpenError
+from app.fallbacks import rule_based_action_items
+from app.llm_scheduler import BATCH, INTERACTIVE
+from app.metrics import record_outcome, timed
 from app.models import TranscriptLine, ActionItem
+from app.prompt_cache import cached_system
+from app.providers import create_llm_client
+from app.single_flight import normalize_text, single_flight
+from app.structured_output import ACTION_ITEMS_SCHEMA, json_tool, parse_structured, result_events, stream_structured
+from app.tokens import ContextBudget, count_tokens, prompt_budget, token_usage
+
+logger = logging.getLogger(__name__)
+
+JIRA_SYSTEM_PROMPT = "You are a product manager creating clear, actionable Jira tickets. Always respond with valid JSON."
 
 
 class TaskGeneratorAgent:
@@ -19,21 +31,21 @@ class TaskGeneratorAgent:
     """
     
     def __init__(self):
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment")
-        
-        # Create Claude client
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        # Claude client (or the simulated backend, see LLM_PROVIDER)
+        self.client = create_llm_client("task_generator")
         self.model = os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307")
         self.confidence_threshold = float(os.getenv("ACTION_ITEM_CONFIDENCE_THRESHOLD", "0.7"))
+        self.prompt_budget = prompt_budget("task_generator", 6000)
         
-        print(f"✅ Task Generator Agent initialized with Claude model: {self.model}")
+        logger.info("✅ Task Generator Agent initialized with Claude model: %s", self.model)
     
+    @timed("task_generator")
     async def extract_action_items_with_context(
         self, 
         transcript_segment: List[TranscriptLine],
-        existing_action_items: List[ActionItem] = None
+        existing_action_items: List[ActionItem] = None,
+        session_id: Optional[str] = None,
+        priority: Optional[str] = None
     ) -> List[ActionItem]:
         """
         Extract action items from transcript, considering existing ones to avoid duplicates
@@ -42,24 +54,29 @@ class TaskGeneratorAgent:
         Args:
             transcript_segment: Recent transcript lines to analyze
             existing_action_items: Already identified action items to check against
+            session_id: Meeting session ID for token accounting (optional)
+            priority: LLM scheduler priority class (BATCH for media-file processing)
             
         Returns:
             Updated list of all action items (existing + new + updated)
         """
         try:
-            # Build context from transcript
-            context = "\n".join([
-                f"{line.speaker}: {line.text}" 
-                for line in transcript_segment
-            ])
-            
-            # Build existing tasks context
+            system_prompt = "You are an expert at managing action items. Avoid duplicates, merge related tasks, and update existing ones with new details. Always respond with valid JSON."
+            budget = ContextBudget(self.prompt_budget).reserve(system_prompt)
+
+            # Build existing tasks context (first claim on the budget)
             existing_context = ""
             if existing_action_items:
-                existing_context = "\n\nEXISTING ACTION ITEMS:\n" + "\n".join([
+                existing_context = "\n\nEXISTING ACTION ITEMS:\n" + "\n".join(budget.take_lines([
                     f"- {item.text} (assignee: {item.assignee or 'unassigned'}, priority: {item.priority})"
                     for item in existing_action_items
-                ])
+                ], newest_first=False))
+
+            # Build context from transcript (newest lines kept if over budget)
+            context = "\n".join(budget.take_lines([
+                f"{line.speaker}: {line.text}" 
+                for line in transcript_segment
+            ]))
 
             prompt = f"""Analyze this meeting conversation and manage action items intelligently.
 
@@ -99,21 +116,26 @@ Example format:
   ]
 }}"""
 
-            response = self.client.messages.create(
+            prompt_tokens = count_tokens(system_prompt) + count_tokens(prompt)
+
+            response = await self.client.messages.acreate(
+                priority=priority,
                 model=self.model,
                 max_tokens=1024,
                 temperature=0.2,
-                system="You are an expert at managing action items. Avoid duplicates, merge related tasks, and update existing ones with new details. Always respond with valid JSON.",
+                system=cached_system(system_prompt, self.model),
                 messages=[
                     {
                         "role": "user",
                         "content": prompt
                     }
-                ]
+                ],
+                **json_tool("record_action_items", "Record the action items found in the conversation", ACTION_ITEMS_SCHEMA)
             )
+
+            token_usage.record(session_id, "task_generator", prompt_tokens, budget.trimmed_lines)
             
-            result = response.content[0].text
-            parsed = json.loads(result)
+            parsed = parse_structured(response, "task_generator")
             
             # Handle both array and object with items key
             items_data = parsed.get("action_items", []) if isinstance(parsed, dict) else parsed
@@ -131,34 +153,46 @@ Example format:
                     ))
             
             if action_items:
-                print(f"✅ Task Generator processed {len(action_items)} action items (with context)")
+                logger.info("✅ Task Generator processed %s action items (with context)", len(action_items))
             
             return action_items
             
+        except CircuitOpenError as e:
+            record_outcome("fallback")
+            logger.warning("🔌 Action items using rule-based extraction: %s", e)
+            return rule_based_action_items(transcript_segment, existing_action_items)
         except Exception as e:
-            print(f"❌ Task Generator Agent context error: {str(e)}")
-            # Fallback to original method
-            return await self.extract_action_items(transcript_segment)
+            record_outcome("error")
+            logger.error("❌ Task Generator Agent context error: %s", e)
+            # Malformed output is already repaired locally; a second model call here
+            # would only double latency when the provider is struggling
+            return existing_action_items or []
 
+    @timed("task_generator")
     async def extract_action_items(
         self, 
-        transcript_segment: List[TranscriptLine]
+        transcript_segment: List[TranscriptLine],
+        session_id: Optional[str] = None
     ) -> List[ActionItem]:
         """
         Extract action items from a segment of transcript
         
         Args:
             transcript_segment: Recent transcript lines to analyze
+            session_id: Meeting session ID for token accounting (optional)
             
         Returns:
             List of detected action items
         """
         try:
-            # Build context from transcript
-            context = "\n".join([
+            system_prompt = "You are an expert at identifying action items and tasks from meeting conversations. Only extract clear, actionable items. Always respond with valid JSON."
+
+            # Build context from transcript (newest lines kept if over budget)
+            budget = ContextBudget(self.prompt_budget).reserve(system_prompt)
+            context = "\n".join(budget.take_lines([
                 f"{line.speaker}: {line.text}" 
                 for line in transcript_segment
-            ])
+            ]))
             
             prompt = f"""Analyze this meeting conversation segment and extract any action items.
 
@@ -189,24 +223,28 @@ Example format:
   }}
 ]"""
 
-            response = self.client.messages.create(
+            prompt_tokens = count_tokens(system_prompt) + count_tokens(prompt)
+
+            response = await self.client.messages.acreate(
                 model=self.model,
                 max_tokens=1024,
                 temperature=0.2,
-                system="You are an expert at identifying action items and tasks from meeting conversations. Only extract clear, actionable items. Always respond with valid JSON.",
+                system=cached_system(system_prompt, self.model),
                 messages=[
                     {
                         "role": "user",
                         "content": prompt
                     }
-                ]
+                ],
+                **json_tool("record_action_items", "Record the action items found in the conversation", ACTION_ITEMS_SCHEMA)
             )
+
+            token_usage.record(session_id, "task_generator", prompt_tokens, budget.trimmed_lines)
             
-            result = response.content[0].text
-            parsed = json.loads(result)
+            parsed = parse_structured(response, "task_generator")
             
             # Handle both array and object with items key
-            items_data = parsed if isinstance(parsed, list) else parsed.get("items", [])
+            items_data = parsed if isinstance(parsed, list) else parsed.get("action_items", parsed.get("items", []))
             
             # Filter by confidence threshold
             action_items = []
@@ -221,39 +259,40 @@ Example format:
                     ))
             
             if action_items:
-                print(f"✅ Task Generator extracted {len(action_items)} action items")
+                logger.info("✅ Task Generator extracted %s action items", len(action_items))
             
             return action_items
             
+        except CircuitOpenError as e:
+            record_outcome("fallback")
+            logger.warning("🔌 Action items using rule-based extraction: %s", e)
+            return rule_based_action_items(transcript_segment)
         except Exception as e:
-            print(f"❌ Task Generator Agent error: {str(e)}")
+            record_outcome("error")
+            logger.error("❌ Task Generator Agent error: %s", e)
             return []
     
-    async def generate_jira_description(self, action_item: ActionItem) -> dict:
+    @timed("task_generator")
+    @single_flight(
+        "task_generator.generate_jira_description",
+        key=lambda self, action_item, session_id=None: "\x1e".join(
+            normalize_text(value) for value in (session_id, action_item.text, action_item.assignee, action_item.priority, action_item.due_date)
+        )
+    )
+    async def generate_jira_description(self, action_item: ActionItem, session_id: Optional[str] = None) -> dict:
         """
         Generate a well-formatted Jira task description from an action item
         """
         try:
-            prompt = f"""Create a professional Jira task description for this action item:
-
-ACTION ITEM: {action_item.text}
-ASSIGNEE: {action_item.assignee or 'Unassigned'}
-PRIORITY: {action_item.priority}
-
-Generate:
-1. A clear summary (one line)
-2. Detailed description with:
-   - Background/Context
-   - Acceptance Criteria (bullet points)
-   - Technical Notes (if applicable)
-
-Format as JSON with keys: summary, description"""
+            prompt = self._jira_prompt(action_item)
+            prompt_tokens = count_tokens(JIRA_SYSTEM_PROMPT) + count_tokens(prompt)
 
-            response = self.client.messages.create(
+            response = await self.client.messages.acreate(
+                priority=BATCH,
                 model=self.model,
                 max_tokens=512,
                 temperature=0.3,
-                system="You are a product manager creating clear, actionable Jira tickets. Always respond with valid JSON.",
+                system=cached_system(JIRA_SYSTEM_PROMPT, self.model),
                 messages=[
                     {
                         "role": "user",
@@ -261,13 +300,82 @@ Format as JSON with keys: summary, description"""
                     }
                 ]
             )
+
+            token_usage.record(session_id, "task_generator", prompt_tokens)
             
-            result = json.loads(response.content[0].text)
+            result = parse_structured(response, "task_generator")
             return result
             
         except Exception as e:
-            print(f"❌ Jira description generation error: {str(e)}")
-            return {
-                "summary": action_item.text,
-                "description": f"Action item from meeting.\n\nAssignee: {action_item.assignee or 'TBD'}"
-            }
+            record_outcome("error")
+            logger.error("❌ Jira description generation error: %s", e)
+            return self._jira_fallback(action_item)
+
+    @timed("task_generator")
+    async def stream_jira_description(self, action_item: ActionItem, session_id: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        generate_jira_description, streamed: tokens are forwarded as they arrive,
+        the description as it grows, and summary/description once each is complete
+
+        Yields:
+            stream_structured events, ending with {"type": "result", "value": {"summary", "description"}},
+            or {"type": "error", "message"} if the stream fails after it started
+        """
+        streamed = False
+        try:
+            prompt = self._jira_prompt(action_item)
+            prompt_tokens = count_tokens(JIRA_SYSTEM_PROMPT) + count_tokens(prompt)
+
+            async with self.client.messages.astream(
+                priority=INTERACTIVE,
+                model=self.model,
+                max_tokens=512,
+                temperature=0.3,
+                system=cached_system(JIRA_SYSTEM_PROMPT, self.model),
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ]
+            ) as stream:
+                async for event in stream_structured(stream, "task_generator"):
+                    streamed = True
+                    yield event
+                token_usage.record(session_id, "task_generator", prompt_tokens)
+
+        except Exception as e:
+            if streamed:
+                # Part of the description is already out: report the failure rather than send a different one
+                record_outcome("error")
+                logger.error("❌ Jira description stream failed: %s", e)
+                yield {"type": "error", "message": str(e)}
+            else:
+                record_outcome("error")
+                logger.error("❌ Jira description generation error: %s", e)
+                for event in result_events(self._jira_fallback(action_item)):
+                    yield event
+
+    @staticmethod
+    def _jira_prompt(action_item: ActionItem) -> str:
+        return f"""Create a professional Jira task description for this action item:
+
+ACTION ITEM: {action_item.text}
+ASSIGNEE: {action_item.assignee or 'Unassigned'}
+PRIORITY: {action_item.priority}
+
+Generate:
+1. A clear summary (one line)
+2. Detailed description with:
+   - Background/Context
+   - Acceptance Criteria (bullet points)
+   - Technical Notes (if applicable)
+
+Format as JSON with keys: summary, description"""
+
+    @staticmethod
+    def _jira_fallback(action_item: ActionItem) -> dict:
+        return {
+            "summary": action_item.text,
+            "description": f"Action item from meeting.\n\nAssignee: {action_item.assignee or 'TBD'}"
+        }
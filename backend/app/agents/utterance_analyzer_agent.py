@@ -0,0 +1,237 @@
+"""
+Utterance Analyzer Agent - Emotion, live insight and term explanations for one spoken line in a single Claude call
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from app.agents.personalized_assistant_agent import format_explanation
+from app.circuit_breaker import CircuitOpenError
+from app.fallbacks import local_message_emotion
+from app.hedging import DeadlineExceeded
+from app.llm_scheduler import INTERACTIVE
+from app.metrics import record_outcome, timed
+from app.model_routing import CLAUDE_STRONG_MODEL, LOCAL, SKIP, STRONG, classify_utterance, local_tier_emotion, route_stats
+from app.prompt_cache import cached_system, cached_user_content
+from app.providers import create_llm_client
+from app.single_flight import fingerprint, normalize_text, single_flight
+from app.structured_output import UTTERANCE_ANALYSIS_SCHEMA, json_tool, parse_structured
+from app.tokens import ContextBudget, count_tokens, prompt_budget, token_usage
+
+logger = logging.getLogger(__name__)
+
+# Conversation lines sent with each utterance (shared by all three analyses)
+UTTERANCE_CONTEXT_LINES = int(os.getenv("UTTERANCE_CONTEXT_LINES", "10"))
+
+NEUTRAL_EMOTION = {
+    "primary_emotion": "neutral",
+    "happiness_emoji": "😐",
+    "energy_level": "medium",
+    "stress_level": "none",
+    "confidence": 0.0
+}
+
+SYSTEM_PROMPT = "You are a real-time meeting assistant. For each new line you detect its emotion, flag truly important moments and explain jargon the listener may not know. Be realistic, conservative and extremely brief."
+
+INSTRUCTIONS = """Analyze the NEW MESSAGE of a live meeting. Do all three tasks in one answer.
+
+1. EMOTION of the new message. Be realistic and nuanced - most workplace communication is neutral or professional.
+- primary_emotion: the MOST accurate of: excited, happy, content, neutral, uncertain, concerned, frustrated, disappointed, calm, focused
+- happiness_emoji: use 😐 for most professional messages unless clearly positive/negative
+- energy_level: high (enthusiastic), medium (normal conversation), low (tired, flat)
+- stress_level: none, low (normal work pressure), medium (concerned), high (urgent/frustrated)
+- confidence: 0.0-1.0
+Short factual statements and greetings are neutral, questions are often neutral or uncertain; only use happy/excited for genuinely positive language.
+
+2. INSIGHT: one line (max 10 words) only if something genuinely important happens, else null:
+- "🎯 ACTION: [brief description]" for an action item
+- "✅ DECISION: [what was decided]" for a key decision
+- "💡 KEY POINT: [the insight]" for important information
+- "⚠️ CONCERN: [the issue]" for a concern or blocker
+- "❓ FOLLOW-UP: [the question]" for a question needing follow-up
+
+3. EXPLANATION for the LISTENER described below: if the new message uses technical terms, jargon or concepts outside the listener's strong areas, set needs_explanation to true, list them in terms_identified and explain them in 2-3 friendly sentences. Otherwise (or when no listener is described) set needs_explanation to false, terms_identified to [] and explanation to null.
+
+Respond with JSON:
+{
+    "emotion": {"primary_emotion": "neutral", "happiness_emoji": "😐", "energy_level": "medium", "stress_level": "none", "confidence": 0.8},
+    "insight": null,
+    "needs_explanation": false,
+    "terms_identified": [],
+    "explanation": null
+}"""
+
+
+def _profile_key(user_profile: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(user_profile or {}, sort_keys=True, default=str)
+
+
+def _utterance_key(self, speaker: str, text: str, recent_transcript=None, user_profile=None, session_id=None) -> str:
+    context = [
+        f"{item.get('speaker', 'Speaker')}: {item.get('text', '')}"
+        for item in (recent_transcript or [])[-UTTERANCE_CONTEXT_LINES:]
+    ]
+    # Per session, so each meeting's tokens are booked to it
+    return "\x1e".join([str(session_id), speaker, normalize_text(text), fingerprint(context), fingerprint([_profile_key(user_profile)])])
+
+
+class UtteranceAnalyzerAgent:
+    """
+    Agent that analyzes each new transcript line with one structured Claude call
+    Features:
+    - Emotion (same fields as EmotionAnalysisAgent.analyze_single_message)
+    - Live insight (same format as RealTimeInsightsAgent, None instead of SKIP)
+    - Personalized term explanations (same format as PersonalizedAssistantAgent)
+    - One shared context window instead of three calls re-sending it
+    - Routed by complexity: filler is skipped, short plain lines use the local
+      heuristic, dense technical lines use the strong model
+    """
+
+    def __init__(self):
+        # Claude client (or the simulated backend, see LLM_PROVIDER)
+        self.client = create_llm_client("utterance_analyzer", priority=INTERACTIVE)
+        # Use faster model for real-time performance
+        self.model = os.getenv("CLAUDE_REALTIME_MODEL", "claude-3-haiku-20240307")
+        self.strong_model = CLAUDE_STRONG_MODEL
+        self.prompt_budget = prompt_budget("utterance_analyzer", 4000)
+
+        logger.info("✅ Utterance Analyzer Agent initialized with Claude model: %s", self.model)
+
+    @timed("utterance_analyzer")
+    @single_flight("utterance_analyzer.analyze_utterance", key=_utterance_key)
+    async def analyze_utterance(
+        self,
+        speaker: str,
+        text: str,
+        recent_transcript: Optional[List[Dict[str, str]]] = None,
+        user_profile: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze one spoken line for emotion, insight and explanations
+
+        Args:
+            speaker: Speaker name
+            text: The new line
+            recent_transcript: Preceding lines as {"speaker", "text"} dicts
+            user_profile: Listener background (see PersonalizedAssistantAgent.analyze_for_user);
+                no explanation is produced without one
+            session_id: Meeting session the tokens are booked to
+
+        Returns:
+            {"emotion": {...}, "insight": str | None, "explanation": str | None, "terms_identified": [...],
+             "route": tier from classify_utterance}
+
+        Raises:
+            DeadlineExceeded: if called inside a deadline_scope that ran out
+        """
+        start = time.perf_counter()
+        route = classify_utterance(text, user_profile)
+        if route.tier in (SKIP, LOCAL):
+            result = {
+                "emotion": local_tier_emotion(route, text),
+                "insight": None,
+                "explanation": None,
+                "terms_identified": [],
+                "route": route.tier
+            }
+            route_stats.record("utterance_analyzer", route, time.perf_counter() - start, text, result["emotion"])
+            return result
+
+        result = await self._analyze_with_model(speaker, text, recent_transcript, user_profile, route.tier == STRONG, session_id)
+        result["route"] = route.tier
+        route_stats.record("utterance_analyzer", route, time.perf_counter() - start, text, result["emotion"])
+        return result
+
+    async def _analyze_with_model(
+        self,
+        speaker: str,
+        text: str,
+        recent_transcript: Optional[List[Dict[str, str]]],
+        user_profile: Optional[Dict[str, Any]],
+        strong: bool,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            message = f'NEW MESSAGE:\n{speaker}: "{text}"'
+            listener = self._describe_listener(user_profile)
+
+            # Newest context lines kept if over budget
+            budget = ContextBudget(self.prompt_budget).reserve(SYSTEM_PROMPT).reserve(listener).reserve(message)
+            context_lines = budget.take_lines([
+                f"{item.get('speaker', 'Speaker')}: {item.get('text', '')}"
+                for item in (recent_transcript or [])[-UTTERANCE_CONTEXT_LINES:]
+            ])
+            conversation = f"{listener}\n\nRECENT CONTEXT:\n" + ("\n".join(context_lines) or "(start of meeting)") + f"\n\n{message}"
+            prompt_tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(INSTRUCTIONS) + count_tokens(conversation)
+            model = self.strong_model if strong else self.model
+
+            response = await self.client.messages.acreate(
+                model=model,
+                max_tokens=400,
+                temperature=0.2,
+                system=cached_system(SYSTEM_PROMPT, model),
+                messages=[
+                    {
+                        "role": "user",
+                        "content": cached_user_content(INSTRUCTIONS, conversation, model, system=SYSTEM_PROMPT)
+                    }
+                ],
+                **json_tool("record_utterance_analysis", "Record the emotion, insight and explanation for the new message", UTTERANCE_ANALYSIS_SCHEMA)
+            )
+
+            token_usage.record(session_id, "utterance_analyzer", prompt_tokens, trimmed_lines=budget.trimmed_lines)
+
+            return self._normalize(parse_structured(response, "utterance_analyzer"), user_profile)
+
+        except DeadlineExceeded:
+            raise  # Too late to show; the caller drops it
+        except CircuitOpenError:
+            # Provider down: local emotion only, skip insight and explanation
+            record_outcome("fallback")
+            return {
+                "emotion": local_message_emotion(text),
+                "insight": None,
+                "explanation": None,
+                "terms_identified": []
+            }
+        except Exception as e:
+            record_outcome("error")
+            logger.error("❌ Utterance analysis error: %s", e)
+            return {
+                "emotion": dict(NEUTRAL_EMOTION),
+                "insight": None,
+                "explanation": None,
+                "terms_identified": []
+            }
+
+    def _describe_listener(self, user_profile: Optional[Dict[str, Any]]) -> str:
+        if not user_profile:
+            return "LISTENER: not described (skip task 3)"
+        return f"""LISTENER:
+- Name: {user_profile.get('name', 'User')}
+- Strong Background: {', '.join(user_profile.get('strong_areas', ['general']))}
+- Areas Needing Support: {', '.join(user_profile.get('weak_areas', ['technical']))}
+- Expertise Level: {user_profile.get('expertise_level', 'intermediate')}"""
+
+    def _normalize(self, result: Dict[str, Any], user_profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fill missing fields and map the model's answer onto each analysis' usual format"""
+        emotion = {**NEUTRAL_EMOTION, "confidence": 0.8, **(result.get("emotion") or {})}
+
+        insight = (result.get("insight") or "").strip()
+        if insight.upper() in ("", "SKIP", "NULL", "NONE"):
+            insight = None
+
+        terms = result.get("terms_identified") or []
+        explanation = None
+        if user_profile and result.get("needs_explanation") and result.get("explanation"):
+            explanation = format_explanation(result["explanation"], terms)
+            logger.info("✅ Utterance Analyzer: Explanation provided for terms: %s", ', '.join(terms))
+
+        return {
+            "emotion": emotion,
+            "insight": insight,
+            "explanation": explanation,
+            "terms_identified": terms if explanation else []
+        }
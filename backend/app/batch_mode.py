@@ -0,0 +1,254 @@
+"""
+Batch Mode - Packs throughput-bound Claude calls into Message Batches jobs, with live fallback on timeout
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.metrics import registry
+from app.usage_ledger import usage_ledger
+
+logger = logging.getLogger(__name__)
+
+# Media uploads and other offline work go through provider batch jobs instead of live calls
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "false").lower() == "true"
+# Batch API endpoint; point at the stand-in server (python -m app.batch_server) to test locally
+LLM_BATCH_BASE_URL = os.getenv("LLM_BATCH_BASE_URL", "")
+# Requests per job; smaller jobs finish (and stream back) sooner
+LLM_BATCH_MAX_REQUESTS = int(os.getenv("LLM_BATCH_MAX_REQUESTS", "100"))
+# How long to wait for more requests before submitting a job
+LLM_BATCH_LINGER_MS = float(os.getenv("LLM_BATCH_LINGER_MS", "200"))
+LLM_BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", "5"))
+# Requests not back from their job by then are cancelled and made as live calls
+LLM_BATCH_TIMEOUT_SECONDS = float(os.getenv("LLM_BATCH_TIMEOUT_SECONDS", "600"))
+
+batch_jobs = registry.counter(
+    "llm_batch_jobs_total",
+    "Message Batches jobs by how they finished: ended, timed_out, failed",
+    ["outcome"]
+)
+batch_requests = registry.counter(
+    "llm_batch_requests_total",
+    "Requests sent in batch jobs by outcome: succeeded, or live_fallback (errored, expired, timed out or job failed)",
+    ["agent", "outcome"]
+)
+
+_current_batch: contextvars.ContextVar[Optional["BatchSession"]] = contextvars.ContextVar("llm_batch", default=None)
+
+
+def current_batch() -> Optional["BatchSession"]:
+    """Batch session Claude calls in this context are queued into, if any"""
+    return _current_batch.get()
+
+
+@dataclass
+class BatchRequest:
+    """One queued messages.create call"""
+    custom_id: str
+    agent: str
+    provider: str
+    params: Dict[str, Any]
+    live: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.perf_counter)
+
+
+class BatchSession:
+    """
+    Collects the Claude calls made inside a batch_scope into Message Batches jobs
+    Features:
+    - Calls made within LLM_BATCH_LINGER_MS of each other share a job
+      (at most LLM_BATCH_MAX_REQUESTS per job)
+    - Jobs are polled; results resolve their callers as they are read, so work
+      can be streamed back while later jobs are still running
+    - Requests that errored, expired or weren't back by LLM_BATCH_TIMEOUT_SECONDS
+      (the job is then cancelled) are retried as ordinary live calls
+    - Each result is recorded in the usage ledger as a messages.batches call
+    """
+
+    def __init__(
+        self,
+        client,
+        max_requests: int = LLM_BATCH_MAX_REQUESTS,
+        linger_ms: float = LLM_BATCH_LINGER_MS,
+        poll_seconds: float = LLM_BATCH_POLL_SECONDS,
+        timeout_seconds: float = LLM_BATCH_TIMEOUT_SECONDS
+    ):
+        self.client = client
+        self.max_requests = max_requests
+        self.linger = linger_ms / 1000
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self._pending: List[BatchRequest] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._jobs: Set[asyncio.Task] = set()
+
+    async def submit(self, agent: str, provider: str, params: Dict[str, Any], live: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Queue a messages.create call for the next job
+
+        Args:
+            agent: Calling agent (usage ledger, metrics)
+            provider: Provider name (usage ledger)
+            params: Messages API arguments
+            live: Zero-argument coroutine function making the same call live (fallback)
+
+        Returns:
+            The Message, from the batch job or from the live fallback
+        """
+        loop = asyncio.get_running_loop()
+        request = BatchRequest(
+            custom_id=f"{agent}-{uuid.uuid4().hex[:12]}",
+            agent=agent,
+            provider=provider,
+            params=params,
+            live=live,
+            future=loop.create_future()
+        )
+        self._pending.append(request)
+        if len(self._pending) >= self.max_requests:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+        return await request.future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        requests, self._pending = self._pending, []
+        if requests:
+            job = asyncio.ensure_future(self._run_job(requests))
+            self._jobs.add(job)
+            job.add_done_callback(self._jobs.discard)
+
+    async def _run_job(self, requests: List[BatchRequest]):
+        """Submit one job, wait for it, resolve its requests; anything unresolved falls back to live calls"""
+        by_id = {request.custom_id: request for request in requests}
+        batch_id = None
+        ended = False
+        try:
+            batch = await asyncio.to_thread(
+                self.client.messages.batches.create,
+                requests=[{"custom_id": request.custom_id, "params": request.params} for request in requests]
+            )
+            batch_id = batch.id
+            logger.info("📦 Submitted batch %s with %s requests", batch_id, len(requests))
+
+            deadline = time.monotonic() + self.timeout_seconds
+            while batch.processing_status != "ended":
+                if time.monotonic() >= deadline:
+                    batch_jobs.inc(outcome="timed_out")
+                    logger.warning("⏱️ Batch %s not done after %.0fs, cancelling and falling back to live calls", batch_id, self.timeout_seconds)
+                    try:
+                        await asyncio.to_thread(self.client.messages.batches.cancel, batch_id)
+                    except Exception as e:
+                        logger.warning("⚠️ Could not cancel batch %s: %s", batch_id, e)
+                    return
+                await asyncio.sleep(min(self.poll_seconds, max(0.0, deadline - time.monotonic())))
+                batch = await asyncio.to_thread(self.client.messages.batches.retrieve, batch_id)
+            ended = True
+
+            # Results are read line by line so early ones reach their callers first
+            results = iter(await asyncio.to_thread(self.client.messages.batches.results, batch_id))
+            done = object()
+            while by_id:
+                entry = await asyncio.to_thread(next, results, done)
+                if entry is done:
+                    break
+                request = by_id.get(entry.custom_id)
+                if request is None or entry.result.type != "succeeded":
+                    continue
+                del by_id[entry.custom_id]
+                message = entry.result.message
+                usage_ledger.record_llm(
+                    request.provider, "messages.batches", request.agent, request.params.get("model"),
+                    message, (time.perf_counter() - request.queued_at) * 1000
+                )
+                batch_requests.inc(agent=request.agent, outcome="succeeded")
+                if not request.future.done():
+                    request.future.set_result(message)
+            batch_jobs.inc(outcome="ended")
+            logger.info("📦 Batch %s ended: %s/%s succeeded", batch_id, len(requests) - len(by_id), len(requests))
+
+        except asyncio.CancelledError:
+            for request in by_id.values():
+                request.future.cancel()  # Scope closed: nobody is waiting for these
+            by_id.clear()
+            if batch_id is not None and not ended:
+                try:
+                    await asyncio.to_thread(self.client.messages.batches.cancel, batch_id)
+                except Exception as e:
+                    logger.warning("⚠️ Could not cancel batch %s: %s", batch_id, e)
+            raise
+        except Exception as e:
+            batch_jobs.inc(outcome="failed")
+            logger.error("❌ Batch job %s failed, falling back to live calls: %s", batch_id or '(not created)', e)
+        finally:
+            for request in by_id.values():
+                if not request.future.done():
+                    batch_requests.inc(agent=request.agent, outcome="live_fallback")
+                    asyncio.ensure_future(self._fall_back(request))
+
+    @staticmethod
+    async def _fall_back(request: BatchRequest):
+        try:
+            result = await request.live()
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+            return
+        if not request.future.done():
+            request.future.set_result(result)
+
+    async def close(self):
+        """Cancel queued requests and outstanding jobs (their callers are gone)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for request in self._pending:
+            request.future.cancel()
+        self._pending = []
+        for job in list(self._jobs):
+            job.cancel()
+        await asyncio.gather(*self._jobs, return_exceptions=True)
+
+
+@asynccontextmanager
+async def batch_scope(enabled: Optional[bool] = None):
+    """
+    Send the Claude calls made inside the block through Message Batches jobs
+
+    Calls must be made concurrently (e.g. with asyncio.gather) to share a job.
+
+    Args:
+        enabled: Override LLM_BATCH_MODE
+
+    Yields:
+        The BatchSession, or None when batch mode is off (calls stay live)
+    """
+    if not (LLM_BATCH_MODE if enabled is None else enabled):
+        yield None
+        return
+
+    from app.providers import create_batch_client
+    try:
+        client = create_batch_client()
+    except Exception as e:
+        logger.warning("⚠️ Batch mode unavailable, using live calls: %s", e)
+        yield None
+        return
+
+    session = BatchSession(client)
+    token = _current_batch.set(session)
+    try:
+        yield session
+    finally:
+        _current_batch.reset(token)
+        await session.close()
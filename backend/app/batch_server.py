@@ -0,0 +1,154 @@
+"""
+Batch Server - Local stand-in for the Message Batches API, answering with the simulated LLM
+
+Run with `python -m app.batch_server` and set LLM_BATCH_BASE_URL=http://localhost:8100
+to exercise batch mode without an Anthropic account. Latency, output length and error
+rate follow the SIM_LLM_* settings; BATCH_SERVER_QUEUE_SECONDS adds the wait real
+batch jobs spend queued before processing starts.
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+
+from app.simulated_providers import SimulatedAPIError, SimulatedMessages
+
+logger = logging.getLogger(__name__)
+
+BATCH_SERVER_PORT = int(os.getenv("BATCH_SERVER_PORT", "8100"))
+# Delay before a job starts processing
+BATCH_SERVER_QUEUE_SECONDS = float(os.getenv("BATCH_SERVER_QUEUE_SECONDS", "2"))
+# Requests of a job processed at the same time
+BATCH_SERVER_CONCURRENCY = int(os.getenv("BATCH_SERVER_CONCURRENCY", "8"))
+
+app = FastAPI(title="Message Batches stand-in")
+simulated = SimulatedMessages()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class StandInBatch:
+    """One job: its requests, their results as they finish, and the API-visible state"""
+
+    def __init__(self, requests: List[Dict[str, Any]]):
+        self.id = f"msgbatch_sim_{uuid.uuid4().hex[:20]}"
+        self.requests = requests
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.created_at = _now()
+        self.expires_at = (datetime.now(timezone.utc) + timedelta(hours=24)).isoformat()
+        self.ended_at: Optional[str] = None
+        self.cancel_initiated_at: Optional[str] = None
+        self.processing_status = "in_progress"
+        self.task: Optional[asyncio.Task] = None
+
+    def counts(self) -> Dict[str, int]:
+        finished = [result["type"] for result in self.results.values()]
+        return {
+            "processing": len(self.requests) - len(finished),
+            "succeeded": finished.count("succeeded"),
+            "errored": finished.count("errored"),
+            "canceled": finished.count("canceled"),
+            "expired": finished.count("expired")
+        }
+
+    def to_api(self, base_url: str) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": "message_batch",
+            "processing_status": self.processing_status,
+            "request_counts": self.counts(),
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+            "ended_at": self.ended_at,
+            "cancel_initiated_at": self.cancel_initiated_at,
+            "archived_at": None,
+            "results_url": f"{base_url}v1/messages/batches/{self.id}/results" if self.processing_status == "ended" else None
+        }
+
+    async def process(self):
+        semaphore = asyncio.Semaphore(BATCH_SERVER_CONCURRENCY)
+
+        async def run(request: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    message = await asyncio.to_thread(simulated.create, **request["params"])
+                    result = {"type": "succeeded", "message": asdict(message)}
+                except SimulatedAPIError as e:
+                    result = {
+                        "type": "errored",
+                        "error": {"type": "error", "error": {"type": "api_error", "message": str(e)}}
+                    }
+                self.results.setdefault(request["custom_id"], result)  # Not if cancelled meanwhile
+
+        try:
+            await asyncio.sleep(BATCH_SERVER_QUEUE_SECONDS)
+            await asyncio.gather(*[run(request) for request in self.requests])
+        finally:
+            for request in self.requests:
+                self.results.setdefault(request["custom_id"], {"type": "canceled"})
+            self.processing_status = "ended"
+            self.ended_at = _now()
+            logger.info("📦 Stand-in batch %s ended: %s", self.id, self.counts())
+
+
+batches: Dict[str, StandInBatch] = {}
+
+
+def _get(batch_id: str) -> StandInBatch:
+    batch = batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail={"type": "not_found_error", "message": f"No batch {batch_id}"})
+    return batch
+
+
+@app.post("/v1/messages/batches")
+async def create_batch(body: dict, request: Request):
+    requests = body.get("requests") or []
+    if not requests:
+        raise HTTPException(status_code=400, detail={"type": "invalid_request_error", "message": "requests is empty"})
+    batch = StandInBatch(requests)
+    batches[batch.id] = batch
+    batch.task = asyncio.create_task(batch.process())
+    logger.info("📦 Stand-in batch %s created with %s requests", batch.id, len(requests))
+    return batch.to_api(str(request.base_url))
+
+
+@app.get("/v1/messages/batches/{batch_id}")
+async def retrieve_batch(batch_id: str, request: Request):
+    return _get(batch_id).to_api(str(request.base_url))
+
+
+@app.post("/v1/messages/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str, request: Request):
+    batch = _get(batch_id)
+    if batch.processing_status == "in_progress":
+        batch.processing_status = "canceling"
+        batch.cancel_initiated_at = _now()
+        batch.task.cancel()
+    return batch.to_api(str(request.base_url))
+
+
+@app.get("/v1/messages/batches/{batch_id}/results")
+async def batch_results(batch_id: str):
+    batch = _get(batch_id)
+    if batch.processing_status != "ended":
+        raise HTTPException(status_code=400, detail={"type": "invalid_request_error", "message": "Batch has not ended"})
+    lines = [
+        json.dumps({"custom_id": custom_id, "result": result}, default=str)
+        for custom_id, result in batch.results.items()
+    ]
+    return Response("\n".join(lines) + "\n", media_type="application/x-jsonl")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=BATCH_SERVER_PORT)
@@ -0,0 +1,237 @@
+"""
+Circuit Breaker - Per-provider breakers that fail fast while a provider is erroring or slow
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.hedging import DeadlineExceeded
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_BREAKERS = os.getenv("CIRCUIT_BREAKERS", "true").lower() == "true"
+# Recent calls per provider the failure and slow-call rates are computed over
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+# Calls slower than CIRCUIT_SLOW_CALL_MS count as slow; the breaker also opens at CIRCUIT_SLOW_CALL_RATE
+CIRCUIT_SLOW_CALL_MS = float(os.getenv("CIRCUIT_SLOW_CALL_MS", "20000"))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.8"))
+# How long an open breaker rejects calls before letting one probe through
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0.0, HALF_OPEN: 1.0, OPEN: 2.0}
+
+circuit_rejected = registry.counter(
+    "circuit_breaker_rejected_total",
+    "Provider calls rejected without being sent because the provider's circuit was open",
+    ["provider"]
+)
+circuit_transitions = registry.counter(
+    "circuit_breaker_transitions_total",
+    "Circuit breaker state changes",
+    ["provider", "state"]
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit is open; the call was not sent"""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider} circuit open (retry in {retry_in:.0f}s)")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """
+    Whether an error says the provider is unhealthy (5xx, overloaded, timeouts,
+    connection failures) rather than that the request was bad or rate limited
+    """
+    if not isinstance(error, Exception) or isinstance(error, (CircuitOpenError, DeadlineExceeded, ValueError)):
+        return False  # Cancelled, abandoned by the caller, or not the provider's fault
+    status = getattr(error, "status_code", None)
+    return status is None or status >= 500 or status == 408
+
+
+class CircuitBreaker:
+    """
+    Failure- and latency-based breaker for one provider
+    Features:
+    - Opens when, over the last CIRCUIT_WINDOW calls, the failure rate or the
+      slow-call rate reaches its threshold
+    - While open, calls fail immediately with CircuitOpenError so agents can
+      switch to their local fallbacks instead of waiting out a dead provider
+    - After CIRCUIT_OPEN_SECONDS one probe call is let through (half-open);
+      it closes the breaker on success and re-opens it on failure
+    - Thread-safe: calls run on worker threads
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=CIRCUIT_WINDOW)  # (failed, slow)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error: Optional[str] = None
+        self._opened_count = 0
+
+    def _retry_in(self, now: float) -> float:
+        return max(0.0, self._opened_at + CIRCUIT_OPEN_SECONDS - now)
+
+    @property
+    def available(self) -> bool:
+        """Whether a call would currently be let through (doesn't claim the half-open probe)"""
+        if not CIRCUIT_BREAKERS:
+            return True
+        with self._lock:
+            if self.state == OPEN:
+                return self._retry_in(time.monotonic()) == 0
+            return not (self.state == HALF_OPEN and self._probe_in_flight)
+
+    def check(self):
+        """
+        Raises:
+            CircuitOpenError: if the breaker would reject a call right now
+        """
+        if not self.available:
+            circuit_rejected.inc(provider=self.provider)
+            raise CircuitOpenError(self.provider, self._retry_in(time.monotonic()))
+
+    def acquire(self) -> bool:
+        """
+        Claim permission for one call
+
+        Returns:
+            True if this call is the half-open probe
+
+        Raises:
+            CircuitOpenError: if the breaker is open (or its probe is already out)
+        """
+        if not CIRCUIT_BREAKERS:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and self._retry_in(now) == 0:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            retry_in = self._retry_in(now)
+        circuit_rejected.inc(provider=self.provider)
+        raise CircuitOpenError(self.provider, retry_in)
+
+    def record(self, seconds: float, error: Optional[BaseException] = None, probe: bool = False):
+        """Record a finished call's latency and outcome"""
+        if not CIRCUIT_BREAKERS:
+            return
+        failed = error is not None and counts_as_failure(error)
+        slow = seconds * 1000 >= CIRCUIT_SLOW_CALL_MS
+        with self._lock:
+            if failed:
+                self._last_error = f"{type(error).__name__}: {error}"[:200]
+            if probe:
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._open(f"probe {'failed' if failed else 'slow'}")
+                else:
+                    self._calls.clear()
+                    self._transition(CLOSED)
+                return
+            if self.state != CLOSED:
+                return  # A call that started before the breaker opened
+            self._calls.append((failed, slow))
+            if len(self._calls) < CIRCUIT_MIN_CALLS:
+                return
+            failure_rate = sum(f for f, _ in self._calls) / len(self._calls)
+            slow_rate = sum(s for _, s in self._calls) / len(self._calls)
+            if failure_rate >= CIRCUIT_FAILURE_RATE:
+                self._open(f"{failure_rate:.0%} of the last {len(self._calls)} calls failed")
+            elif slow_rate >= CIRCUIT_SLOW_CALL_RATE:
+                self._open(f"{slow_rate:.0%} of the last {len(self._calls)} calls took over {CIRCUIT_SLOW_CALL_MS / 1000:.0f}s")
+
+    @contextmanager
+    def guard(self):
+        """
+        Run one provider call through the breaker, recording its latency and outcome
+
+        Raises:
+            CircuitOpenError: without running the block, if the breaker is open
+        """
+        probe = self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(time.perf_counter() - start, e, probe)
+            raise
+        self.record(time.perf_counter() - start, None, probe)
+
+    def _open(self, reason: str):
+        self._opened_at = time.monotonic()
+        self._opened_count += 1
+        self._transition(OPEN)
+        logger.error("🔌 %s circuit opened: %s; using fallbacks for %.0fs", self.provider, reason, CIRCUIT_OPEN_SECONDS)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        circuit_transitions.inc(provider=self.provider, state=state)
+        if state == CLOSED:
+            logger.info("🔌 %s circuit closed, provider healthy again", self.provider)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self._calls)
+            return {
+                "state": self.state,
+                "retry_in_seconds": round(self._retry_in(time.monotonic()), 1) if self.state == OPEN else None,
+                "recent_calls": len(calls),
+                "failure_rate": round(sum(f for f, _ in calls) / len(calls), 3) if calls else 0.0,
+                "slow_call_rate": round(sum(s for _, s in calls) / len(calls), 3) if calls else 0.0,
+                "times_opened": self._opened_count,
+                "last_error": self._last_error
+            }
+
+
+class CircuitBreakers:
+    """Breakers created on first use, keyed by provider name (as in the usage ledger)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = self._breakers[provider] = CircuitBreaker(provider)
+            return breaker
+
+    def degraded(self) -> bool:
+        """Whether any provider is currently cut off"""
+        return any(breaker.state != CLOSED for breaker in list(self._breakers.values()))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {provider: breaker.snapshot() for provider, breaker in list(self._breakers.items())}
+
+
+# Shared breakers for every external provider
+circuit_breakers = CircuitBreakers()
+
+registry.gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state per provider: 0 closed, 1 half-open, 2 open",
+    ["provider"],
+    collect=lambda: {(provider,): _STATE_VALUES[state["state"]] for provider, state in circuit_breakers.snapshot().items()}
+)
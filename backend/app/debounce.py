@@ -0,0 +1,164 @@
+"""
+Debounce - Per-session merging of rapid utterances with latest-wins cancellation
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Quiet period after an utterance before it is analyzed (0 disables debouncing)
+UTTERANCE_DEBOUNCE_MS = float(os.getenv("UTTERANCE_DEBOUNCE_MS", "350"))
+# Longest an utterance waits for the speaker to pause before it is analyzed anyway
+UTTERANCE_DEBOUNCE_MAX_WAIT_MS = float(os.getenv("UTTERANCE_DEBOUNCE_MAX_WAIT_MS", "1500"))
+UTTERANCE_DEBOUNCE_MAX_SESSIONS = int(os.getenv("UTTERANCE_DEBOUNCE_MAX_SESSIONS", "256"))
+
+debounced_utterances = registry.counter(
+    "utterance_debounce_total",
+    "Utterances by how they were handled: analyzed (latest of a batch), merged (folded into a later one), cancelled (in-flight analysis superseded)",
+    ["outcome"]
+)
+
+# Returned to a request whose utterance was folded into a newer request's analysis
+SUPERSEDED = {"superseded": True}
+
+
+@dataclass
+class Utterance:
+    """One recognized phrase waiting for analysis, and the request awaiting its result"""
+    speaker: str
+    text: str
+    future: asyncio.Future
+    arrived_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _SessionState:
+    pending: List[Utterance] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+    in_flight: Optional[asyncio.Task] = None
+    in_flight_batch: List[Utterance] = field(default_factory=list)
+
+
+AnalyzeFn = Callable[[str, str, List[Dict[str, str]]], Awaitable[Any]]
+
+
+class UtteranceDebouncer:
+    """
+    Coalesces a session's burst of utterances into one analysis
+    Features:
+    - Utterances arriving within the debounce window are merged (same-speaker
+      text joined; other speakers' lines passed along as context)
+    - A newer utterance cancels the analysis still running for older ones and
+      is analyzed together with them (latest wins)
+    - Only the newest request of a batch receives the result; the others get
+      SUPERSEDED, so stale results never reach the UI out of order
+    - Bounded wait: a speaker who never pauses is still analyzed every
+      UTTERANCE_DEBOUNCE_MAX_WAIT_MS, and an analysis whose utterances have
+      waited that long is allowed to finish
+    """
+
+    def __init__(
+        self,
+        debounce_ms: float = UTTERANCE_DEBOUNCE_MS,
+        max_wait_ms: float = UTTERANCE_DEBOUNCE_MAX_WAIT_MS,
+        max_sessions: int = UTTERANCE_DEBOUNCE_MAX_SESSIONS
+    ):
+        self.debounce = debounce_ms / 1000
+        self.max_wait = max(max_wait_ms, debounce_ms) / 1000
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _SessionState]" = OrderedDict()
+
+    async def submit(self, session_key: str, speaker: str, text: str, analyze: AnalyzeFn) -> Any:
+        """
+        Queue an utterance and wait for its analysis (or for it to be superseded)
+
+        Args:
+            session_key: Session the utterance belongs to
+            speaker: Speaker name
+            text: Recognized text
+            analyze: Coroutine function (speaker, merged_text, extra_context) run for the batch;
+                the newest request's function is used
+
+        Returns:
+            The analysis result, or SUPERSEDED if a newer utterance took over
+        """
+        loop = asyncio.get_running_loop()
+        state = self._session(session_key)
+        utterance = Utterance(speaker=speaker, text=text, future=loop.create_future())
+
+        in_flight = state.in_flight is not None and not state.in_flight.done()
+        if in_flight and time.monotonic() - state.in_flight_batch[0].arrived_at < self.max_wait:
+            # Latest wins: the running analysis is stale; its utterances are re-analyzed with this one
+            # (unless they have waited max_wait already, so continuous speech still gets results)
+            state.in_flight.cancel()
+            state.pending[:0] = state.in_flight_batch
+            debounced_utterances.inc(len(state.in_flight_batch), outcome="cancelled")
+            state.in_flight, state.in_flight_batch = None, []
+        state.pending.append(utterance)
+
+        if state.timer is not None:
+            state.timer.cancel()
+        waited = time.monotonic() - state.pending[0].arrived_at
+        delay = max(0.0, min(self.debounce, self.max_wait - waited))
+        state.timer = loop.call_later(delay, self._flush, session_key, state, analyze)
+
+        try:
+            return await asyncio.shield(utterance.future)
+        except asyncio.CancelledError:
+            # Client gone: drop the utterance if it hasn't been sent for analysis yet
+            if utterance in state.pending:
+                state.pending.remove(utterance)
+            raise
+
+    def _session(self, session_key: str) -> _SessionState:
+        state = self._sessions.get(session_key)
+        if state is None:
+            state = self._sessions[session_key] = _SessionState()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_key)
+        return state
+
+    def _flush(self, session_key: str, state: _SessionState, analyze: AnalyzeFn):
+        state.timer = None
+        batch, state.pending = state.pending, []
+        if not batch:
+            return
+        latest = batch[-1]
+        merged = [u.text.strip() for u in batch if u.speaker == latest.speaker and u.text.strip()]
+        context = [{"speaker": u.speaker, "text": u.text} for u in batch if u.speaker != latest.speaker]
+        if len(batch) > 1:
+            logger.debug("🧩 Merged %s utterances for session %s", len(batch), session_key)
+
+        state.in_flight_batch = batch
+        state.in_flight = asyncio.ensure_future(analyze(latest.speaker, " ".join(merged), context))
+        state.in_flight.add_done_callback(lambda task: self._deliver(state, task, batch))
+
+    def _deliver(self, state: _SessionState, task: asyncio.Task, batch: List[Utterance]):
+        if state.in_flight is task:
+            state.in_flight, state.in_flight_batch = None, []
+        if task.cancelled():
+            return  # Superseded; the batch was moved into the newer analysis
+        debounced_utterances.inc(len(batch) - 1, outcome="merged")
+        debounced_utterances.inc(outcome="analyzed")
+        for utterance in batch[:-1]:
+            if not utterance.future.done():
+                utterance.future.set_result(SUPERSEDED)
+        latest = batch[-1].future
+        if latest.done():
+            return
+        if task.exception() is not None:
+            latest.set_exception(task.exception())
+        else:
+            latest.set_result(task.result())
+
+
+# Shared debouncer for /api/analyze-emotion
+utterance_debouncer = UtteranceDebouncer()
@@ -0,0 +1,215 @@
+"""
+Fallbacks - Local, model-free analysis used while an AI provider's circuit is open
+"""
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.models import ActionItem, TranscriptLine
+
+# Keyword cues per emotion, strongest signal first when counts tie
+EMOTION_CUES = {
+    "frustrated": ("frustrat", "annoying", "ridiculous", "again?", "still broken", "still not", "fed up"),
+    "disappointed": ("unfortunately", "disappoint", "missed", "failed", "didn't make"),
+    "concerned": ("worried", "concern", "risk", "blocker", "blocked", "issue", "problem", "delay", "behind schedule", "bug", "outage"),
+    "excited": ("awesome", "amazing", "fantastic", "excited", "thrilled", "love it", "incredible"),
+    "happy": ("great", "glad", "thanks", "thank you", "nice", "happy", "perfect", "excellent", "well done", "good news"),
+    "uncertain": ("maybe", "not sure", "unsure", "perhaps", "i guess", "might", "unclear")
+}
+EMOTION_EMOJIS = {
+    "frustrated": "😤",
+    "disappointed": "😞",
+    "concerned": "😟",
+    "excited": "😀",
+    "happy": "🙂",
+    "uncertain": "🤔",
+    "neutral": "😐"
+}
+STRESS_LEVELS = {"frustrated": "high", "concerned": "medium", "disappointed": "medium", "uncertain": "low"}
+
+ACTION_CUE = re.compile(
+    r"\b(need to|needs to|have to|has to|must|should|will|i'll|we'll|let's|can you|could you|please|going to|assigned to|todo|to-do)\b",
+    re.IGNORECASE
+)
+ASSIGNEE_CUE = re.compile(r"\b([A-Z][a-z]+)\s+(?:will|needs to|should|has to|is going to|can)\b")
+ADDRESSED_CUE = re.compile(r"^([A-Z][a-z]+),\s+(?:can|could|would|please)\b")
+DUE_CUE = re.compile(
+    r"\b(?:by|before|until|due)\s+(today|tonight|tomorrow|end of (?:day|the day|week|the week|month|sprint)|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|next week|this week|next sprint)\b",
+    re.IGNORECASE
+)
+HIGH_PRIORITY_CUE = re.compile(r"\b(urgent|asap|critical|blocker|immediately|top priority)\b", re.IGNORECASE)
+LOW_PRIORITY_CUE = re.compile(r"\b(low priority|when you get a chance|nice to have|eventually|someday)\b", re.IGNORECASE)
+DECISION_CUE = re.compile(
+    r"\b(decided|agreed|decision|let's go with|we'll go with|going with|approved|settled on|final answer)\b",
+    re.IGNORECASE
+)
+KEY_POINT_CUE = re.compile(
+    r"\b(important|deadline|release|launch|budget|customer|risk|blocker|plan|priority|goal|issue|problem|need)\b",
+    re.IGNORECASE
+)
+_NOT_A_NAME = {"I", "We", "You", "They", "He", "She", "It", "Let", "This", "That", "Someone", "Everyone", "Who"}
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from have i if in is it its let's me my no not of on or our "
+    "so that the their them then there they this to up us was we we'll were what when will with you your "
+    "i'll it's that's just okay ok yeah yes need needs should going get got think know like also".split()
+)
+
+
+def local_message_emotion(text: str) -> Dict:
+    """
+    Keyword-based emotion for one message, in analyze_single_message's format
+
+    Returns:
+        Dict with primary_emotion, happiness_emoji, energy_level, stress_level, confidence, degraded
+    """
+    lowered = (text or "").lower()
+    scores = {emotion: sum(cue in lowered for cue in cues) for emotion, cues in EMOTION_CUES.items()}
+    if lowered.rstrip().endswith("?"):
+        scores["uncertain"] += 1
+    emotion = max(scores, key=scores.get) if any(scores.values()) else "neutral"
+    exclamations = lowered.count("!")
+    return {
+        "primary_emotion": emotion,
+        "happiness_emoji": EMOTION_EMOJIS[emotion],
+        "energy_level": "high" if exclamations or emotion in ("excited", "frustrated") else "medium",
+        "stress_level": STRESS_LEVELS.get(emotion, "none"),
+        "confidence": 0.5 if emotion != "neutral" else 0.4,
+        "degraded": True
+    }
+
+
+def local_transcript_emotions(transcript: List[TranscriptLine]) -> Dict:
+    """Keyword-based meeting emotion report, in analyze_emotions' format"""
+    per_line = [(line, local_message_emotion(line.text)) for line in transcript]
+    counts = Counter(result["primary_emotion"] for _, result in per_line)
+    positive = counts["happy"] + counts["excited"]
+    negative = counts["concerned"] + counts["frustrated"] + counts["disappointed"]
+    if positive and negative:
+        overall = "mixed"
+    elif positive > len(per_line) * 0.2:
+        overall = "positive"
+    elif negative > len(per_line) * 0.2:
+        overall = "negative"
+    else:
+        overall = "neutral"
+
+    speakers: Dict[str, Counter] = {}
+    for line, result in per_line:
+        speakers.setdefault(line.speaker, Counter())[result["primary_emotion"]] += 1
+
+    return {
+        "overall_sentiment": overall,
+        "happiness_level": "happy" if overall == "positive" else "concerned" if negative else "neutral",
+        "energy_level": "high" if counts["excited"] else "medium",
+        "speakers": {speaker: emotions.most_common(1)[0][0] for speaker, emotions in speakers.items()},
+        "emotional_moments": [
+            f"{line.speaker}: {line.text}" for line, result in per_line
+            if result["primary_emotion"] in ("excited", "frustrated", "disappointed")
+        ][:5],
+        "stress_indicators": [
+            line.text for line, result in per_line if result["stress_level"] in ("medium", "high")
+        ][:5],
+        "confidence_score": 0.4,
+        "degraded": True
+    }
+
+
+def _action_from_line(line: TranscriptLine) -> Optional[ActionItem]:
+    text = line.text.strip()
+    if len(text.split()) < 4 or not ACTION_CUE.search(text):
+        return None
+    assignee = None
+    addressed = ADDRESSED_CUE.search(text)
+    named = ASSIGNEE_CUE.search(text)
+    if addressed and addressed.group(1) not in _NOT_A_NAME:
+        assignee = addressed.group(1)
+    elif named and named.group(1) not in _NOT_A_NAME:
+        assignee = named.group(1)
+    elif re.match(r"^(i'll|i will|i'm going to|i can)\b", text, re.IGNORECASE):
+        assignee = line.speaker
+    due = DUE_CUE.search(text)
+    if HIGH_PRIORITY_CUE.search(text):
+        priority = "high"
+    elif LOW_PRIORITY_CUE.search(text):
+        priority = "low"
+    else:
+        priority = "medium"
+    return ActionItem(
+        text=text,
+        assignee=assignee,
+        priority=priority,
+        due_date=due.group(1) if due else None,
+        confidence=0.5
+    )
+
+
+def rule_based_action_items(
+    transcript: List[TranscriptLine],
+    existing_action_items: Optional[List[ActionItem]] = None
+) -> List[ActionItem]:
+    """
+    Action items from cue phrases ("needs to", "can you", "by Friday", ...)
+
+    Args:
+        transcript: Lines to scan
+        existing_action_items: Items to keep; lines repeating one of them are skipped
+
+    Returns:
+        Existing items followed by the new ones
+    """
+    existing = list(existing_action_items or [])
+    seen = {" ".join(item.text.lower().split()) for item in existing}
+    found = []
+    for line in transcript:
+        item = _action_from_line(line)
+        key = item and " ".join(item.text.lower().split())
+        if item and key not in seen:
+            seen.add(key)
+            found.append(item)
+    return existing + found
+
+
+def extractive_summary(transcript: List[TranscriptLine], action_items: Optional[List[ActionItem]] = None) -> Dict:
+    """
+    Summary made of the transcript's own most informative lines, in generate_summary's format
+
+    Returns:
+        Dict with title, summary, key_points, decisions, participants, degraded
+    """
+    participants = list(dict.fromkeys(line.speaker for line in transcript))
+    decisions = [line.text.strip() for line in transcript if DECISION_CUE.search(line.text)][:5]
+
+    scored = []
+    for index, line in enumerate(transcript):
+        words = line.text.split()
+        if len(words) < 6 or line.text.strip() in decisions:
+            continue
+        score = len(KEY_POINT_CUE.findall(line.text)) * 2 + min(len(words), 30) / 10
+        scored.append((score, index))
+    key_indexes = sorted(index for _, index in sorted(scored, reverse=True)[:5])
+    key_points = [f"{transcript[index].speaker}: {transcript[index].text.strip()}" for index in key_indexes]
+
+    names = {name.lower() for line in transcript for name in re.findall(r"\b[A-Z][a-z]+\b", line.text)} | {p.lower() for p in participants}
+    terms = Counter(
+        word for line in transcript
+        for word in re.findall(r"[a-z][a-z'-]{3,}", line.text.lower())
+        if word not in _STOPWORDS and word not in names
+    )
+    topics = [word for word, _ in terms.most_common(3)]
+    title = f"Meeting on {', '.join(topics)}" if topics else "Meeting Summary"
+
+    summary = f"{len(transcript)} lines from {len(participants)} participant(s)"
+    if topics:
+        summary += f", mostly about {', '.join(topics)}"
+    summary += f". {len(decisions)} decision(s) and {len(action_items or [])} action item(s) were noted."
+    summary += " (Generated locally while the AI provider was unavailable.)"
+
+    return {
+        "title": title,
+        "summary": summary,
+        "key_points": key_points,
+        "decisions": decisions,
+        "participants": participants,
+        "degraded": True
+    }
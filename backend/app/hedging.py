@@ -0,0 +1,181 @@
+"""
+Hedging - Request deadlines and hedged duplicate calls for real-time model requests
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Default deadline for real-time requests (per-line emotion, live insights)
+REALTIME_DEADLINE_MS = float(os.getenv("REALTIME_DEADLINE_MS", "3000"))
+LLM_HEDGING = os.getenv("LLM_HEDGING", "true").lower() == "true"
+# A duplicate call is fired once the first has run longer than this latency percentile
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+# Completed calls per agent/model needed before hedging starts, and how many are kept
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+hedged_calls = registry.counter(
+    "llm_hedged_calls_total",
+    "Real-time Claude calls by how they finished: primary (no hedge needed), hedge_fired_primary_won, hedge_won",
+    ["agent", "outcome"]
+)
+deadline_exceeded = registry.counter(
+    "llm_deadline_exceeded_total",
+    "Real-time Claude calls whose result was dropped because the request deadline passed",
+    ["agent"]
+)
+
+# Absolute time.monotonic() deadline of the current request, if any
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request deadline passed before the model answered; the late result is dropped"""
+
+
+@contextmanager
+def deadline_scope(milliseconds: Optional[float] = None):
+    """
+    Give model calls made inside the block a deadline (nested scopes keep the earlier one)
+
+    Args:
+        milliseconds: Time budget from now (default REALTIME_DEADLINE_MS); 0 or less disables
+    """
+    milliseconds = REALTIME_DEADLINE_MS if milliseconds is None else milliseconds
+    if milliseconds <= 0:
+        yield
+        return
+    deadline = time.monotonic() + milliseconds / 1000
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining_seconds() -> Optional[float]:
+    """Seconds left before the current request's deadline (None without one)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline(agent: str):
+    """
+    Raises:
+        DeadlineExceeded: if the current request's deadline has passed
+    """
+    remaining = remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        deadline_exceeded.inc(agent=agent)
+        raise DeadlineExceeded(f"{agent}: request deadline passed")
+
+
+class LatencyWindows:
+    """Recent call latencies per (agent, model), for the hedging threshold"""
+
+    def __init__(self, window: int = LLM_HEDGE_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def observe(self, key: Tuple[str, str], seconds: float):
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def percentile(self, key: Tuple[str, str], q: float, min_samples: int = LLM_HEDGE_MIN_SAMPLES) -> Optional[float]:
+        """Latency percentile, or None until min_samples calls have completed"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for (agent, model) in list(self._samples):
+            p50 = self.percentile((agent, model), 0.5, min_samples=1)
+            p95 = self.percentile((agent, model), LLM_HEDGE_PERCENTILE, min_samples=1)
+            result[f"{agent}/{model}"] = {
+                "samples": len(self._samples[(agent, model)]),
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "hedge_after_ms": round(p95 * 1000, 1) if p95 is not None else None
+            }
+        return result
+
+
+latency_windows = LatencyWindows()
+
+
+async def hedged_call(call: Callable[[], Awaitable[Any]], agent: str, model: str) -> Any:
+    """
+    Run a model call under the current deadline, hedging slow calls
+
+    Once the call has run longer than the agent/model's observed p95, an
+    identical call is started; the first to succeed wins and the other is
+    cancelled. If the deadline passes first, both are cancelled.
+
+    Args:
+        call: Zero-argument coroutine function making the (scheduled) call
+        agent: Calling agent (metrics, latency window)
+        model: Model name (latency window)
+
+    Raises:
+        DeadlineExceeded: if no call finished before the deadline
+    """
+    check_deadline(agent)
+    key = (agent, model or "")
+    hedge_after = latency_windows.percentile(key, LLM_HEDGE_PERCENTILE) if LLM_HEDGING else None
+    start = time.monotonic()
+
+    async def attempt():
+        attempt_start = time.monotonic()
+        result = await call()
+        latency_windows.observe(key, time.monotonic() - attempt_start)
+        return result
+
+    tasks = [asyncio.ensure_future(attempt())]
+    pending = set(tasks)
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            timeout = remaining_seconds()
+            can_hedge = hedge_after is not None and len(tasks) == 1
+            if can_hedge:
+                until_hedge = max(0.0, start + hedge_after - time.monotonic())
+                timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None:
+                    outcome = "primary" if len(tasks) == 1 else ("hedge_won" if task is tasks[1] else "hedge_fired_primary_won")
+                    hedged_calls.inc(agent=agent, outcome=outcome)
+                    return task.result()
+                error = task.exception()
+
+            if not done:
+                if can_hedge and (remaining_seconds() is None or remaining_seconds() > 0):
+                    logger.info("🪃 %s call slower than p%.0f (%.0fms), sending a hedged duplicate", agent, LLM_HEDGE_PERCENTILE * 100, hedge_after * 1000)
+                    tasks.append(asyncio.ensure_future(attempt()))
+                    pending.add(tasks[-1])
+                else:
+                    deadline_exceeded.inc(agent=agent)
+                    raise DeadlineExceeded(f"{agent}: no answer within the request deadline")
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,487 @@
+"""
+LLM Scheduler - Priority classes, concurrency limits, token buckets and Retry-After aware retries for Claude calls
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, ContextManager, Deque, Dict, Optional
+
+from app.hedging import check_deadline
+from app.metrics import registry
+from app.tokens import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"  # Live meeting UI: per-utterance emotion, real-time insights, explanations
+STANDARD = "standard"        # User-initiated requests: Q&A, live action items
+BATCH = "batch"              # Summaries, Jira descriptions, media-file processing
+PRIORITIES = (INTERACTIVE, STANDARD, BATCH)
+
+# Calls in flight across all classes, and per class
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_CLASS_CONCURRENCY = {
+    INTERACTIVE: int(os.getenv("LLM_CONCURRENCY_INTERACTIVE", "16")),
+    STANDARD: int(os.getenv("LLM_CONCURRENCY_STANDARD", "8")),
+    BATCH: int(os.getenv("LLM_CONCURRENCY_BATCH", "3"))
+}
+# Per-model rate limits of the API key (0 = unlimited)
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_INPUT_TOKENS_PER_MINUTE = float(os.getenv("LLM_INPUT_TOKENS_PER_MINUTE", "0"))
+LLM_OUTPUT_TOKENS_PER_MINUTE = float(os.getenv("LLM_OUTPUT_TOKENS_PER_MINUTE", "0"))
+# Share of each rate limit only interactive calls may use
+LLM_INTERACTIVE_RESERVE = float(os.getenv("LLM_INTERACTIVE_RESERVE", "0.2"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+
+# Rate limited, overloaded, or transient server/network failures
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectionError", "TimeoutError"}
+
+llm_queue_wait = registry.histogram(
+    "llm_queue_wait_seconds",
+    "Time Claude calls waited in the scheduler for a slot and rate-limit budget",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+llm_retries = registry.counter("llm_retries_total", "Claude calls retried by the scheduler", ["priority", "reason"])
+
+
+def estimate_input_tokens(kwargs: Dict[str, Any]) -> int:
+    """Cheap prompt size estimate (system, messages and tool schemas) for rate-limit budgeting"""
+    def length(value) -> int:
+        if isinstance(value, str):
+            return len(value)
+        if isinstance(value, dict):
+            return sum(length(item) for item in value.values())
+        if isinstance(value, (list, tuple)):
+            return sum(length(item) for item in value)
+        return 0
+
+    chars = length(kwargs.get("system")) + length(kwargs.get("messages")) + length(kwargs.get("tools"))
+    return int(chars / CHARS_PER_TOKEN) + 1
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header on an SDK (or simulated) error, if present"""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Per-minute budget that refills continuously (0 = unlimited)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, reserve: float, now: float) -> float:
+        """Seconds until `amount` can be taken while leaving `reserve` (a fraction of capacity) untouched"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        floor = self.capacity * reserve
+        # A request larger than the usable budget waits for a full bucket rather than forever
+        needed = min(amount, self.capacity - floor) + floor
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self.tokens -= amount
+
+    def refund(self, amount: float):
+        """Give back (or, with a negative amount, charge) tokens once actual usage is known"""
+        if not self.unlimited:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+@dataclass
+class ModelLimits:
+    """Rate-limit state for one model"""
+    requests: TokenBucket = field(default_factory=lambda: TokenBucket(LLM_REQUESTS_PER_MINUTE))
+    input_tokens: TokenBucket = field(default_factory=lambda: TokenBucket(LLM_INPUT_TOKENS_PER_MINUTE))
+    output_tokens: TokenBucket = field(default_factory=lambda: TokenBucket(LLM_OUTPUT_TOKENS_PER_MINUTE))
+    # Set from Retry-After on a 429; nobody calls this model until then
+    paused_until: float = 0.0
+
+
+@dataclass
+class Ticket:
+    """One call waiting for, or holding, a scheduler slot"""
+    priority: str
+    model: str
+    agent: str
+    input_tokens: int
+    output_tokens: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Optional[asyncio.Future] = None
+
+
+class AsyncMessageStream:
+    """
+    Async view of a sync Messages stream; each chunk is read on a worker thread
+
+    Under a request deadline (app.hedging), a chunk arriving after it ends
+    the stream with DeadlineExceeded instead of reaching the caller.
+    """
+
+    def __init__(self, stream, run_in_thread: Callable, agent: str):
+        self._stream = stream
+        self._run_in_thread = run_in_thread
+        self._agent = agent
+
+    @property
+    def text_stream(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        iterator = iter(self._stream.text_stream)
+        done = object()
+        while True:
+            chunk = await self._run_in_thread(next, iterator, done)
+            if chunk is done:
+                return
+            check_deadline(self._agent)
+            yield chunk
+
+    def get_final_message(self):
+        return self._stream.get_final_message()
+
+
+class LLMScheduler:
+    """
+    Central admission control for Claude calls
+    Features:
+    - Priority classes (interactive > standard > batch) served strictly in order
+    - Global and per-class concurrency limits, so batch work can't take every slot
+    - Per-model request, input-token and output-token buckets matching the
+      API key's rate limits, with a share reserved for interactive calls
+    - Retries on 429/5xx/529 that honor Retry-After; a 429 pauses the model for everyone
+    - Calls run on worker threads so the sync SDK never blocks the event loop;
+      a cancelled call keeps its slot until its thread is free again
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        class_concurrency: Optional[Dict[str, int]] = None,
+        interactive_reserve: float = LLM_INTERACTIVE_RESERVE,
+        max_retries: int = LLM_MAX_RETRIES
+    ):
+        self.max_concurrency = max_concurrency
+        self.class_concurrency = dict(class_concurrency or LLM_CLASS_CONCURRENCY)
+        self.interactive_reserve = interactive_reserve
+        self.max_retries = max_retries
+        self._queues: Dict[str, Deque[Ticket]] = {priority: deque() for priority in PRIORITIES}
+        self._active: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self._models: Dict[str, ModelLimits] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = 0.0
+        # One thread per slot, so calls never queue behind other to_thread() work
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    # --- Admission ---------------------------------------------------------
+
+    def _limits(self, model: str) -> ModelLimits:
+        limits = self._models.get(model)
+        if limits is None:
+            limits = self._models[model] = ModelLimits()
+        return limits
+
+    def _wait_time(self, ticket: Ticket, now: float) -> float:
+        limits = self._limits(ticket.model)
+        reserve = 0.0 if ticket.priority == INTERACTIVE else self.interactive_reserve
+        return max(
+            limits.paused_until - now,
+            limits.requests.wait_time(1, reserve, now),
+            limits.input_tokens.wait_time(ticket.input_tokens, reserve, now),
+            limits.output_tokens.wait_time(ticket.output_tokens, reserve, now)
+        )
+
+    def _dispatch(self):
+        """Grant slots to waiting calls, highest priority first"""
+        now = time.monotonic()
+        in_flight = sum(self._active.values())
+        wake_in = None
+        blocked_models = set()
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and in_flight < self.max_concurrency and self._active[priority] < self.class_concurrency[priority]:
+                ticket = queue[0]
+                if ticket.future.done():  # Cancelled while waiting
+                    queue.popleft()
+                    continue
+                if ticket.model in blocked_models:
+                    break
+                wait = self._wait_time(ticket, now)
+                if wait > 0:
+                    # Lower classes don't jump ahead on a model a higher class is waiting for
+                    blocked_models.add(ticket.model)
+                    wake_in = wait if wake_in is None else min(wake_in, wait)
+                    break
+                queue.popleft()
+                limits = self._limits(ticket.model)
+                limits.requests.take(1)
+                limits.input_tokens.take(ticket.input_tokens)
+                limits.output_tokens.take(ticket.output_tokens)
+                self._active[priority] += 1
+                in_flight += 1
+                ticket.future.set_result(None)
+
+        if wake_in is not None:
+            wake_at = now + wake_in
+            if self._timer is None or wake_at < self._timer_at:
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer_at = wake_at
+                self._timer = asyncio.get_running_loop().call_later(wake_in, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    async def acquire(self, ticket: Ticket):
+        """Wait until the ticket's class has a free slot and its model has rate-limit budget"""
+        ticket.future = asyncio.get_running_loop().create_future()
+        ticket.enqueued_at = time.monotonic()
+        self._queues[ticket.priority].append(ticket)
+        self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                self.release(ticket)  # Granted just as the caller gave up
+            raise
+        llm_queue_wait.observe(time.monotonic() - ticket.enqueued_at, priority=ticket.priority)
+
+    def release(self, ticket: Ticket, usage=None, refund: bool = False):
+        """
+        Free the ticket's slot and settle its token reservation
+
+        Args:
+            usage: Response usage; unused reserved output tokens are returned
+            refund: Return the whole reservation (the call was rejected, e.g. 429)
+        """
+        self._active[ticket.priority] -= 1
+        limits = self._limits(ticket.model)
+        if refund:
+            limits.input_tokens.refund(ticket.input_tokens)
+            limits.output_tokens.refund(ticket.output_tokens)
+        elif usage is not None:
+            limits.input_tokens.refund(ticket.input_tokens - (getattr(usage, "input_tokens", 0) or 0))
+            limits.output_tokens.refund(ticket.output_tokens - (getattr(usage, "output_tokens", 0) or 0))
+        self._dispatch()
+
+    # --- Calls -------------------------------------------------------------
+
+    def _run_in_thread(self, func: Callable, *args) -> asyncio.Future:
+        # Copy the context so usage-ledger attribution and profile tags follow the call
+        context = contextvars.copy_context()
+        return asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(context.run, func, *args))
+
+    def _release_when_done(self, ticket: Ticket, work: Future, discard: Optional[Callable[[Any], None]] = None):
+        """
+        Free a cancelled call's slot once its worker thread has actually finished
+
+        The sync SDK call can't be interrupted, so until then it still occupies
+        a thread (and, at the API, a request); releasing earlier would let newly
+        admitted calls queue unseen in the executor behind it.
+
+        Args:
+            discard: Cleanup run on the worker thread for a result nobody will read
+        """
+        loop = asyncio.get_running_loop()
+
+        def finished(_):
+            usage = None
+            if not work.cancelled() and work.exception() is None:
+                result = work.result()
+                usage = getattr(result, "usage", None)
+                if discard is not None:
+                    try:
+                        discard(result)
+                    except Exception as e:
+                        logger.debug("Discarding abandoned %s call result failed: %s", ticket.agent, e)
+            try:
+                loop.call_soon_threadsafe(self.release, ticket, usage)
+            except RuntimeError:
+                pass  # Event loop already closed (shutdown)
+
+        work.add_done_callback(finished)
+
+    async def _attempt(
+        self,
+        ticket: Ticket,
+        call: Callable[[], Any],
+        discard: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """
+        Acquire a slot and run `call` on a worker thread, retrying retryable failures; the slot stays held on success
+
+        If the caller is cancelled while the call runs, the slot is held until the
+        thread finishes and `discard` (if given) is applied to the unused result.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(ticket)
+            work = self._executor.submit(contextvars.copy_context().run, call)
+            try:
+                return await asyncio.wrap_future(work)
+            except asyncio.CancelledError:
+                self._release_when_done(ticket, work, discard)
+                raise
+            except Exception as e:
+                status = _status_code(e)
+                retryable = status in RETRYABLE_STATUS or (status is None and type(e).__name__ in RETRYABLE_ERRORS)
+                self.release(ticket, refund=status == 429)
+                if not retryable or attempt == self.max_retries:
+                    raise
+                retry_after = _retry_after(e)
+                delay = retry_after if retry_after is not None else min(
+                    LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt * (0.5 + random.random())
+                )
+                llm_retries.inc(priority=ticket.priority, reason=str(status or type(e).__name__))
+                logger.warning(
+                    "⚠️ %s call failed (%s), retry %s/%s in %.2fs",
+                    ticket.agent, status or type(e).__name__, attempt + 1, self.max_retries, delay
+                )
+                if status == 429:
+                    # The whole key is over its limit for this model, not just this call
+                    limits = self._limits(ticket.model)
+                    limits.paused_until = max(limits.paused_until, time.monotonic() + delay)
+                else:
+                    await asyncio.sleep(delay)
+
+    async def create(
+        self,
+        call: Callable[[], Any],
+        priority: str,
+        agent: str,
+        model: str,
+        input_tokens: int,
+        max_tokens: int
+    ) -> Any:
+        """
+        Run a sync messages.create call under the scheduler
+
+        Args:
+            call: Zero-argument callable making the API call
+            priority: interactive, standard or batch
+            agent: Calling agent (for logs)
+            model: Model the rate limits apply to
+            input_tokens: Estimated prompt tokens
+            max_tokens: Output tokens to reserve until the response reports actual usage
+        """
+        ticket = Ticket(priority=priority, model=model or "", agent=agent, input_tokens=input_tokens, output_tokens=max_tokens)
+        response = await self._attempt(ticket, call)
+        self.release(ticket, usage=getattr(response, "usage", None))
+        return response
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        open_stream: Callable[[], ContextManager],
+        priority: str,
+        agent: str,
+        model: str,
+        input_tokens: int,
+        max_tokens: int
+    ):
+        """
+        Run a sync messages.stream call under the scheduler, yielding an AsyncMessageStream
+
+        Opening the stream is retried like create(); failures after text has
+        started flowing are not.
+        """
+        check_deadline(agent)
+        ticket = Ticket(priority=priority, model=model or "", agent=agent, input_tokens=input_tokens, output_tokens=max_tokens)
+
+        def enter():
+            manager = open_stream()
+            return manager, manager.__enter__()
+
+        manager, stream = await self._attempt(ticket, enter, discard=lambda opened: opened[0].__exit__(None, None, None))
+        usage = None
+        try:
+            yield AsyncMessageStream(stream, self._run_in_thread, agent)
+            usage = getattr(await self._run_in_thread(stream.get_final_message), "usage", None)
+        except BaseException:
+            await self._run_in_thread(manager.__exit__, *sys.exc_info())
+            raise
+        else:
+            await self._run_in_thread(manager.__exit__, None, None, None)
+        finally:
+            self.release(ticket, usage=usage)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue depth, in-flight calls and rate-limit budget per model"""
+        now = time.monotonic()
+        return {
+            "classes": {
+                priority: {
+                    "queued": len(self._queues[priority]),
+                    "in_flight": self._active[priority],
+                    "concurrency_limit": self.class_concurrency[priority]
+                }
+                for priority in PRIORITIES
+            },
+            "max_concurrency": self.max_concurrency,
+            "models": {
+                model: {
+                    "paused_for_seconds": round(max(0.0, limits.paused_until - now), 2),
+                    **{
+                        name: None if bucket.unlimited else round(bucket.tokens, 1)
+                        for name, bucket in (
+                            ("requests_available", limits.requests),
+                            ("input_tokens_available", limits.input_tokens),
+                            ("output_tokens_available", limits.output_tokens)
+                        )
+                    }
+                }
+                for model, limits in self._models.items()
+            }
+        }
+
+
+# Shared scheduler every agent's LLM client submits to
+llm_scheduler = LLMScheduler()
+
+registry.gauge(
+    "llm_scheduler_queued",
+    "Claude calls waiting in the scheduler",
+    ["priority"],
+    collect=lambda: {(priority,): len(queue) for priority, queue in llm_scheduler._queues.items()}
+)
+registry.gauge(
+    "llm_scheduler_in_flight",
+    "Claude calls holding a scheduler slot",
+    ["priority"],
+    collect=lambda: {(priority,): active for priority, active in llm_scheduler._active.items()}
+)
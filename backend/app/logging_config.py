@@ -0,0 +1,141 @@
+"""
+Logging - Non-blocking JSON-lines logging with per-module levels and event sampling
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.metrics import registry
+
+log_records_dropped = registry.counter(
+    "log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+    ["logger"]
+)
+
+# Standard LogRecord attributes; anything else on a record came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Parse "a=1,b=2" into {"a": "1", "b": "2"}"""
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            key, _, val = item.partition("=")
+            mapping[key.strip()] = val.strip()
+    return mapping
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, any extra fields, exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = "".join(traceback.format_exception(*record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of high-frequency records
+
+    Records logged with extra={"event": name} are kept with the probability
+    configured for that event (LOG_SAMPLE_RATES="transcript=0.1,insight=0.2").
+    Other records always pass.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        return rate is None or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueues records for the background listener thread
+
+    Formatting (including tracebacks) happens on the listener thread; when the
+    queue is full the record is dropped and counted instead of blocking.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message now so mutable args can't change before it's written
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc(logger=record.name)
+
+
+def configure_logging():
+    """
+    Install the queue-backed handler on the "app" logger (idempotent)
+
+    Environment:
+        LOG_LEVEL: Default level (INFO)
+        LOG_LEVELS: Per-module overrides, e.g. "app.agents.listener_agent=DEBUG,app.main=WARNING"
+        LOG_FORMAT: "json" (default) or "text"
+        LOG_SAMPLE_RATES: Per-event keep rates, e.g. "transcript=0.1"
+        LOG_QUEUE_SIZE: Max records waiting for the writer thread
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    app_logger.propagate = False
+    for name, level in _parse_mapping(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter({
+        event: float(rate) for event, rate in _parse_mapping(os.getenv("LOG_SAMPLE_RATES", "")).items()
+    }))
+    app_logger.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,233 @@
+"""
+Loop Monitor - Event-loop lag watchdog that captures the stack of blocking code
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from app.metrics import registry
+from app.profiling import loop_task_tag
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_MONITOR = os.getenv("LOOP_LAG_MONITOR", "true").lower() == "true"
+# How often the heartbeat task wakes up; its lateness is the loop lag
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+# Lag at which the watchdog captures the stack of whatever is holding the loop
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+LOOP_LAG_MAX_EVENTS = int(os.getenv("LOOP_LAG_MAX_EVENTS", "200"))
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_BACKEND_DIR = os.path.dirname(_APP_DIR)
+
+loop_lag_seconds = registry.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a heartbeat scheduled every LOOP_LAG_INTERVAL_MS",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+loop_blocked = registry.counter(
+    "event_loop_blocked_total",
+    "Times the event loop was blocked past LOOP_LAG_THRESHOLD_MS, by blocking call site",
+    ["site"]
+)
+
+
+def _frame_label(frame) -> str:
+    filename = frame.f_code.co_filename
+    if filename.startswith(_BACKEND_DIR):
+        filename = os.path.relpath(filename, _BACKEND_DIR)
+    return f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def _blocking_site(frame) -> str:
+    """
+    The deepest app/ frame on the stack and the library call it is waiting on,
+    e.g. "app/agents/jira_agent.py:236 in _request -> requests.api:request"
+    """
+    leaf, library_call = frame, None
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(_APP_DIR):
+            site = _frame_label(frame)
+            return f"{site} -> {library_call}" if library_call else site
+        library_call = f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    # Blocked outside application code (framework or a dependency's own thread work)
+    return _frame_label(leaf) if leaf is not None else "(unknown)"
+
+
+@dataclass
+class BlockingEvent:
+    """One stall of the event loop past the threshold"""
+    deadline: float
+    site: str
+    stack: List[str]
+    tag: Optional[str] = None
+    task: Optional[str] = None
+    detected_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="milliseconds"))
+    lag_ms: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "detected_at": self.detected_at,
+            "lag_ms": self.lag_ms,
+            "site": self.site,
+            "tag": self.tag,
+            "task": self.task,
+            "stack": self.stack
+        }
+
+
+class LoopLagMonitor:
+    """
+    Continuous event-loop lag measurement with blocking call-site capture
+    Features:
+    - A heartbeat task measures how late the loop wakes it (event_loop_lag_seconds)
+    - A watchdog thread notices a late heartbeat while the loop is still stuck
+      and captures the loop thread's stack, so the blocking code is named
+    - Per-site totals (event_loop_blocked_total) and recent stalls with stacks
+    - The session/request tag of the blocked task (see app.profiling)
+    """
+
+    def __init__(
+        self,
+        interval_ms: float = LOOP_LAG_INTERVAL_MS,
+        threshold_ms: float = LOOP_LAG_THRESHOLD_MS,
+        max_events: int = LOOP_LAG_MAX_EVENTS
+    ):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._lock = threading.Lock()
+        self._events: Deque[BlockingEvent] = deque(maxlen=max_events)
+        self._sites: Dict[str, Dict] = {}
+        self._recent_lags: Deque[float] = deque(maxlen=max(1, int(60 / self.interval)))
+        self._open: Optional[BlockingEvent] = None
+        self._deadline: Optional[float] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat_task is not None and not self._heartbeat_task.done()
+
+    def start(self):
+        """Start monitoring the running loop; must be called from the event loop thread"""
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._heartbeat_task = loop.create_task(self._heartbeat(), name="loop-lag-heartbeat")
+        threading.Thread(
+            target=self._watchdog,
+            args=(loop, threading.get_ident()),
+            name="loop-lag-watchdog",
+            daemon=True
+        ).start()
+        logger.info("🐢 Event loop lag monitor started (interval=%.0fms, threshold=%.0fms)", self.interval * 1000, self.threshold * 1000)
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            self._deadline = expected
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            loop_lag_seconds.observe(lag)
+            self._recent_lags.append(lag)
+            if lag >= self.threshold:
+                self._close_event(expected, lag)
+
+    def _watchdog(self, loop: asyncio.AbstractEventLoop, loop_thread: int):
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            deadline = self._deadline
+            if deadline is None or time.monotonic() - deadline < self.threshold:
+                continue
+            with self._lock:
+                if self._open is not None and self._open.deadline == deadline:
+                    continue  # Already captured this stall
+            frame = sys._current_frames().get(loop_thread)
+            if frame is None:
+                continue
+            stack = []
+            f = frame
+            while f is not None:
+                stack.append(_frame_label(f))
+                f = f.f_back
+            stack.reverse()  # Most recent call last, as in tracebacks
+            task = asyncio.current_task(loop)
+            event = BlockingEvent(
+                deadline=deadline,
+                site=_blocking_site(frame),
+                stack=stack,
+                tag=loop_task_tag(loop),
+                task=task.get_name() if task is not None else None
+            )
+            del frame, f
+            with self._lock:
+                if self._deadline != deadline:
+                    continue  # The loop caught up while the stack was being taken
+                self._open = event
+            logger.warning(
+                "🐢 Event loop blocked for >%.0fms at %s",
+                self.threshold * 1000,
+                event.site,
+                extra={"event": "loop_blocked", "site": event.site, "tag": event.tag, "stack": stack}
+            )
+
+    def _close_event(self, deadline: float, lag: float):
+        """Attach the measured lag to the stall the watchdog captured, and tally its site"""
+        with self._lock:
+            event, self._open = self._open, None
+            if event is None or event.deadline != deadline:
+                # Stall ended before the watchdog's next poll; nothing was captured
+                event = BlockingEvent(deadline=deadline, site="(not captured)", stack=[])
+            event.lag_ms = round(lag * 1000, 1)
+            self._events.append(event)
+            site = self._sites.setdefault(event.site, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            site["count"] += 1
+            site["total_ms"] += event.lag_ms
+            site["max_ms"] = max(site["max_ms"], event.lag_ms)
+            site["last_seen"] = event.detected_at
+            if event.stack:
+                site["stack"] = event.stack
+        loop_blocked.inc(site=event.site)
+        logger.info("🐢 Event loop unblocked after %.0fms (%s)", event.lag_ms, event.site)
+
+    def snapshot(self, limit: int = 50) -> Dict:
+        """Recent lag percentiles, blocking sites by total stall time, and the latest stalls"""
+        lags = sorted(self._recent_lags)
+        with self._lock:
+            sites = [{"site": name, **totals} for name, totals in self._sites.items()]
+            events = [event.to_dict() for event in list(self._events)[-limit:]]
+            current = self._open.to_dict() if self._open is not None else None
+        sites.sort(key=lambda site: site["total_ms"], reverse=True)
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {
+                "p50": round(lags[len(lags) // 2] * 1000, 2) if lags else None,
+                "p99": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2) if lags else None,
+                "max": round(lags[-1] * 1000, 2) if lags else None,
+                "window_seconds": round(len(lags) * self.interval, 1)
+            },
+            "blocked_now": current,
+            "sites": sites,
+            "events": events
+        }
+
+
+# Shared monitor started with the app
+loop_monitor = LoopLagMonitor()
@@ -1,33 +1,38 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File
+from fastapi import Depends, FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Match
 from dotenv import load_dotenv
+import logging
 import os
-from typing import Dict, List
+from typing import Dict, List, Optional
 import asyncio
 import tempfile
+import time
 import subprocess
 import json
+import uuid
 from datetime import datetime
 
-from app.agents.listener_agent import ListenerAgent
-from app.agents.summarizer_agent import SummarizerAgent
-from app.agents.task_generator_agent import TaskGeneratorAgent
-from app.agents.integration_agent import IntegrationAgent
-from app.agents.emotion_agent import EmotionAnalysisAgent
-from app.agents.jira_agent import JiraAgent
-from app.agents.realtime_insights_agent import RealTimeInsightsAgent
-from app.agents.qa_agent import QAAgent
-from app.agents.personalized_assistant_agent import PersonalizedAssistantAgent
+from app.agents.emotion_agent import emotion_to_happiness
+from app.admin import require_admin
+from app.agent_registry import AGENT_WARMUP, agent_registry
+from app.batch_mode import LLM_BATCH_MODE, batch_scope
+from app.circuit_breaker import circuit_breakers
+from app.debounce import UTTERANCE_DEBOUNCE_MS, utterance_debouncer
+from app.hedging import DeadlineExceeded, deadline_scope, latency_windows
+from app.llm_scheduler import BATCH, llm_scheduler
+from app.metrics import registry as metrics_registry, websocket_connections, websocket_messages
+from app.model_routing import route_stats
 from app.models import MeetingSession, TranscriptLine, ActionItem
-
-# Optional: Deepgram agent (only if dependencies are installed)
-try:
-    from app.agents.deepgram_realtime_agent import DeepgramRealtimeAgent
-    DEEPGRAM_AVAILABLE = True
-except ImportError:
-    DEEPGRAM_AVAILABLE = False
-    print("⚠️ Deepgram agent not available - install deepgram-sdk to enable real-time video transcription")
+from app.profiling import ProfilerBusyError, profiler, set_profile_tag
+from app.providers import STREAMING_STT_PROVIDER, create_streaming_stt, streaming_stt_available
+from app.structured_output import structured_output_stats
+from app.tokens import token_usage
+from app.tracing import tracer
+from app.usage_ledger import set_usage_context, usage_ledger
+from app.logging_config import configure_logging
+from app.loop_monitor import LOOP_LAG_MONITOR, loop_monitor
 
 # Load environment variables from backend/.env
 from pathlib import Path
@@ -35,6 +40,10 @@ backend_dir = Path(__file__).parent.parent
 env_path = backend_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
+# JSON-lines logging on a background writer thread
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Meeting Whisperer API",
@@ -51,20 +60,109 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize agents
-listener_agent = ListenerAgent()
-summarizer_agent = SummarizerAgent()
-task_generator_agent = TaskGeneratorAgent()
-integration_agent = IntegrationAgent()
-emotion_agent = EmotionAnalysisAgent()
-jira_agent = JiraAgent()
-realtime_insights_agent = RealTimeInsightsAgent()
-qa_agent = QAAgent()
-personalized_assistant_agent = PersonalizedAssistantAgent()
+
+@app.middleware("http")
+async def tag_request_for_profiling(request: Request, call_next):
+    """Requests sent with X-Profile-Tag can be profiled on their own (see /api/admin/profile)"""
+    tag = request.headers.get("x-profile-tag")
+    if not tag:
+        return await call_next(request)
+    set_profile_tag(tag)
+    started_at = time.time()
+    try:
+        return await call_next(request)
+    finally:
+        profiler.request_finished(tag, started_at)
+
+
+@app.middleware("http")
+async def attribute_usage(request: Request, call_next):
+    """Attribute external calls made while serving a request to its route and session"""
+    endpoint, session_id = request.url.path, request.headers.get("x-session-id")
+    for route in request.app.router.routes:
+        match, child_scope = route.matches(request.scope)
+        if match == Match.FULL:
+            endpoint = getattr(route, "path", endpoint)
+            session_id = child_scope.get("path_params", {}).get("session_id", session_id)
+            break
+    set_usage_context(session_id=session_id, endpoint=endpoint)
+    return await call_next(request)
+
+
+def body_session_id(body: dict) -> Optional[str]:
+    """`session_id` from a JSON body; the request's external calls are attributed to it (like X-Session-Id)"""
+    session_id = body.get("session_id")
+    if session_id:
+        set_usage_context(session_id=session_id)
+    return session_id
+
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if LOOP_LAG_MONITOR:
+        loop_monitor.start()
+
+
+@app.on_event("startup")
+async def start_agent_warmup():
+    """Construct agents in the background so the server accepts connections immediately"""
+    if AGENT_WARMUP:
+        app.state.agent_warmup = asyncio.create_task(warm_up())
+
+
+async def warm_up():
+    await agent_registry.warm_up()
+    # Streaming transcription: Deepgram (only if dependencies are installed) or the simulated backend
+    if not await asyncio.to_thread(streaming_stt_available):
+        logger.warning("⚠️ Deepgram agent not available - install deepgram-sdk to enable real-time video transcription")
+
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+# Agents are imported and constructed on first use or by the startup warm-up (see app/agent_registry.py)
+listener_agent = agent_registry.register("listener", "app.agents.listener_agent:ListenerAgent")
+summarizer_agent = agent_registry.register("summarizer", "app.agents.summarizer_agent:SummarizerAgent")
+task_generator_agent = agent_registry.register("task_generator", "app.agents.task_generator_agent:TaskGeneratorAgent")
+integration_agent = agent_registry.register("integration", "app.agents.integration_agent:IntegrationAgent")
+emotion_agent = agent_registry.register("emotion", "app.agents.emotion_agent:EmotionAnalysisAgent")
+jira_agent = agent_registry.register("jira", "app.agents.jira_agent:JiraAgent")
+realtime_insights_agent = agent_registry.register("realtime_insights", "app.agents.realtime_insights_agent:RealTimeInsightsAgent")
+qa_agent = agent_registry.register("qa", "app.agents.qa_agent:QAAgent")
+personalized_assistant_agent = agent_registry.register("personalized_assistant", "app.agents.personalized_assistant_agent:PersonalizedAssistantAgent")
+utterance_analyzer_agent = agent_registry.register("utterance_analyzer", "app.agents.utterance_analyzer_agent:UtteranceAnalyzerAgent")
+
+# /api/analyze-emotion answers emotion, insight and explanation with one Claude call per line
+UTTERANCE_FUSED_ANALYSIS = os.getenv("UTTERANCE_FUSED_ANALYSIS", "true").lower() == "true"
+# In batch mode (LLM_BATCH_MODE) uploaded media gets action items per window of this many lines
+MEDIA_BATCH_ACTION_WINDOW_LINES = int(os.getenv("MEDIA_BATCH_ACTION_WINDOW_LINES", "20"))
 
 # Store active meeting sessions
 active_sessions: Dict[str, MeetingSession] = {}
 
+def _queue_depths() -> Dict[tuple, int]:
+    # Scraping shouldn't construct the summarizer
+    summarizer = agent_registry.peek("summarizer")
+    return {(name,): depth for name, depth in summarizer.queue_depths().items()} if summarizer else {}
+
+
+# Scrape-time gauges
+metrics_registry.gauge("meeting_active_sessions", "Live meeting sessions", collect=lambda: len(active_sessions))
+metrics_registry.gauge(
+    "queue_depth",
+    "Pending background work items by queue",
+    ["queue"],
+    collect=_queue_depths
+)
+metrics_registry.gauge("asyncio_tasks", "Tasks alive on the event loop", collect=lambda: len(asyncio.all_tasks()))
+
+
+async def send_ws_json(websocket: WebSocket, endpoint: str, message: dict):
+    """Send a JSON WebSocket message and count it"""
+    websocket_messages.inc(endpoint=endpoint, direction="out")
+    await websocket.send_json(message)
+
 
 @app.get("/")
 async def root():
@@ -84,78 +182,124 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Detailed health check"""
+    """Detailed health check; "degraded" while a provider's circuit is open and local fallbacks are in use"""
     return {
-        "status": "ok",
+        "status": "degraded" if circuit_breakers.degraded() else "ok",
         "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
         "jira_configured": bool(os.getenv("JIRA_API_TOKEN")),
         "teams_configured": bool(os.getenv("TEAMS_WEBHOOK_URL")),
-        "slack_configured": bool(os.getenv("SLACK_WEBHOOK_URL"))
+        "slack_configured": bool(os.getenv("SLACK_WEBHOOK_URL")),
+        "circuit_breakers": circuit_breakers.snapshot()
     }
 
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness: 200 once every agent is constructed, 503 while warming up or if one failed"""
+    ready = agent_registry.ready()
+    return JSONResponse(
+        {"ready": ready, "agents": agent_registry.status()},
+        status_code=200 if ready else 503
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: agent latency histograms, LLM/STT counters, WebSocket and queue gauges"""
+    return PlainTextResponse(metrics_registry.render(), media_type=metrics_registry.CONTENT_TYPE)
+
+
 @app.websocket("/ws/meeting/{session_id}")
 async def meeting_websocket(websocket: WebSocket, session_id: str):
     """
     WebSocket endpoint for real-time meeting transcription and processing
     """
     await websocket.accept()
+    await agent_registry.ensure("listener")
+    websocket_connections.inc(endpoint="meeting")
+    set_profile_tag(f"session:{session_id}")
+    set_usage_context(session_id=session_id, endpoint="/ws/meeting/{session_id}")
 
     # Create new meeting session
     session = MeetingSession(session_id=session_id)
     active_sessions[session_id] = session
 
+    chunk_seq = 0
+
     try:
         while True:
             # Receive audio data from client
             data = await websocket.receive_bytes()
+            websocket_messages.inc(endpoint="meeting", direction="in")
+            chunk_seq += 1
+            trace = tracer.start("meeting.chunk", session_id, chunk_seq)
 
             # Process with Listener Agent (transcription)
-            transcript_line = await listener_agent.process_audio(data)
+            with trace.span("transcribe", audio_bytes=len(data)):
+                transcript_line = await listener_agent.process_audio(data)
 
             if transcript_line:
-                session.transcript.append(transcript_line)
-
-                # Analyze emotions for this message
-                emotion_data = await emotion_agent.analyze_single_message(
-                    transcript_line.text,
-                    transcript_line.speaker
-                )
+                with trace.span("index"):
+                    session.transcript.append(transcript_line)
+                    qa_agent.index_line(session_id, transcript_line)
+                    summarizer_agent.add_transcript_line(session_id, transcript_line)
+
+                # Analyze emotions for this message (sent without emotions if not ready in time)
+                with trace.span("emotion"):
+                    try:
+                        with deadline_scope():
+                            emotion_data = await emotion_agent.analyze_single_message(
+                                transcript_line.speaker,
+                                transcript_line.text,
+                                session_id=session_id
+                            )
+                    except DeadlineExceeded:
+                        emotion_data = None
 
                 # Send transcript with emotion data back to client
-                await websocket.send_json({
-                    "type": "transcript",
-                    "data": {
-                        "speaker": transcript_line.speaker,
-                        "text": transcript_line.text,
-                        "timestamp": transcript_line.timestamp.isoformat(),
-                        "emotions": emotion_data
-                    }
-                })
+                with trace.span("send_json", type="transcript"):
+                    await send_ws_json(websocket, "meeting", {
+                        "type": "transcript",
+                        "seq": chunk_seq,  # Audio chunk this line came from (lets clients measure latency)
+                        "data": {
+                            "speaker": transcript_line.speaker,
+                            "text": transcript_line.text,
+                            "timestamp": transcript_line.timestamp.isoformat(),
+                            "emotions": emotion_data
+                        }
+                    })
 
                 # Check for action items with Task Generator Agent
                 if len(session.transcript) % 5 == 0:  # Check every 5 lines
-                    action_items = await task_generator_agent.extract_action_items(
-                        session.transcript[-5:]
-                    )
+                    with trace.span("action_items"):
+                        action_items = await task_generator_agent.extract_action_items(
+                            session.transcript[-5:],
+                            session_id
+                        )
 
                     if action_items:
                         session.action_items.extend(action_items)
 
-                        await websocket.send_json({
-                            "type": "action_items",
-                            "data": [item.dict() for item in action_items]
-                        })
+                        with trace.span("send_json", type="action_items"):
+                            await send_ws_json(websocket, "meeting", {
+                                "type": "action_items",
+                                "seq": chunk_seq,
+                                "data": [item.dict() for item in action_items]
+                            })
+
+            trace.finish(transcribed=transcript_line is not None)
 
     except WebSocketDisconnect:
-        print(f"Client disconnected from session {session_id}")
+        logger.info("Client disconnected from session %s", session_id)
     except Exception as e:
-        print(f"Error in WebSocket: {str(e)}")
+        logger.error("Error in WebSocket: %s", e)
         await websocket.close(code=1011, reason=str(e))
     finally:
+        websocket_connections.dec(endpoint="meeting")
         # Clean up session
         if session_id in active_sessions:
             del active_sessions[session_id]
+        drop_session_state(session_id)
 
 
 @app.websocket("/ws/realtime-video/{session_id}")
@@ -165,46 +309,61 @@ async def realtime_video_websocket(websocket: WebSocket, session_id: str):
     Audio is streamed from playing video and transcribed instantly
     """
     await websocket.accept()
+    set_profile_tag(f"session:{session_id}")
+    set_usage_context(session_id=session_id, endpoint="/ws/realtime-video/{session_id}")
 
-    if not DEEPGRAM_AVAILABLE:
-        await websocket.send_json({
+    if not await asyncio.to_thread(streaming_stt_available):
+        await send_ws_json(websocket, "realtime_video", {
             "type": "error",
             "message": "Deepgram real-time transcription not available. Install deepgram-sdk package."
         })
         await websocket.close()
         return
 
-    print(f"🎬 Real-time video session started: {session_id}")
+    logger.info("🎬 Real-time video session started: %s", session_id)
 
-    # Create Deepgram agent for this session
-    deepgram_agent = DeepgramRealtimeAgent()
+    # Create a streaming transcription session (Deepgram or simulated)
+    streaming_stt = create_streaming_stt()
     transcript_buffer = []
 
+    transcript_seq = 0
+
     # Define callback for when Deepgram sends transcripts
     async def on_transcript(data):
+        nonlocal transcript_seq
         text = data["text"]
         is_final = data["is_final"]
         speaker = data["speaker"]
+        transcript_seq += 1
+        trace = tracer.start("realtime_video.transcript", session_id, transcript_seq)
 
         if is_final:
             # Final transcript - send to frontend
-            print(f"📝 Real-time transcript: [{speaker}] {text}")
+            logger.info("📝 Real-time transcript: [%s] %s", speaker, text, extra={"event": "transcript", "session_id": session_id})
 
             # Send to frontend
-            await websocket.send_json({
-                "type": "transcript",
-                "data": {
-                    "speaker": speaker,
-                    "text": text,
-                    "is_final": True
-                }
-            })
+            with trace.span("send_json", type="transcript"):
+                await send_ws_json(websocket, "realtime_video", {
+                    "type": "transcript",
+                    "data": {
+                        "speaker": speaker,
+                        "text": text,
+                        "is_final": True,
+                        "audio_end": data.get("audio_end")
+                    }
+                })
 
             # Store in buffer for later processing
-            transcript_buffer.append({
-                "speaker": speaker,
-                "text": text
-            })
+            with trace.span("index"):
+                transcript_buffer.append({
+                    "speaker": speaker,
+                    "text": text
+                })
+                qa_agent.index_line(session_id, TranscriptLine(
+                    speaker=speaker,
+                    text=text,
+                    timestamp=datetime.now()
+                ))
 
             # Generate action items every 3 lines
             if len(transcript_buffer) % 3 == 0:
@@ -220,59 +379,91 @@ async def realtime_video_websocket(websocket: WebSocket, session_id: str):
                     ]
 
                     # Generate action items
-                    action_items = await task_generator_agent.extract_action_items(transcript_lines)
+                    with trace.span("action_items"):
+                        action_items = await task_generator_agent.extract_action_items(transcript_lines, session_id)
 
                     if action_items:
-                        await websocket.send_json({
-                            "type": "action_items",
-                            "data": [item.dict() for item in action_items]
-                        })
-                        print(f"🎯 Generated {len(action_items)} action items")
+                        with trace.span("send_json", type="action_items"):
+                            await send_ws_json(websocket, "realtime_video", {
+                                "type": "action_items",
+                                "data": [item.dict() for item in action_items]
+                            })
+                        logger.info("🎯 Generated %s action items", len(action_items))
                 except Exception as e:
-                    print(f"❌ Action item generation error: {e}")
+                    logger.error("❌ Action item generation error: %s", e)
         else:
             # Interim result - send as live preview
-            await websocket.send_json({
-                "type": "transcript",
-                "data": {
-                    "speaker": speaker,
-                    "text": text,
-                    "is_final": False
-                }
-            })
+            with trace.span("send_json", type="interim"):
+                await send_ws_json(websocket, "realtime_video", {
+                    "type": "transcript",
+                    "data": {
+                        "speaker": speaker,
+                        "text": text,
+                        "is_final": False,
+                        "audio_end": data.get("audio_end")
+                    }
+                })
+
+        trace.finish(is_final=is_final)
 
     def on_error(error):
-        print(f"❌ Deepgram error: {error}")
+        logger.error("❌ Deepgram error: %s", error)
 
+    websocket_connections.inc(endpoint="realtime_video")
+    stream_started = time.perf_counter()
+    audio_bytes_sent = 0
     try:
         # Start Deepgram streaming
-        await deepgram_agent.start_streaming(
+        await streaming_stt.start_streaming(
             on_transcript=on_transcript,
             on_error=on_error
         )
 
-        await websocket.send_json({
+        await send_ws_json(websocket, "realtime_video", {
             "type": "status",
             "message": "🎙️ Real-time transcription active! Play your video."
         })
 
         # Receive audio chunks from frontend and forward to Deepgram
+        chunk_seq = 0
         while True:
             data = await websocket.receive_bytes()
+            websocket_messages.inc(endpoint="realtime_video", direction="in")
+            chunk_seq += 1
+            trace = tracer.start("realtime_video.audio", session_id, chunk_seq)
 
             # Forward audio to Deepgram
-            deepgram_agent.send_audio(data)
+            with trace.span("deepgram_send", audio_bytes=len(data)):
+                streaming_stt.send_audio(data)
+            audio_bytes_sent += len(data)
+            trace.finish()
 
     except WebSocketDisconnect:
-        print(f"🔌 Client disconnected from real-time video session {session_id}")
+        logger.info("🔌 Client disconnected from real-time video session %s", session_id)
     except Exception as e:
-        print(f"❌ Error in real-time video WebSocket: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error in real-time video WebSocket: %s", e, extra={"session_id": session_id})
     finally:
         # Clean up Deepgram connection
-        deepgram_agent.finish()
-        print(f"✅ Real-time video session ended: {session_id}")
+        streaming_stt.finish()
+        # Streaming STT bills for the audio streamed (16 kHz, 16-bit mono PCM)
+        usage_ledger.record(
+            "simulated" if STREAMING_STT_PROVIDER == "simulated" else "deepgram",
+            "stream",
+            "listener",
+            (time.perf_counter() - stream_started) * 1000,
+            audio_seconds=audio_bytes_sent / 32000
+        )
+        websocket_connections.dec(endpoint="realtime_video")
+        logger.info("✅ Real-time video session ended: %s", session_id)
+
+
+def drop_session_state(session_id: str):
+    """Free the per-session state the agents keep for a live meeting (rolling summary, topic index)"""
+    # Agents that were never loaded have nothing to free
+    for name in ("summarizer", "qa"):
+        agent = agent_registry.peek(name)
+        if agent is not None:
+            agent.drop_session(session_id)
 
 
 @app.post("/api/meeting/{session_id}/end")
@@ -288,12 +479,14 @@ async def end_meeting(session_id: str):
     # Generate summary with Summarizer Agent
     summary = await summarizer_agent.generate_summary(
         transcript=session.transcript,
-        action_items=session.action_items
+        action_items=session.action_items,
+        session_id=session_id
     )
     
     # Generate emotion analysis
-    emotion_summary = await emotion_agent.analyze_emotions(session.transcript)
-    happiness_summary = await emotion_agent.get_happiness_summary(session.transcript)
+    emotion_summary = await emotion_agent.analyze_emotions(session.transcript, session_id)
+    happiness_summary = await emotion_agent.get_happiness_summary(session.transcript, session_id)
+    drop_session_state(session_id)
     
     return {
         "session_id": session_id,
@@ -305,6 +498,82 @@ async def end_meeting(session_id: str):
     }
 
 
+def sse_event(payload: dict) -> str:
+    """One Server-Sent Events message"""
+    return f"data: {json.dumps(payload, default=str)}\n\n"
+
+
+async def stream_result_events(events):
+    """SSE for a stream_structured event stream; its final result is sent as the "complete" event"""
+    try:
+        async for event in events:
+            if event["type"] == "result":
+                yield sse_event({"type": "complete", "result": event["value"]})
+            else:
+                yield sse_event(event)
+    except Exception as e:
+        logger.error("❌ Streaming error: %s", e)
+        yield sse_event({"type": "error", "message": str(e)})
+
+
+@app.post("/api/meeting/{session_id}/end/stream")
+async def end_meeting_stream(session_id: str):
+    """
+    End a meeting session with the summary streamed as Server-Sent Events
+
+    Events: "token" (raw model output), "partial" (text appended to a summary
+    field as it is written), "field" (a completed summary field), "section" (emotion_analysis,
+    happiness_summary) and finally "complete" with the same body as /end, or
+    "error" if the summary stream fails after it started.
+    """
+    if session_id not in active_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    session = active_sessions[session_id]
+
+    async def generate_stream():
+        # Emotion sections run while the summary streams
+        emotion_task = asyncio.ensure_future(emotion_agent.analyze_emotions(session.transcript, session_id))
+        happiness_task = asyncio.ensure_future(emotion_agent.get_happiness_summary(session.transcript, session_id))
+        try:
+            summary = None
+            async for event in summarizer_agent.stream_summary(
+                transcript=session.transcript,
+                action_items=session.action_items,
+                session_id=session_id
+            ):
+                if event["type"] == "result":
+                    summary = event["value"]
+                elif event["type"] == "error":
+                    yield sse_event(event)
+                    return
+                else:
+                    yield sse_event({**event, "section": "summary"})
+
+            emotion_summary = await emotion_task
+            yield sse_event({"type": "section", "section": "emotion_analysis", "value": emotion_summary})
+            happiness_summary = await happiness_task
+            yield sse_event({"type": "section", "section": "happiness_summary", "value": happiness_summary})
+
+            drop_session_state(session_id)
+            yield sse_event({"type": "complete", "result": {
+                "session_id": session_id,
+                "summary": summary,
+                "emotion_analysis": emotion_summary,
+                "happiness_summary": happiness_summary,
+                "transcript_lines": len(session.transcript),
+                "action_items": len(session.action_items)
+            }})
+        except Exception as e:
+            logger.error("❌ Streamed meeting end error: %s", e)
+            yield sse_event({"type": "error", "message": str(e)})
+        finally:
+            for task in (emotion_task, happiness_task):
+                task.cancel()
+
+    return StreamingResponse(generate_stream(), media_type="text/event-stream")
+
+
 @app.post("/api/meeting/{session_id}/create-jira-tasks")
 async def create_jira_tasks(session_id: str):
     """
@@ -340,7 +609,8 @@ async def post_summary(session_id: str, platform: str = "teams"):
     # Generate summary
     summary = await summarizer_agent.generate_summary(
         transcript=session.transcript,
-        action_items=session.action_items
+        action_items=session.action_items,
+        session_id=session_id
     )
     
     # Post to platform
@@ -368,96 +638,225 @@ async def list_sessions():
                 "session_id": sid,
                 "transcript_lines": len(session.transcript),
                 "action_items": len(session.action_items),
-                "started_at": session.started_at.isoformat()
+                "started_at": session.started_at.isoformat(),
+                "token_usage": token_usage.session_totals(sid)["total"]
             }
             for sid, session in active_sessions.items()
         ]
     }
 
 
-@app.post("/api/analyze-emotion")
-async def analyze_emotion_text(data: dict):
-    """Analyze emotion from text using Claude AI (for browser speech recognition) WITH REAL-TIME INSIGHTS"""
+@app.get("/api/tokens")
+async def get_token_totals():
+    """Token and prompt-cache totals per agent across all sessions"""
+    return {"agents": token_usage.agent_totals()}
+
+
+@app.get("/api/llm-scheduler")
+async def get_llm_scheduler():
+    """Claude calls queued and in flight per priority class, remaining rate-limit budget per model, and hedging thresholds"""
+    return {**llm_scheduler.snapshot(), "hedging": latency_windows.snapshot()}
+
+
+@app.get("/api/model-routing")
+async def get_model_routing():
+    """Per-line analyses by routing tier (skip, local, fast, strong): traffic share, latency, confidence and local-heuristic agreement"""
+    return {"agents": route_stats.snapshot()}
+
+
+@app.get("/api/structured-output")
+async def get_structured_output_stats():
+    """How structured responses were obtained per agent (tool use, clean JSON, repaired, failed)"""
+    return {"agents": structured_output_stats.snapshot()}
+
+
+@app.get("/api/sessions/{session_id}/tokens")
+async def get_session_tokens(session_id: str):
+    """Token totals for a meeting session, broken down by agent"""
+    return {
+        "session_id": session_id,
+        **token_usage.session_totals(session_id)
+    }
+
+
+@app.get("/api/sessions/{session_id}/usage")
+async def get_session_usage(session_id: str, limit: int = 500):
+    """Cost and latency of every external call made for a meeting session"""
+    return usage_ledger.session_usage(session_id, limit=limit)
+
+
+@app.get("/api/usage")
+async def get_usage(group_by: str = "provider,agent", since: str = None, limit: int = 50):
+    """
+    Spend and latency rolled up across sessions, most expensive first
+
+    Args:
+        group_by: Comma-separated entry fields (session_id, endpoint, provider, agent, model, operation)
+        since: ISO timestamp; only calls at or after it
+    """
+    fields = [field.strip() for field in group_by.split(",") if field.strip()]
+    allowed = {"session_id", "endpoint", "provider", "agent", "model", "operation", "outcome"}
+    if not fields or not set(fields) <= allowed:
+        raise HTTPException(status_code=400, detail=f"group_by must be a subset of {sorted(allowed)}")
+    return {
+        "group_by": fields,
+        "since": since,
+        "rows": usage_ledger.rollup(fields, since=since, limit=limit)
+    }
+
+
+@app.get("/api/traces", dependencies=[Depends(require_admin)])
+async def get_traces(session_id: str = None):
+    """Sampled pipeline traces as Chrome trace-event JSON (open in chrome://tracing or Perfetto)"""
+    return JSONResponse(
+        tracer.to_chrome(session_id),
+        headers={"Content-Disposition": "attachment; filename=meeting-whisperer-trace.json"}
+    )
+
+
+@app.post("/api/traces/export", dependencies=[Depends(require_admin)])
+async def export_traces(request: dict = None):
+    """Push sampled traces to the configured OTLP/HTTP collector (TRACE_OTLP_ENDPOINT)"""
+    request = request or {}
     try:
-        text = data.get("text", "")
-        speaker = data.get("speaker", "Speaker")
-        recent_transcript = data.get("recent_transcript", [])  # Get context from frontend
+        return await tracer.export_otlp(request.get("session_id"))
+    except Exception as e:
+        logger.error("❌ Trace export error: %s", e)
+        return {"error": str(e)}
 
-        if not text:
-            return {"error": "No text provided"}
 
-        print(f"🧠 Analyzing emotion + real-time insights for: {speaker}: {text[:50]}...")
+@app.post("/api/traces/sampling", dependencies=[Depends(require_admin)])
+async def set_trace_sampling(request: dict):
+    """Change the trace sampling rate (0.0 - 1.0) at runtime"""
+    tracer.set_sample_rate(float(request.get("rate", 0.0)))
+    return {"sample_rate": tracer.sample_rate}
 
-        # Use the emotion agent to analyze
-        emotion_result = await emotion_agent.analyze_single_message(speaker, text)
 
-        print(f"✅ Emotion result: {emotion_result}")
+@app.delete("/api/traces", dependencies=[Depends(require_admin)])
+async def clear_traces():
+    """Drop buffered traces"""
+    tracer.clear()
+    return {"cleared": True}
 
-        # Transform to frontend-expected format
-        # Map emotions to happiness percentages
-        emotion_to_happiness = {
-            'excited': 95,
-            'very happy': 90,
-            'happy': 80,
-            'content': 70,
-            'calm': 60,
-            'focused': 60,
-            'neutral': 50,
-            'uncertain': 45,
-            'concerned': 35,
-            'frustrated': 25,
-            'disappointed': 20,
-            'sad': 15,
-            'angry': 10
+
+@app.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def run_profiler(request: dict = None):
+    """
+    Sample the live server and return flame-graph-ready folded stacks
+
+    Body (all optional):
+        seconds: Run length (default 10, capped at PROFILER_MAX_SECONDS)
+        session_id: Only sample while that meeting's WebSocket work is running
+        tag: Only sample requests sent with this X-Profile-Tag header
+        single_request: With tag, stop when the first tagged request completes
+        scope: "app" (default, frames in app/ only) or "all"
+        all_threads: Also sample executor threads
+        interval_ms: Sampling interval
+        format: "folded" (default; flamegraph.pl / speedscope) or "json"
+    """
+    request = request or {}
+    tag = f"session:{request['session_id']}" if request.get("session_id") else request.get("tag")
+    try:
+        run = await profiler.profile(
+            float(request.get("seconds", 10)),
+            tag=tag,
+            app_only=request.get("scope", "app") == "app",
+            all_threads=bool(request.get("all_threads", False)),
+            interval_ms=request.get("interval_ms"),
+            single_request=bool(request.get("single_request", False))
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if request.get("format") == "json":
+        return run.summary()
+    return PlainTextResponse(
+        run.folded(),
+        headers={
+            "Content-Disposition": "attachment; filename=meeting-whisperer-profile.folded",
+            "X-Profile-Samples": str(run.samples),
+            "X-Profile-Idle-Samples": str(run.idle_samples)
         }
+    )
 
-        primary_emotion = emotion_result.get('primary_emotion', 'neutral')
-        happiness_level = emotion_to_happiness.get(primary_emotion, 50)
 
-        # Map emotions to sentiment
-        positive_emotions = ['excited', 'very happy', 'happy', 'content', 'calm']
-        negative_emotions = ['frustrated', 'disappointed', 'sad', 'angry', 'concerned']
+@app.delete("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def stop_profiler():
+    """End the running profile early (the pending /api/admin/profile call returns what it has)"""
+    active = profiler.active is not None
+    profiler.stop()
+    return {"stopped": active}
 
-        if primary_emotion in positive_emotions:
-            sentiment = 'positive'
-        elif primary_emotion in negative_emotions:
-            sentiment = 'negative'
-        else:
-            sentiment = 'neutral'
 
-        # NEW: Get real-time insights from the insights agent
-        insights = []
-        try:
-            # Convert recent transcript to TranscriptLine objects for context
-            context_lines = []
-            for item in recent_transcript[-5:]:  # Last 5 lines of context
-                context_lines.append(TranscriptLine(
-                    speaker=item.get("speaker", "Unknown"),
-                    text=item.get("text", ""),
-                    timestamp=item.get("timestamp", datetime.now().isoformat())
-                ))
+@app.get("/api/admin/loop-lag", dependencies=[Depends(require_admin)])
+async def get_loop_lag(limit: int = 50):
+    """Event-loop lag percentiles and the call sites that blocked the loop, with their stacks"""
+    return loop_monitor.snapshot(limit=limit)
 
-            # Create current line
-            current_line = TranscriptLine(
-                speaker=speaker,
-                text=text,
-                timestamp=datetime.now()
-            )
-
-            # Get real-time insights (collect all from async generator)
-            async for insight_chunk in realtime_insights_agent.analyze_live_transcript(
-                current_line,
-                context_lines
-            ):
-                if insight_chunk.get("type") == "insight_complete":
-                    insights.append(insight_chunk.get("insight", ""))
-                    print(f"🤖 Real-time insight: {insight_chunk.get('insight')}")
 
-        except Exception as insight_error:
-            print(f"⚠️ Real-time insights error (non-critical): {insight_error}")
-            # Don't fail the whole request if insights fail
+@app.post("/api/analyze-emotion")
+async def analyze_emotion_text(data: dict, request: Request):
+    """
+    Analyze emotion from text using Claude AI (for browser speech recognition) WITH REAL-TIME INSIGHTS
 
-        return {
+    With a `user_profile` the response also carries `personalized_explanation`
+    (what /api/personalized-assistant/analyze returns), from the same call.
+    Results not ready within `deadline_ms` (default REALTIME_DEADLINE_MS) are
+    dropped and `deadline_exceeded` is returned instead.
+
+    Utterances of one session (`session_id` or X-Session-Id) arriving within
+    UTTERANCE_DEBOUNCE_MS are analyzed together; the older requests of such a
+    burst get `superseded` instead of a stale result. Requests without a session
+    are analyzed on their own (clients behind one address must not be merged).
+    """
+    text = data.get("text", "")
+    speaker = data.get("speaker", "Speaker")
+    recent_transcript = data.get("recent_transcript", [])  # Get context from frontend
+    user_profile = data.get("user_profile")
+    deadline_ms = data.get("deadline_ms")
+
+    if not text:
+        return {"error": "No text provided"}
+
+    session_id = body_session_id(data) or request.headers.get("x-session-id")
+    if UTTERANCE_DEBOUNCE_MS <= 0 or not session_id:
+        return await _analyze_utterance(speaker, text, recent_transcript, user_profile, deadline_ms, session_id)
+
+    return await utterance_debouncer.submit(
+        session_id, speaker, text,
+        lambda merged_speaker, merged_text, context: _analyze_utterance(
+            merged_speaker, merged_text, recent_transcript + context, user_profile, deadline_ms, session_id
+        )
+    )
+
+
+async def _analyze_utterance(speaker: str, text: str, recent_transcript: List[dict], user_profile, deadline_ms, session_id: Optional[str] = None) -> dict:
+    """Emotion, insights and (with a user profile) explanation for one utterance, in the frontend's format"""
+    try:
+        # Real-time: an answer arriving after the deadline is dropped, not shown late
+        with deadline_scope(deadline_ms):
+            if UTTERANCE_FUSED_ANALYSIS and not emotion_agent.demo_mode:
+                logger.debug("🧠 Analyzing utterance for: %s: %s...", speaker, text[:50])
+                analysis = await utterance_analyzer_agent.analyze_utterance(speaker, text, recent_transcript, user_profile, session_id=session_id)
+                emotion_result, explanation = analysis["emotion"], analysis["explanation"]
+                insights = [analysis["insight"]] if analysis["insight"] else []
+                if insights:
+                    logger.info("🤖 Real-time insight: %s", insights[0], extra={"event": "insight"})
+            else:
+                emotion_result, insights = await _analyze_emotion_separately(speaker, text, recent_transcript, session_id)
+                explanation = await personalized_assistant_agent.analyze_for_user(
+                    user_profile=user_profile,
+                    recent_transcript=recent_transcript + [{"speaker": speaker, "text": text}],
+                    latest_text=text
+                ) if user_profile else None
+
+        logger.info("✅ Emotion result: %s", emotion_result, extra={"event": "emotion"})
+
+        # Transform to frontend-expected format
+        primary_emotion = emotion_result.get('primary_emotion', 'neutral')
+        happiness_level, sentiment = emotion_to_happiness(primary_emotion)
+
+        response = {
             'sentiment': sentiment,
             'confidence': emotion_result.get('confidence', 0.8),
             'happiness_level': happiness_level,
@@ -465,20 +864,72 @@ async def analyze_emotion_text(data: dict):
             'mood_summary': f"{primary_emotion} ({emotion_result.get('happiness_emoji', '😐')})",
             'realtime_insights': insights  # NEW: Add real-time insights to response
         }
+        if user_profile:
+            response['personalized_explanation'] = explanation
+        return response
 
+    except DeadlineExceeded as e:
+        logger.info("⏱️ Emotion analysis dropped: %s", e)
+        return {"error": "deadline exceeded", "deadline_exceeded": True}
     except Exception as e:
-        print(f"❌ Emotion analysis error: {e}")
+        logger.error("❌ Emotion analysis error: %s", e)
         return {"error": str(e)}
 
 
+async def _analyze_emotion_separately(speaker: str, text: str, recent_transcript: List[dict], session_id: Optional[str] = None):
+    """Emotion and real-time insights as two Claude calls (UTTERANCE_FUSED_ANALYSIS=false or demo mode)"""
+    logger.debug("🧠 Analyzing emotion + real-time insights for: %s: %s...", speaker, text[:50])
+
+    # Use the emotion agent to analyze
+    emotion_result = await emotion_agent.analyze_single_message(speaker, text, session_id=session_id)
+
+    # Get real-time insights from the insights agent
+    insights = []
+    try:
+        # Convert recent transcript to TranscriptLine objects for context
+        context_lines = []
+        for item in recent_transcript[-5:]:  # Last 5 lines of context
+            context_lines.append(TranscriptLine(
+                speaker=item.get("speaker", "Unknown"),
+                text=item.get("text", ""),
+                timestamp=item.get("timestamp", datetime.now().isoformat())
+            ))
+
+        # Create current line
+        current_line = TranscriptLine(
+            speaker=speaker,
+            text=text,
+            timestamp=datetime.now()
+        )
+
+        # Get real-time insights (collect all from async generator)
+        async for insight_chunk in realtime_insights_agent.analyze_live_transcript(
+            current_line,
+            context_lines,
+            session_id=session_id
+        ):
+            if insight_chunk.get("type") == "insight_complete":
+                insights.append(insight_chunk.get("insight", ""))
+                logger.info("🤖 Real-time insight: %s", insight_chunk.get('insight'), extra={"event": "insight"})
+
+    except Exception as insight_error:
+        logger.warning("⚠️ Real-time insights error (non-critical): %s", insight_error)
+        # Don't fail the whole request if insights fail
+
+    return emotion_result, insights
+
+
 @app.post("/api/generate-action-items")
-async def generate_action_items(request: dict):
+async def generate_action_items(data: dict, request: Request):
     """
     Generate action items from transcript lines, checking existing ones to avoid duplicates
+
+    Tokens are booked to the session named by `session_id` or X-Session-Id.
     """
     try:
-        transcript_data = request.get("transcript", [])
-        existing_action_items = request.get("existing_action_items", [])
+        transcript_data = data.get("transcript", [])
+        existing_action_items = data.get("existing_action_items", [])
+        session_id = body_session_id(data) or request.headers.get("x-session-id")
         
         if not transcript_data:
             return {"action_items": []}
@@ -504,17 +955,17 @@ async def generate_action_items(request: dict):
         
         # Use the task generator agent to extract action items with existing context
         action_items = await task_generator_agent.extract_action_items_with_context(
-            transcript_lines, existing_items
+            transcript_lines, existing_items, session_id=session_id
         )
         
-        print(f"✅ Generated {len(action_items)} action items from {len(transcript_lines)} transcript lines (considering {len(existing_items)} existing)")
+        logger.info("✅ Generated %s action items from %s transcript lines (considering %s existing)", len(action_items), len(transcript_lines), len(existing_items))
         
         return {
             "action_items": [item.dict() for item in action_items]
         }
         
     except Exception as e:
-        print(f"❌ Action item generation error: {e}")
+        logger.error("❌ Action item generation error: %s", e)
         return {"error": str(e)}
 
 
@@ -538,17 +989,41 @@ async def generate_jira_description(request: dict):
         )
         
         # Generate Jira description using task generator
-        jira_description = await task_generator_agent.generate_jira_description(action_item)
+        jira_description = await task_generator_agent.generate_jira_description(action_item, session_id=body_session_id(request))
         
-        print(f"✅ Generated Jira description for: {action_item.text}")
+        logger.info("✅ Generated Jira description for: %s", action_item.text)
         
         return jira_description
         
     except Exception as e:
-        print(f"❌ Jira description generation error: {e}")
+        logger.error("❌ Jira description generation error: %s", e)
         return {"error": str(e)}
 
 
+@app.post("/api/generate-jira-description/stream")
+async def generate_jira_description_stream(request: dict):
+    """
+    Generate a Jira description for an action item, streamed as Server-Sent Events
+
+    Events: "token", "partial", "field" (summary, description), then "complete"
+    with the same body as /api/generate-jira-description.
+    """
+    action_item_data = request.get("action_item", {})
+    if not action_item_data:
+        return {"error": "No action item data provided"}
+
+    action_item = ActionItem(
+        text=action_item_data.get("text", ""),
+        assignee=action_item_data.get("assignee"),
+        priority=action_item_data.get("priority", "medium"),
+        confidence=action_item_data.get("confidence", 0.8)
+    )
+    return StreamingResponse(
+        stream_result_events(task_generator_agent.stream_jira_description(action_item, session_id=body_session_id(request))),
+        media_type="text/event-stream"
+    )
+
+
 @app.post("/api/create-jira-ticket")
 async def create_jira_ticket(request: dict):
     """
@@ -569,20 +1044,62 @@ async def create_jira_ticket(request: dict):
         )
         
         # Generate Jira description using task generator
-        jira_description = await task_generator_agent.generate_jira_description(action_item)
+        jira_description = await task_generator_agent.generate_jira_description(action_item, session_id=body_session_id(request))
         
         # Create the Jira ticket
         ticket_result = await jira_agent.create_ticket(action_item, jira_description)
         
-        print(f"✅ Jira ticket creation result: {ticket_result}")
+        logger.info("✅ Jira ticket creation result: %s", ticket_result)
         
         return ticket_result
         
     except Exception as e:
-        print(f"❌ Jira ticket creation error: {e}")
+        logger.error("❌ Jira ticket creation error: %s", e)
         return {"error": str(e)}
 
 
+async def batch_media_events(transcript_lines: List[TranscriptLine], include_summary: bool = False):
+    """
+    Emotion per line, action items per window and (optionally) a summary for an
+    uploaded file, requested together so they share batch jobs (use inside batch_scope)
+
+    Yields:
+        "emotion" {index, emotion, emotion_score}, "action_items" (all found so far,
+        deduplicated) and "summary" events as results come back, then "complete"
+    """
+    async def line_emotion(index: int, line: TranscriptLine):
+        return "emotion", index, await emotion_agent.analyze_single_message("Speaker", line.text)
+
+    async def window_action_items(start: int):
+        return "action_items", start, await task_generator_agent.extract_action_items_with_context(
+            transcript_lines[start:start + MEDIA_BATCH_ACTION_WINDOW_LINES], [], priority=BATCH
+        )
+
+    async def summary():
+        return "summary", 0, await summarizer_agent.generate_summary(transcript_lines, [])
+
+    requests = [line_emotion(i, line) for i, line in enumerate(transcript_lines)]
+    requests += [window_action_items(start) for start in range(0, len(transcript_lines), MEDIA_BATCH_ACTION_WINDOW_LINES)]
+    if include_summary:
+        requests.append(summary())
+
+    found: Dict[str, ActionItem] = {}
+    for next_result in asyncio.as_completed(requests):
+        kind, index, result = await next_result
+        if kind == "emotion":
+            yield {"type": "emotion", "index": index, "emotion": result.get("primary_emotion"), "emotion_score": result.get("confidence")}
+        elif kind == "action_items":
+            for item in result:
+                found.setdefault(" ".join(item.text.lower().split()), item)
+            yield {
+                "type": "action_items",
+                "items": [item.dict() for item in found.values()]
+            }
+        else:
+            yield {"type": "summary", "summary": result}
+    yield {"type": "complete", "message": f"Processed {len(transcript_lines)} lines"}
+
+
 @app.post("/api/process-media-stream")
 async def process_media_stream(file: UploadFile = File(...)):
     """
@@ -592,15 +1109,17 @@ async def process_media_stream(file: UploadFile = File(...)):
     async def generate_stream():
         tmp_path = None
         audio_path = None
+        trace = tracer.start("media.stream", f"media-{uuid.uuid4().hex[:8]}")
         
         try:
-            print(f"📹 Processing media file: {file.filename}")
+            logger.info("📹 Processing media file: %s", file.filename)
             
             # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-                content = await file.read()
-                tmp_file.write(content)
-                tmp_path = tmp_file.name
+            with trace.span("upload"):
+                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
+                    content = await file.read()
+                    tmp_file.write(content)
+                    tmp_path = tmp_file.name
             
             # Determine if it's video or audio
             is_video = file.content_type and 'video' in file.content_type or \
@@ -610,12 +1129,13 @@ async def process_media_stream(file: UploadFile = File(...)):
             
             # If it's a video, extract audio using ffmpeg
             if is_video:
-                print("🎬 Video detected - extracting audio...")
+                logger.info("🎬 Video detected - extracting audio...")
                 yield f"data: {json.dumps({'type': 'status', 'message': 'Extracting audio from video...'})}\n\n"
                 
                 audio_path = tmp_path.replace(os.path.splitext(tmp_path)[1], '.wav')
                 cmd = ['ffmpeg', '-i', tmp_path, '-vn', '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1', audio_path, '-y']
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+                with trace.span("ffmpeg"):
+                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
                 
                 if result.returncode != 0:
                     yield f"data: {json.dumps({'type': 'error', 'message': f'ffmpeg error: {result.stderr}'})}\n\n"
@@ -624,16 +1144,32 @@ async def process_media_stream(file: UploadFile = File(...)):
             # Transcribe
             yield f"data: {json.dumps({'type': 'status', 'message': 'Transcribing audio...'})}\n\n"
             
-            transcript_lines = await listener_agent.transcribe_file(audio_path)
+            with trace.span("transcribe_file"):
+                await agent_registry.ensure("listener")
+                transcript_lines = await listener_agent.transcribe_file(audio_path)
             
             if not transcript_lines:
                 yield f"data: {json.dumps({'type': 'error', 'message': 'No speech detected'})}\n\n"
                 return
             
+            # Offline mode: analysis goes into batch jobs, results streamed back as they finish
+            if LLM_BATCH_MODE:
+                async with batch_scope() as batch:
+                    if batch is not None:
+                        yield f"data: {json.dumps({'type': 'status', 'message': 'Analyzing in batch mode...'})}\n\n"
+                        for line in transcript_lines:
+                            timestamp_str = line.timestamp.isoformat() if hasattr(line.timestamp, 'isoformat') else str(line.timestamp)
+                            yield sse_event({'type': 'transcript', 'line': {'speaker': line.speaker or 'Unknown', 'text': line.text, 'timestamp': timestamp_str, 'emotion': None, 'emotion_score': None}})
+                        with trace.span("batch_analysis"):
+                            async for event in batch_media_events(transcript_lines, include_summary=True):
+                                yield sse_event(event)
+                        return
+
             # Stream each transcript line
             for i, line in enumerate(transcript_lines):
                 # Analyze emotion
-                emotion_result = await emotion_agent.analyze_single_message("Speaker", line.text)
+                with trace.span("emotion", line=i):
+                    emotion_result = await emotion_agent.analyze_single_message("Speaker", line.text)
                 if emotion_result and emotion_result.get("emotion"):
                     line.emotion = emotion_result.get("emotion")
                     line.emotion_score = emotion_result.get("confidence", 0.5)
@@ -644,9 +1180,10 @@ async def process_media_stream(file: UploadFile = File(...)):
                 
                 # Generate action items every 3 lines
                 if (i + 1) % 3 == 0 or i == len(transcript_lines) - 1:
-                    action_items = await task_generator_agent.extract_action_items_with_context(
-                        transcript_lines[:i+1], []
-                    )
+                    with trace.span("action_items", line=i):
+                        action_items = await task_generator_agent.extract_action_items_with_context(
+                            transcript_lines[:i+1], [], priority=BATCH
+                        )
                     if action_items:
                         yield f"data: {json.dumps({'type': 'action_items', 'items': [{'text': item.text, 'priority': item.priority, 'assignee': item.assignee, 'confidence': item.confidence} for item in action_items]})}\n\n"
             
@@ -654,10 +1191,11 @@ async def process_media_stream(file: UploadFile = File(...)):
             yield f"data: {json.dumps({'type': 'complete', 'message': f'Processed {len(transcript_lines)} lines'})}\n\n"
             
         except Exception as e:
-            print(f"❌ Stream processing error: {e}")
+            logger.error("❌ Stream processing error: %s", e)
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
         
         finally:
+            trace.finish(filename=file.filename)
             # Clean up
             if tmp_path and os.path.exists(tmp_path):
                 os.remove(tmp_path)
@@ -676,14 +1214,16 @@ async def process_media_file(file: UploadFile = File(...)):
     3. Analyze emotions in the transcript
     4. Generate action items
     """
+    trace = tracer.start("media.file", f"media-{uuid.uuid4().hex[:8]}")
     try:
-        print(f"📹 Processing media file: {file.filename}")
+        logger.info("📹 Processing media file: %s", file.filename)
         
         # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
+        with trace.span("upload"):
+            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
+                content = await file.read()
+                tmp_file.write(content)
+                tmp_path = tmp_file.name
         
         try:
             # Determine if it's video or audio
@@ -694,24 +1234,27 @@ async def process_media_file(file: UploadFile = File(...)):
             
             # If it's a video, extract audio using ffmpeg
             if is_video:
-                print("🎬 Video detected - extracting audio...")
+                logger.info("🎬 Video detected - extracting audio...")
                 audio_path = tmp_path.replace(os.path.splitext(tmp_path)[1], '.wav')
                 
                 # Use ffmpeg to extract audio
                 cmd = ['ffmpeg', '-i', tmp_path, '-vn', '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1', audio_path, '-y']
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+                with trace.span("ffmpeg"):
+                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
                 
                 if result.returncode != 0:
                     raise Exception(f"ffmpeg error: {result.stderr}")
             
             # Read audio file
-            print("🎙️ Reading audio file...")
+            logger.info("🎙️ Reading audio file...")
             with open(audio_path, 'rb') as f:
                 audio_data = f.read()
             
             # Use listener agent to transcribe
-            print("🔄 Transcribing audio...")
-            transcript_lines = await listener_agent.transcribe_file(audio_path)
+            logger.info("🔄 Transcribing audio...")
+            with trace.span("transcribe_file"):
+                await agent_registry.ensure("listener")
+                transcript_lines = await listener_agent.transcribe_file(audio_path)
             
             if not transcript_lines:
                 return {
@@ -720,21 +1263,40 @@ async def process_media_file(file: UploadFile = File(...)):
                     "transcript": []
                 }
             
-            # Analyze emotions for each line
-            print("😊 Analyzing emotions...")
-            for line in transcript_lines:
-                emotion_result = await emotion_agent.analyze_single_message("Speaker", line.text)
-                if emotion_result and emotion_result.get("emotion"):
-                    line.emotion = emotion_result.get("emotion")
-                    line.emotion_score = emotion_result.get("confidence", 0.5)
-            
-            # Generate action items from the transcript
-            print("📋 Generating action items...")
-            action_items = await task_generator_agent.extract_action_items_with_context(
-                transcript_lines, []
-            )
+            line_emotions = [(getattr(line, 'emotion', None), getattr(line, 'emotion_score', None)) for line in transcript_lines]
+            action_items = None
+
+            # Offline mode: every line's emotion and the action items go into batch jobs
+            if LLM_BATCH_MODE:
+                async with batch_scope() as batch:
+                    if batch is not None:
+                        logger.info("📦 Analyzing emotions and action items in batch mode...")
+                        with trace.span("batch_analysis"):
+                            async for event in batch_media_events(transcript_lines):
+                                if event["type"] == "emotion":
+                                    line_emotions[event["index"]] = (event["emotion"], event["emotion_score"])
+                                elif event["type"] == "action_items":
+                                    action_items = [ActionItem(**item) for item in event["items"]]
+                        action_items = action_items or []
+
+            if action_items is None:
+                # Analyze emotions for each line
+                logger.info("😊 Analyzing emotions...")
+                for i, line in enumerate(transcript_lines):
+                    with trace.span("emotion", line=i):
+                        emotion_result = await emotion_agent.analyze_single_message("Speaker", line.text)
+                    if emotion_result and emotion_result.get("emotion"):
+                        line.emotion = emotion_result.get("emotion")
+                        line.emotion_score = emotion_result.get("confidence", 0.5)
+
+                # Generate action items from the transcript
+                logger.info("📋 Generating action items...")
+                with trace.span("action_items"):
+                    action_items = await task_generator_agent.extract_action_items_with_context(
+                        transcript_lines, [], priority=BATCH
+                    )
             
-            print(f"✅ Media processing complete: {len(transcript_lines)} lines, {len(action_items)} action items")
+            logger.info("✅ Media processing complete: %s lines, %s action items", len(transcript_lines), len(action_items))
             
             return {
                 "success": True,
@@ -745,10 +1307,10 @@ async def process_media_file(file: UploadFile = File(...)):
                         "speaker": line.speaker or "Unknown",
                         "text": line.text,
                         "timestamp": line.timestamp,
-                        "emotion": getattr(line, 'emotion', None),
-                        "emotion_score": getattr(line, 'emotion_score', None)
+                        "emotion": emotion,
+                        "emotion_score": emotion_score
                     }
-                    for line in transcript_lines
+                    for line, (emotion, emotion_score) in zip(transcript_lines, line_emotions)
                 ],
                 "action_items": [
                     {
@@ -762,6 +1324,7 @@ async def process_media_file(file: UploadFile = File(...)):
             }
             
         finally:
+            trace.finish(filename=file.filename)
             # Clean up temporary files
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
@@ -769,7 +1332,7 @@ async def process_media_file(file: UploadFile = File(...)):
                 os.remove(audio_path)
                 
     except Exception as e:
-        print(f"❌ Media processing error: {e}")
+        logger.error("❌ Media processing error: %s", e)
         return {
             "success": False,
             "error": str(e),
@@ -787,61 +1350,79 @@ async def get_jira_project_info():
         return project_info
 
     except Exception as e:
-        print(f"❌ Jira project info error: {e}")
+        logger.error("❌ Jira project info error: %s", e)
         return {"error": str(e)}
 
 
+def _qa_arguments(request: dict) -> dict:
+    """QAAgent.answer_question / stream_answer keyword arguments from a /api/qa/ask body"""
+    # Convert transcript data to TranscriptLine objects
+    transcript_lines = []
+    for item in request.get("transcript", []):
+        transcript_lines.append(TranscriptLine(
+            speaker=item.get("speaker", "Unknown"),
+            text=item.get("text", ""),
+            timestamp=item.get("timestamp", datetime.now().isoformat())
+        ))
+
+    # Convert action items data to ActionItem objects
+    action_items = []
+    for item in request.get("action_items", []):
+        action_items.append(ActionItem(
+            text=item.get("text", ""),
+            assignee=item.get("assignee"),
+            priority=item.get("priority", "medium"),
+            confidence=item.get("confidence", 0.8)
+        ))
+
+    return {
+        "question": request.get("question", ""),
+        "transcript": transcript_lines,
+        "action_items": action_items if action_items else None,
+        "summary": request.get("summary"),
+        "session_id": body_session_id(request)
+    }
+
+
 @app.post("/api/qa/ask")
 async def ask_question(request: dict):
     """
     Ask a question about meeting content using the Q&A Agent
     """
     try:
-        question = request.get("question", "")
-        session_id = request.get("session_id")
-        transcript_data = request.get("transcript", [])
-        action_items_data = request.get("action_items", [])
-        summary = request.get("summary")
-
-        if not question:
+        if not request.get("question", ""):
             return {"error": "No question provided"}
 
-        # Convert transcript data to TranscriptLine objects
-        transcript_lines = []
-        for item in transcript_data:
-            transcript_lines.append(TranscriptLine(
-                speaker=item.get("speaker", "Unknown"),
-                text=item.get("text", ""),
-                timestamp=item.get("timestamp", datetime.now().isoformat())
-            ))
-
-        # Convert action items data to ActionItem objects
-        action_items = []
-        for item in action_items_data:
-            action_items.append(ActionItem(
-                text=item.get("text", ""),
-                assignee=item.get("assignee"),
-                priority=item.get("priority", "medium"),
-                confidence=item.get("confidence", 0.8)
-            ))
-
         # Use Q&A agent to answer
-        result = await qa_agent.answer_question(
-            question=question,
-            transcript=transcript_lines,
-            action_items=action_items if action_items else None,
-            summary=summary
-        )
+        result = await qa_agent.answer_question(**_qa_arguments(request))
 
-        print(f"✅ Q&A: Answered question with {result.get('confidence', 0):.2f} confidence")
+        logger.info("✅ Q&A: Answered question with %.2f confidence", result.get('confidence', 0))
 
         return result
 
     except Exception as e:
-        print(f"❌ Q&A error: {e}")
+        logger.error("❌ Q&A error: %s", e)
         return {"error": str(e)}
 
 
+@app.post("/api/qa/ask/stream")
+async def ask_question_stream(request: dict):
+    """
+    Ask a question about meeting content, with the answer streamed as Server-Sent Events
+
+    Events: "token", "partial" (text appended to the answer), "field" (answer,
+    confidence, sources, relevant_speakers), then "complete" with the same body
+    as /api/qa/ask.
+    """
+    if not request.get("question", ""):
+        return {"error": "No question provided"}
+
+    return StreamingResponse(
+        stream_result_events(qa_agent.stream_answer(**_qa_arguments(request))),
+        media_type="text/event-stream"
+    )
+
+
 @app.post("/api/qa/search-topic")
 async def search_topic(request: dict):
     """
@@ -849,6 +1430,8 @@ async def search_topic(request: dict):
     """
     try:
         topic = request.get("topic", "")
+        session_id = request.get("session_id")
+        summarize = request.get("summarize", True)
         transcript_data = request.get("transcript", [])
 
         if not topic:
@@ -864,14 +1447,19 @@ async def search_topic(request: dict):
             ))
 
         # Search for topic
-        result = await qa_agent.search_topic(topic, transcript_lines)
+        result = await qa_agent.search_topic(
+            topic,
+            transcript_lines,
+            session_id=session_id,
+            summarize=summarize
+        )
 
-        print(f"✅ Q&A: Searched for topic '{topic}'")
+        logger.info("✅ Q&A: Searched for topic '%s'", topic)
 
         return result
 
     except Exception as e:
-        print(f"❌ Topic search error: {e}")
+        logger.error("❌ Topic search error: %s", e)
         return {"error": str(e)}
 
 
@@ -897,14 +1485,14 @@ async def compare_tasks(request: dict):
             ))
 
         # Analyze tasks
-        result = await qa_agent.compare_tasks(action_items)
+        result = await qa_agent.compare_tasks(action_items, session_id=body_session_id(request))
 
-        print(f"✅ Q&A: Compared {len(action_items)} tasks")
+        logger.info("✅ Q&A: Compared %s tasks", len(action_items))
 
         return result
 
     except Exception as e:
-        print(f"❌ Task comparison error: {e}")
+        logger.error("❌ Task comparison error: %s", e)
         return {"error": str(e)}
 
 
@@ -928,7 +1516,7 @@ async def analyze_for_personalized_help(request: dict):
             latest_text=latest_text
         )
 
-        print(f"✅ Personalized Assistant: Analysis complete")
+        logger.info("✅ Personalized Assistant: Analysis complete")
 
         return {
             "explanation": explanation,
@@ -936,7 +1524,7 @@ async def analyze_for_personalized_help(request: dict):
         }
 
     except Exception as e:
-        print(f"❌ Personalized assistant error: {e}")
+        logger.error("❌ Personalized assistant error: %s", e)
         return {"error": str(e), "explanation": None}
 
 
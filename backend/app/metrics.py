@@ -0,0 +1,315 @@
+"""
+Metrics - In-process Prometheus-style counters, gauges and latency histograms
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers sub-10ms local work up to slow batch transcription
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Common state for a labelled metric family"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. calls or tokens"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down
+
+    Either set/inc/dec it directly, or pass a collect callback that returns
+    the current value (or a {label_values_tuple: value} dict) at scrape time.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        collect: Optional[Callable] = None
+    ):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self._collect is not None:
+            try:
+                collected = self._collect()
+            except Exception as e:
+                logger.warning("⚠️ Metric %s collection failed: %s", self.name, e)
+                return
+            items = collected.items() if isinstance(collected, dict) else [((), collected)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in sorted(items):
+            key = key if isinstance(key, tuple) else (key,)
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies) in cumulative buckets"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * len(self.buckets) + [0.0, 0]
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += state[i]
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(state[-2])}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {state[-1]}"
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text format"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = (), collect: Optional[Callable] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, collect))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Shared registry served at /metrics
+registry = MetricsRegistry()
+
+agent_call_seconds = registry.histogram(
+    "agent_call_duration_seconds",
+    "Latency of agent method calls by outcome (ok, fallback, error, cancelled)",
+    ["agent", "method", "outcome"]
+)
+llm_calls = registry.counter("llm_calls_total", "Claude API calls", ["agent"])
+llm_tokens = registry.counter("llm_tokens_total", "Claude tokens by kind (input, output, cache_read_input, cache_creation_input)", ["agent", "kind"])
+stt_calls = registry.counter("stt_calls_total", "Speech-to-text provider calls", ["provider", "operation"])
+stt_audio_bytes = registry.counter("stt_audio_bytes_total", "Audio bytes sent to speech-to-text providers", ["provider"])
+websocket_messages = registry.counter("websocket_messages_total", "WebSocket messages", ["endpoint", "direction"])
+websocket_connections = registry.gauge("websocket_connections", "Open WebSocket connections", ["endpoint"])
+
+
+def _resident_memory_bytes() -> float:
+    """Current RSS from /proc, falling back to peak RSS where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Process gauges so load tests can read server CPU/RSS from /metrics
+registry.gauge("process_cpu_seconds_total", "User and system CPU time used by the server process", collect=time.process_time)
+registry.gauge("process_resident_memory_bytes", "Resident memory of the server process", collect=_resident_memory_bytes)
+
+
+# Outcome of the innermost @timed call in progress (a one-item list so helper tasks can update it)
+_call_outcome: ContextVar[Optional[List[str]]] = ContextVar("agent_call_outcome", default=None)
+
+
+def record_outcome(outcome: str):
+    """
+    Label the @timed call in progress with an outcome other than "ok".
+    Agents catch their own errors and return a fallback, so the decorator
+    can't tell a degraded answer from a good one without this.
+
+    Args:
+        outcome: "fallback" (local or degraded answer) or "error" (the call failed)
+    """
+    holder = _call_outcome.get()
+    if holder is not None:
+        holder[0] = outcome
+
+
+def timed(agent: str, method: Optional[str] = None):
+    """
+    Decorator recording agent_call_duration_seconds for an async method
+    (or async generator, timed until it is exhausted).
+    The outcome is "error" if it raised, "cancelled" if it was cancelled (or the
+    consumer of a generator stopped early, e.g. an SSE client went away), otherwise
+    whatever record_outcome set (default "ok").
+
+    Usage:
+        @timed("qa")
+        async def answer_question(self, ...): ...
+    """
+    def decorator(func):
+        name = method or func.__name__
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def gen_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                holder = ["ok"]
+                outer = _call_outcome.get()
+                _call_outcome.set(holder)
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                except (GeneratorExit, asyncio.CancelledError):
+                    holder[0] = "cancelled"
+                    raise
+                except BaseException:
+                    holder[0] = "error"
+                    raise
+                finally:
+                    # set, not reset: the consumer may resume the generator in another context
+                    _call_outcome.set(outer)
+                    agent_call_seconds.observe(time.perf_counter() - start, agent=agent, method=name, outcome=holder[0])
+            return gen_wrapper
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            holder = ["ok"]
+            token = _call_outcome.set(holder)
+            try:
+                return await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                holder[0] = "cancelled"
+                raise
+            except BaseException:
+                holder[0] = "error"
+                raise
+            finally:
+                _call_outcome.reset(token)
+                agent_call_seconds.observe(time.perf_counter() - start, agent=agent, method=name, outcome=holder[0])
+        return wrapper
+
+    return decorator
@@ -0,0 +1,236 @@
+"""
+Model Routing - Picks the cheapest sufficient tier (skip, local heuristic, fast or strong model) per utterance
+"""
+import logging
+import os
+import re
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.fallbacks import ACTION_CUE, DECISION_CUE, HIGH_PRIORITY_CUE, local_message_emotion
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "true").lower() == "true"
+# Model for dense technical utterances (the fast tier uses each agent's usual model)
+CLAUDE_STRONG_MODEL = os.getenv("CLAUDE_STRONG_MODEL", "claude-3-5-sonnet-20241022")
+# Short plain statements with no action/decision cue, where the local keyword heuristic finds a clear
+# emotion cue, are answered by that heuristic; everything else it can't read goes to a model
+ROUTE_LOCAL_MAX_WORDS = int(os.getenv("ROUTE_LOCAL_MAX_WORDS", "8"))
+# Long utterances with this share of jargon words go to the strong model
+ROUTE_STRONG_MIN_WORDS = int(os.getenv("ROUTE_STRONG_MIN_WORDS", "30"))
+ROUTE_STRONG_JARGON_DENSITY = float(os.getenv("ROUTE_STRONG_JARGON_DENSITY", "0.15"))
+# Recent routed calls per agent/tier kept for /api/model-routing
+ROUTE_STATS_WINDOW = int(os.getenv("ROUTE_STATS_WINDOW", "500"))
+
+SKIP, LOCAL, FAST, STRONG = "skip", "local", "fast", "strong"
+TIERS = (SKIP, LOCAL, FAST, STRONG)
+
+# Backchannel and filler: nothing to analyze beyond "neutral"
+FILLER_WORDS = frozenset(
+    "yeah yes yep yup no nope ok okay okey right sure uh huh um uhm hmm mhm mm hm ah oh so well alright "
+    "got it see bye hi hello hey uh-huh mm-hmm".split()
+)
+# Negation flips keyword cues ("not great", "never happy"), so the local heuristic can't be trusted
+_NEGATION = re.compile(r"\b(not|no|never|nothing|hardly|isn't|wasn't|aren't|don't|doesn't|didn't|can't|won't|couldn't|wouldn't)\b", re.IGNORECASE)
+TECH_TERMS = frozenset(
+    "api apis sdk backend frontend database schema query queries index latency throughput cache caching "
+    "deploy deployment pipeline kubernetes docker container cluster microservice microservices endpoint "
+    "endpoints server serverless runtime compiler refactor regression migration rollback repo branch merge "
+    "auth oauth token tokens encryption protocol async sync thread threads concurrency serialization "
+    "middleware framework library dependency dependencies config infra infrastructure load balancer "
+    "sharding replica replication webhook payload json yaml sql nosql graphql grpc websocket http https "
+    "algorithm model inference embedding embeddings vector tensor gpu cpu memory heap garbage bandwidth "
+    "kpi roi okr arr mrr churn ebitda p99 p95 sla slo".split()
+)
+_WORD = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.\-/]*")
+_QUESTION_START = re.compile(
+    r"^(who|what|when|where|why|how|which|can|could|would|should|is|are|do|does|did|will|have|has)\b",
+    re.IGNORECASE
+)
+
+route_decisions = registry.counter(
+    "model_route_decisions_total",
+    "Utterances by the tier they were routed to (skip, local, fast, strong)",
+    ["agent", "tier"]
+)
+route_latency = registry.histogram(
+    "model_route_latency_seconds",
+    "Time to analyze an utterance per routing tier",
+    ["agent", "tier"]
+)
+route_local_agreement = registry.counter(
+    "model_route_local_agreement_total",
+    "Model-tier answers by whether the local heuristic would have given the same primary emotion",
+    ["agent", "tier", "agreed"]
+)
+
+
+def _is_jargon(word: str) -> bool:
+    bare = word.strip(".-/")
+    if len(bare) < 2:
+        return False
+    if bare.isupper() and bare.isalpha() and bare not in ("OK", "I"):
+        return True  # Acronym
+    if any(c.isdigit() for c in bare) and any(c.isalpha() for c in bare):
+        return True  # v2, p99, S3
+    if any(c in bare for c in "_./") or re.search(r"[a-z][A-Z]", bare):
+        return True  # snake_case, file.py, camelCase
+    return bare.lower() in TECH_TERMS or len(bare) >= 13
+
+
+@dataclass
+class RouteDecision:
+    """Tier chosen for one utterance and the features it was chosen on"""
+    tier: str
+    reason: str
+    words: int = 0
+    jargon: List[str] = field(default_factory=list)
+    question: bool = False
+
+    @property
+    def jargon_density(self) -> float:
+        return len(self.jargon) / self.words if self.words else 0.0
+
+
+def classify_utterance(text: str, user_profile: Optional[Dict[str, Any]] = None) -> RouteDecision:
+    """
+    Choose the analysis tier for an utterance from local features only
+
+    Args:
+        text: The utterance
+        user_profile: Listener profile; any jargon then needs a model (to explain it)
+
+    Returns:
+        RouteDecision (tier is FAST for everything when MODEL_ROUTING is off)
+    """
+    words = _WORD.findall(text or "")
+    jargon = [word for word in words if _is_jargon(word)]
+    stripped = (text or "").strip()
+    question = stripped.endswith("?") or bool(_QUESTION_START.match(stripped))
+    decision = RouteDecision(tier=FAST, reason="default", words=len(words), jargon=jargon, question=question)
+
+    if not MODEL_ROUTING:
+        decision.reason = "routing disabled"
+    elif not words or all(word.strip(".-/").lower() in FILLER_WORDS for word in words):
+        decision.tier, decision.reason = SKIP, "filler"
+    elif len(words) >= ROUTE_STRONG_MIN_WORDS and decision.jargon_density >= ROUTE_STRONG_JARGON_DENSITY:
+        decision.tier, decision.reason = STRONG, "dense technical"
+    elif jargon:
+        decision.reason = "jargon" if user_profile else "technical"
+    elif question:
+        decision.reason = "question"
+    elif ACTION_CUE.search(stripped) or DECISION_CUE.search(stripped) or HIGH_PRIORITY_CUE.search(stripped):
+        decision.reason = "action or decision cue"
+    elif len(words) <= ROUTE_LOCAL_MAX_WORDS:
+        # Only when a keyword cue matched: "I am really upset about this" has none and needs a model
+        if not _NEGATION.search(stripped) and local_message_emotion(stripped)["primary_emotion"] != "neutral":
+            decision.tier, decision.reason = LOCAL, "short statement with emotion cue"
+        else:
+            decision.reason = "short statement without clear cue"
+
+    return decision
+
+
+def local_tier_emotion(decision: RouteDecision, text: str) -> Dict[str, Any]:
+    """Emotion for an utterance routed to SKIP (neutral) or LOCAL (keyword heuristic), in analyze_single_message's format"""
+    if decision.tier == SKIP:
+        return {
+            "primary_emotion": "neutral",
+            "happiness_emoji": "😐",
+            "energy_level": "medium",
+            "stress_level": "none",
+            "confidence": 0.6
+        }
+    emotion = local_message_emotion(text)
+    emotion.pop("degraded", None)  # Chosen on purpose, not a provider outage
+    return emotion
+
+
+class RouteStats:
+    """
+    Routing decisions and their outcomes per agent and tier
+    Features:
+    - Share of traffic, latency percentiles and mean confidence per tier
+    - For model tiers, how often the local heuristic agreed with the model
+      (high agreement means more traffic could be routed locally)
+    - Decisions are logged (event "model_route") and exported as metrics
+    """
+
+    def __init__(self, window: int = ROUTE_STATS_WINDOW):
+        self._lock = threading.Lock()
+        self._outcomes: Dict[Tuple[str, str], Deque[Tuple[float, Optional[float], Optional[bool]]]] = defaultdict(lambda: deque(maxlen=window))
+        self._totals: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def record(self, agent: str, decision: RouteDecision, seconds: float, text: str, emotion: Optional[Dict[str, Any]] = None):
+        """
+        Record a routed analysis
+
+        Args:
+            agent: Calling agent
+            decision: The routing decision
+            seconds: Time the analysis took
+            text: The utterance (to compare the model's answer with the local heuristic)
+            emotion: The resulting emotion, if any
+        """
+        confidence = (emotion or {}).get("confidence")
+        agreed = None
+        if decision.tier in (FAST, STRONG) and confidence and not emotion.get("degraded"):
+            agreed = local_message_emotion(text)["primary_emotion"] == emotion.get("primary_emotion")
+            route_local_agreement.inc(agent=agent, tier=decision.tier, agreed=str(agreed).lower())
+
+        route_decisions.inc(agent=agent, tier=decision.tier)
+        route_latency.observe(seconds, agent=agent, tier=decision.tier)
+        with self._lock:
+            self._outcomes[(agent, decision.tier)].append((seconds, confidence, agreed))
+            self._totals[(agent, decision.tier)] += 1
+
+        logger.debug(
+            "🧭 %s routed to %s (%s) in %.0fms", agent, decision.tier, decision.reason, seconds * 1000,
+            extra={
+                "event": "model_route",
+                "agent": agent,
+                "tier": decision.tier,
+                "reason": decision.reason,
+                "words": decision.words,
+                "jargon_density": round(decision.jargon_density, 3),
+                "question": decision.question,
+                "latency_ms": round(seconds * 1000, 1),
+                "confidence": confidence,
+                "local_agreed": agreed
+            }
+        )
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            outcomes = {key: list(values) for key, values in self._outcomes.items()}
+            totals = dict(self._totals)
+
+        result: Dict[str, Dict[str, Any]] = {}
+        for agent in sorted({agent for agent, _ in totals}):
+            agent_total = sum(count for (a, _), count in totals.items() if a == agent)
+            tiers = {}
+            for tier in TIERS:
+                recent = outcomes.get((agent, tier))
+                if not recent:
+                    continue
+                latencies = sorted(seconds for seconds, _, _ in recent)
+                confidences = [c for _, c, _ in recent if c is not None]
+                agreements = [a for _, _, a in recent if a is not None]
+                tiers[tier] = {
+                    "total": totals[(agent, tier)],
+                    "share": round(totals[(agent, tier)] / agent_total, 3),
+                    "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+                    "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                    "mean_confidence": round(sum(confidences) / len(confidences), 3) if confidences else None,
+                    "local_agreement_rate": round(sum(agreements) / len(agreements), 3) if agreements else None
+                }
+            result[agent] = {"total": agent_total, "tiers": tiers}
+        return result
+
+
+# Shared routing outcomes for /api/model-routing
+route_stats = RouteStats()
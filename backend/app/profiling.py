@@ -0,0 +1,289 @@
+"""
+Profiling - On-demand sampling CPU profiler with flame-graph (folded stacks) output
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+# Set per request (X-Profile-Tag header) and per WebSocket session ("session:<id>")
+profile_tag: ContextVar[Optional[str]] = ContextVar("profile_tag", default=None)
+
+# Tagged tasks, readable from the sampler thread (Task contexts aren't before 3.12)
+_task_tags: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+_factory_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_BACKEND_DIR = os.path.dirname(_APP_DIR)
+
+
+class ProfilerBusyError(RuntimeError):
+    """Another profiling run is already in progress"""
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop):
+    """Make tasks created from a tagged context inherit the tag"""
+    if loop in _factory_loops:
+        return
+    previous = loop.get_task_factory()
+
+    def factory(loop, coro, **kwargs):
+        task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+        context = kwargs.get("context")
+        tag = context.get(profile_tag) if context is not None else profile_tag.get()
+        if tag is not None:
+            _task_tags[task] = tag
+        return task
+
+    loop.set_task_factory(factory)
+    _factory_loops.add(loop)
+
+
+def set_profile_tag(tag: str):
+    """
+    Tag the current task, and tasks it goes on to create, for tagged profiling runs
+
+    Args:
+        tag: Request tag (X-Profile-Tag) or "session:<id>"
+    """
+    profile_tag.set(tag)
+    task = asyncio.current_task()
+    if task is not None:
+        _task_tags[task] = tag
+        _install_task_factory(task.get_loop())
+
+
+def loop_task_tag(loop: asyncio.AbstractEventLoop) -> Optional[str]:
+    """Tag of the task currently running on `loop`; safe to call from another thread"""
+    task = asyncio.current_task(loop)
+    return _task_tags.get(task) if task is not None else None
+
+
+def _frame_label(code, filename: str) -> str:
+    return f"{code.co_name} ({os.path.relpath(filename, _BACKEND_DIR)}:{code.co_firstlineno})"
+
+
+def _fold(frame, app_only: bool) -> Optional[str]:
+    """
+    Root-to-leaf "a;b;c" stack for one thread
+
+    With app_only, frames outside app/ are dropped except the library call the
+    deepest app frame is waiting on, shown as [module:function]. Returns None
+    when the stack has no app frames (the loop is idle or in framework code).
+    """
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+
+    labels = []
+    library_call = None
+    for f in frames:
+        filename = f.f_code.co_filename
+        if filename.startswith(_APP_DIR):
+            labels.append(_frame_label(f.f_code, filename))
+            library_call = None
+        elif not app_only:
+            labels.append(_frame_label(f.f_code, filename) if filename.startswith(_BACKEND_DIR) else f"{f.f_globals.get('__name__', '?')}:{f.f_code.co_name}")
+        elif labels and library_call is None:
+            library_call = f"[{f.f_globals.get('__name__', '?')}:{f.f_code.co_name}]"
+
+    if app_only and not labels:
+        return None
+    if library_call:
+        labels.append(library_call)
+    return ";".join(labels)
+
+
+@dataclass
+class ProfileRun:
+    """One profiling window and the samples collected in it"""
+    seconds: float
+    interval: float
+    tag: Optional[str] = None
+    app_only: bool = True
+    all_threads: bool = False
+    single_request: bool = False
+    started_at: float = field(default_factory=time.time)
+    ended_at: Optional[float] = None
+    samples: int = 0
+    idle_samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def folded(self) -> str:
+        """Brendan Gregg folded-stack format (flamegraph.pl, speedscope, inferno)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 20) -> List[Dict]:
+        """Functions by self time (leaf of the stack) and total time (anywhere on it)"""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        busy = max(1, sum(self.stacks.values()))
+        return [
+            {
+                "function": function,
+                "self_pct": round(100 * self_counts[function] / busy, 1),
+                "total_pct": round(100 * total / busy, 1)
+            }
+            for function, total in sorted(total_counts.items(), key=lambda item: (-self_counts[item[0]], -item[1]))[:limit]
+        ]
+
+    def summary(self) -> Dict:
+        return {
+            "tag": self.tag,
+            "seconds": round((self.ended_at or time.time()) - self.started_at, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "busy_pct": round(100 * (self.samples - self.idle_samples) / self.samples, 1) if self.samples else 0.0,
+            "top": self.top_functions(),
+            "stacks": dict(self.stacks.most_common())
+        }
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler for the running server
+    Features:
+    - A background thread samples the event loop thread every PROFILER_INTERVAL_MS
+    - Whole-server runs for N seconds, or only samples taken while a tagged
+      request's or session's task is running
+    - Folded-stack output trimmed to frames in app/ (agents and app/main.py)
+    - One run at a time, capped at PROFILER_MAX_SECONDS
+    """
+
+    def __init__(self, interval_ms: float = PROFILER_INTERVAL_MS, max_seconds: float = PROFILER_MAX_SECONDS):
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._run: Optional[ProfileRun] = None
+
+    @property
+    def active(self) -> Optional[ProfileRun]:
+        return self._run
+
+    def start(
+        self,
+        seconds: float,
+        tag: Optional[str] = None,
+        app_only: bool = True,
+        all_threads: bool = False,
+        interval_ms: Optional[float] = None,
+        single_request: bool = False
+    ) -> ProfileRun:
+        """
+        Begin sampling; must be called from the event loop thread
+
+        Args:
+            seconds: Run length (capped at PROFILER_MAX_SECONDS)
+            tag: Only sample while a task carrying this profile_tag is running
+            app_only: Trim stacks to frames in app/
+            all_threads: Also sample executor and other threads (untagged runs only)
+            interval_ms: Sampling interval override
+            single_request: End the run when the first request tagged `tag` completes
+
+        Raises:
+            ProfilerBusyError: if a run is already in progress
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._run is not None:
+                raise ProfilerBusyError("A profiling run is already in progress")
+            run = ProfileRun(
+                seconds=min(seconds, self.max_seconds),
+                interval=max(0.001, (interval_ms / 1000) if interval_ms else self.interval),
+                tag=tag,
+                app_only=app_only,
+                all_threads=all_threads,
+                single_request=single_request and tag is not None
+            )
+            self._run = run
+
+        threading.Thread(
+            target=self._sample_loop,
+            args=(run, loop, threading.get_ident()),
+            name="profiler",
+            daemon=True
+        ).start()
+        logger.info("🔬 Profiling started for %ss (tag=%s, interval=%.1fms)", run.seconds, tag, run.interval * 1000)
+        return run
+
+    def stop(self):
+        """End the active run early"""
+        run = self._run
+        if run is not None:
+            run.done.set()
+
+    def request_finished(self, tag: str, started_at: float):
+        """Called when a tagged request completes; ends single-request runs for that tag"""
+        run = self._run
+        # Requests already in flight when the run began don't count as "the" request
+        if run is not None and run.single_request and run.tag == tag and started_at >= run.started_at:
+            run.done.set()
+
+    async def profile(self, seconds: float, **kwargs) -> ProfileRun:
+        """Run for `seconds` (or until stopped) and return the finished run"""
+        run = self.start(seconds, **kwargs)
+        await asyncio.get_running_loop().run_in_executor(None, run.done.wait, run.seconds + 5)
+        return run
+
+    def _sample_loop(self, run: ProfileRun, loop: asyncio.AbstractEventLoop, loop_thread: int):
+        own_thread = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        deadline = time.monotonic() + run.seconds
+        # With the default 5ms GIL switch interval the sampler mostly gets the GIL
+        # when the loop goes idle, skewing samples towards select(); shorten it for the run
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, run.interval / 10))
+        try:
+            while not run.done.wait(run.interval) and time.monotonic() < deadline:
+                if run.tag is not None and loop_task_tag(loop) != run.tag:
+                    continue
+                frames = sys._current_frames()
+                run.samples += 1
+
+                stack = _fold(frames.get(loop_thread), run.app_only)
+                if stack:
+                    run.stacks[stack] += 1
+                else:
+                    run.idle_samples += 1
+
+                if run.all_threads and run.tag is None:
+                    for ident, frame in frames.items():
+                        if ident in (loop_thread, own_thread):
+                            continue
+                        stack = _fold(frame, run.app_only)
+                        if stack:
+                            run.stacks[f"[thread {thread_names.get(ident, ident)}];{stack}"] += 1
+        except Exception as e:
+            logger.exception("❌ Profiler sampling failed: %s", e)
+        finally:
+            sys.setswitchinterval(switch_interval)
+            run.ended_at = time.time()
+            run.done.set()
+            with self._lock:
+                self._run = None
+            logger.info("🔬 Profiling finished: %s samples, %s idle", run.samples, run.idle_samples)
+
+
+# Shared profiler used by the admin endpoint
+profiler = SamplingProfiler()
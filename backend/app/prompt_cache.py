@@ -0,0 +1,57 @@
+"""
+Prompt Caching - Marks stable prompt prefixes as cacheable with Anthropic prompt caching
+"""
+import functools
+import os
+from typing import List, Optional, Union
+
+from app.tokens import count_tokens
+
+PROMPT_CACHING_ENABLED = os.getenv("PROMPT_CACHING", "true").lower() == "true"
+# Shortest prefix the API will cache (0 = the model's documented minimum)
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "0"))
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def cache_min_tokens(model: Optional[str]) -> int:
+    """Minimum cacheable prefix for a model; shorter prefixes are silently not cached"""
+    if PROMPT_CACHE_MIN_TOKENS:
+        return PROMPT_CACHE_MIN_TOKENS
+    return 2048 if model and "haiku" in model else 1024
+
+
+@functools.lru_cache(maxsize=256)
+def _static_tokens(text: str) -> int:
+    # System prompts and instructions repeat on every call
+    return count_tokens(text)
+
+
+def cached_system(text: str, model: Optional[str]) -> Union[str, List[dict]]:
+    """
+    System prompt with a cache breakpoint
+
+    Returns the plain string when caching is disabled, or when the prompt is
+    too short for the model to cache, so requests are unchanged.
+    """
+    if not PROMPT_CACHING_ENABLED or _static_tokens(text) < cache_min_tokens(model):
+        return text
+    return [{"type": "text", "text": text, "cache_control": CACHE_CONTROL}]
+
+
+def cached_user_content(prefix: str, suffix: str, model: Optional[str], system: str = "") -> Union[str, List[dict]]:
+    """
+    User message split into a cacheable stable prefix and a per-request suffix
+
+    Args:
+        prefix: Context that repeats across calls (instructions, transcript so far)
+        suffix: The part that changes every call (question, new line)
+        model: Model the request goes to (decides the minimum cacheable length)
+        system: System prompt sent before it, which counts toward the cached prefix
+    """
+    if not PROMPT_CACHING_ENABLED or _static_tokens(system) + count_tokens(prefix) < cache_min_tokens(model):
+        return f"{prefix}\n\n{suffix}"
+    return [
+        {"type": "text", "text": prefix, "cache_control": CACHE_CONTROL},
+        {"type": "text", "text": suffix}
+    ]
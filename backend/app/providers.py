@@ -0,0 +1,229 @@
+"""
+Providers - Pluggable LLM, speech-to-text and streaming speech-to-text backends
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, ContextManager, Optional, Protocol
+
+from app.batch_mode import LLM_BATCH_BASE_URL, current_batch
+from app.circuit_breaker import circuit_breakers
+from app.hedging import current_deadline, hedged_call
+from app.llm_scheduler import STANDARD, estimate_input_tokens, llm_scheduler
+from app.usage_ledger import usage_ledger
+
+logger = logging.getLogger(__name__)
+
+# "anthropic" (default) or "simulated"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "anthropic").lower()
+# "" (listener picks Whisper/AssemblyAI/local as before) or "simulated"
+STT_PROVIDER = os.getenv("STT_PROVIDER", "").lower()
+# "deepgram" (default) or "simulated"
+STREAMING_STT_PROVIDER = os.getenv("STREAMING_STT_PROVIDER", "deepgram").lower()
+
+
+class LLMMessages(Protocol):
+    """The subset of the Anthropic Messages API the agents use"""
+
+    def create(self, **kwargs) -> Any:
+        """Return a message with .content blocks and .usage"""
+
+    def stream(self, **kwargs) -> ContextManager:
+        """Context manager exposing .text_stream and .get_final_message()"""
+
+
+class LLMClient(Protocol):
+    messages: LLMMessages
+
+
+class STTClient(Protocol):
+    """The subset of the OpenAI audio API the listener uses: client.audio.transcriptions.create(...)"""
+
+    audio: Any
+
+
+class StreamingSTT(Protocol):
+    """Live transcription session (see DeepgramRealtimeAgent)"""
+
+    async def start_streaming(self, on_transcript: Callable, on_error: Optional[Callable] = None):
+        ...
+
+    def send_audio(self, audio_bytes: bytes):
+        ...
+
+    def finish(self):
+        ...
+
+
+class MeteredMessages:
+    """
+    Wraps a Messages API so every call lands in the usage ledger
+
+    Agents call acreate()/astream(), which go through the LLM scheduler
+    (priority class, rate limits, retries) and run off the event loop.
+    Calls pass the provider's circuit breaker and raise CircuitOpenError
+    right away while it is open.
+    """
+
+    def __init__(self, messages: LLMMessages, agent: str, provider: str, priority: str = STANDARD):
+        self._messages = messages
+        self.agent = agent
+        self.provider = provider
+        self.priority = priority
+        self.breaker = circuit_breakers.get(provider)
+
+    def _schedule_args(self, priority: Optional[str], kwargs: dict) -> dict:
+        return {
+            "priority": priority or self.priority,
+            "agent": self.agent,
+            "model": kwargs.get("model"),
+            "input_tokens": estimate_input_tokens(kwargs),
+            "max_tokens": kwargs.get("max_tokens", 1024)
+        }
+
+    async def acreate(self, priority: Optional[str] = None, **kwargs) -> Any:
+        """
+        messages.create through the LLM scheduler
+
+        Inside a deadline_scope (app.hedging) slow calls are hedged and
+        DeadlineExceeded is raised once the deadline passes. Inside a
+        batch_scope (app.batch_mode) the call goes into a Message Batches job.
+
+        Args:
+            priority: Priority class for this call (defaults to the agent's)
+            **kwargs: Messages API arguments
+
+        Raises:
+            CircuitOpenError: if the provider's circuit is open
+        """
+        self.breaker.check()  # Fail fast instead of queueing for a provider that is down
+        schedule_args = self._schedule_args(priority, kwargs)
+        batch = current_batch()
+        if batch is not None:
+            # Offline work (app.batch_mode): queued into a batch job, made live if the job doesn't deliver
+            return await batch.submit(
+                self.agent, self.provider, kwargs,
+                live=lambda: llm_scheduler.create(lambda: self.create(**kwargs), **schedule_args)
+            )
+        if current_deadline() is not None:
+            # Real-time request: hedge slow calls and drop answers past the deadline
+            return await hedged_call(
+                lambda: llm_scheduler.create(lambda: self.create(**kwargs), **schedule_args),
+                self.agent, kwargs.get("model")
+            )
+        return await llm_scheduler.create(lambda: self.create(**kwargs), **schedule_args)
+
+    def astream(self, priority: Optional[str] = None, **kwargs):
+        """messages.stream through the LLM scheduler; use with `async with` and `async for text in stream.text_stream`"""
+        self.breaker.check()
+        return llm_scheduler.stream(lambda: self.stream(**kwargs), **self._schedule_args(priority, kwargs))
+
+    def create(self, **kwargs) -> Any:
+        with self.breaker.guard():
+            start = time.perf_counter()
+            response, outcome = None, "error"
+            try:
+                response = self._messages.create(**kwargs)
+                outcome = "ok"
+                return response
+            finally:
+                usage_ledger.record_llm(
+                    self.provider, "messages.create", self.agent, kwargs.get("model"),
+                    response, (time.perf_counter() - start) * 1000, outcome
+                )
+
+    @contextmanager
+    def stream(self, **kwargs):
+        with self.breaker.guard():
+            start = time.perf_counter()
+            final, outcome = None, "error"
+            try:
+                with self._messages.stream(**kwargs) as stream:
+                    yield stream
+                    final = stream.get_final_message()
+                outcome = "ok"
+            finally:
+                usage_ledger.record_llm(
+                    self.provider, "messages.stream", self.agent, kwargs.get("model"),
+                    final, (time.perf_counter() - start) * 1000, outcome
+                )
+
+
+class MeteredLLMClient:
+    """LLM client whose calls are recorded per agent in the usage ledger"""
+
+    def __init__(self, client: LLMClient, agent: str, provider: str, priority: str = STANDARD):
+        self.client = client
+        self.messages = MeteredMessages(client.messages, agent, provider, priority)
+
+
+def create_llm_client(agent: str, priority: str = STANDARD) -> LLMClient:
+    """
+    Claude client for an agent, or the simulated backend when LLM_PROVIDER=simulated
+
+    Args:
+        agent: Agent name the client's calls are attributed to in the usage ledger
+        priority: Default LLM scheduler priority class for the agent's calls
+
+    Raises:
+        ValueError: if the Anthropic provider is selected without an API key
+    """
+    if LLM_PROVIDER == "simulated":
+        from app.simulated_providers import SimulatedLLMClient
+        return MeteredLLMClient(SimulatedLLMClient(), agent, "simulated", priority)
+
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY not found in environment")
+
+    import anthropic
+    # Retries (and Retry-After handling) belong to the LLM scheduler
+    return MeteredLLMClient(anthropic.Anthropic(api_key=api_key, max_retries=0), agent, "anthropic", priority)
+
+
+def create_batch_client():
+    """
+    Anthropic client for the Message Batches API (LLM_BATCH_BASE_URL, if set, points
+    it at another server, such as the stand-in from app.batch_server)
+
+    Raises:
+        ValueError: if no API key is configured for the real API
+    """
+    api_key = os.getenv("ANTHROPIC_API_KEY") or ("stand-in" if LLM_BATCH_BASE_URL else None)
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY not found in environment")
+
+    import anthropic
+    return anthropic.Anthropic(api_key=api_key, base_url=LLM_BATCH_BASE_URL or None)
+
+
+def create_stt_client() -> Optional[STTClient]:
+    """Simulated Whisper-compatible client when STT_PROVIDER=simulated, otherwise None"""
+    if STT_PROVIDER == "simulated":
+        from app.simulated_providers import SimulatedSTTClient
+        return SimulatedSTTClient()
+    return None
+
+
+@lru_cache(maxsize=None)
+def streaming_stt_available() -> bool:
+    """Whether /ws/realtime-video has a streaming transcription backend (checked once)"""
+    if STREAMING_STT_PROVIDER == "simulated":
+        return True
+    try:
+        import app.agents.deepgram_realtime_agent  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_streaming_stt() -> StreamingSTT:
+    """New live transcription session for one WebSocket connection"""
+    if STREAMING_STT_PROVIDER == "simulated":
+        from app.simulated_providers import SimulatedStreamingSTT
+        return SimulatedStreamingSTT()
+
+    from app.agents.deepgram_realtime_agent import DeepgramRealtimeAgent
+    return DeepgramRealtimeAgent()
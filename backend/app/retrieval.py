@@ -0,0 +1,218 @@
+"""
+Transcript Retrieval - Chunks meeting transcripts and ranks passages locally (BM25)
+"""
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List
+
+from app.models import TranscriptLine
+
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just let me more
+most my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves yeah okay ok um uh like
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed"""
+    return [
+        token.strip("'-")
+        for token in _TOKEN_RE.findall(text.lower())
+        if token not in STOPWORDS and len(token) > 1
+    ]
+
+
+@dataclass
+class TranscriptChunk:
+    """A passage of consecutive speaker turns from a transcript"""
+    start_line: int
+    end_line: int
+    lines: List[TranscriptLine]
+    tokens: List[str] = field(default_factory=list)
+
+    def render(self) -> str:
+        return "\n".join(f"{line.speaker}: {line.text}" for line in self.lines)
+
+
+def group_speaker_turns(transcript: List[TranscriptLine]) -> List[List[int]]:
+    """
+    Group consecutive lines by the same speaker into turns
+
+    Returns:
+        List of turns, each a list of transcript line indexes
+    """
+    turns: List[List[int]] = []
+    for i, line in enumerate(transcript):
+        if turns and transcript[turns[-1][-1]].speaker == line.speaker:
+            turns[-1].append(i)
+        else:
+            turns.append([i])
+    return turns
+
+
+def chunk_transcript(
+    transcript: List[TranscriptLine],
+    turns_per_chunk: int = 6,
+    overlap: int = 2,
+    max_lines: int = 12
+) -> List[TranscriptChunk]:
+    """
+    Split a transcript into overlapping chunks of speaker turns
+
+    Args:
+        transcript: Full meeting transcript
+        turns_per_chunk: Speaker turns per chunk
+        overlap: Turns shared between neighbouring chunks
+        max_lines: Upper bound on lines per chunk (long monologues are split)
+
+    Returns:
+        Chunks in transcript order
+    """
+    if not transcript:
+        return []
+
+    # Split long monologues so one speaker can't produce an unbounded chunk
+    turns = []
+    for turn in group_speaker_turns(transcript):
+        for i in range(0, len(turn), max_lines):
+            turns.append(turn[i:i + max_lines])
+
+    # Windows hold whole turns up to turns_per_chunk and max_lines, and the next one starts
+    # `overlap` turns before this one ended, so every line lands in at least one chunk
+    chunks = []
+    start = 0
+    while start < len(turns):
+        end = start + 1
+        line_count = len(turns[start])
+        while end < min(len(turns), start + turns_per_chunk) and line_count + len(turns[end]) <= max_lines:
+            line_count += len(turns[end])
+            end += 1
+        indexes = [i for turn in turns[start:end] for i in turn]
+        lines = [transcript[i] for i in indexes]
+        chunks.append(TranscriptChunk(
+            start_line=indexes[0],
+            end_line=indexes[-1],
+            lines=lines,
+            tokens=tokenize(" ".join(f"{line.speaker} {line.text}" for line in lines))
+        ))
+        if end >= len(turns):
+            break
+        start = max(start + 1, end - overlap)
+
+    return chunks
+
+
+def rank_chunks(
+    query: str,
+    chunks: List[TranscriptChunk],
+    k1: float = 1.5,
+    b: float = 0.75
+) -> List[tuple]:
+    """
+    Score chunks against a query with Okapi BM25
+
+    Returns:
+        List of (score, chunk) pairs, best first
+    """
+    query_tokens = tokenize(query)
+    if not chunks or not query_tokens:
+        return []
+
+    doc_freq = Counter()
+    for chunk in chunks:
+        doc_freq.update(set(chunk.tokens))
+
+    n_chunks = len(chunks)
+    avg_len = sum(len(chunk.tokens) for chunk in chunks) / n_chunks or 1.0
+
+    scored = []
+    for chunk in chunks:
+        term_freq = Counter(chunk.tokens)
+        length_norm = k1 * (1 - b + b * len(chunk.tokens) / avg_len)
+        score = 0.0
+        for token in query_tokens:
+            tf = term_freq.get(token)
+            if not tf:
+                continue
+            idf = math.log(1 + (n_chunks - doc_freq[token] + 0.5) / (doc_freq[token] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + length_norm)
+        scored.append((score, chunk))
+
+    scored.sort(key=lambda pair: pair[0], reverse=True)
+    return scored
+
+
+class TranscriptRetriever:
+    """
+    Selects the transcript passages most relevant to a question
+    Features:
+    - Speaker-turn chunking with overlap
+    - Local BM25 ranking (no API calls)
+    - Always keeps the most recent passage for "what was just said" questions
+    - Short transcripts are passed through unchanged
+    """
+
+    def __init__(self):
+        self.top_k = int(os.getenv("QA_RETRIEVAL_TOP_K", "6"))
+        self.turns_per_chunk = int(os.getenv("QA_CHUNK_TURNS", "6"))
+        self.overlap = int(os.getenv("QA_CHUNK_OVERLAP", "2"))
+        self.full_transcript_max_lines = int(os.getenv("QA_FULL_TRANSCRIPT_MAX_LINES", "60"))
+
+    def select(self, question: str, transcript: List[TranscriptLine]) -> List[TranscriptChunk]:
+        """
+        Pick the passages to send to the model
+
+        Args:
+            question: User's question
+            transcript: Full meeting transcript
+
+        Returns:
+            Selected chunks in transcript order
+        """
+        if len(transcript) <= self.full_transcript_max_lines:
+            if not transcript:
+                return []
+            return [TranscriptChunk(start_line=0, end_line=len(transcript) - 1, lines=list(transcript))]
+
+        chunks = chunk_transcript(transcript, self.turns_per_chunk, self.overlap)
+        ranked = [chunk for score, chunk in rank_chunks(question, chunks) if score > 0]
+
+        selected = ranked[:self.top_k]
+        if not any(chunk is chunks[-1] for chunk in selected):
+            selected.append(chunks[-1])
+
+        selected.sort(key=lambda chunk: chunk.start_line)
+
+        # Merge overlapping passages so no line is sent twice
+        merged: List[TranscriptChunk] = []
+        for chunk in selected:
+            if merged and chunk.start_line <= merged[-1].end_line + 1:
+                previous = merged[-1]
+                end_line = max(previous.end_line, chunk.end_line)
+                merged[-1] = TranscriptChunk(
+                    start_line=previous.start_line,
+                    end_line=end_line,
+                    lines=transcript[previous.start_line:end_line + 1]
+                )
+            else:
+                merged.append(chunk)
+        return merged
+
+    @staticmethod
+    def render(chunks: List[TranscriptChunk]) -> str:
+        """Format selected chunks as numbered excerpts for a prompt"""
+        return "\n\n".join(
+            f"[Lines {chunk.start_line + 1}-{chunk.end_line + 1}]\n{chunk.render()}"
+            for chunk in chunks
+        )
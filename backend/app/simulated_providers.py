@@ -0,0 +1,351 @@
+"""
+Simulated Providers - Offline LLM/STT backends with configurable latency, throughput and error rates
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+_rng = random.Random(int(os.getenv("SIM_SEED")) if os.getenv("SIM_SEED") else None)
+
+PHRASES = [
+    "Good morning team, let's start the meeting.",
+    "We need to update the documentation by Friday.",
+    "John, can you review the pull request?",
+    "Sarah will handle the database migration.",
+    "We decided to use React for the frontend.",
+    "The API integration should be completed this week.",
+    "Mike needs to create the deployment scripts.",
+    "Let's schedule a follow-up meeting for next week.",
+    "I think we should improve our testing coverage.",
+    "The performance is critical for our users.",
+]
+
+WORDS = (
+    "the team agreed to review deployment timeline budget risk customer feedback "
+    "release migration testing priority blocker follow up decision owner next week"
+).split()
+
+
+class Distribution:
+    """
+    Random delay/size distribution parsed from a spec string
+
+    Specs:
+        "const:300"          always 300
+        "uniform:100,500"    uniform between 100 and 500
+        "normal:300,50"      normal (mean, stddev), clipped at 0
+        "lognormal:300,0.5"  lognormal (median, sigma) - long tail like real APIs
+        "exp:300"            exponential with mean 300
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.args = [float(arg) for arg in args.split(",") if arg.strip()]
+        if self.kind not in ("const", "uniform", "normal", "lognormal", "exp"):
+            raise ValueError(f"Unknown distribution: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "const":
+            return self.args[0]
+        if self.kind == "uniform":
+            return _rng.uniform(self.args[0], self.args[1])
+        if self.kind == "normal":
+            return max(0.0, _rng.gauss(self.args[0], self.args[1]))
+        if self.kind == "lognormal":
+            return _rng.lognormvariate(math.log(self.args[0]), self.args[1])
+        return _rng.expovariate(1.0 / self.args[0])
+
+
+def _env_distribution(name: str, default: str) -> Distribution:
+    return Distribution(os.getenv(name, default))
+
+
+class SimulatedAPIError(Exception):
+    """Provider-style error with an HTTP status (429s carry retry-after)"""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"Simulated provider error {status_code}: {message}")
+        self.status_code = status_code
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+
+def _maybe_fail(error_rate: float, rate_limit_rate: float = 0.0):
+    roll = _rng.random()
+    if roll < rate_limit_rate:
+        raise SimulatedAPIError(429, "rate_limit_error", retry_after=round(_rng.uniform(0.5, 2.0), 2))
+    if roll < rate_limit_rate + error_rate:
+        raise SimulatedAPIError(_rng.choice([500, 529]), "overloaded_error")
+
+
+# --- LLM -------------------------------------------------------------------
+
+@dataclass
+class SimulatedUsage:
+    input_tokens: int
+    output_tokens: int
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+
+
+@dataclass
+class SimulatedTextBlock:
+    text: str
+    type: str = "text"
+
+
+@dataclass
+class SimulatedToolUseBlock:
+    name: str
+    input: Dict[str, Any]
+    id: str = field(default_factory=lambda: f"toolu_sim_{uuid.uuid4().hex[:16]}")
+    type: str = "tool_use"
+
+
+@dataclass
+class SimulatedMessage:
+    content: List[Any]
+    usage: SimulatedUsage
+    model: str
+    stop_reason: str = "end_turn"
+    id: str = field(default_factory=lambda: f"msg_sim_{uuid.uuid4().hex[:16]}")
+    role: str = "assistant"
+    type: str = "message"
+
+
+def _text_of(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content or [] if isinstance(block, dict))
+
+
+def sample_from_schema(schema: dict, depth: int = 0) -> Any:
+    """Plausible value matching a JSON schema (objects, arrays, enums, primitives)"""
+    schema_type = schema.get("type", "string")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "string")
+    if "enum" in schema:
+        return _rng.choice(schema["enum"])
+    if schema_type == "object":
+        return {
+            key: sample_from_schema(value, depth + 1)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        count = _rng.randint(0, 3) if depth < 3 else 0
+        return [sample_from_schema(schema.get("items", {}), depth + 1) for _ in range(count)]
+    if schema_type == "number":
+        return round(_rng.uniform(0.6, 1.0), 2)
+    if schema_type == "integer":
+        return _rng.randint(0, 10)
+    if schema_type == "boolean":
+        return _rng.random() < 0.5
+    return _rng.choice(PHRASES)
+
+
+class SimulatedMessages:
+    """messages.create / messages.stream with simulated timing"""
+
+    def __init__(self):
+        self.ttft_ms = _env_distribution("SIM_LLM_TTFT_MS", "lognormal:450,0.4")
+        self.output_tokens = _env_distribution("SIM_LLM_OUTPUT_TOKENS", "uniform:40,220")
+        self.tokens_per_second = float(os.getenv("SIM_LLM_TOKENS_PER_SECOND", "90"))
+        self.error_rate = float(os.getenv("SIM_LLM_ERROR_RATE", "0.0"))
+        self.rate_limit_rate = float(os.getenv("SIM_LLM_RATE_LIMIT_RATE", "0.0"))
+
+    def _plan(self, kwargs: dict):
+        """Sample the response shape and timing for one request"""
+        _maybe_fail(self.error_rate, self.rate_limit_rate)
+
+        prompt_text = _text_of(kwargs.get("system")) + "".join(
+            _text_of(message.get("content")) for message in kwargs.get("messages", [])
+        )
+        output_tokens = max(1, min(int(self.output_tokens.sample()), kwargs.get("max_tokens", 1024)))
+        usage = SimulatedUsage(input_tokens=count_tokens(prompt_text), output_tokens=output_tokens)
+
+        tool_choice = kwargs.get("tool_choice") or {}
+        if tool_choice.get("type") == "tool":
+            tool = next(t for t in kwargs.get("tools", []) if t["name"] == tool_choice["name"])
+            content = [SimulatedToolUseBlock(name=tool["name"], input=sample_from_schema(tool["input_schema"]))]
+            return content, usage, "tool_use"
+
+        if "JSON" in prompt_text:
+            text = json.dumps({"summary": _rng.choice(PHRASES), "confidence": round(_rng.uniform(0.6, 1.0), 2)})
+        else:
+            text = " ".join(_rng.choice(WORDS) for _ in range(max(1, int(output_tokens * 0.75))))
+        return [SimulatedTextBlock(text=text)], usage, "end_turn"
+
+    def create(self, **kwargs) -> SimulatedMessage:
+        ttft = self.ttft_ms.sample() / 1000
+        try:
+            content, usage, stop_reason = self._plan(kwargs)
+        except SimulatedAPIError:
+            # Errors still cost a round trip
+            time.sleep(ttft)
+            raise
+        time.sleep(ttft + usage.output_tokens / self.tokens_per_second)
+        return SimulatedMessage(content=content, usage=usage, model=kwargs.get("model", "simulated"), stop_reason=stop_reason)
+
+    @contextmanager
+    def stream(self, **kwargs):
+        content, usage, stop_reason = self._plan(kwargs)
+        message = SimulatedMessage(content=content, usage=usage, model=kwargs.get("model", "simulated"), stop_reason=stop_reason)
+        yield SimulatedStream(message, self.ttft_ms.sample() / 1000, 1.0 / self.tokens_per_second)
+
+
+class SimulatedStream:
+    """Yields text in token-sized pieces at the configured throughput"""
+
+    def __init__(self, message: SimulatedMessage, ttft: float, seconds_per_token: float):
+        self.message = message
+        self.ttft = ttft
+        self.seconds_per_token = seconds_per_token
+
+    @property
+    def text_stream(self):
+        time.sleep(self.ttft)
+        text = "".join(getattr(block, "text", "") for block in self.message.content)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.seconds_per_token)
+            yield word if i == 0 else " " + word
+
+    def get_final_message(self) -> SimulatedMessage:
+        return self.message
+
+
+class SimulatedLLMClient:
+    """Drop-in for anthropic.Anthropic in the agents"""
+
+    def __init__(self):
+        self.messages = SimulatedMessages()
+
+
+# --- Speech to text --------------------------------------------------------
+
+@dataclass
+class SimulatedTranscription:
+    text: str
+    segments: List[dict]
+
+
+class SimulatedTranscriptions:
+
+    def __init__(self):
+        self.latency_ms = _env_distribution("SIM_STT_LATENCY_MS", "lognormal:600,0.3")
+        # Processing seconds per second of audio, on top of the base latency
+        self.realtime_factor = float(os.getenv("SIM_STT_REALTIME_FACTOR", "0.05"))
+        # Rough compressed-audio byte rate used to estimate duration
+        self.bytes_per_audio_second = float(os.getenv("SIM_STT_BYTES_PER_SECOND", "16000"))
+        self.error_rate = float(os.getenv("SIM_STT_ERROR_RATE", "0.0"))
+
+    def create(self, model: str = "whisper-1", file=None, language: str = "en", **kwargs) -> SimulatedTranscription:
+        _maybe_fail(self.error_rate)
+        audio = file.read() if file is not None else b""
+        audio_seconds = len(audio) / self.bytes_per_audio_second
+        time.sleep(self.latency_ms.sample() / 1000 + audio_seconds * self.realtime_factor)
+
+        sentence_count = max(1, int(audio_seconds / 4))
+        sentences = [_rng.choice(PHRASES) for _ in range(sentence_count)]
+        return SimulatedTranscription(
+            text=" ".join(sentences),
+            segments=[{"text": sentence, "confidence": 0.9} for sentence in sentences]
+        )
+
+
+class SimulatedAudio:
+
+    def __init__(self):
+        self.transcriptions = SimulatedTranscriptions()
+
+
+class SimulatedSTTClient:
+    """Drop-in for the OpenAI client's audio.transcriptions API"""
+
+    def __init__(self):
+        self.audio = SimulatedAudio()
+
+
+class SimulatedStreamingSTT:
+    """
+    Stand-in for DeepgramRealtimeAgent
+
+    Counts incoming 16 kHz 16-bit PCM and emits an interim result every
+    SIM_STREAMING_INTERIM_SECONDS of audio and a final one every
+    SIM_STREAMING_UTTERANCE_SECONDS, each after a sampled delay.
+    """
+
+    BYTES_PER_SECOND = 16000 * 2
+
+    def __init__(self):
+        self.latency_ms = _env_distribution("SIM_STREAMING_STT_LATENCY_MS", "lognormal:250,0.3")
+        self.interim_seconds = float(os.getenv("SIM_STREAMING_INTERIM_SECONDS", "0.5"))
+        self.utterance_seconds = float(os.getenv("SIM_STREAMING_UTTERANCE_SECONDS", "3.0"))
+        self.is_connected = False
+        self._on_transcript: Optional[Callable] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._utterance_bytes = 0
+        self._interim_bytes = 0
+        self._speaker_index = 0
+        self._phrase = ""
+        self._total_bytes = 0
+
+    async def start_streaming(self, on_transcript: Callable, on_error: Optional[Callable] = None):
+        self._on_transcript = on_transcript
+        self._loop = asyncio.get_running_loop()
+        self.is_connected = True
+        self._phrase = _rng.choice(PHRASES)
+        logger.info("✅ Simulated streaming transcription started")
+
+    def send_audio(self, audio_bytes: bytes):
+        if not self.is_connected:
+            return
+        self._total_bytes += len(audio_bytes)
+        self._utterance_bytes += len(audio_bytes)
+        self._interim_bytes += len(audio_bytes)
+
+        if self._utterance_bytes >= self.utterance_seconds * self.BYTES_PER_SECOND:
+            self._emit(self._phrase, True)
+            self._utterance_bytes = 0
+            self._interim_bytes = 0
+            self._speaker_index = (self._speaker_index + 1) % 3
+            self._phrase = _rng.choice(PHRASES)
+        elif self._interim_bytes >= self.interim_seconds * self.BYTES_PER_SECOND:
+            self._interim_bytes = 0
+            progress = self._utterance_bytes / (self.utterance_seconds * self.BYTES_PER_SECOND)
+            words = self._phrase.split()
+            self._emit(" ".join(words[:max(1, int(len(words) * progress))]), False)
+
+    def _emit(self, text: str, is_final: bool):
+        data = {
+            "text": text,
+            "is_final": is_final,
+            "speaker": f"Speaker {self._speaker_index + 1}",
+            "audio_end": self._total_bytes / self.BYTES_PER_SECOND
+        }
+
+        def deliver():
+            if not self.is_connected:
+                return
+            if asyncio.iscoroutinefunction(self._on_transcript):
+                asyncio.create_task(self._on_transcript(data))
+            else:
+                self._on_transcript(data)
+
+        self._loop.call_later(self.latency_ms.sample() / 1000, deliver)
+
+    def finish(self):
+        self.is_connected = False
@@ -0,0 +1,144 @@
+"""
+Single Flight - Concurrent identical requests share one in-flight call
+"""
+import asyncio
+import copy
+import functools
+import hashlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from app.batch_mode import current_batch
+from app.hedging import DeadlineExceeded, current_deadline, deadline_exceeded
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+single_flight_calls = registry.counter(
+    "single_flight_calls_total",
+    "Calls through the single-flight layer: leader ran the work, coalesced shared a leader's result",
+    ["name", "role"]
+)
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of free text for request keys"""
+    return " ".join((text or "").split()).casefold()
+
+
+def fingerprint(parts: Iterable[Any]) -> str:
+    """Short digest of a sequence of values (e.g. transcript lines) for request keys"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode("utf-8", "surrogatepass"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class _Flight:
+    """One in-flight call and the callers waiting on it"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one execution
+    Features:
+    - The first caller (leader) starts the work; callers arriving while it
+      runs await the same result instead of making their own API call
+    - Each caller gets its own copy of the result, so callers can't see
+      each other's mutations
+    - A caller that disconnects doesn't cancel the work for the others; the
+      work is cancelled only when every caller has gone
+    - Keys are forgotten as soon as the call finishes (this is not a cache)
+    - Calls only coalesce with calls made the same way (inside a batch_scope or
+      not, with a request deadline or without); a caller's own deadline is
+      enforced while it waits, and if the leader's earlier deadline ran out it
+      makes the call itself
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple[str, str, bool, bool], _Flight] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, name: str, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `work`, or join an identical call already in flight
+
+        Args:
+            name: Operation name (metric label), e.g. "qa.answer_question"
+            key: Normalized request key; equal keys share one call
+            work: Zero-argument coroutine function doing the real call
+        """
+        # The work runs in the leader's context, so its batch scope and deadline apply to everyone
+        deadline = current_deadline()
+        flight_key = (name, key, current_batch() is not None, deadline is not None)
+        flight = self._flights.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = _Flight(asyncio.ensure_future(work()))
+            self._flights[flight_key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(flight_key, flight))
+        single_flight_calls.inc(name=name, role="leader" if leader else "coalesced")
+
+        flight.waiters += 1
+        try:
+            if leader or deadline is None:
+                result = await asyncio.shield(flight.task)
+            else:
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(flight.task), max(0.0, deadline - time.monotonic()))
+                except DeadlineExceeded:
+                    if time.monotonic() >= deadline:
+                        raise
+                    leader = True  # The leader's deadline was earlier than ours: make the call ourselves
+                    result = await work()
+                except TimeoutError:
+                    if flight.task.done():
+                        raise  # The work's own timeout, not our deadline
+                    deadline_exceeded.inc(agent=name)
+                    raise DeadlineExceeded(f"{name}: request deadline passed")
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        return result if leader else copy.deepcopy(result)
+
+    def _forget(self, flight_key: Tuple[str, str, bool, bool], flight: _Flight):
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+
+
+# Shared by the agents' @single_flight methods
+single_flight_group = SingleFlight()
+
+
+def single_flight(name: str, key: Callable[..., str]):
+    """
+    Decorator coalescing concurrent calls of an async method with equal keys
+
+    Args:
+        name: Operation name for metrics
+        key: Called with the method's arguments (including self); returns the request key
+
+    Usage:
+        @single_flight("emotion.analyze_single_message", key=lambda self, speaker, text: ...)
+        async def analyze_single_message(self, speaker, text): ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await single_flight_group.do(name, key(*args, **kwargs), lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,482 @@
+"""
+Structured Output - Tool-use schemas, a tolerant incremental JSON parser and field-by-field streaming for model responses
+"""
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_OUTPUT_TOOLS = os.getenv("STRUCTURED_OUTPUT_TOOLS", "true").lower() == "true"
+
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_WORD_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-+.")
+
+
+class StructuredOutputError(ValueError):
+    """Model output could not be parsed or repaired into JSON"""
+
+
+class IncrementalJSONParser:
+    """
+    Tolerant JSON scanner that can be fed text in chunks
+
+    Repairs the usual ways model output deviates from strict JSON:
+    - Preamble/postamble text and ``` code fences around the value; a bracketed
+      preamble that doesn't parse is skipped and the next { or [ is tried
+    - Trailing commas before } or ]
+    - Python literals (True/False/None)
+    - Raw control characters (newlines, tabs, ...) inside strings
+    - Truncated output (open strings, arrays and objects are closed)
+    """
+
+    def __init__(self):
+        self._reset()
+        # Characters fed so far; start is where the current value began
+        self._position = 0
+        self.start: Optional[int] = None
+
+    def _reset(self):
+        self._out: List[str] = []
+        # Raw text of the current value, to retry from its next { or [ if it doesn't parse
+        self._raw: List[str] = []
+        # Each frame: [closer, object_state, key_start]; object_state is "key" or "value"
+        self._stack: List[list] = []
+        self._word = ""
+        self._in_string = False
+        self._escape = False
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk: str):
+        pending = chunk
+        while pending:
+            pending = self._feed(pending)
+
+    def _feed(self, chunk: str) -> str:
+        """Scan chunk; returns text to scan again when the value turned out not to be JSON"""
+        for index, char in enumerate(chunk):
+            if self.done:
+                return ""
+            self._position += 1
+            if not self.started:
+                if char in "{[":
+                    self.started = True
+                    self.start = self._position - 1
+                    self._raw.append(char)
+                    self._open(char)
+                continue
+            self._raw.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                elif char < " ":
+                    char = json.dumps(char)[1:-1]
+                self._out.append(char)
+                continue
+
+            if char in _WORD_CHARS:
+                self._word += char
+                continue
+
+            self._flush_word()
+            if char == '"':
+                frame = self._stack[-1]
+                if frame[0] == "}" and frame[1] == "key" and frame[2] is None:
+                    frame[2] = len(self._out)
+                self._in_string = True
+                self._out.append(char)
+            elif char in "{[":
+                self._open(char)
+            elif char in "}]":
+                self._close_frame()
+                if not self._stack:
+                    self.done = True
+                    if not self._parses():
+                        # e.g. "Here is the JSON [as requested]: {...}"
+                        retry = "".join(self._raw[1:]) + chunk[index + 1:]
+                        self._position = self.start + 1
+                        self._reset()
+                        return retry
+            elif char == ":":
+                self._stack[-1][1] = "value"
+                self._out.append(char)
+            elif char == ",":
+                frame = self._stack[-1]
+                if frame[0] == "}":
+                    frame[1] = "key"
+                    frame[2] = len(self._out)
+                self._out.append(char)
+            elif not char.isspace() or self._out[-1:] != [char]:
+                self._out.append(char)
+        return ""
+
+    def _parses(self) -> bool:
+        try:
+            json.loads("".join(self._out))
+            return True
+        except json.JSONDecodeError:
+            return False
+
+    def _open(self, char: str):
+        self._out.append(char)
+        self._stack.append(["}" if char == "{" else "]", "key", None])
+
+    def _flush_word(self):
+        if self._word:
+            self._out.append(_LITERALS.get(self._word, self._word))
+            self._word = ""
+
+    def _close_frame(self):
+        closer = self._stack.pop()[0]
+        self._strip_trailing(self._out)
+        self._out.append(closer)
+
+    @staticmethod
+    def _strip_trailing(out: List[str]):
+        while out and (out[-1].isspace() or out[-1] == ","):
+            out.pop()
+
+    def text(self) -> Optional[str]:
+        """Repaired JSON text for everything fed so far (open containers are closed)"""
+        if not self.started:
+            return None
+
+        out = list(self._out)
+        stack = [list(frame) for frame in self._stack]
+
+        word = self._word
+        if word:
+            if word in _LITERALS:
+                word = _LITERALS[word]
+            else:
+                for literal in ("true", "false", "null"):
+                    if literal.startswith(word.lower()):
+                        word = literal
+                        break
+                else:
+                    word = word.rstrip(".-+eE")
+            if word:
+                out.append(word)
+
+        if self._in_string:
+            if self._escape:
+                out.pop()
+            out.append('"')
+
+        while stack:
+            closer, state, key_start = stack.pop()
+            if closer == "}" and state == "key" and key_start is not None:
+                # A key with no value yet: drop it
+                del out[key_start:]
+            self._strip_trailing(out)
+            if out and out[-1] == ":":
+                out.append("null")
+            out.append(closer)
+            if stack and stack[-1][0] == "}":
+                stack[-1][2] = None
+
+        return "".join(out)
+
+    def value(self) -> Any:
+        """Best-effort parse of everything fed so far"""
+        text = self.text()
+        if text is None:
+            raise StructuredOutputError("No JSON object or array found in model output")
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            raise StructuredOutputError(f"Unrepairable JSON: {e}") from e
+
+
+def parse_json_text(text: str) -> tuple:
+    """
+    Parse model text as JSON, repairing it locally if needed
+
+    Returns:
+        (value, repaired) tuple
+    """
+    try:
+        return json.loads(text), False
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    text = text or ""
+    offset = 0
+    while True:
+        parser = IncrementalJSONParser()
+        parser.feed(text[offset:])
+        try:
+            return parser.value(), True
+        except StructuredOutputError:
+            # An unclosed bracket in the preamble swallowed the real value: try the next one
+            retry = parser.start is not None and min(
+                (i for i in (text.find("{", offset + parser.start + 1), text.find("[", offset + parser.start + 1)) if i >= 0),
+                default=None
+            )
+            if not retry:
+                raise
+            offset = retry
+
+
+class JSONFieldStream:
+    """
+    Top-level fields of a JSON object being streamed, emitted as soon as each is complete
+    Features:
+    - A field counts as complete once the next key starts or the object closes
+    - The top-level string being written is reported as it grows, as deltas (partial)
+    - Uses IncrementalJSONParser, so fenced, truncated or sloppy output still yields fields
+    """
+
+    def __init__(self):
+        self.parser = IncrementalJSONParser()
+        self._chunks: List[str] = []
+        self._emitted = set()
+        self._partial: Dict[str, str] = {}
+
+    @property
+    def text(self) -> str:
+        """Raw text received so far"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add a chunk of model output
+
+        Returns:
+            New events: {"type": "partial", "field", "delta"} and {"type": "field", "field", "value"}.
+            A partial with "reset": true replaces the field's text instead of extending it.
+        """
+        self._chunks.append(chunk)
+        self.parser.feed(chunk)
+        return self._events(final=self.parser.done)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Events for the fields still open when the stream ended"""
+        return self._events(final=True)
+
+    def _events(self, final: bool) -> List[Dict[str, Any]]:
+        try:
+            value = self.parser.value()
+        except StructuredOutputError:
+            return []
+        if not isinstance(value, dict):
+            return []
+
+        keys = list(value)
+        events = []
+        for key in (keys if final else keys[:-1]):
+            if key not in self._emitted:
+                self._emitted.add(key)
+                events.append({"type": "field", "field": key, "value": value[key]})
+        if not final and keys:
+            key, current = keys[-1], value[keys[-1]]
+            previous = self._partial.get(key, "")
+            if isinstance(current, str) and current and current != previous:
+                self._partial[key] = current
+                if current.startswith(previous):
+                    events.append({"type": "partial", "field": key, "delta": current[len(previous):]})
+                else:
+                    events.append({"type": "partial", "field": key, "delta": current, "reset": True})
+        return events
+
+
+def result_events(value: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """A structured result that didn't come from a stream (fallbacks, errors) as field events plus the result"""
+    return [{"type": "field", "field": key, "value": field} for key, field in value.items()] + [{"type": "result", "value": value}]
+
+
+structured_output_responses = registry.counter(
+    "structured_output_responses_total",
+    "Structured model responses by how they were obtained (tool_use, clean, repaired, failed)",
+    ["agent", "outcome"]
+)
+
+
+class StructuredOutputStats:
+    """Counts how each agent's structured responses were obtained"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, agent: str, outcome: str):
+        with self._lock:
+            self._counts[agent][outcome] += 1
+        structured_output_responses.inc(agent=agent, outcome=outcome)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            result = {}
+            for agent, counts in self._counts.items():
+                total = sum(counts.values())
+                result[agent] = dict(counts)
+                result[agent]["repair_rate"] = round(counts.get("repaired", 0) / total, 4) if total else 0.0
+            return result
+
+
+structured_output_stats = StructuredOutputStats()
+
+
+def json_tool(name: str, description: str, schema: dict) -> dict:
+    """
+    messages.create kwargs forcing the model to answer through a tool call,
+    so the arguments arrive as already-parsed JSON
+
+    Returns an empty dict when STRUCTURED_OUTPUT_TOOLS is disabled.
+    """
+    if not STRUCTURED_OUTPUT_TOOLS:
+        return {}
+    return {
+        "tools": [{"name": name, "description": description, "input_schema": schema}],
+        "tool_choice": {"type": "tool", "name": name}
+    }
+
+
+def parse_structured(response, agent: str) -> Any:
+    """
+    Extract structured data from a Claude response
+
+    Uses the tool_use block when present, otherwise parses the text blocks
+    with local repair. Never triggers another model call.
+
+    Raises:
+        StructuredOutputError: if nothing usable could be recovered
+    """
+    text_parts = []
+    for block in getattr(response, "content", None) or []:
+        if getattr(block, "type", None) == "tool_use":
+            structured_output_stats.record(agent, "tool_use")
+            return block.input
+        text = getattr(block, "text", None)
+        if text:
+            text_parts.append(text)
+
+    try:
+        value, repaired = parse_json_text("".join(text_parts))
+    except StructuredOutputError:
+        structured_output_stats.record(agent, "failed")
+        raise
+
+    structured_output_stats.record(agent, "repaired" if repaired else "clean")
+    if repaired:
+        logger.info("🔧 Repaired malformed JSON from %s", agent)
+    return value
+
+
+async def stream_structured(stream, agent: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Events for a JSON answer read from a Claude stream (no tool use, so the text is the JSON)
+
+    Yields:
+        {"type": "token", "text"} for every chunk as it arrives, the JSONFieldStream
+        events ("partial", "field"), and finally {"type": "result", "value"} with the
+        whole parsed object
+
+    Raises:
+        StructuredOutputError: if nothing usable could be recovered
+    """
+    fields = JSONFieldStream()
+    async for text in stream.text_stream:
+        yield {"type": "token", "text": text}
+        for event in fields.feed(text):
+            yield event
+    for event in fields.finish():
+        yield event
+
+    try:
+        value, repaired = parse_json_text(fields.text)
+    except StructuredOutputError:
+        structured_output_stats.record(agent, "failed")
+        raise
+    structured_output_stats.record(agent, "repaired" if repaired else "clean")
+    yield {"type": "result", "value": value}
+
+
+# Shared schemas
+STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+ACTION_ITEMS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action_items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string"},
+                    "assignee": {"type": ["string", "null"]},
+                    "priority": {"type": "string", "enum": ["high", "medium", "low"]},
+                    "confidence": {"type": "number"},
+                    "status": {"type": "string", "enum": ["new", "updated"]}
+                },
+                "required": ["text", "priority", "confidence"]
+            }
+        }
+    },
+    "required": ["action_items"]
+}
+
+SECTION_SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "key_points": STRING_LIST,
+        "decisions": STRING_LIST,
+        "participants": STRING_LIST
+    },
+    "required": ["summary", "key_points", "decisions", "participants"]
+}
+
+MEETING_SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        **SECTION_SUMMARY_SCHEMA["properties"]
+    },
+    "required": ["title", "summary", "key_points", "decisions", "participants"]
+}
+
+QA_ANSWER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {"type": "string"},
+        "confidence": {"type": "number"},
+        "sources": STRING_LIST,
+        "relevant_speakers": STRING_LIST
+    },
+    "required": ["answer", "confidence", "sources", "relevant_speakers"]
+}
+
+MESSAGE_EMOTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "primary_emotion": {"type": "string"},
+        "happiness_emoji": {"type": "string"},
+        "energy_level": {"type": "string"},
+        "stress_level": {"type": "string"},
+        "confidence": {"type": "number"}
+    },
+    "required": ["primary_emotion", "happiness_emoji", "energy_level", "stress_level", "confidence"]
+}
+
+UTTERANCE_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "emotion": MESSAGE_EMOTION_SCHEMA,
+        "insight": {"type": ["string", "null"]},
+        "needs_explanation": {"type": "boolean"},
+        "terms_identified": STRING_LIST,
+        "explanation": {"type": ["string", "null"]}
+    },
+    "required": ["emotion", "insight", "needs_explanation", "terms_identified", "explanation"]
+}
@@ -0,0 +1,193 @@
+"""
+Token Accounting - Prompt measurement, per-agent context budgets and per-session token totals
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional
+
+from app.usage_ledger import UNSCOPED_SESSION, USAGE_LEDGER_MAX_SESSIONS, usage_ledger, usage_session
+
+# Try to import tiktoken (falls back to a character heuristic)
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_failed = False
+
+# Conservative characters-per-token ratio when no tokenizer is available
+CHARS_PER_TOKEN = 3.5
+
+# Provider-reported usage fields taken from the usage ledger (calls, then token counts)
+LEDGER_TOKEN_FIELDS = ("calls", "input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed and TIKTOKEN_AVAILABLE:
+        try:
+            # cl100k_base is not Claude's tokenizer, but tracks it closely enough for budgeting
+            _encoding = tiktoken.get_encoding(os.getenv("TOKEN_COUNT_ENCODING", "cl100k_base"))
+        except Exception as e:
+            logger.warning("⚠️ tiktoken encoding unavailable, using character estimate: %s", e)
+            _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count (or estimate) the tokens in a piece of text"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def prompt_budget(agent: str, default: int) -> int:
+    """
+    Prompt token budget for an agent, overridable per agent
+
+    e.g. PROMPT_TOKEN_BUDGET_SUMMARIZER=12000
+    """
+    return int(os.getenv(f"PROMPT_TOKEN_BUDGET_{agent.upper()}", str(default)))
+
+
+class ContextBudget:
+    """
+    Allocates a prompt token budget across context sections by priority
+
+    Usage:
+        budget = ContextBudget(8000)
+        budget.reserve(system_prompt)
+        action_lines = budget.take_lines(action_lines)       # highest priority first
+        transcript_lines = budget.take_lines(transcript_lines)  # newest lines kept
+    """
+
+    # Allowance for the fixed instructions and JSON examples in each prompt
+    DEFAULT_INSTRUCTION_RESERVE = 800
+
+    def __init__(self, budget: int, instruction_reserve: int = DEFAULT_INSTRUCTION_RESERVE):
+        self.budget = budget
+        self.remaining = budget - instruction_reserve
+        self.trimmed_lines = 0
+
+    def reserve(self, text: str) -> "ContextBudget":
+        """Account for text that is always sent (system prompt, question, ...)"""
+        self.remaining -= count_tokens(text)
+        return self
+
+    def take_lines(self, lines: List[str], newest_first: bool = True) -> List[str]:
+        """
+        Keep as many lines as fit in the remaining budget
+
+        Args:
+            lines: Context lines in chronological order
+            newest_first: Keep the end of the list (True) or the start (False)
+
+        Returns:
+            Kept lines in their original order, prefixed with an omission marker if trimmed
+        """
+        ordered = reversed(lines) if newest_first else iter(lines)
+        kept = []
+        for line in ordered:
+            cost = count_tokens(line) + 1
+            if cost > self.remaining:
+                break
+            kept.append(line)
+            self.remaining -= cost
+
+        omitted = len(lines) - len(kept)
+        if newest_first:
+            kept.reverse()
+        if omitted:
+            self.trimmed_lines += omitted
+            marker = f"[... {omitted} {'earlier' if newest_first else 'later'} lines omitted ...]"
+            kept = [marker] + kept if newest_first else kept + [marker]
+        return kept
+
+
+class TokenUsageTracker:
+    """
+    Per-session, per-agent token totals
+    Features:
+    - Provider-reported usage (tokens, prompt cache, cost) is read from the
+      usage ledger, which records every Claude call, so both views agree
+    - Adds what only the agents know: locally measured prompt size and the
+      context lines trimmed to fit the budget
+    - Keeps as many sessions as the ledger (least recently used dropped first);
+      per-agent totals across sessions are kept regardless
+    """
+
+    def __init__(self, max_sessions: int = USAGE_LEDGER_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._totals: "OrderedDict[str, Dict[str, Dict[str, int]]]" = OrderedDict()
+        self._agent_totals: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, session_id: Optional[str], agent: str, prompt_tokens: int = 0, trimmed_lines: int = 0):
+        """
+        Record the prompt of one model call
+
+        Args:
+            session_id: Meeting session ID (defaults to the current usage context)
+            agent: Agent name
+            prompt_tokens: Locally measured prompt size
+            trimmed_lines: Context lines dropped to fit the budget
+        """
+        session_id = session_id or usage_session.get() or UNSCOPED_SESSION
+        with self._lock:
+            agents = self._totals.get(session_id)
+            if agents is None:
+                agents = self._totals[session_id] = defaultdict(lambda: defaultdict(int))
+                while len(self._totals) > self.max_sessions:
+                    self._totals.popitem(last=False)
+            else:
+                self._totals.move_to_end(session_id)
+            for totals in (agents[agent], self._agent_totals[agent]):
+                totals["prompts"] += 1
+                totals["prompt_tokens_estimated"] += prompt_tokens
+                totals["trimmed_lines"] += trimmed_lines
+
+    @staticmethod
+    def _merge(local: Dict[str, Dict[str, int]], ledger: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, Any]]:
+        agents: Dict[str, Dict[str, Any]] = {}
+        for agent in sorted(set(local) | set(ledger)):
+            provider = ledger.get(agent, {})
+            if agent not in local and not any(provider.get(key) for key in LEDGER_TOKEN_FIELDS[1:]):
+                continue  # Not a model call (speech-to-text, Jira)
+            agents[agent] = {
+                **{key: int(provider.get(key, 0)) for key in LEDGER_TOKEN_FIELDS},
+                **local.get(agent, {})
+            }
+            agents[agent]["cost_usd"] = round(provider.get("cost_usd", 0.0), 6)
+        return agents
+
+    def agent_totals(self) -> Dict[str, Dict[str, Any]]:
+        """Token totals per agent across all sessions"""
+        with self._lock:
+            local = {agent: dict(totals) for agent, totals in self._agent_totals.items()}
+        return self._merge(local, usage_ledger.agent_totals())
+
+    def session_totals(self, session_id: str) -> dict:
+        """Token totals for one session, broken down by agent"""
+        with self._lock:
+            local = {agent: dict(totals) for agent, totals in self._totals.get(session_id, {}).items()}
+        agents = self._merge(local, usage_ledger.session_agent_totals(session_id))
+        combined: Dict[str, Any] = defaultdict(int)
+        for totals in agents.values():
+            for key, value in totals.items():
+                combined[key] += value
+        if "cost_usd" in combined:
+            combined["cost_usd"] = round(combined["cost_usd"], 6)
+        return {"total": dict(combined), "agents": agents}
+
+
+# Shared tracker used by all agents
+token_usage = TokenUsageTracker()
@@ -0,0 +1,159 @@
+"""
+Topic Index - Incremental per-session inverted index for instant transcript topic search
+"""
+import difflib
+import math
+import os
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from app.models import TranscriptLine
+from app.retrieval import tokenize
+
+
+def stem(word: str) -> str:
+    """
+    Light suffix-stripping stemmer (Porter step 1 style)
+    "updates", "updated", "updating" and "update" all map to "updat"
+    """
+    if len(word) <= 3:
+        return word
+
+    for suffix, replacement in (("sses", "ss"), ("ies", "y"), ("eed", "eed"),
+                                ("ing", ""), ("ed", ""), ("s", "")):
+        if not word.endswith(suffix):
+            continue
+        base = word[:-len(suffix)]
+        if len(base) < 3 or (suffix == "s" and word.endswith(("ss", "us", "is"))):
+            break
+        if suffix in ("ing", "ed"):
+            if not any(vowel in base for vowel in "aeiouy"):
+                break
+            # "running" -> "runn" -> "run"
+            if base[-1] == base[-2] and base[-1] not in "lsz":
+                base = base[:-1]
+        word = base + replacement
+        break
+
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def stem_tokens(text: str) -> List[str]:
+    return [stem(token) for token in tokenize(text)]
+
+
+class TopicIndex:
+    """
+    Inverted index over one meeting's transcript
+    Features:
+    - Lines are indexed as they arrive (no rebuild per query)
+    - Stemmed tokens so "deploy", "deploys" and "deployed" match
+    - Fuzzy fallback for misspelled or mis-transcribed terms
+    - Resyncs from a client-supplied transcript when it diverges
+    """
+
+    def __init__(self, fuzzy_cutoff: float = 0.8):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.lines: List[Tuple[str, str]] = []
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def add_line(self, speaker: str, text: str):
+        """Index a single new transcript line"""
+        line_number = len(self.lines)
+        self.lines.append((speaker, text))
+        for token in stem_tokens(text):
+            postings = self.postings[token]
+            postings[line_number] = postings.get(line_number, 0) + 1
+
+    def sync(self, transcript: List[TranscriptLine]):
+        """
+        Bring the index up to date with a full transcript
+
+        Only lines past the indexed prefix are tokenized. If the transcript no
+        longer starts with what was indexed, the index is rebuilt.
+        """
+        indexed = len(self.lines)
+        if indexed > len(transcript) or (
+            indexed and self.lines[-1] != (transcript[indexed - 1].speaker, transcript[indexed - 1].text)
+        ):
+            self.lines = []
+            self.postings = defaultdict(dict)
+            indexed = 0
+
+        for line in transcript[indexed:]:
+            self.add_line(line.speaker, line.text)
+
+    def _expand_term(self, term: str) -> List[str]:
+        """Exact vocabulary match, or the closest fuzzy matches"""
+        if term in self.postings:
+            return [term]
+        return difflib.get_close_matches(term, self.postings.keys(), n=3, cutoff=self.fuzzy_cutoff)
+
+    def search(self, topic: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Find lines discussing a topic
+
+        Args:
+            topic: Free-text topic or keywords
+            limit: Maximum number of matches to return
+
+        Returns:
+            List of (line_number, score) pairs, best first
+        """
+        terms = list(dict.fromkeys(stem_tokens(topic)))
+        if not terms or not self.lines:
+            return []
+
+        total_lines = len(self.lines)
+        scores: Dict[int, float] = defaultdict(float)
+        matched_terms: Dict[int, int] = defaultdict(int)
+
+        for term in terms:
+            seen = set()
+            for variant in self._expand_term(term):
+                postings = self.postings[variant]
+                idf = math.log(1 + total_lines / len(postings))
+                # Fuzzy matches count for less than exact ones
+                weight = 1.0 if variant == term else 0.6
+                for line_number, term_freq in postings.items():
+                    scores[line_number] += weight * idf * (1 + math.log(term_freq))
+                    if line_number not in seen:
+                        matched_terms[line_number] += 1
+                        seen.add(line_number)
+
+        # Multi-word topics need at least half their terms on a line
+        min_terms = max(1, math.ceil(len(terms) / 2))
+        results = [
+            (line_number, score)
+            for line_number, score in scores.items()
+            if matched_terms[line_number] >= min_terms
+        ]
+        results.sort(key=lambda pair: pair[1], reverse=True)
+        return results[:limit] if limit else results
+
+
+class TopicIndexRegistry:
+    """Per-session topic indexes, least recently used sessions evicted first"""
+
+    def __init__(self, max_sessions: Optional[int] = None):
+        self.max_sessions = max_sessions or int(os.getenv("TOPIC_INDEX_MAX_SESSIONS", "64"))
+        self._indexes: "OrderedDict[str, TopicIndex]" = OrderedDict()
+
+    def get(self, session_id: str) -> TopicIndex:
+        index = self._indexes.get(session_id)
+        if index is None:
+            index = TopicIndex()
+            self._indexes[session_id] = index
+            while len(self._indexes) > self.max_sessions:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(session_id)
+        return index
+
+    def drop(self, session_id: str):
+        self._indexes.pop(session_id, None)
@@ -0,0 +1,200 @@
+"""
+Tracing - Lightweight per-chunk span tracing with Chrome trace-event and OTLP export
+"""
+import os
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+SERVICE_NAME = "meeting-whisperer"
+
+
+class Span:
+    """One timed stage of a traced chunk"""
+
+    __slots__ = ("name", "span_id", "start_ns", "end_ns", "args")
+
+    def __init__(self, name: str, args: Optional[dict] = None):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.args = args or {}
+
+
+class ChunkTrace:
+    """
+    Spans for one unit of pipeline work (an audio chunk, a transcript line, a media file)
+
+    Usage:
+        trace = tracer.start("meeting.chunk", session_id, seq)
+        with trace.span("transcribe"):
+            line = await listener_agent.process_audio(data)
+        trace.finish()
+    """
+
+    sampled = True
+
+    def __init__(self, tracer: "Tracer", name: str, session_id: str, seq: int):
+        self.tracer = tracer
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(name, {"session_id": session_id, "seq": seq})
+        self.session_id = session_id
+        self.seq = seq
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **args):
+        span = Span(name, args)
+        try:
+            yield span
+        except BaseException as e:
+            span.args["error"] = type(e).__name__
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            self.spans.append(span)
+
+    def finish(self, **args):
+        if self.root.end_ns is None:
+            self.root.args.update(args)
+            self.root.end_ns = time.time_ns()
+            self.tracer._record(self)
+
+
+class _UnsampledTrace:
+    """Stand-in returned for chunks that are not sampled; every call is a no-op"""
+
+    sampled = False
+
+    @contextmanager
+    def span(self, name: str, **args):
+        yield None
+
+    def finish(self, **args):
+        pass
+
+
+UNSAMPLED = _UnsampledTrace()
+
+
+class Tracer:
+    """
+    Samples chunks, keeps finished traces in a bounded buffer and exports them
+    Features:
+    - Per-chunk sampling (TRACE_SAMPLE_RATE, adjustable at runtime)
+    - Chrome trace-event JSON (load in chrome://tracing or Perfetto)
+    - OTLP/HTTP JSON export to a local collector
+    """
+
+    def __init__(self):
+        self.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+        self.otlp_endpoint = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+        self._traces: deque = deque(maxlen=int(os.getenv("TRACE_BUFFER_SIZE", "2000")))
+        self._lock = threading.Lock()
+
+    def start(self, name: str, session_id: str, seq: int = 0):
+        """Begin a trace for one chunk, or return a no-op trace if it is not sampled"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return UNSAMPLED
+        return ChunkTrace(self, name, session_id, seq)
+
+    def set_sample_rate(self, rate: float):
+        self.sample_rate = min(max(rate, 0.0), 1.0)
+
+    def _record(self, trace: ChunkTrace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def traces(self, session_id: Optional[str] = None) -> List[ChunkTrace]:
+        with self._lock:
+            traces = list(self._traces)
+        if session_id:
+            traces = [trace for trace in traces if trace.session_id == session_id]
+        return traces
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+    def to_chrome(self, session_id: Optional[str] = None) -> dict:
+        """
+        Chrome trace-event format: one process per session, one thread per chunk
+        """
+        events = []
+        pids: Dict[str, int] = {}
+        for trace in self.traces(session_id):
+            if trace.session_id not in pids:
+                pids[trace.session_id] = len(pids) + 1
+                events.append({
+                    "name": "process_name", "ph": "M", "pid": pids[trace.session_id], "tid": 0,
+                    "args": {"name": f"session {trace.session_id}"}
+                })
+            pid = pids[trace.session_id]
+            for span in [trace.root] + trace.spans:
+                events.append({
+                    "name": span.name,
+                    "cat": trace.root.name,
+                    "ph": "X",
+                    "ts": span.start_ns / 1000,
+                    "dur": ((span.end_ns or span.start_ns) - span.start_ns) / 1000,
+                    "pid": pid,
+                    "tid": trace.seq,
+                    "args": span.args
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_otlp(self, session_id: Optional[str] = None) -> dict:
+        """OTLP/HTTP JSON payload (ExportTraceServiceRequest)"""
+        def attributes(args: dict) -> list:
+            return [{"key": str(key), "value": {"stringValue": str(value)}} for key, value in args.items()]
+
+        spans = []
+        for trace in self.traces(session_id):
+            for span in [trace.root] + trace.spans:
+                otlp_span = {
+                    "traceId": trace.trace_id,
+                    "spanId": span.span_id,
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                    "attributes": attributes(span.args)
+                }
+                if span is not trace.root:
+                    otlp_span["parentSpanId"] = trace.root.span_id
+                spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}]
+            }]
+        }
+
+    async def export_otlp(self, session_id: Optional[str] = None) -> dict:
+        """
+        Push buffered traces to the configured OTLP/HTTP collector (TRACE_OTLP_ENDPOINT)
+
+        Returns:
+            Dictionary with the endpoint, span count and collector status code
+        """
+        import httpx  # Only needed for exports; keeps it off the startup path
+
+        payload = self.to_otlp(session_id)
+        endpoint = self.otlp_endpoint
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.post(endpoint, json=payload)
+        return {
+            "endpoint": endpoint,
+            "spans": len(payload["resourceSpans"][0]["scopeSpans"][0]["spans"]),
+            "status_code": response.status_code
+        }
+
+
+# Shared tracer used by the WebSocket handlers and media endpoints
+tracer = Tracer()
@@ -0,0 +1,397 @@
+"""
+Usage Ledger - Per-call cost and latency records for every external provider call
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from app.metrics import llm_calls, llm_tokens, registry
+
+logger = logging.getLogger(__name__)
+
+# JSON-lines file entries are appended to (off by default: the ledger is kept in memory only)
+USAGE_LEDGER_PATH = os.getenv("USAGE_LEDGER_PATH", "")
+USAGE_LEDGER_FLUSH_SECONDS = float(os.getenv("USAGE_LEDGER_FLUSH_SECONDS", "10"))
+# The file is rotated at this size, keeping USAGE_LEDGER_BACKUPS old files (path.1 is the newest)
+USAGE_LEDGER_MAX_BYTES = int(os.getenv("USAGE_LEDGER_MAX_BYTES", str(50 * 1024 * 1024)))
+USAGE_LEDGER_BACKUPS = int(os.getenv("USAGE_LEDGER_BACKUPS", "5"))
+# Recent entries kept in memory for /api/sessions/{id}/usage
+USAGE_LEDGER_MAX_ENTRIES = int(os.getenv("USAGE_LEDGER_MAX_ENTRIES", "50000"))
+# Sessions whose totals are kept, least recently used dropped first (fleet-wide agent totals are kept regardless)
+USAGE_LEDGER_MAX_SESSIONS = int(os.getenv("USAGE_LEDGER_MAX_SESSIONS", "1000"))
+
+# Session and endpoint the current call is made for (set by WebSocket handlers and HTTP middleware)
+usage_session: ContextVar[Optional[str]] = ContextVar("usage_session", default=None)
+usage_endpoint: ContextVar[Optional[str]] = ContextVar("usage_endpoint", default=None)
+
+UNSCOPED_SESSION = "unscoped"
+
+# Message Batches jobs are billed at half the list price
+LLM_BATCH_PRICE_FACTOR = 0.5
+
+# USD list prices. LLM: per million tokens, matched on the first model-name
+# substring that fits. STT: per audio minute. Override with USAGE_PRICING (JSON).
+DEFAULT_PRICING = {
+    "llm": [
+        {"match": "3-5-haiku", "input": 0.80, "output": 4.00, "cache_write": 1.00, "cache_read": 0.08},
+        {"match": "haiku-4", "input": 1.00, "output": 5.00, "cache_write": 1.25, "cache_read": 0.10},
+        {"match": "haiku", "input": 0.25, "output": 1.25, "cache_write": 0.30, "cache_read": 0.03},
+        {"match": "sonnet", "input": 3.00, "output": 15.00, "cache_write": 3.75, "cache_read": 0.30},
+        {"match": "opus", "input": 15.00, "output": 75.00, "cache_write": 18.75, "cache_read": 1.50}
+    ],
+    "stt_per_minute": {
+        "whisper_api": 0.006,
+        "assemblyai": 0.0062,
+        "deepgram": 0.0059,
+        "local_whisper": 0.0,
+        "simulated": 0.0
+    },
+    "per_call": {
+        "jira": 0.0
+    }
+}
+
+ledger_cost_usd = registry.counter(
+    "external_call_cost_usd_total",
+    "Estimated spend on external providers",
+    ["provider", "agent"]
+)
+
+
+def _load_pricing() -> Dict[str, Any]:
+    pricing = json.loads(json.dumps(DEFAULT_PRICING))
+    override = os.getenv("USAGE_PRICING", "")
+    if not override:
+        return pricing
+    try:
+        if os.path.exists(override):
+            with open(override) as f:
+                override = f.read()
+        custom = json.loads(override)
+        pricing["llm"] = custom.get("llm", []) + pricing["llm"]
+        pricing["stt_per_minute"].update(custom.get("stt_per_minute", {}))
+        pricing["per_call"].update(custom.get("per_call", {}))
+    except (OSError, ValueError) as e:
+        logger.warning("⚠️ Ignoring invalid USAGE_PRICING: %s", e)
+    return pricing
+
+
+def set_usage_context(session_id: Optional[str] = None, endpoint: Optional[str] = None):
+    """Attribute external calls made from the current task (and tasks it creates) to a session/endpoint"""
+    if session_id is not None:
+        usage_session.set(session_id)
+    if endpoint is not None:
+        usage_endpoint.set(endpoint)
+
+
+class UsageLedger:
+    """
+    In-memory ledger of external calls, flushed to a JSON-lines file
+    Features:
+    - One entry per Claude, Whisper, AssemblyAI, Deepgram and Jira call
+    - Session, endpoint, agent, model, tokens, audio seconds, latency and estimated cost
+    - Per-session and per-agent totals: the source of truth for token and
+      cost reporting (/api/sessions/{id}/tokens reads from here too)
+    - Fleet-wide rollups by any entry field
+    - Optional background flush to a size-rotated file; recording never blocks on disk
+    """
+
+    def __init__(
+        self,
+        path: str = USAGE_LEDGER_PATH,
+        flush_seconds: float = USAGE_LEDGER_FLUSH_SECONDS,
+        max_entries: int = USAGE_LEDGER_MAX_ENTRIES,
+        max_sessions: int = USAGE_LEDGER_MAX_SESSIONS,
+        max_bytes: int = USAGE_LEDGER_MAX_BYTES,
+        backups: int = USAGE_LEDGER_BACKUPS
+    ):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.pricing = _load_pricing()
+        self._lock = threading.Lock()
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=max_entries)
+        self._pending: List[Dict[str, Any]] = []
+        self._session_totals: "OrderedDict[str, Dict[str, Dict[str, float]]]" = OrderedDict()
+        self._agent_totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --- Pricing -----------------------------------------------------------
+
+    def _llm_prices(self, model: Optional[str]) -> Optional[Dict[str, float]]:
+        for prices in self.pricing["llm"]:
+            if model and prices["match"] in model:
+                return prices
+        return None
+
+    def estimate_cost(self, entry: Dict[str, Any]) -> Optional[float]:
+        """USD estimate for an entry, or None when its model/provider has no price"""
+        provider = entry["provider"]
+        if entry.get("input_tokens") or entry.get("output_tokens"):
+            prices = self._llm_prices(entry.get("model"))
+            if prices is None:
+                return 0.0 if provider == "simulated" else None
+            cost = (
+                entry.get("input_tokens", 0) * prices["input"]
+                + entry.get("output_tokens", 0) * prices["output"]
+                + entry.get("cache_creation_input_tokens", 0) * prices["cache_write"]
+                + entry.get("cache_read_input_tokens", 0) * prices["cache_read"]
+            ) / 1_000_000
+            if entry.get("operation") == "messages.batches":
+                cost *= LLM_BATCH_PRICE_FACTOR
+            return cost
+        if entry.get("audio_seconds"):
+            per_minute = self.pricing["stt_per_minute"].get(provider)
+            return None if per_minute is None else entry["audio_seconds"] / 60 * per_minute
+        return self.pricing["per_call"].get(provider, 0.0)
+
+    # --- Recording ---------------------------------------------------------
+
+    def record(
+        self,
+        provider: str,
+        operation: str,
+        agent: str,
+        latency_ms: float,
+        model: Optional[str] = None,
+        session_id: Optional[str] = None,
+        outcome: str = "ok",
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cache_creation_input_tokens: int = 0,
+        cache_read_input_tokens: int = 0,
+        audio_seconds: float = 0.0,
+        **extra
+    ) -> Dict[str, Any]:
+        """
+        Record one external call
+
+        Args:
+            provider: anthropic, simulated, whisper_api, assemblyai, local_whisper, deepgram, jira
+            operation: messages.create, messages.stream, messages.batches, chunk, file, stream, create_issue, ...
+            agent: Agent that made the call
+            latency_ms: Wall time of the call
+            model: Model name, when the provider has one
+            session_id: Meeting session (defaults to the current usage context)
+            outcome: "ok" or "error"
+
+        Returns:
+            The stored entry
+        """
+        entry = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "session_id": session_id or usage_session.get() or UNSCOPED_SESSION,
+            "endpoint": usage_endpoint.get(),
+            "provider": provider,
+            "operation": operation,
+            "agent": agent,
+            "model": model,
+            "outcome": outcome,
+            "latency_ms": round(latency_ms, 1),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_creation_input_tokens": cache_creation_input_tokens,
+            "cache_read_input_tokens": cache_read_input_tokens,
+            "audio_seconds": round(audio_seconds, 3),
+            **extra
+        }
+        cost = self.estimate_cost(entry)
+        entry["cost_usd"] = round(cost, 8) if cost is not None else None
+
+        with self._lock:
+            self._entries.append(entry)
+            if self.path:
+                self._pending.append(entry)
+            for totals in (self._session(entry["session_id"])[agent], self._agent_totals[agent]):
+                totals["calls"] += 1
+                totals["errors"] += outcome != "ok"
+                totals["latency_ms"] += entry["latency_ms"]
+                totals["cost_usd"] += entry["cost_usd"] or 0.0
+                for key in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "audio_seconds"):
+                    totals[key] += entry[key]
+        if cost:
+            ledger_cost_usd.inc(cost, provider=provider, agent=agent)
+
+        self._ensure_flusher()
+        return entry
+
+    def _session(self, session_id: str) -> Dict[str, Dict[str, float]]:
+        """Totals by agent for a session (call with the lock held)"""
+        agents = self._session_totals.get(session_id)
+        if agents is None:
+            agents = self._session_totals[session_id] = defaultdict(lambda: defaultdict(float))
+            while len(self._session_totals) > self.max_sessions:
+                self._session_totals.popitem(last=False)
+        else:
+            self._session_totals.move_to_end(session_id)
+        return agents
+
+    def record_llm(self, provider: str, operation: str, agent: str, model: Optional[str], response, latency_ms: float, outcome: str = "ok"):
+        """Record a Messages API call from its response usage block"""
+        usage = getattr(response, "usage", None)
+        llm_calls.inc(agent=agent)
+        if usage is not None:
+            for kind in ("input", "output", "cache_read_input", "cache_creation_input"):
+                llm_tokens.inc(getattr(usage, f"{kind}_tokens", 0) or 0, agent=agent, kind=kind)
+        self.record(
+            provider,
+            operation,
+            agent,
+            latency_ms,
+            model=getattr(response, "model", None) or model,
+            outcome=outcome,
+            input_tokens=getattr(usage, "input_tokens", 0) or 0,
+            output_tokens=getattr(usage, "output_tokens", 0) or 0,
+            cache_creation_input_tokens=getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            cache_read_input_tokens=getattr(usage, "cache_read_input_tokens", 0) or 0
+        )
+
+    @contextmanager
+    def track(self, provider: str, operation: str, agent: str, **fields):
+        """
+        Time a block and record it; the yielded dict can be updated with
+        fields learned during the call (audio_seconds, outcome, status, ...)
+
+        Usage:
+            with usage_ledger.track("whisper_api", "chunk", "listener", model="whisper-1") as call:
+                transcript = client.audio.transcriptions.create(...)
+                call["audio_seconds"] = transcript.duration
+        """
+        call: Dict[str, Any] = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield call
+        except BaseException:
+            call["outcome"] = "error"
+            raise
+        finally:
+            self.record(provider, operation, agent, (time.perf_counter() - start) * 1000, **call)
+
+    # --- Queries -----------------------------------------------------------
+
+    def session_agent_totals(self, session_id: str) -> Dict[str, Dict[str, float]]:
+        """Totals by agent for one session"""
+        with self._lock:
+            return {agent: dict(totals) for agent, totals in self._session_totals.get(session_id, {}).items()}
+
+    def agent_totals(self) -> Dict[str, Dict[str, float]]:
+        """Totals by agent across all sessions"""
+        with self._lock:
+            return {agent: dict(totals) for agent, totals in self._agent_totals.items()}
+
+    def session_usage(self, session_id: str, limit: int = 500) -> Dict[str, Any]:
+        """Totals by agent and the most recent entries for one session"""
+        agents = self.session_agent_totals(session_id)
+        with self._lock:
+            entries = [entry for entry in self._entries if entry["session_id"] == session_id]
+        total: Dict[str, float] = defaultdict(float)
+        for totals in agents.values():
+            for key, value in totals.items():
+                total[key] += value
+        return {
+            "session_id": session_id,
+            "total": dict(total),
+            "agents": agents,
+            "entries": entries[-limit:]
+        }
+
+    def rollup(self, group_by: Iterable[str] = ("provider", "agent"), since: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Fleet-wide totals grouped by entry fields, most expensive first
+
+        Covers entries still in memory (the last USAGE_LEDGER_MAX_ENTRIES calls);
+        older history is in the ledger file.
+
+        Args:
+            group_by: Entry fields to group on (session_id, endpoint, provider, agent, model, operation)
+            since: ISO timestamp; only entries at or after it
+        """
+        group_by = tuple(group_by)
+        groups: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        latencies: Dict[tuple, List[float]] = defaultdict(list)
+        with self._lock:
+            entries = list(self._entries)
+        for entry in entries:
+            if since and entry["ts"] < since:
+                continue
+            key = tuple(entry.get(field) for field in group_by)
+            totals = groups[key]
+            totals["calls"] += 1
+            totals["errors"] += entry["outcome"] != "ok"
+            totals["cost_usd"] += entry["cost_usd"] or 0.0
+            totals["unpriced_calls"] += entry["cost_usd"] is None
+            for field in ("input_tokens", "output_tokens", "cache_read_input_tokens", "audio_seconds"):
+                totals[field] += entry[field]
+            latencies[key].append(entry["latency_ms"])
+
+        rows = []
+        for key, totals in groups.items():
+            ordered = sorted(latencies[key])
+            rows.append({
+                **dict(zip(group_by, key)),
+                **{name: round(value, 6) if name == "cost_usd" else value for name, value in totals.items()},
+                "latency_ms_p50": ordered[len(ordered) // 2],
+                "latency_ms_p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            })
+        rows.sort(key=lambda row: row["cost_usd"], reverse=True)
+        return rows[:limit]
+
+    # --- Storage -----------------------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._flusher is None and self.path:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name="usage-ledger", daemon=True)
+                    self._flusher.start()
+                    atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def flush(self) -> int:
+        """Append pending entries to the ledger file; returns how many were written"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        try:
+            self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in pending))
+        except OSError as e:
+            logger.error("❌ Usage ledger flush failed, keeping %s entries for retry: %s", len(pending), e)
+            with self._lock:
+                self._pending = (pending + self._pending)[-(self._entries.maxlen or len(pending)):]
+            return 0
+        return len(pending)
+
+    def _rotate(self):
+        """Shift path -> path.1 -> ... -> path.N (dropping the oldest) once the file reaches max_bytes"""
+        if self.max_bytes <= 0 or not os.path.exists(self.path) or os.path.getsize(self.path) < self.max_bytes:
+            return
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        logger.info("🗂️ Rotated usage ledger %s", self.path)
+
+
+# Shared ledger used by provider clients, the listener and the Jira agent
+usage_ledger = UsageLedger()
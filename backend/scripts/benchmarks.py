@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the backend's pure-Python hot paths
+
+Covers agent prompt building (each agent called with an instant in-process
+LLM client, so only our own work is timed), TranscriptLine/ActionItem
+construction and .dict(), WebSocket send_json payload encoding, the
+emotion-to-happiness mapping and agent response JSON parsing. Fixtures are
+generated from a fixed seed at 10, 1,000 and 100,000 transcript lines.
+
+    python scripts/benchmarks.py                       # run and compare with the saved baseline
+    python scripts/benchmarks.py --save                # overwrite the baseline
+    python scripts/benchmarks.py --filter models --sizes 10,1000
+    python scripts/benchmarks.py --fail-on-regression  # exit 1 if anything is >25% slower
+
+Baselines are machine-specific; the comparison warns when the baseline was
+recorded on a different machine or Python.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import warnings
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Agents are constructed offline; their client is replaced with InstantLLMClient below
+os.environ.setdefault("LLM_PROVIDER", "simulated")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["DEMO_MODE"] = "false"
+# The app still calls pydantic's .dict(); benchmark it as shipped without the noise
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+from app.logging_config import configure_logging  # noqa: E402
+
+configure_logging()
+
+from app.agents.emotion_agent import EmotionAnalysisAgent, emotion_to_happiness  # noqa: E402
+from app.agents.personalized_assistant_agent import PersonalizedAssistantAgent  # noqa: E402
+from app.agents.qa_agent import QAAgent  # noqa: E402
+from app.agents.realtime_insights_agent import RealTimeInsightsAgent  # noqa: E402
+from app.agents.summarizer_agent import SummarizerAgent  # noqa: E402
+from app.agents.task_generator_agent import TaskGeneratorAgent  # noqa: E402
+from app.models import ActionItem, TranscriptLine  # noqa: E402
+from app.simulated_providers import (  # noqa: E402
+    PHRASES,
+    SimulatedMessage,
+    SimulatedTextBlock,
+    SimulatedToolUseBlock,
+    SimulatedUsage,
+)
+from app.structured_output import IncrementalJSONParser, parse_json_text  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+SIZES = (10, 1_000, 100_000)
+SEED = 1234
+SPEAKERS = ["Alice", "Bob", "Carol", "Dan"]
+EMOTIONS = ["excited", "happy", "content", "neutral", "uncertain", "concerned", "frustrated", "calm", "focused", "surprised"]
+
+
+# --- Fixtures --------------------------------------------------------------
+
+def transcript_dicts(size: int) -> List[Dict[str, str]]:
+    """Transcript lines as the frontend posts them"""
+    rng = random.Random(SEED)
+    start = datetime(2024, 1, 15, 9, 0, 0)
+    return [
+        {
+            "speaker": rng.choice(SPEAKERS),
+            "text": " ".join(rng.choice(PHRASES) for _ in range(rng.randint(1, 3))),
+            "timestamp": (start + timedelta(seconds=4 * i)).isoformat()
+        }
+        for i in range(size)
+    ]
+
+
+def transcript_lines(size: int) -> List[TranscriptLine]:
+    return [TranscriptLine(**item) for item in transcript_dicts(size)]
+
+
+def action_item_dicts(size: int) -> List[Dict[str, Any]]:
+    rng = random.Random(SEED)
+    return [
+        {
+            "text": rng.choice(PHRASES),
+            "assignee": rng.choice(SPEAKERS + [None]),
+            "priority": rng.choice(["high", "medium", "low"]),
+            "due_date": rng.choice([None, "2024-02-01", "Friday"]),
+            "confidence": round(rng.uniform(0.5, 1.0), 2)
+        }
+        for _ in range(size)
+    ]
+
+
+def agent_response_text(size: int, repaired: bool = False) -> str:
+    """A task-generator style JSON response with `size` items; optionally fenced with trailing commas"""
+    text = json.dumps({"action_items": action_item_dicts(size)}, indent=2)
+    if repaired:
+        text = "Here are the action items:\n```json\n" + text.replace("\n  ]", ",\n  ]") + "\n```"
+    return text
+
+
+class InstantLLMClient:
+    """Returns a canned message immediately so agent benchmarks time only prompt building and parsing"""
+
+    def __init__(self):
+        self.messages = self
+        self._text = json.dumps({"summary": PHRASES[0], "confidence": 0.9})
+
+    def _message(self, kwargs: dict) -> SimulatedMessage:
+        usage = SimulatedUsage(input_tokens=1000, output_tokens=50)
+        tool_choice = kwargs.get("tool_choice") or {}
+        if tool_choice.get("type") == "tool":
+            block = SimulatedToolUseBlock(name=tool_choice["name"], input={
+                "action_items": [], "items": [], "answer": PHRASES[0], "confidence": 0.9,
+                "sources": [], "relevant_speakers": [], "summary": PHRASES[0], "key_points": [],
+                "decisions": [], "primary_emotion": "neutral", "happiness_emoji": "😐",
+                "energy_level": "medium", "stress_level": "none"
+            }, id="toolu_bench")
+            return SimulatedMessage(content=[block], usage=usage, model="bench", stop_reason="tool_use", id="msg_bench")
+        return SimulatedMessage(content=[SimulatedTextBlock(text=self._text)], usage=usage, model="bench", id="msg_bench")
+
+    def create(self, **kwargs) -> SimulatedMessage:
+        return self._message(kwargs)
+
+    @contextmanager
+    def stream(self, **kwargs):
+        message = self._message(kwargs)
+
+        class _Stream:
+            text_stream = [PHRASES[1]]
+
+            @staticmethod
+            def get_final_message():
+                return message
+
+        yield _Stream()
+
+    async def acreate(self, priority=None, **kwargs) -> SimulatedMessage:
+        return self._message(kwargs)
+
+    @asynccontextmanager
+    async def astream(self, priority=None, **kwargs):
+        message = self._message(kwargs)
+
+        class _Stream:
+            @property
+            async def text_stream(self):
+                yield PHRASES[1]
+
+            @staticmethod
+            def get_final_message():
+                return message
+
+        yield _Stream()
+
+
+def agent(cls):
+    instance = cls()
+    instance.client = InstantLLMClient()
+    return instance
+
+
+# --- Registry --------------------------------------------------------------
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[int], Callable[[], Any]]
+    sizes: tuple = SIZES
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, sizes: tuple = SIZES):
+    """Register a setup function: setup(size) returns the zero-argument callable to time"""
+    def decorator(setup):
+        BENCHMARKS.append(Benchmark(name, setup, sizes))
+        return setup
+    return decorator
+
+
+def run_async(coro_factory: Callable[[], Any]) -> Callable[[], Any]:
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(coro_factory())
+
+
+async def drain(agen):
+    return [item async for item in agen]
+
+
+# --- Models ----------------------------------------------------------------
+
+@benchmark("models.transcript_line_construct")
+def _(size):
+    items = transcript_dicts(size)
+    return lambda: [TranscriptLine(**item) for item in items]
+
+
+@benchmark("models.transcript_line_dict")
+def _(size):
+    lines = transcript_lines(size)
+    return lambda: [line.dict() for line in lines]
+
+
+@benchmark("models.action_item_construct")
+def _(size):
+    items = action_item_dicts(size)
+    return lambda: [ActionItem(**item) for item in items]
+
+
+@benchmark("models.action_item_dict")
+def _(size):
+    items = [ActionItem(**item) for item in action_item_dicts(size)]
+    return lambda: [item.dict() for item in items]
+
+
+# --- WebSocket payloads ----------------------------------------------------
+
+def encode_ws(message: dict) -> str:
+    # Same encoding as Starlette's WebSocket.send_json
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+@benchmark("ws.send_json_transcript")
+def _(size):
+    emotions = {"primary_emotion": "neutral", "happiness_emoji": "😐", "energy_level": "medium", "stress_level": "none", "confidence": 0.8}
+    lines = transcript_lines(size)
+    return lambda: [
+        encode_ws({
+            "type": "transcript",
+            "seq": i,
+            "data": {"speaker": line.speaker, "text": line.text, "timestamp": line.timestamp.isoformat(), "emotions": emotions}
+        })
+        for i, line in enumerate(lines)
+    ]
+
+
+@benchmark("ws.send_json_action_items")
+def _(size):
+    items = [ActionItem(**item) for item in action_item_dicts(size)]
+    return lambda: encode_ws({"type": "action_items", "data": [item.dict() for item in items]})
+
+
+# --- Emotion mapping -------------------------------------------------------
+
+@benchmark("emotion.happiness_mapping")
+def _(size):
+    rng = random.Random(SEED)
+    emotions = [rng.choice(EMOTIONS) for _ in range(size)]
+    return lambda: [emotion_to_happiness(emotion) for emotion in emotions]
+
+
+# --- Response parsing ------------------------------------------------------
+
+@benchmark("parse.json_clean")
+def _(size):
+    text = agent_response_text(size)
+    return lambda: parse_json_text(text)
+
+
+@benchmark("parse.json_repaired")
+def _(size):
+    text = agent_response_text(size, repaired=True)
+    return lambda: parse_json_text(text)
+
+
+@benchmark("parse.incremental_stream", sizes=(10, 1_000))
+def _(size):
+    text = agent_response_text(size)
+    pieces = [text[i:i + 16] for i in range(0, len(text), 16)]
+
+    def feed_all():
+        parser = IncrementalJSONParser()
+        for piece in pieces:
+            parser.feed(piece)
+        return parser.value()
+
+    return feed_all
+
+
+# --- Agent prompt building -------------------------------------------------
+
+@benchmark("agents.task_generator.extract_action_items")
+def _(size):
+    task_generator, lines = agent(TaskGeneratorAgent), transcript_lines(size)
+    return run_async(lambda: task_generator.extract_action_items(lines))
+
+
+@benchmark("agents.summarizer.generate_summary")
+def _(size):
+    summarizer, lines = agent(SummarizerAgent), transcript_lines(size)
+    items = [ActionItem(**item) for item in action_item_dicts(min(size, 50))]
+    return run_async(lambda: summarizer.generate_summary(lines, items))
+
+
+@benchmark("agents.qa.answer_question")
+def _(size):
+    qa, lines = agent(QAAgent), transcript_lines(size)
+    return run_async(lambda: qa.answer_question("Who owns the database migration?", lines))
+
+
+@benchmark("agents.emotion.analyze_emotions")
+def _(size):
+    emotion, lines = agent(EmotionAnalysisAgent), transcript_lines(size)
+    return run_async(lambda: emotion.analyze_emotions(lines))
+
+
+@benchmark("agents.realtime_insights.analyze_live_transcript")
+def _(size):
+    insights, lines = agent(RealTimeInsightsAgent), transcript_lines(size)
+    return run_async(lambda: drain(insights.analyze_live_transcript(lines[-1], lines)))
+
+
+@benchmark("agents.personalized.analyze_for_user")
+def _(size):
+    assistant, recent = agent(PersonalizedAssistantAgent), transcript_dicts(size)
+    profile = {"name": "Paul", "strong_areas": ["finance"], "weak_areas": ["technical"], "expertise_level": "finance_expert"}
+    return run_async(lambda: assistant.analyze_for_user(profile, recent, recent[-1]["text"]))
+
+
+# --- Runner ----------------------------------------------------------------
+
+def measure(func: Callable[[], Any], min_time: float, repeat: int) -> Dict[str, float]:
+    """Calibrate a loop count that runs for at least min_time, then take `repeat` timings"""
+    func()  # warm-up (imports, caches, lazy encoders)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    return {"min_s": min(timings), "median_s": statistics.median(timings), "loops": number, "repeat": repeat}
+
+
+def machine_info() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "processor": platform.processor() or "unknown",
+        "cpu_count": str(os.cpu_count())
+    }
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict]:
+    sizes = tuple(int(s) for s in args.sizes.split(",")) if args.sizes else None
+    results = {}
+    for bench in BENCHMARKS:
+        if args.filter and args.filter not in bench.name:
+            continue
+        for size in bench.sizes:
+            if sizes and size not in sizes:
+                continue
+            key = f"{bench.name}[{size}]"
+            results[key] = measure(bench.setup(size), args.min_time, args.repeat)
+            print(f"  {key:<60} {format_seconds(results[key]['min_s']):>12}", flush=True)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, threshold: float) -> List[str]:
+    """Print a comparison table; return the keys slower than baseline * threshold"""
+    if baseline.get("machine") != machine_info():
+        print("⚠️ Baseline was recorded on a different machine/Python; ratios are indicative only")
+    regressions = []
+    print(f"\n  {'benchmark':<60} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for key, current in results.items():
+        previous = baseline.get("results", {}).get(key)
+        if not previous:
+            print(f"  {key:<60} {'-':>12} {format_seconds(current['min_s']):>12} {'new':>7}")
+            continue
+        ratio = current["min_s"] / previous["min_s"]
+        marker = " ❌" if ratio > threshold else (" ✅" if ratio < 1 / threshold else "")
+        print(f"  {key:<60} {format_seconds(previous['min_s']):>12} {format_seconds(current['min_s']):>12} {ratio:>6.2f}x{marker}")
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for backend hot paths")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--sizes", default=None, help="Comma-separated fixture sizes (default 10,1000,100000)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="Timings per benchmark (min is reported)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 if any benchmark regressed")
+    args = parser.parse_args(argv)
+
+    print(f"⏱️ Running benchmarks (min {args.min_time}s x {args.repeat})")
+    results = run(args)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        # Partial runs (--filter/--sizes) update only the benchmarks they ran
+        merged = {**baseline.get("results", {}), **results} if baseline.get("machine") == machine_info() else results
+        with open(args.baseline, "w") as f:
+            json.dump({"recorded_at": datetime.now().isoformat(timespec="seconds"), "machine": machine_info(), "results": merged}, f, indent=2, sort_keys=True)
+        print(f"📝 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ No baseline at {args.baseline}; run with --save to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {args.threshold}x")
+        return 1 if args.fail_on_regression else 0
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+WebSocket load generator for /ws/meeting and /ws/realtime-video
+
+Opens N concurrent sessions against a running backend, streams recorded or
+synthetic audio at real-time pace and writes a JSON report with
+chunk-to-transcript and action-item latency percentiles, late/dropped frames
+and server CPU/RSS (scraped from /metrics while the test runs).
+
+Run the backend on the simulated providers to size the app itself, or on the
+real ones to include provider latency:
+    LLM_PROVIDER=simulated STT_PROVIDER=simulated STREAMING_STT_PROVIDER=simulated python start_server.py
+    python scripts/load_test.py --endpoint meeting --sessions 50 --duration 60 --report load-report.json
+
+Latency is measured against the send time of the audio a result belongs to:
+/ws/meeting replies carry the chunk "seq", /ws/realtime-video transcripts
+carry "audio_end" (seconds of streamed audio). --max-p95-ms and
+--max-dropped-rate make the run exit non-zero for regression checks.
+"""
+import argparse
+import asyncio
+import bisect
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+import wave
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import aiohttp
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit PCM, what /ws/realtime-video expects
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH
+
+# Frontend defaults: MediaRecorder.start(1000) and a 4096-sample ScriptProcessor
+DEFAULT_CHUNK_SECONDS = {"meeting": 1.0, "realtime-video": 4096 / SAMPLE_RATE}
+
+
+def load_audio(path: str) -> bytes:
+    """Read 16 kHz mono 16-bit PCM from a WAV file"""
+    with wave.open(path, "rb") as wav:
+        if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, SAMPLE_WIDTH):
+            raise ValueError(
+                f"{path}: expected 16 kHz mono 16-bit WAV, got {wav.getframerate()} Hz, "
+                f"{wav.getnchannels()} channel(s), {wav.getsampwidth() * 8}-bit"
+            )
+        return wav.readframes(wav.getnframes())
+
+
+def synthetic_audio(seconds: float, seed: int = 0) -> bytes:
+    """Speech-like PCM: syllable-rate amplitude bursts of a few tones with short pauses"""
+    rng = random.Random(seed)
+    samples = bytearray()
+    t = 0
+    while len(samples) < seconds * BYTES_PER_SECOND:
+        burst = int(SAMPLE_RATE * rng.uniform(0.15, 0.4))
+        silent = rng.random() < 0.2
+        pitch = rng.uniform(110, 260)
+        for n in range(burst):
+            envelope = math.sin(math.pi * n / burst)
+            value = 0 if silent else envelope * 8000 * (
+                math.sin(2 * math.pi * pitch * t / SAMPLE_RATE)
+                + 0.4 * math.sin(2 * math.pi * pitch * 2.7 * t / SAMPLE_RATE)
+            ) / 1.4
+            samples += int(value).to_bytes(2, "little", signed=True)
+            t += 1
+    return bytes(samples[:int(seconds * BYTES_PER_SECOND) // 2 * 2])
+
+
+def wav_bytes(pcm: bytes) -> bytes:
+    """Wrap a PCM slice as a standalone WAV file (one /ws/meeting chunk)"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """count, mean, p50/p90/p95/p99 and max, in milliseconds"""
+    if not values:
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p90_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)] * 1000, 1)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 1)
+    }
+
+
+@dataclass
+class SessionResult:
+    session_id: str
+    connected: bool = False
+    frames_sent: int = 0
+    frames_late: int = 0
+    frames_unsent: int = 0
+    frames_unanswered: int = 0
+    transcript_latencies: List[float] = field(default_factory=list)
+    interim_latencies: List[float] = field(default_factory=list)
+    action_item_latencies: List[float] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+
+class LoadTest:
+    """
+    Drives concurrent sessions against one backend
+    Features:
+    - Real-time paced audio per session with optional ramp-up
+    - Latency matched to the exact chunk (meeting) or audio offset (realtime-video)
+    - Late frames (sender behind schedule) and dropped frames (never sent or never answered)
+    - Server CPU/RSS sampled from /metrics during the run
+    """
+
+    def __init__(self, args: argparse.Namespace, pcm: bytes):
+        self.args = args
+        self.pcm = pcm
+        self.base_url = args.url.rstrip("/")
+        self.http_url = self.base_url.replace("ws://", "http://", 1).replace("wss://", "https://", 1)
+        self.chunk_seconds = args.chunk_seconds or DEFAULT_CHUNK_SECONDS[args.endpoint]
+        self.chunk_bytes = int(self.chunk_seconds * SAMPLE_RATE) * SAMPLE_WIDTH
+        self.total_chunks = max(1, int(args.duration / self.chunk_seconds))
+        self.run_id = uuid.uuid4().hex[:8]
+        self.server_samples: List[Dict] = []
+
+    def _chunk(self, index: int) -> bytes:
+        """PCM for chunk index, looping the source audio"""
+        start = (index * self.chunk_bytes) % len(self.pcm)
+        chunk = self.pcm[start:start + self.chunk_bytes]
+        while len(chunk) < self.chunk_bytes:
+            chunk += self.pcm[:self.chunk_bytes - len(chunk)]
+        return chunk
+
+    async def _paced_send(self, ws, result: SessionResult, encode, on_sent):
+        """Send every chunk on its real-time schedule; counts late and unsent frames"""
+        start = time.monotonic()
+        for index in range(self.total_chunks):
+            target = start + index * self.chunk_seconds
+            delay = target - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > self.chunk_seconds:
+                result.frames_late += 1
+            if ws.closed:
+                result.frames_unsent += self.total_chunks - index
+                return
+            # Registered before the send so a fast reply can't arrive unmatched
+            result.frames_sent += 1
+            on_sent(index, time.monotonic())
+            try:
+                await ws.send_bytes(encode(self._chunk(index)))
+            except (ConnectionError, RuntimeError) as e:
+                result.errors.append(f"send: {e}")
+                result.frames_unsent += self.total_chunks - index - 1
+                return
+
+    async def _drain(self, reader: asyncio.Task, done):
+        """Wait for outstanding replies, up to --drain-timeout"""
+        deadline = time.monotonic() + self.args.drain_timeout
+        while not done() and not reader.done() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def run_meeting(self, http: aiohttp.ClientSession, result: SessionResult):
+        """/ws/meeting: WAV chunks, replies matched by seq"""
+        sent_at: Dict[int, float] = {}
+        answered = set()
+
+        async with http.ws_connect(f"{self.base_url}/ws/meeting/{result.session_id}", max_msg_size=0) as ws:
+            result.connected = True
+
+            async def read():
+                async for msg in ws:
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        continue
+                    now = time.monotonic()
+                    payload = json.loads(msg.data)
+                    seq = payload.get("seq")
+                    if seq not in sent_at:
+                        continue
+                    if payload.get("type") == "transcript":
+                        answered.add(seq)
+                        result.transcript_latencies.append(now - sent_at[seq])
+                    elif payload.get("type") == "action_items":
+                        result.action_item_latencies.append(now - sent_at[seq])
+
+            reader = asyncio.create_task(read())
+            # Server seq numbers start at 1
+            await self._paced_send(ws, result, wav_bytes, lambda index, ts: sent_at.__setitem__(index + 1, ts))
+            await self._drain(reader, lambda: len(answered) >= len(sent_at))
+            await ws.close()
+            await reader
+
+        result.frames_unanswered = len(set(sent_at) - answered)
+
+    async def run_realtime_video(self, http: aiohttp.ClientSession, result: SessionResult):
+        """/ws/realtime-video: raw PCM, transcripts matched by audio_end offset"""
+        # Audio offset (seconds) at the end of each sent chunk, and when it was sent
+        sent_offsets: List[float] = []
+        sent_times: List[float] = []
+        last_final = {"offset": None, "at": None}
+
+        def sent_time_for(offset: float) -> Optional[float]:
+            index = bisect.bisect_left(sent_offsets, offset - 1e-6)
+            return sent_times[index] if index < len(sent_times) else None
+
+        async with http.ws_connect(f"{self.base_url}/ws/realtime-video/{result.session_id}", max_msg_size=0) as ws:
+            status = await ws.receive_json(timeout=self.args.connect_timeout)
+            if status.get("type") == "error":
+                result.errors.append(f"server: {status.get('message')}")
+                return
+            result.connected = True
+
+            async def read():
+                async for msg in ws:
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        continue
+                    now = time.monotonic()
+                    payload = json.loads(msg.data)
+                    if payload.get("type") == "transcript":
+                        data = payload.get("data", {})
+                        sent = sent_time_for(data["audio_end"]) if data.get("audio_end") is not None else None
+                        if sent is None:
+                            continue
+                        if data.get("is_final"):
+                            result.transcript_latencies.append(now - sent)
+                            last_final.update(offset=data["audio_end"], at=sent)
+                        else:
+                            result.interim_latencies.append(now - sent)
+                    elif payload.get("type") == "action_items" and last_final["at"] is not None:
+                        result.action_item_latencies.append(now - last_final["at"])
+
+            def on_sent(index: int, ts: float):
+                sent_offsets.append((index + 1) * self.chunk_seconds)
+                sent_times.append(ts)
+
+            reader = asyncio.create_task(read())
+            await self._paced_send(ws, result, lambda chunk: chunk, on_sent)
+            # Streaming STT has no per-chunk reply; give trailing results time to arrive
+            await self._drain(reader, lambda: False)
+            await ws.close()
+            await reader
+
+    async def run_session(self, http: aiohttp.ClientSession, index: int) -> SessionResult:
+        result = SessionResult(session_id=f"loadtest-{self.run_id}-{index}")
+        await asyncio.sleep(self.args.ramp_up * index / max(1, self.args.sessions))
+        runner = self.run_meeting if self.args.endpoint == "meeting" else self.run_realtime_video
+        try:
+            await runner(http, result)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+            result.errors.append(f"{type(e).__name__}: {e}")
+        if not result.connected:
+            result.frames_unsent = self.total_chunks - result.frames_sent
+        return result
+
+    async def sample_server(self, http: aiohttp.ClientSession, stop: asyncio.Event):
+        """Scrape process CPU/RSS and connection gauges from /metrics until stopped"""
+        while not stop.is_set():
+            try:
+                async with http.get(f"{self.http_url}/metrics") as response:
+                    text = await response.text()
+                sample = {"t": time.monotonic()}
+                for line in text.splitlines():
+                    if line.startswith("process_cpu_seconds_total "):
+                        sample["cpu_seconds"] = float(line.split()[1])
+                    elif line.startswith("process_resident_memory_bytes "):
+                        sample["rss_bytes"] = float(line.split()[1])
+                    elif line.startswith("websocket_connections{"):
+                        sample["websocket_connections"] = sample.get("websocket_connections", 0) + float(line.split()[1])
+                self.server_samples.append(sample)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, IndexError):
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), self.args.sample_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def server_report(self) -> Dict:
+        samples = [s for s in self.server_samples if "cpu_seconds" in s]
+        cpu_percent = [
+            100 * (b["cpu_seconds"] - a["cpu_seconds"]) / (b["t"] - a["t"])
+            for a, b in zip(samples, samples[1:])
+            if b["t"] > a["t"]
+        ]
+        rss = [s["rss_bytes"] for s in self.server_samples if "rss_bytes" in s]
+        connections = [s["websocket_connections"] for s in self.server_samples if "websocket_connections" in s]
+        return {
+            "samples": len(self.server_samples),
+            "cpu_percent_mean": round(sum(cpu_percent) / len(cpu_percent), 1) if cpu_percent else None,
+            "cpu_percent_max": round(max(cpu_percent), 1) if cpu_percent else None,
+            "rss_bytes_start": rss[0] if rss else None,
+            "rss_bytes_max": max(rss) if rss else None,
+            "rss_bytes_end": rss[-1] if rss else None,
+            "websocket_connections_max": max(connections) if connections else None
+        }
+
+    async def run(self) -> Dict:
+        timeout = aiohttp.ClientTimeout(total=None, connect=self.args.connect_timeout)
+        connector = aiohttp.TCPConnector(limit=0)
+        started_at = datetime.now(timezone.utc)
+        wall_start = time.monotonic()
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(self.sample_server(http, stop))
+            results = await asyncio.gather(*(self.run_session(http, i) for i in range(self.args.sessions)))
+            stop.set()
+            await sampler
+
+        return self.report(results, started_at, time.monotonic() - wall_start)
+
+    def report(self, results: List[SessionResult], started_at: datetime, elapsed: float) -> Dict:
+        expected = self.total_chunks * len(results)
+        sent = sum(r.frames_sent for r in results)
+        dropped = sum(r.frames_unsent + r.frames_unanswered for r in results)
+        errors = [f"{r.session_id}: {e}" for r in results for e in r.errors]
+
+        return {
+            "started_at": started_at.isoformat(),
+            "elapsed_seconds": round(elapsed, 2),
+            "config": {
+                "url": self.base_url,
+                "endpoint": self.args.endpoint,
+                "sessions": self.args.sessions,
+                "duration_seconds": self.args.duration,
+                "chunk_seconds": self.chunk_seconds,
+                "ramp_up_seconds": self.args.ramp_up,
+                "audio": self.args.audio or "synthetic"
+            },
+            "sessions": {
+                "requested": len(results),
+                "connected": sum(r.connected for r in results),
+                "with_errors": sum(bool(r.errors) for r in results)
+            },
+            "latency": {
+                "transcript": percentiles([v for r in results for v in r.transcript_latencies]),
+                "interim": percentiles([v for r in results for v in r.interim_latencies]),
+                "action_items": percentiles([v for r in results for v in r.action_item_latencies])
+            },
+            "frames": {
+                "expected": expected,
+                "sent": sent,
+                "late": sum(r.frames_late for r in results),
+                "unsent": sum(r.frames_unsent for r in results),
+                "unanswered": sum(r.frames_unanswered for r in results),
+                "dropped": dropped,
+                "dropped_rate": round(dropped / expected, 4) if expected else 0.0
+            },
+            "server": self.server_report(),
+            "errors": errors[:50]
+        }
+
+
+def check_thresholds(report: Dict, args: argparse.Namespace) -> List[str]:
+    """Regression gates; returns the failed checks"""
+    failures = []
+    p95 = report["latency"]["transcript"]["p95_ms"]
+    if args.max_p95_ms is not None and (p95 is None or p95 > args.max_p95_ms):
+        failures.append(f"transcript p95 {p95} ms > {args.max_p95_ms} ms")
+    if args.max_dropped_rate is not None and report["frames"]["dropped_rate"] > args.max_dropped_rate:
+        failures.append(f"dropped rate {report['frames']['dropped_rate']} > {args.max_dropped_rate}")
+    if report["sessions"]["connected"] < report["sessions"]["requested"]:
+        failures.append(f"only {report['sessions']['connected']}/{report['sessions']['requested']} sessions connected")
+    return failures
+
+
+def print_summary(report: Dict):
+    transcript = report["latency"]["transcript"]
+    actions = report["latency"]["action_items"]
+    frames = report["frames"]
+    server = report["server"]
+    print(f"📊 {report['config']['endpoint']}: {report['sessions']['connected']}/{report['sessions']['requested']} sessions, {report['elapsed_seconds']}s")
+    print(f"   transcript latency p50={transcript['p50_ms']} p95={transcript['p95_ms']} p99={transcript['p99_ms']} ms (n={transcript['count']})")
+    print(f"   action items latency p50={actions['p50_ms']} p95={actions['p95_ms']} ms (n={actions['count']})")
+    print(f"   frames sent={frames['sent']}/{frames['expected']} late={frames['late']} dropped={frames['dropped']} ({frames['dropped_rate']:.2%})")
+    rss_max = f"{server['rss_bytes_max'] / 2 ** 20:.0f} MiB" if server["rss_bytes_max"] else None
+    print(f"   server cpu mean={server['cpu_percent_mean']}% max={server['cpu_percent_max']}% rss max={rss_max}")
+    if report["errors"]:
+        print(f"   ⚠️ {len(report['errors'])} error(s), first: {report['errors'][0]}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Concurrent WebSocket load test for the Meeting Whisperer backend")
+    parser.add_argument("--url", default=os.getenv("LOAD_TEST_URL", "ws://localhost:8000"), help="Backend base URL (ws:// or wss://)")
+    parser.add_argument("--endpoint", choices=["meeting", "realtime-video"], default="meeting")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of audio streamed per session")
+    parser.add_argument("--chunk-seconds", type=float, default=None, help="Audio per message (default matches the frontend)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which sessions are started")
+    parser.add_argument("--audio", default=None, help="16 kHz mono 16-bit WAV to stream (looped); synthetic if omitted")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic audio")
+    parser.add_argument("--drain-timeout", type=float, default=10.0, help="Seconds to wait for replies after the last chunk")
+    parser.add_argument("--connect-timeout", type=float, default=10.0)
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between /metrics scrapes")
+    parser.add_argument("--report", default=None, help="Write the JSON report here (stdout if omitted)")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Fail if transcript p95 latency exceeds this")
+    parser.add_argument("--max-dropped-rate", type=float, default=None, help="Fail if dropped/expected frames exceeds this")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    pcm = load_audio(args.audio) if args.audio else synthetic_audio(min(args.duration, 30.0), args.seed)
+
+    report = asyncio.run(LoadTest(args, pcm).run())
+    failures = check_thresholds(report, args)
+    report["failures"] = failures
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print_summary(report)
+        print(f"📝 Report written to {args.report}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Anthropic Messages API, with prompt-cache accounting
+
+Point the backend at it with:
+    ANTHROPIC_BASE_URL=http://localhost:8010 python start_server.py
+
+Requests whose cacheable prefix (everything up to the last cache_control
+breakpoint) has been seen before report cache_read_input_tokens and respond
+faster; new prefixes report cache_creation_input_tokens. As with the real API,
+a prefix shorter than the model's minimum cacheable length (2048 tokens for
+Haiku, 1024 otherwise) is not cached at all. Both streaming and
+non-streaming calls are supported. When the request forces a tool
+(tool_choice type "tool"), the response text is returned as that tool's input.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PORT = int(os.getenv("MOCK_ANTHROPIC_PORT", "8010"))
+# Simulated prefill cost per uncached input token, and per cached token
+UNCACHED_SECONDS_PER_TOKEN = float(os.getenv("MOCK_UNCACHED_SECONDS_PER_TOKEN", "0.0002"))
+CACHED_SECONDS_PER_TOKEN = float(os.getenv("MOCK_CACHED_SECONDS_PER_TOKEN", "0.00002"))
+RESPONSE_TEXT = os.getenv(
+    "MOCK_RESPONSE_TEXT",
+    json.dumps({
+        "answer": "This is a stand-in response.",
+        "confidence": 0.5,
+        "sources": [],
+        "relevant_speakers": []
+    })
+)
+
+_seen_prefixes = set()
+
+
+def _min_cacheable_tokens(model: str) -> int:
+    return 2048 if "haiku" in (model or "") else 1024
+
+
+def _estimate_tokens(text: str) -> int:
+    return int(len(text) / 3.5) + 1
+
+
+def _blocks(content):
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    return content or []
+
+
+def _split_cacheable(body: dict):
+    """Return (cacheable_prefix_text, uncached_text) for a request body"""
+    blocks = _blocks(body.get("system"))
+    for message in body.get("messages", []):
+        blocks = blocks + _blocks(message.get("content"))
+
+    last_breakpoint = -1
+    for i, block in enumerate(blocks):
+        if block.get("cache_control"):
+            last_breakpoint = i
+
+    prefix = "".join(block.get("text", "") for block in blocks[:last_breakpoint + 1])
+    rest = "".join(block.get("text", "") for block in blocks[last_breakpoint + 1:])
+    return prefix, rest
+
+
+class MockAnthropicHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.startswith("/v1/messages"):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prefix, rest = _split_cacheable(body)
+
+        usage = {
+            "input_tokens": _estimate_tokens(rest),
+            "output_tokens": _estimate_tokens(RESPONSE_TEXT),
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0
+        }
+        if prefix and _estimate_tokens(prefix) < _min_cacheable_tokens(body.get("model")):
+            # Too short to cache: the breakpoint is ignored and the prefix billed as normal input
+            usage["input_tokens"] += _estimate_tokens(prefix)
+        elif prefix:
+            key = hashlib.sha256(prefix.encode()).hexdigest()
+            if key in _seen_prefixes:
+                usage["cache_read_input_tokens"] = _estimate_tokens(prefix)
+            else:
+                usage["cache_creation_input_tokens"] = _estimate_tokens(prefix)
+                _seen_prefixes.add(key)
+
+        # Time to first token scales with the tokens that had to be prefilled
+        time.sleep(
+            (usage["input_tokens"] + usage["cache_creation_input_tokens"]) * UNCACHED_SECONDS_PER_TOKEN
+            + usage["cache_read_input_tokens"] * CACHED_SECONDS_PER_TOKEN
+        )
+
+        content = [{"type": "text", "text": RESPONSE_TEXT}]
+        stop_reason = "end_turn"
+        tool_choice = body.get("tool_choice") or {}
+        if tool_choice.get("type") == "tool" and not body.get("stream"):
+            try:
+                tool_input = json.loads(RESPONSE_TEXT)
+            except json.JSONDecodeError:
+                tool_input = {"text": RESPONSE_TEXT}
+            content = [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}",
+                        "name": tool_choice["name"], "input": tool_input}]
+            stop_reason = "tool_use"
+
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage
+        }
+
+        if body.get("stream"):
+            self._stream(message)
+        else:
+            payload = json.dumps(message).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def _stream(self, message: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def event(name, data):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+        start = dict(message, content=[], stop_reason=None)
+        start["usage"] = dict(message["usage"], output_tokens=1)
+        event("message_start", {"type": "message_start", "message": start})
+        event("content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}})
+        text = message["content"][0]["text"]
+        for i in range(0, len(text), 16):
+            event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": text[i:i + 16]}})
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+        event("message_stop", {"type": "message_stop"})
+
+
+if __name__ == "__main__":
+    print(f"🧪 Mock Anthropic API listening on http://localhost:{PORT}")
+    ThreadingHTTPServer(("0.0.0.0", PORT), MockAnthropicHandler).serve_forever()
@@ -0,0 +1,12 @@
+"""
+Test setup - run from backend/ with `python -m pytest tests`
+"""
+import os
+import sys
+
+# Keep tests offline and side-effect free: simulated providers, no ledger file
+os.environ.setdefault("LLM_PROVIDER", "simulated")
+os.environ.setdefault("STT_PROVIDER", "simulated")
+os.environ.setdefault("USAGE_LEDGER_PATH", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,75 @@
+"""
+Tests for the per-provider circuit breaker
+"""
+import time
+
+import pytest
+
+from app import circuit_breaker
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+@pytest.fixture(autouse=True)
+def short_open_period(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_BREAKERS", True)
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_OPEN_SECONDS", 0.05)
+
+
+def fail(breaker: CircuitBreaker, error: Exception):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test")
+    for _ in range(circuit_breaker.CIRCUIT_MIN_CALLS):
+        fail(breaker, ServerError())
+    return breaker
+
+
+def test_opens_on_failure_rate_and_rejects_calls():
+    breaker = open_breaker()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pytest.fail("block must not run while open")
+
+
+def test_client_errors_do_not_open_it():
+    breaker = CircuitBreaker("test")
+    for _ in range(circuit_breaker.CIRCUIT_MIN_CALLS * 2):
+        fail(breaker, BadRequest())
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_it_on_success():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.available
+
+    with breaker.guard():
+        assert breaker.state == HALF_OPEN
+        # Only one probe at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.acquire()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["recent_calls"] == 0
+
+
+def test_failed_probe_reopens_it():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    fail(breaker, ServerError())
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["times_opened"] == 2
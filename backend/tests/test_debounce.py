@@ -0,0 +1,78 @@
+"""
+Tests for per-session utterance debouncing
+"""
+import asyncio
+
+from app.debounce import SUPERSEDED, UtteranceDebouncer
+
+
+class RecordingAnalyzer:
+    """analyze() for the debouncer that records each (speaker, text, context) it was run with"""
+
+    def __init__(self, seconds: float = 0.0):
+        self.seconds = seconds
+        self.started = []
+        self.finished = []
+
+    async def __call__(self, speaker, text, context):
+        self.started.append((speaker, text, context))
+        await asyncio.sleep(self.seconds)
+        self.finished.append(text)
+        return {"text": text}
+
+
+def test_burst_is_merged_and_only_the_latest_request_gets_the_result():
+    async def scenario():
+        debouncer, analyze = UtteranceDebouncer(debounce_ms=50, max_wait_ms=1000), RecordingAnalyzer()
+        first = asyncio.ensure_future(debouncer.submit("s", "Ann", "we should", analyze))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(debouncer.submit("s", "Bob", "agreed", analyze))
+        await asyncio.sleep(0.01)
+        third = asyncio.ensure_future(debouncer.submit("s", "Bob", "let's ship", analyze))
+
+        assert await first == SUPERSEDED
+        assert await second == SUPERSEDED
+        assert await third == {"text": "agreed let's ship"}
+        assert analyze.started == [("Bob", "agreed let's ship", [{"speaker": "Ann", "text": "we should"}])]
+
+    asyncio.run(scenario())
+
+
+def test_newer_utterance_cancels_the_running_analysis():
+    async def scenario():
+        debouncer, analyze = UtteranceDebouncer(debounce_ms=20, max_wait_ms=1000), RecordingAnalyzer(seconds=0.2)
+        first = asyncio.ensure_future(debouncer.submit("s", "Ann", "first part", analyze))
+        await asyncio.sleep(0.05)  # Debounce window over: analysis of "first part" is running
+        assert analyze.started == [("Ann", "first part", [])]
+
+        second = await debouncer.submit("s", "Ann", "second part", analyze)
+        assert await first == SUPERSEDED
+        assert second == {"text": "first part second part"}
+        assert analyze.finished == ["first part second part"]  # The stale analysis never finished
+
+    asyncio.run(scenario())
+
+
+def test_analysis_that_waited_max_wait_is_not_cancelled():
+    async def scenario():
+        debouncer, analyze = UtteranceDebouncer(debounce_ms=20, max_wait_ms=40), RecordingAnalyzer(seconds=0.1)
+        first = asyncio.ensure_future(debouncer.submit("s", "Ann", "first", analyze))
+        await asyncio.sleep(0.06)
+        second = await debouncer.submit("s", "Ann", "second", analyze)
+
+        assert await first == {"text": "first"}
+        assert second == {"text": "second"}
+
+    asyncio.run(scenario())
+
+
+def test_sessions_are_independent():
+    async def scenario():
+        debouncer, analyze = UtteranceDebouncer(debounce_ms=20, max_wait_ms=1000), RecordingAnalyzer()
+        results = await asyncio.gather(
+            debouncer.submit("a", "Ann", "hello there", analyze),
+            debouncer.submit("b", "Bob", "good morning", analyze)
+        )
+        assert results == [{"text": "hello there"}, {"text": "good morning"}]
+
+    asyncio.run(scenario())
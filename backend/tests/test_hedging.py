@@ -0,0 +1,78 @@
+"""
+Tests for request deadlines and hedged calls
+"""
+import asyncio
+
+import pytest
+
+from app.hedging import DeadlineExceeded, LatencyWindows, deadline_scope, hedged_call
+from app import hedging
+
+
+@pytest.fixture
+def warm_latency_window(monkeypatch):
+    """A window whose p95 for ("test", "model") is 50ms, so hedging kicks in"""
+    windows = LatencyWindows()
+    for _ in range(hedging.LLM_HEDGE_MIN_SAMPLES):
+        windows.observe(("test", "model"), 0.05)
+    monkeypatch.setattr(hedging, "latency_windows", windows)
+    monkeypatch.setattr(hedging, "LLM_HEDGING", True)
+    return windows
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled(warm_latency_window):
+    async def scenario():
+        calls = []
+
+        async def call():
+            index = len(calls)
+            calls.append("cancelled")
+            try:
+                await asyncio.sleep(1.0 if index == 0 else 0.01)
+            except asyncio.CancelledError:
+                raise
+            calls[index] = "finished"
+            return index
+
+        with deadline_scope(2000):
+            winner = await hedged_call(call, "test", "model")
+        await asyncio.sleep(0)
+        assert winner == 1
+        assert calls == ["cancelled", "finished"]
+
+    asyncio.run(scenario())
+
+
+def test_fast_call_is_not_hedged(warm_latency_window):
+    async def scenario():
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "primary"
+
+        assert await hedged_call(call, "test", "model") == "primary"
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_deadline_drops_late_answers():
+    async def scenario():
+        async def slow():
+            await asyncio.sleep(1.0)
+
+        with deadline_scope(50):
+            with pytest.raises(DeadlineExceeded):
+                await hedged_call(slow, "cold-agent", "model")
+
+    asyncio.run(scenario())
+
+
+def test_nested_deadline_keeps_the_earlier_one():
+    with deadline_scope(50):
+        outer = hedging.current_deadline()
+        with deadline_scope(5000):
+            assert hedging.current_deadline() == outer
+    assert hedging.current_deadline() is None
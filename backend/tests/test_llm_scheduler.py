@@ -0,0 +1,197 @@
+"""
+Tests for the LLM scheduler: admission order, limits, rate-limit budgets and retries
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import llm_scheduler
+from app.llm_scheduler import BATCH, INTERACTIVE, STANDARD, LLMScheduler
+
+
+def make_scheduler(**overrides) -> LLMScheduler:
+    options = {
+        "max_concurrency": 4,
+        "class_concurrency": {INTERACTIVE: 4, STANDARD: 4, BATCH: 4},
+        "interactive_reserve": 0.2,
+        "max_retries": 2
+    }
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+
+def test_cancelled_call_keeps_its_slot_until_the_thread_finishes():
+    async def scenario():
+        scheduler = make_scheduler(max_concurrency=1)
+        release_worker = threading.Event()
+
+        def blocking_call():
+            release_worker.wait(5)
+            return "late"
+
+        first = asyncio.create_task(scheduler.create(blocking_call, INTERACTIVE, "test", "model", 10, 10))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        second = asyncio.create_task(scheduler.create(lambda: "second", INTERACTIVE, "test", "model", 10, 10))
+        await asyncio.sleep(0.1)
+
+        # The orphaned thread still runs: the slot is still held and the new call waits visibly
+        assert not second.done()
+        assert scheduler.snapshot()["classes"][INTERACTIVE] == {"queued": 1, "in_flight": 1, "concurrency_limit": 4}
+
+        release_worker.set()
+        assert await asyncio.wait_for(second, 2) == "second"
+        assert scheduler._active[INTERACTIVE] == 0
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+class FakeAPIError(Exception):
+    """SDK-like error with a status code and response headers"""
+
+    def __init__(self, status_code: int, retry_after: float = None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+
+def response(input_tokens: int, output_tokens: int):
+    return SimpleNamespace(usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens))
+
+
+def test_waiting_calls_are_dispatched_by_priority():
+    async def scenario():
+        scheduler = make_scheduler(max_concurrency=1)
+        gate = threading.Event()
+        order = []
+
+        def call(name):
+            def run():
+                order.append(name)
+                return name
+            return run
+
+        blocker = asyncio.ensure_future(scheduler.create(lambda: gate.wait(5), BATCH, "test", "model", 1, 1))
+        await asyncio.sleep(0.02)
+        waiting = [
+            asyncio.ensure_future(scheduler.create(call(priority), priority, "test", "model", 1, 1))
+            for priority in (BATCH, STANDARD, INTERACTIVE)
+        ]
+        await asyncio.sleep(0.02)
+        gate.set()
+        await asyncio.gather(blocker, *waiting)
+        assert order == [INTERACTIVE, STANDARD, BATCH]
+
+    asyncio.run(scenario())
+
+
+def test_class_limit_leaves_room_for_other_classes():
+    async def scenario():
+        scheduler = make_scheduler(class_concurrency={INTERACTIVE: 4, STANDARD: 4, BATCH: 1})
+        gate = threading.Event()
+        batch = [
+            asyncio.ensure_future(scheduler.create(lambda: gate.wait(5), BATCH, "test", "model", 1, 1))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.02)
+        classes = scheduler.snapshot()["classes"]
+        assert (classes[BATCH]["in_flight"], classes[BATCH]["queued"]) == (1, 2)
+
+        # Interactive work isn't stuck behind the queued batch calls
+        assert await asyncio.wait_for(scheduler.create(lambda: "live", INTERACTIVE, "test", "model", 1, 1), 1) == "live"
+        gate.set()
+        await asyncio.gather(*batch)
+        assert scheduler.snapshot()["classes"][BATCH]["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_interactive_reserve_and_token_refund(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "LLM_INPUT_TOKENS_PER_MINUTE", 1000)
+    monkeypatch.setattr(llm_scheduler, "LLM_OUTPUT_TOKENS_PER_MINUTE", 1000)
+
+    async def scenario():
+        scheduler = make_scheduler(interactive_reserve=0.2)
+        # Reserves 900 input and 500 output tokens; the response reports 100 output tokens
+        await scheduler.create(lambda: response(900, 100), STANDARD, "test", "model", 900, 500)
+        budget = scheduler.snapshot()["models"]["model"]
+        assert budget["input_tokens_available"] == pytest.approx(100, abs=5)
+        assert budget["output_tokens_available"] == pytest.approx(900, abs=5)
+
+        # Only the interactive reserve is left: a standard call waits, an interactive one runs
+        standard = asyncio.ensure_future(scheduler.create(lambda: "standard", STANDARD, "test", "model", 100, 10))
+        interactive = await asyncio.wait_for(scheduler.create(lambda: "interactive", INTERACTIVE, "test", "model", 50, 10), 1)
+        await asyncio.sleep(0.05)
+        assert interactive == "interactive"
+        assert not standard.done()
+        assert scheduler.snapshot()["classes"][STANDARD]["queued"] == 1
+        standard.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_rejected_call_refunds_its_whole_reservation(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "LLM_INPUT_TOKENS_PER_MINUTE", 1000)
+
+    async def scenario():
+        scheduler = make_scheduler(max_retries=0)
+
+        def rejected():
+            raise FakeAPIError(429, retry_after=0)
+
+        with pytest.raises(FakeAPIError):
+            await scheduler.create(rejected, STANDARD, "test", "model", 600, 10)
+        assert scheduler.snapshot()["models"]["model"]["input_tokens_available"] == pytest.approx(1000, abs=5)
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_pauses_the_model_for_every_caller():
+    async def scenario():
+        scheduler = make_scheduler()
+        attempts = []
+
+        def rate_limited_once():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise FakeAPIError(429, retry_after=0.3)
+            return "ok"
+
+        start = time.monotonic()
+        first = asyncio.ensure_future(scheduler.create(rate_limited_once, STANDARD, "test", "model", 1, 1))
+        await asyncio.sleep(0.05)
+        assert scheduler.snapshot()["models"]["model"]["paused_for_seconds"] > 0
+
+        # A different caller on the same model also waits out the pause; other models don't
+        other_started = []
+        other = asyncio.ensure_future(scheduler.create(lambda: other_started.append(time.monotonic()), INTERACTIVE, "test", "model", 1, 1))
+        assert await asyncio.wait_for(scheduler.create(lambda: "free", INTERACTIVE, "test", "other-model", 1, 1), 1) == "free"
+
+        assert await first == "ok"
+        await other
+        assert attempts[1] - start >= 0.3
+        assert other_started[0] - start >= 0.3
+
+    asyncio.run(scenario())
+
+
+def test_non_retryable_errors_are_not_retried():
+    async def scenario():
+        scheduler = make_scheduler()
+        attempts = []
+
+        def bad_request():
+            attempts.append(1)
+            raise FakeAPIError(400)
+
+        with pytest.raises(FakeAPIError):
+            await scheduler.create(bad_request, STANDARD, "test", "model", 1, 1)
+        assert len(attempts) == 1
+        assert scheduler._active[STANDARD] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,101 @@
+"""
+Tests for the @timed agent latency decorator
+"""
+import asyncio
+
+import pytest
+
+from app.metrics import agent_call_seconds, record_outcome, timed
+
+
+def count(method: str, outcome: str) -> int:
+    state = agent_call_seconds._values.get(("test_agent", method, outcome))
+    return state[-1] if state else 0
+
+
+@timed("test_agent")
+async def answers():
+    return "answer"
+
+
+@timed("test_agent")
+async def falls_back():
+    try:
+        raise ConnectionError("provider down")
+    except ConnectionError:
+        record_outcome("fallback")
+        return "local answer"
+
+
+@timed("test_agent")
+async def raises():
+    raise ValueError("bad input")
+
+
+@timed("test_agent")
+async def outer_with_failing_inner():
+    await falls_back()
+    return "answer"
+
+
+def test_outcome_reflects_how_the_call_ended():
+    before = {method: count(method, outcome) for method, outcome in [
+        ("answers", "ok"), ("falls_back", "fallback"), ("raises", "error"), ("outer_with_failing_inner", "ok")
+    ]}
+
+    async def scenario():
+        await answers()
+        await falls_back()
+        with pytest.raises(ValueError):
+            await raises()
+        await outer_with_failing_inner()
+
+    asyncio.run(scenario())
+    assert count("answers", "ok") == before["answers"] + 1
+    assert count("falls_back", "fallback") == before["falls_back"] + 2
+    assert count("falls_back", "ok") == 0
+    assert count("raises", "error") == before["raises"] + 1
+    # A fallback inside a nested timed call is that call's outcome, not the caller's
+    assert count("outer_with_failing_inner", "ok") == before["outer_with_failing_inner"] + 1
+
+
+def test_outcome_outside_a_timed_call_is_ignored():
+    record_outcome("error")
+
+
+@timed("test_agent")
+async def streams():
+    for index in range(3):
+        await asyncio.sleep(0)
+        yield index
+
+
+@timed("test_agent")
+async def waits():
+    await asyncio.sleep(1.0)
+
+
+def test_streams_and_cancelled_calls():
+    before = {(method, outcome): count(method, outcome) for method, outcome in [
+        ("streams", "ok"), ("streams", "cancelled"), ("waits", "cancelled")
+    ]}
+
+    async def scenario():
+        assert [item async for item in streams()] == [0, 1, 2]
+
+        # Consumer stops early, as when an SSE client disconnects
+        stream = streams()
+        await stream.__anext__()
+        await stream.aclose()
+
+        task = asyncio.ensure_future(waits())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert count("streams", "ok") == before[("streams", "ok")] + 1
+    assert count("streams", "cancelled") == before[("streams", "cancelled")] + 1
+    assert count("streams", "error") == 0
+    assert count("waits", "cancelled") == before[("waits", "cancelled")] + 1
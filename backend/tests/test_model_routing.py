@@ -0,0 +1,31 @@
+"""
+Tests for per-utterance model routing
+"""
+import pytest
+
+from app.model_routing import FAST, LOCAL, SKIP, STRONG, classify_utterance
+
+
+@pytest.mark.parametrize("text", ["Okay.", "Right.", "Yeah, sure.", "Uh-huh.", "Hmm...", ""])
+def test_filler_is_skipped_despite_punctuation(text):
+    assert classify_utterance(text).tier == SKIP
+
+
+@pytest.mark.parametrize("text", [
+    "I am really upset about this.",
+    "Honestly this is terrible news",
+    "That went badly wrong",
+    "That's not great"
+])
+def test_short_lines_the_heuristic_cannot_read_go_to_a_model(text):
+    assert classify_utterance(text).tier == FAST
+
+
+def test_short_line_with_a_keyword_cue_stays_local():
+    assert classify_utterance("Thanks, that's great!").tier == LOCAL
+
+
+def test_action_cues_and_dense_jargon():
+    assert classify_utterance("We need to fix the bug").tier == FAST
+    dense = " ".join(["the API latency on the p99 endpoint and the Kubernetes cluster config"] * 3)
+    assert classify_utterance(dense).tier == STRONG
@@ -0,0 +1,32 @@
+"""
+Tests for prompt cache breakpoints
+"""
+from app.prompt_cache import cache_min_tokens, cached_system, cached_user_content
+from app.tokens import count_tokens
+
+HAIKU = "claude-3-haiku-20240307"
+SONNET = "claude-3-5-sonnet-20241022"
+
+
+def test_minimum_depends_on_the_model():
+    assert cache_min_tokens(HAIKU) == 2048
+    assert cache_min_tokens(SONNET) == 1024
+
+
+def test_short_prompts_are_sent_without_a_breakpoint():
+    assert cached_system("You are a meeting summarizer.", HAIKU) == "You are a meeting summarizer."
+    assert cached_user_content("Instructions", "New line", HAIKU) == "Instructions\n\nNew line"
+
+
+def test_long_prefix_gets_a_breakpoint_counting_the_system_prompt():
+    lines = [f"Speaker {i % 4}: we discussed item number {i} of the rollout plan" for i in range(400)]
+    content = cached_user_content("\n".join(lines), "USER QUESTION: when do we ship?", HAIKU, system="You answer questions.")
+    assert content[0]["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in content[1]
+
+    # A prefix just over half of Haiku's minimum only qualifies together with the system prompt
+    half = ""
+    while count_tokens(half) <= cache_min_tokens(HAIKU) // 2:
+        half += lines.pop() + "\n"
+    assert isinstance(cached_user_content(half, "q", HAIKU), str)
+    assert isinstance(cached_user_content(half, "q", HAIKU, system=half), list)
@@ -0,0 +1,34 @@
+"""
+Tests for transcript chunking and retrieval
+"""
+from datetime import datetime
+
+import pytest
+
+from app.models import TranscriptLine
+from app.retrieval import chunk_transcript
+
+
+def make_transcript(turns: int, lines_per_turn: int):
+    return [
+        TranscriptLine(speaker=f"Speaker {turn % 2}", text=f"turn {turn} line {line}", timestamp=datetime.now())
+        for turn in range(turns)
+        for line in range(lines_per_turn)
+    ]
+
+
+@pytest.mark.parametrize("turns,lines_per_turn", [(12, 4), (30, 1), (3, 25), (7, 5), (1, 1)])
+def test_every_line_is_in_a_chunk(turns, lines_per_turn):
+    transcript = make_transcript(turns, lines_per_turn)
+    chunks = chunk_transcript(transcript, turns_per_chunk=6, overlap=2, max_lines=12)
+
+    covered = {transcript.index(line) for chunk in chunks for line in chunk.lines}
+    assert covered == set(range(len(transcript)))
+    assert all(len(chunk.lines) <= 12 for chunk in chunks)
+
+
+def test_chunks_overlap_and_stay_in_order():
+    transcript = make_transcript(12, 1)
+    chunks = chunk_transcript(transcript, turns_per_chunk=6, overlap=2, max_lines=12)
+
+    assert [(chunk.start_line, chunk.end_line) for chunk in chunks] == [(0, 5), (4, 9), (8, 11)]
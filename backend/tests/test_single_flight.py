@@ -0,0 +1,135 @@
+"""
+Tests for single-flight request coalescing
+"""
+import asyncio
+
+import pytest
+
+from app.agents.emotion_agent import EmotionAnalysisAgent
+from app.batch_mode import _current_batch
+from app.hedging import DeadlineExceeded, check_deadline, deadline_scope
+from app.single_flight import SingleFlight
+from app.tokens import token_usage
+
+
+class CountingWork:
+    """Zero-argument coroutine function that counts its runs and takes `seconds`"""
+
+    def __init__(self, seconds: float = 0.05, result=None):
+        self.seconds = seconds
+        self.result = result if result is not None else {"value": 1}
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+        await asyncio.sleep(self.seconds)
+        return self.result
+
+
+def test_concurrent_callers_share_one_call_and_get_their_own_copy():
+    async def scenario():
+        group, work = SingleFlight(), CountingWork()
+        results = await asyncio.gather(*[group.do("op", "key", work) for _ in range(3)])
+        assert work.runs == 1
+        assert results == [{"value": 1}] * 3
+        assert len({id(result) for result in results}) == 3
+        assert group.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_work_is_cancelled_only_when_every_caller_is_gone():
+    async def scenario():
+        group, work = SingleFlight(), CountingWork(seconds=0.2)
+        first = asyncio.ensure_future(group.do("op", "key", work))
+        second = asyncio.ensure_future(group.do("op", "key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == {"value": 1}
+
+    asyncio.run(scenario())
+
+
+def test_callers_with_and_without_a_deadline_do_not_share():
+    async def scenario():
+        group, work = SingleFlight(), CountingWork()
+
+        async def realtime():
+            with deadline_scope(1000):
+                return await group.do("op", "key", work)
+
+        await asyncio.gather(realtime(), group.do("op", "key", work))
+        assert work.runs == 2
+
+    asyncio.run(scenario())
+
+
+def test_batch_and_live_callers_do_not_share():
+    async def scenario():
+        group, work = SingleFlight(), CountingWork()
+
+        async def batched():
+            token = _current_batch.set(object())
+            try:
+                return await group.do("op", "key", work)
+            finally:
+                _current_batch.reset(token)
+
+        await asyncio.gather(batched(), group.do("op", "key", work))
+        assert work.runs == 2
+
+    asyncio.run(scenario())
+
+
+def test_joiner_enforces_its_own_deadline():
+    async def scenario():
+        group, work = SingleFlight(), CountingWork(seconds=0.3)
+
+        async def caller(milliseconds):
+            with deadline_scope(milliseconds):
+                return await group.do("op", "key", work)
+
+        leader = asyncio.ensure_future(caller(2000))
+        await asyncio.sleep(0.01)
+        with pytest.raises(DeadlineExceeded):
+            await caller(50)
+        assert await leader == {"value": 1}
+        assert work.runs == 1
+
+    asyncio.run(scenario())
+
+
+def test_joiner_retries_when_the_leaders_earlier_deadline_runs_out():
+    async def scenario():
+        group = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.1)
+            check_deadline("op")  # Stands in for hedged_call noticing the leader's deadline
+            return "done"
+
+        async def caller(milliseconds):
+            with deadline_scope(milliseconds):
+                return await group.do("op", "key", work)
+
+        leader = asyncio.ensure_future(caller(50))
+        await asyncio.sleep(0.01)
+        assert await caller(2000) == "done"
+        with pytest.raises(DeadlineExceeded):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_same_line_in_two_meetings_is_booked_to_both():
+    async def scenario():
+        agent = EmotionAnalysisAgent()
+        line = "We should migrate the Kubernetes ingress to the new gateway API before the Postgres upgrade"
+        await asyncio.gather(
+            agent.analyze_single_message("Ann", line, session_id="meeting-a"),
+            agent.analyze_single_message("Ann", line, session_id="meeting-b")
+        )
+
+    asyncio.run(scenario())
+    for session_id in ("meeting-a", "meeting-b"):
+        assert token_usage.session_totals(session_id)["agents"]["emotion"]["prompts"] == 1
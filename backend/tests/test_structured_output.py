@@ -0,0 +1,85 @@
+"""
+Tests for streamed structured output
+"""
+import asyncio
+
+from app.agents.qa_agent import QAAgent
+from app.metrics import agent_call_seconds
+from app.structured_output import JSONFieldStream, parse_json_text
+
+
+def feed_all(chunks):
+    fields = JSONFieldStream()
+    events = []
+    for chunk in chunks:
+        events.extend(fields.feed(chunk))
+    return events + fields.finish()
+
+
+def test_partials_carry_only_new_text():
+    events = feed_all(['{"answer": "The re', 'lease is', ' on Friday", "confi', 'dence": "high"}'])
+
+    deltas = [event["delta"] for event in events if event["type"] == "partial"]
+    assert "".join(deltas) == "The release is on Friday"
+    assert deltas == ["The re", "lease is", " on Friday"]
+    assert {"type": "field", "field": "answer", "value": "The release is on Friday"} in events
+
+
+def test_raw_control_characters_in_strings_are_repaired():
+    assert parse_json_text('{"a": "x\ty\r\x01z\nw"}') == ({"a": "x\ty\r\x01z\nw"}, True)
+
+
+def test_bracketed_preamble_is_skipped():
+    assert parse_json_text('Here is the JSON [as requested]: {"answer": "ok"}') == ({"answer": "ok"}, True)
+    assert parse_json_text('Here is the JSON [as requested: {"answer": "ok"}') == ({"answer": "ok"}, True)
+
+    events = feed_all(['Here is the JSON [as reque', 'sted]: {"answer": "o', 'k"}'])
+    assert {"type": "field", "field": "answer", "value": "ok"} in events
+
+
+class BrokenStream:
+    """astream() stand-in whose text stream fails after a few chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    async def text_stream(self):
+        for chunk in self.chunks:
+            yield chunk
+        raise ConnectionError("stream reset")
+
+
+def stream_answer_calls(outcome: str) -> int:
+    state = agent_call_seconds._values.get(("qa", "stream_answer", outcome))
+    return state[-1] if state else 0
+
+
+def test_failure_after_streaming_started_sends_error_not_fallback():
+    errors = stream_answer_calls("error")
+
+    async def scenario():
+        agent = QAAgent()
+        agent.client.messages.astream = lambda **kwargs: BrokenStream(['{"answer": "We agr', 'eed to'])
+        return [event async for event in agent.stream_answer("What did we agree?", [])]
+
+    events = asyncio.run(scenario())
+    assert events[-1] == {"type": "error", "message": "stream reset"}
+    assert not any(event["type"] in ("result", "field") for event in events)
+    assert stream_answer_calls("error") == errors + 1
+
+
+def test_failure_before_streaming_still_falls_back():
+    async def scenario():
+        agent = QAAgent()
+        agent.client.messages.astream = lambda **kwargs: BrokenStream([])
+        return [event async for event in agent.stream_answer("What did we agree?", [])]
+
+    events = asyncio.run(scenario())
+    assert events[-1]["type"] == "result"
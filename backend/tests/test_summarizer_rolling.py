@@ -0,0 +1,77 @@
+"""
+Tests for the summarizer's per-session rolling state
+"""
+import asyncio
+from datetime import datetime
+
+from app.agents.summarizer_agent import SummarizerAgent
+from app.models import TranscriptLine
+
+
+def lines(count: int):
+    return [
+        TranscriptLine(speaker=f"Speaker {i % 3}", text=f"Line {i} about the release plan", timestamp=datetime.now())
+        for i in range(count)
+    ]
+
+
+def slow_agent(seconds: float) -> SummarizerAgent:
+    agent = SummarizerAgent()
+    agent.chunk_lines = 4
+    summarize_chunk = agent._summarize_chunk
+
+    async def slow_summarize_chunk(*args):
+        await asyncio.sleep(seconds)
+        return await summarize_chunk(*args)
+
+    agent._summarize_chunk = slow_summarize_chunk
+    return agent
+
+
+def test_drop_session_cancels_background_chunks():
+    async def scenario():
+        agent = slow_agent(1.0)
+        for line in lines(4):
+            agent.add_transcript_line("s", line)
+        task = agent.rolling["s"].task
+
+        agent.drop_session("s")
+        await asyncio.sleep(0)
+        assert "s" not in agent.rolling
+        assert task.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_summary_survives_state_dropped_while_waiting():
+    async def scenario():
+        agent = slow_agent(0.2)
+        transcript = lines(8)
+        for line in transcript:
+            agent.add_transcript_line("s", line)
+
+        pending = asyncio.ensure_future(agent.generate_summary(transcript, [], session_id="s"))
+        await asyncio.sleep(0.05)
+        agent.drop_session("s")
+
+        summary = await pending
+        assert summary["summary"] != "Error generating summary"
+        assert "s" not in agent.rolling
+
+    asyncio.run(scenario())
+
+
+def test_state_restarted_after_drop_is_not_reused():
+    async def scenario():
+        agent = slow_agent(0)
+        transcript = lines(6)
+        for line in transcript[:3]:
+            agent.add_transcript_line("s", line)
+        agent.drop_session("s")
+        for line in transcript[3:]:
+            agent.add_transcript_line("s", line)
+
+        chunk_summaries = await agent._collect_chunk_summaries(transcript, "s")
+        assert [(chunk["start_line"], chunk["end_line"]) for chunk in chunk_summaries] == [(0, 4), (4, 6)]
+
+    asyncio.run(scenario())
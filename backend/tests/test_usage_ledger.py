@@ -0,0 +1,60 @@
+"""
+Tests for the usage ledger and the token totals read from it
+"""
+from types import SimpleNamespace
+
+from app.tokens import TokenUsageTracker
+from app.usage_ledger import UsageLedger
+
+
+def llm_response(input_tokens: int, output_tokens: int):
+    return SimpleNamespace(model="claude-3-haiku-20240307", usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens))
+
+
+def test_ledger_file_is_rotated(tmp_path):
+    path = tmp_path / "usage_ledger.jsonl"
+    ledger = UsageLedger(path=str(path), max_bytes=200, backups=2)
+    for _ in range(4):
+        for _ in range(3):
+            ledger.record("jira", "create_issue", "jira", 12.0)
+        ledger.flush()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["usage_ledger.jsonl", "usage_ledger.jsonl.1", "usage_ledger.jsonl.2"]
+
+
+def test_session_totals_are_bounded_but_agent_totals_are_not():
+    ledger = UsageLedger(path="", max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        ledger.record("simulated", "messages.create", "qa", 5.0, session_id=session_id, input_tokens=10)
+
+    assert ledger.session_agent_totals("a") == {}
+    assert ledger.session_agent_totals("c")["qa"]["input_tokens"] == 10
+    assert ledger.agent_totals()["qa"]["input_tokens"] == 30
+
+
+def test_token_totals_come_from_the_ledger(monkeypatch):
+    ledger = UsageLedger(path="")
+    monkeypatch.setattr("app.tokens.usage_ledger", ledger)
+    tracker = TokenUsageTracker()
+
+    ledger.record_llm("simulated", "messages.create", "summarizer", None, llm_response(100, 20), 50.0)
+    ledger.record("whisper_api", "chunk", "listener", 80.0, session_id="unscoped", audio_seconds=3.0)
+    tracker.record(None, "summarizer", prompt_tokens=95, trimmed_lines=4)
+
+    totals = tracker.session_totals("unscoped")
+    assert list(totals["agents"]) == ["summarizer"]  # Speech-to-text has no tokens to report
+    assert totals["total"]["input_tokens"] == 100
+    assert totals["total"]["output_tokens"] == 20
+    assert totals["total"]["prompt_tokens_estimated"] == 95
+    assert totals["total"]["trimmed_lines"] == 4
+
+
+def test_token_tracker_is_bounded_per_session(monkeypatch):
+    monkeypatch.setattr("app.tokens.usage_ledger", UsageLedger(path=""))
+    tracker = TokenUsageTracker(max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        tracker.record(session_id, "qa", prompt_tokens=10)
+
+    assert tracker.session_totals("a")["agents"] == {}
+    assert tracker.session_totals("c")["total"]["prompt_tokens_estimated"] == 10
+    assert tracker.agent_totals()["qa"]["prompt_tokens_estimated"] == 30
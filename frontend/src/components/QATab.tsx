@@ -284,35 +284,91 @@ export const QATab: React.FC<QATabProps> = ({ transcript }) => {
     // Add question to list
     setQuestions(prev => [...prev, question]);
 
-    // Call backend to get AI answer
-    try {
+    const setAnswer = (answer: string) => {
+      setQuestions(prev =>
+        prev.map(q =>
+          q.id === question.id
+            ? { ...q, hasAnswer: true, answer }
+            : q
+        )
+      );
+    };
+
+    const requestBody = JSON.stringify({
+      question: newQuestion,
+      transcript: transcript.map(item => ({
+        speaker: item.speaker,
+        text: item.text,
+        timestamp: item.timestamp || new Date().toISOString()
+      }))
+    });
+
+    // Non-streaming answer, used when the stream fails before any answer text arrived
+    const askWithoutStreaming = async () => {
       const response = await fetch('http://localhost:8000/api/qa/ask', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          question: newQuestion,
-          transcript: transcript.map(item => ({
-            speaker: item.speaker,
-            text: item.text,
-            timestamp: item.timestamp || new Date().toISOString()
-          }))
-        })
+        body: requestBody
       });
-
       const result = await response.json();
+      setAnswer(result.answer || '⚠️ Could not get an answer. Please try again.');
+    };
 
-      if (result.answer) {
-        // Update question with answer
-        setQuestions(prev =>
-          prev.map(q =>
-            q.id === question.id
-              ? { ...q, hasAnswer: true, answer: result.answer }
-              : q
-          )
-        );
+    // Call backend to get AI answer, streamed so it appears as it is written
+    let streamedAnswer = '';
+    let completed = false;
+    try {
+      const response = await fetch('http://localhost:8000/api/qa/ask/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: requestBody
+      });
+
+      if (!response.body) throw new Error('No response stream');
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Server-Sent Events are separated by a blank line
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop() || '';
+        for (const message of messages) {
+          if (!message.startsWith('data: ')) continue;
+          const event = JSON.parse(message.slice(6));
+          if (event.type === 'partial' && event.field === 'answer') {
+            // Partials carry only the newly written text
+            streamedAnswer = event.reset ? event.delta : streamedAnswer + event.delta;
+            setAnswer(streamedAnswer);
+          } else if (event.type === 'field' && event.field === 'answer') {
+            streamedAnswer = event.value;
+            setAnswer(event.value);
+          } else if (event.type === 'complete') {
+            completed = true;
+            if (event.result?.answer) setAnswer(event.result.answer);
+          } else if (event.type === 'error') {
+            throw new Error(event.message || 'Answer stream failed');
+          }
+        }
       }
+      if (!completed) throw new Error('Answer stream ended early');
     } catch (err) {
       console.error('Failed to get Q&A answer:', err);
+      if (streamedAnswer) {
+        // Keep what was written, but don't present it as a complete answer
+        setAnswer(`${streamedAnswer}\n\n⚠️ The answer was interrupted and may be incomplete.`);
+      } else {
+        try {
+          await askWithoutStreaming();
+        } catch (fallbackErr) {
+          console.error('Failed to get Q&A answer:', fallbackErr);
+          setAnswer('⚠️ Could not get an answer. Please try again.');
+        }
+      }
     }
 
     setNewQuestion('');
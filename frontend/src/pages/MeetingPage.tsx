@@ -810,7 +810,8 @@ const MeetingPage: React.FC = () => {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           transcript: transcriptData,
-          existing_action_items: existingActionItems
+          existing_action_items: existingActionItems,
+          session_id: sessionIdRef.current  // Tokens are booked to this meeting
         })
       });
       
@@ -993,6 +994,7 @@ Click OK to open the ticket in Jira.`;
               body: JSON.stringify({
                 text: finalTranscript,
                 speaker: 'You',
+                session_id: sessionIdRef.current,  // Rapid phrases of this session are analyzed together
                 recent_transcript: transcript.slice(-5).map(item => ({  // Send last 5 lines as context
                   speaker: item.speaker,
                   text: item.text,
@@ -1021,7 +1023,7 @@ Click OK to open the ticket in Jira.`;
               speaker: 'You',
               text: finalTranscript,
               timestamp: new Date().toISOString(),
-              emotions: emotionData
+              emotions: emotionData.error || emotionData.superseded ? undefined : emotionData  // Late, failed or merged-into-a-newer-line analysis isn't shown
             };
             
             setTranscript(prev => {
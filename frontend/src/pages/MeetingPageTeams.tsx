@@ -371,11 +371,13 @@ const MeetingPageTeams: React.FC = () => {
               body: JSON.stringify({
                 text: finalTranscript,
                 speaker: 'You',
-                recent_transcript: transcript.slice(-5).map(item => ({
+                session_id: sessionIdRef.current,  // Rapid phrases of this session are analyzed together
+                recent_transcript: transcript.slice(-10).map(item => ({
                   speaker: item.speaker,
                   text: item.text,
                   timestamp: new Date().toISOString()
-                }))
+                })),
+                user_profile: userProfile  // Explanation comes back in the same response
               })
             });
 
@@ -387,11 +389,16 @@ const MeetingPageTeams: React.FC = () => {
               setRealtimeInsights(prev => [...prev, ...emotionData.realtime_insights]);
             }
 
+            // Personalized explanation for terms outside the user's background
+            if (emotionData.personalized_explanation) {
+              setAgentData(emotionData.personalized_explanation);
+            }
+
             const newTranscriptItem = {
               speaker: 'You',
               text: finalTranscript,
               timestamp: new Date().toISOString(),
-              emotions: emotionData
+              emotions: emotionData.error || emotionData.superseded ? undefined : emotionData  // Late, failed or merged-into-a-newer-line analysis isn't shown
             };
 
             setTranscript(prev => {
@@ -402,9 +409,6 @@ const MeetingPageTeams: React.FC = () => {
                 generateActionItems(updated);
               }
 
-              // Call personalized assistant to check for explanations
-              checkForPersonalizedHelp(finalTranscript, updated);
-
               return updated;
             });
 
@@ -458,32 +462,6 @@ const MeetingPageTeams: React.FC = () => {
     setIsRecording(false);
   };
 
-  // Check for personalized help
-  const checkForPersonalizedHelp = async (latestText: string, currentTranscript: TranscriptItem[]) => {
-    try {
-      const response = await fetch('http://localhost:8000/api/personalized-assistant/analyze', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          user_profile: userProfile,
-          recent_transcript: currentTranscript.slice(-10).map(item => ({
-            speaker: item.speaker,
-            text: item.text
-          })),
-          latest_text: latestText
-        })
-      });
-
-      const result = await response.json();
-
-      if (result.explanation) {
-        setAgentData(result.explanation);
-      }
-    } catch (err) {
-      console.error('Personalized assistant failed:', err);
-    }
-  };
-
   // Generate action items
   const generateActionItems = async (currentTranscript: TranscriptItem[]) => {
     try {
@@ -516,7 +494,8 @@ const MeetingPageTeams: React.FC = () => {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           transcript: transcriptData,
-          existing_action_items: existingActionItems
+          existing_action_items: existingActionItems,
+          session_id: sessionIdRef.current  // Tokens are booked to this meeting
         })
       });
 